@@ -15,12 +15,15 @@ from app.models.campaign import Campaign, CampaignAudience, CampaignStatus, Mess
 from app.services.store_factory import campaigns_store as campaign_store, leads_store
 from app.services.campaign_scheduler import CampaignScheduler
 from app.services.message_sender import MessageSender
+from app.services.send_worker import SendWorker
+from app.services.pagination import InvalidCursor
 
 router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
 # Initialize services
 scheduler = CampaignScheduler()
 sender = MessageSender()
+send_worker = SendWorker(scheduler, sender, campaign_store, leads_store)
 
 
 @router.get("", response_model=DataResponse[CampaignsResponse])
@@ -29,27 +32,39 @@ async def list_campaigns(
     page_size: int = Query(25, ge=1, le=100),
     status: List[CampaignStatus] = Query(None),
     search: str = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
     user: Dict[str, Any] = Depends(require_auth)
 ):
-    """List campaigns with filtering and pagination."""
+    """List campaigns with filtering and pagination (offset, or keyset when cursor is given)."""
     try:
         query = CampaignQuery(
             page=page,
             page_size=page_size,
             status=status,
-            search=search
+            search=search,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        campaigns, total = campaign_store.list_campaigns(query)
+        if cursor is not None:
+            result = campaign_store.campaigns_page(query)
+            campaigns, total, next_cursor = result.items, result.total, result.next_cursor
+        else:
+            campaigns, total = campaign_store.list_campaigns(query)
+            next_cursor = None
         
         response = CampaignsResponse(
             items=[CampaignOut.model_validate(c.__dict__) for c in campaigns],
-            total=total
+            total=total,
+            next_cursor=next_cursor
         )
         
         logger.info(f"Listed {len(campaigns)} campaigns (total: {total})")
         return DataResponse(data=response)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing campaigns: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -225,6 +240,7 @@ async def resume_campaign(
         # Update status
         campaign_store.update_campaign_status(campaign_id, CampaignStatus.running)
         scheduler.resume_campaign(campaign_id)
+        send_worker.notify(campaign.domain)
         
         logger.info(f"Resumed campaign {campaign_id}")
         return DataResponse(data=CampaignActionResponse(ok=True, message="Campaign resumed"))
@@ -311,8 +327,11 @@ async def dry_run_campaign(
         if not audience:
             raise HTTPException(status_code=400, detail="Campaign has no audience")
         
-        # Simulate planning
-        domains = ["domain1.com", "domain2.com", "domain3.com", "domain4.com"]  # Default domains
+        # Simulate planning (campaign domain flow; default domains use the fallback planner)
+        if campaign.domain:
+            domains = [campaign.domain]
+        else:
+            domains = ["domain1.com", "domain2.com", "domain3.com", "domain4.com"]  # Default domains
         lead_count = len(audience.lead_ids)
         
         by_day = scheduler.dry_run_planning(lead_count, domains, campaign.start_at)
@@ -338,6 +357,8 @@ async def get_campaign_messages(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     status: List[MessageStatus] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
     user: Dict[str, Any] = Depends(require_auth)
 ):
     """Get messages for a specific campaign."""
@@ -346,18 +367,28 @@ async def get_campaign_messages(
             page=page,
             page_size=page_size,
             campaign_id=campaign_id,
-            status=status
+            status=status,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        messages, total = campaign_store.list_messages(query)
+        if cursor is not None:
+            result = campaign_store.messages_page(query)
+            messages, total, next_cursor = result.items, result.total, result.next_cursor
+        else:
+            messages, total = campaign_store.list_messages(query)
+            next_cursor = None
         
         response = MessagesResponse(
             items=[MessageOut.model_validate(m.__dict__) for m in messages],
-            total=total
+            total=total,
+            next_cursor=next_cursor
         )
         
         return DataResponse(data=response)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting campaign messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -369,6 +400,8 @@ async def list_messages(
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     status: List[MessageStatus] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
     user: Dict[str, Any] = Depends(require_auth)
 ):
     """List messages for a campaign."""
@@ -377,18 +410,28 @@ async def list_messages(
             page=page,
             page_size=page_size,
             campaign_id=campaign_id,
-            status=status
+            status=status,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        messages, total = campaign_store.list_messages(query)
+        if cursor is not None:
+            result = campaign_store.messages_page(query)
+            messages, total, next_cursor = result.items, result.total, result.next_cursor
+        else:
+            messages, total = campaign_store.list_messages(query)
+            next_cursor = None
         
         response = MessagesResponse(
             items=[MessageOut.model_validate(m.__dict__) for m in messages],
-            total=total
+            total=total,
+            next_cursor=next_cursor
         )
         
         return DataResponse(data=response)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -433,13 +476,9 @@ async def resend_message(
 async def _start_campaign(campaign: Campaign, audience: CampaignAudience, domains: List[str]):
     """Start campaign by creating and scheduling messages."""
     
-    # Create messages
-    messages = scheduler.create_campaign_messages(
-        campaign=campaign,
-        lead_ids=audience.lead_ids,
-        domains=domains,
-        start_at=campaign.start_at
-    )
+    # Assign slots and queue messages per domain
+    result = scheduler.schedule_campaign(campaign, audience.lead_ids)
+    messages = result.get("messages", [])
     
     # Store messages
     campaign_store.create_messages(messages)
@@ -447,4 +486,7 @@ async def _start_campaign(campaign: Campaign, audience: CampaignAudience, domain
     # Update campaign status
     campaign_store.update_campaign_status(campaign.id, CampaignStatus.running)
     
+    # Wake the send worker so it picks up the new first slot
+    send_worker.notify(campaign.domain)
+    
     logger.info(f"Started campaign {campaign.id} with {len(messages)} messages")
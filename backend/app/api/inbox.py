@@ -11,49 +11,38 @@ from ..schemas.common import DataResponse
 from ..services.inbox.accounts import MailAccountService
 from ..services.inbox.fetch_runner import FetchRunner, MailMessageStore
 from ..services.inbox.linker import MessageLinker
+from ..services.inbox.idle_listener import IdleListener
+from ..services.inbox.bounces import BounceProcessor
+from ..services.message_sender import MessageSender
+from ..services.store_factory import campaigns_store, leads_store
+from ..services.pagination import InvalidCursor
 
 # Initialize services (in production, use dependency injection)
 accounts_service = MailAccountService()
 messages_store = MailMessageStore()
 
-# Import existing stores for linking (mock references)
-class MockLeadsStore:
-    def get_all(self):
-        return [
-            type('Lead', (), {'id': 'lead-001', 'email': 'john.doe@gmail.com'}),
-            type('Lead', (), {'id': 'lead-002', 'email': 'sarah.smith@outlook.com'}),
-        ]
-
-class MockMessagesStore:
-    def get_all(self):
-        return [
-            type('Message', (), {
-                'id': 'msg-out-001', 
-                'campaign_id': 'campaign-001', 
-                'lead_id': 'lead-001',
-                'smtp_message_id': 'campaign-msg-001@domain1.com',
-                'sent_at': None
-            })
-        ]
-
-class MockCampaignsStore:
-    def get_all(self):
-        return []
-
-# Initialize linker with mock stores
+# Link replies and bounces against the real outbound messages and leads; both stores
+# report new writes to the linker through their listeners
 message_linker = MessageLinker(
-    messages_store=MockMessagesStore(),
-    leads_store=MockLeadsStore(),
-    campaigns_store=MockCampaignsStore()
+    messages_store=campaigns_store,
+    leads_store=leads_store,
+    campaigns_store=campaigns_store
 )
 
+# Bounce reports (DSNs) found while fetching suppress their lead via MessageSender.handle_bounce
+bounce_processor = BounceProcessor(message_linker, MessageSender(), campaigns_store, leads_store)
+
 # Initialize fetch runner
 fetch_runner = FetchRunner(
     accounts_service=accounts_service,
     messages_store=messages_store,
-    message_linker=message_linker
+    message_linker=message_linker,
+    bounce_processor=bounce_processor
 )
 
+# Push-mode listener (IMAP IDLE / polling fallback), started from the app lifespan when enabled
+idle_listener = IdleListener(fetch_runner)
+
 router = APIRouter(prefix="/inbox", tags=["inbox"])
 
 
@@ -90,11 +79,14 @@ async def list_messages(
     q: Optional[str] = Query(None, description="Search query"),
     from_date: Optional[str] = Query(None, description="ISO date"),
     to_date: Optional[str] = Query(None, description="ISO date"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
     user: Dict[str, Any] = Depends(require_auth)
 ):
     """
     Get inbox messages with filtering and pagination.
     Default sort: received_at desc.
+    With cursor: keyset pagination on (received_at, id), next_cursor in the response.
     """
     try:
         query = {
@@ -108,13 +100,18 @@ async def list_messages(
             'to_date': to_date
         }
         
-        # Get filtered messages
-        messages = messages_store.get_by_query(query)
-        
-        # Apply pagination
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_messages = messages[start_idx:end_idx]
+        if cursor is not None:
+            result = messages_store.get_page_by_query(query, page_size, cursor, include_total)
+            paginated_messages, total, next_cursor = result.items, result.total, result.next_cursor
+        else:
+            # Get filtered messages
+            messages = messages_store.get_by_query(query)
+            
+            # Apply pagination
+            start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+            paginated_messages = messages[start_idx:end_idx]
+            total, next_cursor = len(messages), None
         
         # Add account labels
         accounts = {acc['id']: acc for acc in accounts_service.get_all_accounts()}
@@ -131,11 +128,14 @@ async def list_messages(
         
         response_data = {
             'items': paginated_messages,
-            'total': len(messages)
+            'total': total,
+            'next_cursor': next_cursor
         }
         
         return DataResponse(data=response_data, error=None)
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to list messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve messages")
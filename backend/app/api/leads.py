@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Query, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Query, HTTPException
 from typing import Optional, List
 from pydantic import BaseModel
 from datetime import datetime
@@ -14,12 +14,14 @@ from app.schemas.lead import (
     LeadRestoreResponse,
 )
 from app.services.store_factory import leads_store
-from app.services.leads_import import process_import_file
+from app.services.leads_import import start_import
 from app.services.template_preview import render_preview
 from app.schemas.common import DataResponse
 from app.services.import_jobs import import_job_store
 from app.services.supabase_storage import supabase_storage
 from app.services.lead_enrichment import enrich_leads_bulk, enrich_lead_with_metadata, get_lead_variables_detail
+from app.services.pagination import InvalidCursor
+from app.api.campaigns import scheduler, campaign_store
 
 router = APIRouter(dependencies=[Depends(require_auth)])
 
@@ -40,28 +42,35 @@ async def list_leads(
     list_name: Optional[str] = None,
     is_complete: Optional[bool] = None,
     include_deleted: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
 ):
-    # Map API parameters to store parameters
-    # Note: API uses domain_tld, store uses tld; API uses has_var, store uses has_vars
-    tld_filter = domain_tld[0] if domain_tld and len(domain_tld) > 0 else None
-    
-    items, total = store.query(
-        page=page,
-        page_size=page_size,
-        status=status[0] if status and len(status) > 0 else None,
-        tld=tld_filter,
+    filters = dict(
+        status=status,
+        domain_tld=domain_tld,
         has_image=has_image,
-        has_vars=has_var,
+        has_var=has_var,
         search=search,
         list_name=list_name,
         is_complete=is_complete,
         include_deleted=include_deleted,
     )
     
+    next_cursor = None
+    if cursor is not None:
+        # Keyset mode: deep pages cost the same as page 1, total only on request
+        try:
+            result = store.query_page(page_size=page_size, cursor=cursor, include_total=include_total, **filters)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        items, total, next_cursor = result.items, result.total, result.next_cursor
+    else:
+        items, total = store.query(page=page, page_size=page_size, **filters)
+    
     # Enrich leads with metadata (zonder full completeness voor performance)
-    enriched_items = enrich_leads_bulk(items, include_completeness=True)
+    enriched_items = enrich_leads_bulk(items, include_completeness=True, materialised=True)
     
-    return {"data": {"items": enriched_items, "total": total}, "error": None}
+    return {"data": {"items": enriched_items, "total": total, "next_cursor": next_cursor}, "error": None}
 
 
 @router.get("/leads/{lead_id}", response_model=DataResponse[LeadDetail])
@@ -96,8 +105,9 @@ class ImportResult(BaseModel):
 
 
 @router.post("/import/leads", response_model=DataResponse[ImportResult])
-async def import_leads(file: UploadFile = File(...)):
-    result = await process_import_file(file, store)
+async def import_leads(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """Queue a lead import. Counts are reported on GET /import/jobs/{jobId} as the job progresses."""
+    result = await start_import(file, store, background_tasks)
     return {"data": result, "error": None}
 
 
@@ -204,15 +214,18 @@ async def stop_lead(lead_id: str):
     if not lead:
         raise HTTPException(status_code=404, detail="lead_not_found")
     
-    # Stop the lead
-    canceled_count = store.stop_lead(lead_id)
+    # Stop the lead and cancel its queued messages
+    store.stop_lead(lead_id)
+    canceled = scheduler.stop_lead(lead_id)
+    for message in canceled:
+        campaign_store.save_message(message)
     
     return {
         "data": {
             "ok": True,
             "lead_id": lead_id,
             "stopped": True,
-            "canceled": canceled_count
+            "canceled": len(canceled)
         },
         "error": None
     }
@@ -12,6 +12,7 @@ from app.schemas.report import (
 )
 from app.services.store_factory import reports_store, leads_store
 from app.services.file_handler import file_handler
+from app.services.pagination import InvalidCursor
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -29,9 +30,11 @@ async def list_reports(
     search: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; empty string for the first page"),
+    include_total: bool = Query(False),
     user: Dict[str, Any] = Depends(require_auth)
 ):
-    """List reports with filtering and pagination."""
+    """List reports with filtering and pagination (offset, or keyset when cursor is given)."""
     try:
         # Parse types filter
         type_list = None
@@ -47,17 +50,26 @@ async def list_reports(
             bound_id=bound_id,
             search=search,
             date_from=date_from,
-            date_to=date_to
+            date_to=date_to,
+            cursor=cursor,
+            include_total=include_total
         )
         
-        reports, total = reports_store.list_reports(query)
+        if cursor is not None:
+            result = reports_store.reports_page(query)
+            reports, total, next_cursor = result.items, result.total, result.next_cursor
+        else:
+            reports, total = reports_store.list_reports(query)
+            next_cursor = None
         
-        response = ReportsResponse(items=reports, total=total)
+        response = ReportsResponse(items=reports, total=total, next_cursor=next_cursor)
         
         logger.info(f"Listed {len(reports)} reports (total: {total}) for user {user.get('sub')}")
         
         return DataResponse(data=response, error=None)
     
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing reports: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -152,7 +164,7 @@ async def bulk_upload_reports(
     try:
         # Get leads data for mapping
         leads_data = []
-        for lead in leads_store._leads:
+        for lead in leads_store.records():
             leads_data.append({
                 "id": lead.id,
                 "email": lead.email,
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional, List
+import json
 import logging
 import os
 
@@ -10,11 +12,12 @@ from app.schemas.common import DataResponse
 from app.schemas.template import (
     TemplateOut, TemplateDetail, TemplatePreviewResponse, 
     TemplateTestSendRequest, TemplateTestSendResponse, TemplatesResponse,
-    TemplateVarItem, TestsendPayload
+    TemplateVarItem, TestsendPayload, TemplateBatchRenderRequest
 )
 from app.services.template_renderer import render_template_with_lead
 from app.services.testsend import testsend_service
 from app.services.template_variables import template_variables_service
+from app.services.batch_render import BatchRenderer
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 logger = logging.getLogger(__name__)
@@ -260,7 +263,8 @@ async def preview_template(
             template_subject,
             lead_data,
             {'name': 'Preview Campaign', 'sender_name': 'Preview Sender'},
-            mail_number=mail_number
+            mail_number=mail_number,
+            template_id=template_id
         )
         
         # Combine warnings
@@ -295,6 +299,56 @@ async def preview_template(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/{template_id}/render-batch")
+async def render_template_batch(
+    template_id: str,
+    payload: TemplateBatchRenderRequest,
+    user: Dict[str, Any] = Depends(require_auth)
+):
+    """Render template for many leads, streamed as NDJSON (one line per lead, then a summary line)"""
+    use_in_memory = os.getenv("USE_IN_MEMORY_STORES", "true").lower() == "true"
+    
+    # Get template from appropriate source
+    if use_in_memory:
+        template = get_template(template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        template_subject, template_body = template.subject, template.body
+    else:
+        db_template = templates_store.get_by_id(template_id)
+        if not db_template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        template_subject = db_template.get('subject_template')
+        template_body = db_template.get('body_template')
+    
+    renderer = BatchRenderer(leads_store, processes=int(os.getenv("BATCH_RENDER_PROCESSES", "1")))
+    
+    def stream():
+        total = with_warnings = not_found = 0
+        for result in renderer.render_many(
+            template_id,
+            template_subject,
+            template_body,
+            payload.lead_ids,
+            mail_number=payload.mail_number,
+            include_content=payload.include_content
+        ):
+            total += 1
+            if "error" in result:
+                not_found += 1
+            elif result["warnings"]:
+                with_warnings += 1
+            yield json.dumps(result) + "\n"
+        
+        summary = {"total": total, "with_warnings": with_warnings, "not_found": not_found,
+                   "ok": with_warnings == 0 and not_found == 0}
+        yield json.dumps({"summary": summary}) + "\n"
+        logger.info("template_batch_render", extra={"user": user.get("sub"), "template_id": template_id, **summary})
+    
+    # Sync generator: Starlette iterates it in a worker thread, off the event loop
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/{template_id}/variables", response_model=DataResponse[List[TemplateVarItem]])
 async def get_template_variables(
     template_id: str,
@@ -405,7 +459,8 @@ async def send_test_email(
             template_body,
             template_subject,
             lead_data,
-            {'name': 'Test Campaign', 'sender_name': 'Test Sender'}
+            {'name': 'Test Campaign', 'sender_name': 'Test Sender'},
+            template_id=template_id
         )
         
         logger.info("template_testsend_requested", extra={
@@ -47,6 +47,7 @@ async def track_open(
         
         # Log open event
         await sender.handle_open(message, user_agent, client_ip)
+        campaign_store.save_message(message)  # notify listeners (stats buckets) of the open
         
         logger.info(f"Tracked open for message {m} from {client_ip}")
         
@@ -89,22 +89,20 @@ def get_all_flows() -> Dict[str, CampaignFlow]:
 
 def calculate_mail_schedule(campaign_start: datetime, flow: CampaignFlow) -> Dict[int, datetime]:
     """Calculate scheduled dates for all mails in flow."""
-    from app.core.sending_policy import SENDING_POLICY
+    from app.core.sending_policy import COMPILED_POLICY, WORKDAY_CALENDAR
     
     schedule = {}
     
-    for step in flow.steps:
-        # Calculate target date (workdays from start)
-        target_date = campaign_start
-        workdays_added = 0
-        
-        while workdays_added < step.workdays_offset:
-            target_date += timedelta(days=1)
-            if SENDING_POLICY.is_valid_sending_day(target_date):
-                workdays_added += 1
+    # Resolve all workday offsets at once (closed-form, no day-by-day walk)
+    start_day = campaign_start.date()
+    target_days = WORKDAY_CALENDAR.add_workdays_many(start_day, [step.workdays_offset for step in flow.steps])
+    
+    for step, target_day in zip(flow.steps, target_days):
+        # Keep time of day from campaign start, move to target date
+        target_date = campaign_start + timedelta(days=(target_day - start_day).days)
         
         # Get next valid slot for this date
-        scheduled_at = SENDING_POLICY.get_next_valid_slot(target_date)
+        scheduled_at = COMPILED_POLICY.next_slot(target_date)
         schedule[step.mail_number] = scheduled_at
     
     return schedule
@@ -1,13 +1,115 @@
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import List
-from datetime import time, datetime, timedelta
-import pytz
+from typing import FrozenSet, List, Optional, Tuple
+from datetime import date, time, datetime
+from zoneinfo import ZoneInfo
+
+from app.core.workday_calendar import WorkdayCalendar
+
+
+def _parse_minutes(value: str) -> int:
+    """Convert "HH:MM" to minutes since midnight."""
+    hour, minute = map(int, value.split(':'))
+    return hour * 60 + minute
+
+
+class CompiledSendingPolicy:
+    """
+    Sending policy resolved once into integer minute offsets.
+    - Cached timezone and workday calendar
+    - Precomputed slot grid for a day (minutes since midnight)
+    - Slot lookups by bisect, no string parsing at call time
+    """
+
+    def __init__(self, policy: "SendingPolicy"):
+        self.tz = ZoneInfo(policy.timezone)
+        self.calendar = WorkdayCalendar.from_day_names(policy.days, policy.holidays)
+        self.slot_minutes = policy.slot_every_minutes
+        self.window_start = _parse_minutes(policy.window_from)
+        self.window_end = _parse_minutes(policy.window_to)  # Exclusive
+        self.grace_end = _parse_minutes(policy.grace_to)    # Inclusive
+        self.grace_time = time(self.grace_end // 60, self.grace_end % 60)
+
+        slots = range(self.window_start, self.window_end, self.slot_minutes)
+        self.slots: Tuple[int, ...] = tuple(slots)
+        self.slot_labels: Tuple[str, ...] = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in self.slots)
+
+    @property
+    def slots_per_day(self) -> int:
+        return len(self.slots)
+
+    def to_local(self, dt: datetime) -> datetime:
+        """Convert datetime to policy timezone."""
+        # pytz zones passed as tzinfo= carry an LMT offset; their wall time is what was meant
+        if getattr(dt.tzinfo, "zone", None) == self.tz.key:
+            return dt.replace(tzinfo=self.tz)
+        return dt.astimezone(self.tz)
+
+    def minute_of_day(self, dt: datetime) -> int:
+        """Minutes since local midnight (seconds ignored)."""
+        local = self.to_local(dt)
+        return local.hour * 60 + local.minute
+
+    def slot_datetime(self, day: date, slot_index: int) -> datetime:
+        """Local datetime of slot_index on day."""
+        minutes = self.slots[slot_index]
+        return datetime(day.year, day.month, day.day, minutes // 60, minutes % 60, tzinfo=self.tz)
+
+    def is_sending_day(self, day) -> bool:
+        return self.calendar.is_workday(day)
+
+    def is_within_grace_period(self, dt: datetime) -> bool:
+        """Check if local time is at or before the grace limit."""
+        return self.to_local(dt).time() <= self.grace_time
+
+    def slot_index(self, dt: datetime) -> Optional[int]:
+        """Index of the slot dt falls in, or None outside the sending window."""
+        local = self.to_local(dt)
+        if not self.calendar.is_workday(local.date()):
+            return None
+        minute = local.hour * 60 + local.minute
+        if minute < self.window_start or minute >= self.window_end:
+            return None
+        idx = bisect_right(self.slots, minute) - 1
+        if idx < 0 or minute >= self.slots[idx] + self.slot_minutes:
+            return None
+        return idx
+
+    def slots_remaining_today(self, dt: datetime) -> int:
+        """Number of slots at or after dt on the same local day."""
+        local = self.to_local(dt)
+        if not self.calendar.is_workday(local.date()):
+            return 0
+        return len(self.slots) - bisect_left(self.slots, local.hour * 60 + local.minute)
+
+    def next_slot_position(self, dt: datetime) -> Tuple[date, int]:
+        """(day, slot index) of the first slot at or after dt."""
+        local = self.to_local(dt)
+        day = local.date()
+
+        if not self.calendar.is_workday(day):
+            return self.calendar.next_workday(day), 0
+
+        idx = bisect_left(self.slots, local.hour * 60 + local.minute)
+        if idx == len(self.slots):
+            return self.calendar.add_workdays(day, 1), 0
+        return day, idx
+
+    def next_slot(self, dt: datetime) -> datetime:
+        """First slot at or after dt."""
+        day, idx = self.next_slot_position(dt)
+        return self.slot_datetime(day, idx)
+
+    def next_day_start(self, dt: datetime) -> datetime:
+        """First slot of the next sending day after dt's local date."""
+        day = self.calendar.add_workdays(self.to_local(dt).date(), 1)
+        return self.slot_datetime(day, 0)
 
 
 @dataclass(frozen=True)
 class SendingPolicy:
     """Hard-coded sending policy - NOT editable via API"""
-    
+
     timezone: str = "Europe/Amsterdam"
     days: List[str] = None
     window_from: str = "08:00"
@@ -16,91 +118,35 @@ class SendingPolicy:
     slot_every_minutes: int = 20
     daily_cap_per_domain: int = 27
     throttle_scope: str = "per_domain"
-    
+    holidays: FrozenSet[date] = frozenset()  # Non-sending dates on top of weekends
+
     def __post_init__(self):
         if self.days is None:
             object.__setattr__(self, 'days', ["Mon", "Tue", "Wed", "Thu", "Fri"])
-    
+        object.__setattr__(self, 'compiled', CompiledSendingPolicy(self))
+
     def get_daily_slots(self) -> List[str]:
         """Generate all valid sending slots for a day"""
-        slots = []
-        start_hour, start_min = map(int, self.window_from.split(':'))
-        end_hour, end_min = map(int, self.window_to.split(':'))
-        
-        current_time = time(start_hour, start_min)
-        end_time = time(end_hour, end_min)
-        
-        while current_time < end_time:
-            slots.append(current_time.strftime("%H:%M"))
-            # Add 20 minutes
-            dt = datetime.combine(datetime.today(), current_time)
-            dt += timedelta(minutes=self.slot_every_minutes)
-            current_time = dt.time()
-            
-            # Safety check to prevent infinite loop
-            if len(slots) >= 50:
-                break
-                
-        return slots
-    
+        return list(self.compiled.slot_labels)
+
     def is_valid_sending_day(self, date: datetime) -> bool:
         """Check if date is a valid sending day"""
-        day_name = date.strftime("%a")
-        return day_name in self.days
-    
+        return self.compiled.is_sending_day(date)
+
     def is_within_grace_period(self, current_time: datetime) -> bool:
         """Check if current time is within grace period"""
-        tz = pytz.timezone(self.timezone)
-        local_time = current_time.astimezone(tz)
-        grace_hour, grace_min = map(int, self.grace_to.split(':'))
-        grace_time = time(grace_hour, grace_min)
-        
-        return local_time.time() <= grace_time
-    
+        return self.compiled.is_within_grace_period(current_time)
+
     def get_next_valid_slot(self, from_datetime: datetime) -> datetime:
         """Get next valid sending slot from given datetime"""
-        tz = pytz.timezone(self.timezone)
-        current = from_datetime.astimezone(tz)
-        
-        # If weekend, move to next Monday
-        weekend_skipped = False
-        while not self.is_valid_sending_day(current):
-            current += timedelta(days=1)
-            weekend_skipped = True
-        
-        # If we skipped weekend, reset to window start
-        if weekend_skipped:
-            window_start_hour, window_start_min = map(int, self.window_from.split(':'))
-            current = current.replace(hour=window_start_hour, minute=window_start_min, second=0, microsecond=0)
-        
-        # If before window, set to window start
-        window_start_hour, window_start_min = map(int, self.window_from.split(':'))
-        if current.time() < time(window_start_hour, window_start_min):
-            current = current.replace(hour=window_start_hour, minute=window_start_min, second=0, microsecond=0)
-        
-        # If after window, move to next valid day
-        window_end_hour, window_end_min = map(int, self.window_to.split(':'))
-        if current.time() >= time(window_end_hour, window_end_min):
-            current += timedelta(days=1)
-            current = current.replace(hour=window_start_hour, minute=window_start_min, second=0, microsecond=0)
-            # Check if new day is valid
-            while not self.is_valid_sending_day(current):
-                current += timedelta(days=1)
-                current = current.replace(hour=window_start_hour, minute=window_start_min, second=0, microsecond=0)
-        
-        # Align to slot grid (:00, :20, :40)
-        minutes = current.minute
-        if minutes % 20 != 0:
-            # Round up to next 20-minute mark
-            next_slot_minutes = ((minutes // 20) + 1) * 20
-            if next_slot_minutes >= 60:
-                current += timedelta(hours=1)
-                current = current.replace(minute=0)
-            else:
-                current = current.replace(minute=next_slot_minutes)
-        
-        return current
+        return self.compiled.next_slot(from_datetime)
 
 
 # Global singleton instance
 SENDING_POLICY = SendingPolicy()
+
+# Compiled form used on hot paths (scheduler tick, dry run, planners)
+COMPILED_POLICY = SENDING_POLICY.compiled
+
+# Workday calendar derived from the policy (O(1) "n workdays after" lookups)
+WORKDAY_CALENDAR = COMPILED_POLICY.calendar
@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from typing import Dict, List, Optional
 import re
 
+from app.services.template_compiler import compile_template
+
 
 @dataclass(frozen=True)
 class HardCodedTemplate:
@@ -15,18 +17,10 @@ class HardCodedTemplate:
     
     def render(self, variables: Dict[str, str]) -> Dict[str, str]:
         """Render template with variables."""
-        rendered_subject = self.subject
-        rendered_body = self.body
-        
-        # Replace placeholders
-        for key, value in variables.items():
-            placeholder = f"{{{{{key}}}}}"
-            rendered_subject = rendered_subject.replace(placeholder, str(value))
-            rendered_body = rendered_body.replace(placeholder, str(value))
-        
+        # Compiled once per template id; placeholders without a value stay as written
         return {
-            "subject": rendered_subject,
-            "body": rendered_body
+            "subject": compile_template(self.subject, f"{self.id}:subject").substitute(variables),
+            "body": compile_template(self.body, f"{self.id}:body").substitute(variables)
         }
     
     def get_placeholders(self) -> List[str]:
@@ -467,6 +461,14 @@ def get_template_for_flow(version: int, mail_number: int) -> Optional[HardCodedT
     return get_template(template_id)
 
 
+def precompile_templates() -> int:
+    """Compile all hard-coded templates into the shared template cache. Returns count."""
+    for template in HARD_CODED_TEMPLATES.values():
+        compile_template(template.subject, f"{template.id}:subject")
+        compile_template(template.body, f"{template.id}:body")
+    return len(HARD_CODED_TEMPLATES)
+
+
 def validate_template_id(template_id: str) -> bool:
     """Validate if template ID exists."""
     return template_id in HARD_CODED_TEMPLATES
@@ -0,0 +1,98 @@
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Union
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _as_date(day: Union[date, datetime]) -> date:
+    return day.date() if isinstance(day, datetime) else day
+
+
+class WorkdayCalendar:
+    """
+    Workday arithmetic in O(1) using whole weeks plus a short remainder walk.
+    - Workdays given as weekday numbers (Mon=0)
+    - Holidays on workdays are skipped via bisect on a sorted list
+    """
+
+    def __init__(self, workdays: Iterable[int], holidays: Iterable[date] = ()):
+        self.workdays = frozenset(workdays)
+        if not self.workdays:
+            raise ValueError("Calendar needs at least one workday")
+        self.per_week = len(self.workdays)
+        # Only holidays that fall on a workday can shift the calendar
+        self.holidays = frozenset(_as_date(h) for h in holidays)
+        self._sorted_holidays: List[date] = sorted(h for h in self.holidays if h.weekday() in self.workdays)
+
+    @classmethod
+    def from_day_names(cls, day_names: Iterable[str], holidays: Iterable[date] = ()) -> "WorkdayCalendar":
+        """Build calendar from policy-style day names ("Mon", "Tue", ...)."""
+        return cls([DAY_NAMES.index(name) for name in day_names], holidays)
+
+    def is_workday(self, day: Union[date, datetime]) -> bool:
+        """Check if day is a workday and not a holiday."""
+        day = _as_date(day)
+        return day.weekday() in self.workdays and day not in self.holidays
+
+    def next_workday(self, day: Union[date, datetime]) -> date:
+        """Return day itself if it is a workday, otherwise the first workday after it."""
+        day = _as_date(day)
+        if self.is_workday(day):
+            return day
+        return self.add_workdays(day, 1)
+
+    def add_workdays(self, start: Union[date, datetime], n: int) -> date:
+        """Return the n-th workday after start (start itself for n <= 0)."""
+        start = _as_date(start)
+        if n <= 0:
+            return start
+
+        end = self._add_weekdays(start, n)
+
+        # Each holiday inside the range pushes the end further out
+        low = start
+        while True:
+            skipped = self._holidays_between(low, end)
+            if not skipped:
+                return end
+            low = end
+            end = self._add_weekdays(end, skipped)
+
+    def add_workdays_many(self, start: Union[date, datetime], offsets: Iterable[int]) -> List[date]:
+        """Resolve several workday offsets from the same start date."""
+        start = _as_date(start)
+        return [self.add_workdays(start, n) for n in offsets]
+
+    def workdays_between(self, start: Union[date, datetime], end: Union[date, datetime]) -> int:
+        """Count workdays in (start, end]."""
+        start, end = _as_date(start), _as_date(end)
+        if end <= start:
+            return 0
+
+        weeks, remainder = divmod((end - start).days, 7)
+        count = weeks * self.per_week
+        day = start + timedelta(weeks=weeks)
+        for _ in range(remainder):
+            day += timedelta(days=1)
+            if day.weekday() in self.workdays:
+                count += 1
+
+        return count - self._holidays_between(start, end)
+
+    def _add_weekdays(self, start: date, n: int) -> date:
+        """n-th workday after start, ignoring holidays (n >= 1)."""
+        weeks, remainder = divmod(n - 1, self.per_week)
+        day = start + timedelta(weeks=weeks)
+        steps = remainder + 1
+        while steps:
+            day += timedelta(days=1)
+            if day.weekday() in self.workdays:
+                steps -= 1
+        return day
+
+    def _holidays_between(self, start: date, end: date) -> int:
+        """Count workday holidays in (start, end]."""
+        if not self._sorted_holidays:
+            return 0
+        return bisect_right(self._sorted_holidays, end) - bisect_right(self._sorted_holidays, start)
@@ -2,6 +2,8 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from loguru import logger
+from contextlib import asynccontextmanager
+import os
 import traceback
 
 from app.api.leads import router as leads_router
@@ -15,7 +17,48 @@ from app.api.inbox import router as inbox_router
 from app.api.exports import router as exports_router
 from app.api.health import router as health_router
 
-app = FastAPI(title="Private Mail SaaS API", version="0.1.0")
+from app.api.campaigns import scheduler, send_worker, campaign_store
+from app.api.tracking import campaign_store as tracking_store
+from app.api.inbox import bounce_processor, idle_listener
+from app.services.inbox.idle_listener import IMAP_IDLE_ENABLED
+from app.core.templates_store import precompile_templates
+from app.services.smtp_pool import smtp_pool
+from app.services.stats import stats_service
+from app.services.store_factory import leads_store
+from app.services.template_variables import template_variables_service
+
+# Leads suppressed by a bounce report lose their queued messages before the next slot
+bounce_processor.add_suppress_listener(scheduler.stop_lead)
+
+# Materialised lead completeness (is_complete / vars_complete) follows the template set
+template_variables_service.add_change_listener(leads_store.refresh_completeness)
+
+# Stats buckets follow every message transition (queued -> sent -> opened/bounced)
+for store in (campaign_store, tracking_store):
+    stats_service.attach(store)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Precompile templates, run the send worker (and IMAP listeners) for the lifetime of the app, drain on shutdown."""
+    logger.info(f"Precompiled {precompile_templates()} hard-coded templates")
+    # The template set is loaded per deploy: recompute completeness stored for the previous one
+    template_variables_service.invalidate()
+    worker_enabled = os.getenv("SEND_WORKER_ENABLED", "true").lower() == "true"
+    if worker_enabled:
+        send_worker.start()
+    if IMAP_IDLE_ENABLED:
+        idle_listener.start()
+    try:
+        yield
+    finally:
+        if IMAP_IDLE_ENABLED:
+            await idle_listener.stop()
+        if worker_enabled:
+            await send_worker.stop(timeout=float(os.getenv("SEND_WORKER_DRAIN_SECONDS", "30")))
+        smtp_pool.close_all()
+
+
+app = FastAPI(title="Private Mail SaaS API", version="0.1.0", lifespan=lifespan)
 
 
 # Central Exception Handler
@@ -17,6 +17,7 @@ class MailAccount(SQLModel, table=True):
     active: bool = Field(default=True, index=True)
     last_fetch_at: Optional[datetime] = None
     last_seen_uid: Optional[int] = None
+    folders: List[str] = Field(default_factory=lambda: ['INBOX'], sa_column=Column(JSON))
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
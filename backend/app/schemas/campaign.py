@@ -123,12 +123,14 @@ class CampaignDetail(CampaignOut):
 # API response wrappers
 class CampaignsResponse(BaseModel):
     items: List[CampaignOut]
-    total: int
+    total: Optional[int] = None  # None in cursor mode unless include_total
+    next_cursor: Optional[str] = None
 
 
 class MessagesResponse(BaseModel):
     items: List[MessageOut]
-    total: int
+    total: Optional[int] = None  # None in cursor mode unless include_total
+    next_cursor: Optional[str] = None
 
 
 # Action payloads
@@ -160,6 +162,8 @@ class CampaignQuery(BaseModel):
     search: Optional[str] = None
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
+    cursor: Optional[str] = None  # keyset pagination (campaigns_page); page is ignored
+    include_total: bool = False
 
 
 class MessageQuery(BaseModel):
@@ -168,3 +172,5 @@ class MessageQuery(BaseModel):
     campaign_id: Optional[str] = None
     status: Optional[List[MessageStatus]] = None
     lead_id: Optional[str] = None
+    cursor: Optional[str] = None  # keyset pagination (messages_page); page is ignored
+    include_total: bool = False
@@ -34,7 +34,8 @@ class InboxMessageOut(BaseModel):
 
 class InboxListResponse(BaseModel):
     items: List[InboxMessageOut]
-    total: int
+    total: Optional[int] = None  # None in cursor mode unless include_total
+    next_cursor: Optional[str] = None
 
 
 class FetchStartResponse(BaseModel):
@@ -56,6 +57,7 @@ class MailAccountOut(BaseModel):
     active: bool
     last_fetch_at: Optional[datetime] = None
     last_seen_uid: Optional[int] = None
+    folders: List[str] = ['INBOX']
 
 
 class MailAccountUpsert(BaseModel):
@@ -65,6 +67,7 @@ class MailAccountUpsert(BaseModel):
     use_ssl: bool = True
     username: str
     secret_ref: str  # Reference to secret store
+    folders: List[str] = ['INBOX']  # e.g. ['INBOX', 'Junk'] to catch bounces and auto-replies
 
 
 class MailAccountTestResponse(BaseModel):
@@ -90,6 +93,8 @@ class InboxQuery(BaseModel):
     q: Optional[str] = None  # Search query
     from_date: Optional[str] = None  # ISO date
     to_date: Optional[str] = None    # ISO date
+    cursor: Optional[str] = None  # keyset pagination; page is ignored
+    include_total: bool = False
 
 
 # Response wrappers
@@ -43,7 +43,8 @@ class LeadDetail(LeadOut):
 
 class LeadsListResponse(BaseModel):
     items: List[LeadOut]
-    total: int
+    total: Optional[int] = None  # None in cursor mode unless include_total
+    next_cursor: Optional[str] = None
 
 
 class LeadDeleteRequest(BaseModel):
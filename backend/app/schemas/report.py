@@ -31,7 +31,8 @@ class ReportDetail(BaseModel):
 class ReportsResponse(BaseModel):
     """Response for reports list."""
     items: List[ReportOut]
-    total: int
+    total: Optional[int] = None  # None in cursor mode unless include_total
+    next_cursor: Optional[str] = None
 
 
 class ReportsQuery(BaseModel):
@@ -45,6 +46,8 @@ class ReportsQuery(BaseModel):
     search: Optional[str] = None
     date_from: Optional[str] = None
     date_to: Optional[str] = None
+    cursor: Optional[str] = None  # keyset pagination (reports_page); page is ignored
+    include_total: bool = False
 
 
 class ReportUploadPayload(BaseModel):
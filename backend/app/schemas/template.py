@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class TemplateOut(BaseModel):
@@ -45,6 +45,13 @@ class TemplatePreviewResponse(BaseModel):
     warnings: Optional[List[str]] = None
 
 
+class TemplateBatchRenderRequest(BaseModel):
+    """Batch render request (one template, many leads)"""
+    lead_ids: List[str] = Field(..., min_length=1, max_length=50000)
+    mail_number: Optional[int] = Field(default=None, ge=1, le=4)
+    include_content: bool = True  # False: only warnings per lead (pre-flight check)
+
+
 class TestsendPayload(BaseModel):
     """Testsend request payload"""
     to: EmailStr
@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.mime.nonmultipart import MIMENonMultipart
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class CachedAsset:
+    """Immutable, pre-encoded file contents."""
+    sha256: str
+    data: bytes
+    maintype: str
+    subtype: str
+    b64: str        # single line, for data: URLs
+    b64_mime: str   # 76-char lines, ready as a base64 MIME payload
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.maintype}/{self.subtype};base64,{self.b64}"
+
+    def mime_part(self, content_id: str, filename: Optional[str] = None) -> MIMENonMultipart:
+        """Inline MIME part using the pre-encoded payload (no re-encoding per message)."""
+        part = MIMENonMultipart(self.maintype, self.subtype)
+        part.set_payload(self.b64_mime)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-ID', f'<{content_id}>')
+        if filename:
+            part.add_header('Content-Disposition', 'inline', filename=filename)
+        return part
+
+
+_MIME_TYPES = {
+    ".png": ("image", "png"),
+    ".jpg": ("image", "jpeg"),
+    ".jpeg": ("image", "jpeg"),
+    ".gif": ("image", "gif"),
+    ".pdf": ("application", "pdf"),
+}
+
+
+class AssetCache:
+    """
+    Content-addressed cache of static asset files.
+    - Blobs keyed by sha256, so identical files are stored and encoded once
+    - Path index invalidated by (mtime_ns, size); stat at most every check_interval seconds
+    - Hits do no file reads and no base64 work
+    """
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, CachedAsset] = {}                        # sha256 -> asset
+        self._paths: Dict[Path, Tuple[Tuple[int, int], str, float]] = {}  # path -> (stat key, sha256, checked_at)
+
+    def get(self, path: Union[str, Path]) -> Optional[CachedAsset]:
+        """Cached asset for path, reloading if the file changed. None if missing."""
+        path = Path(path)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._paths.get(path)
+            if entry and now - entry[2] < self.check_interval:
+                return self._blobs[entry[1]]
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._paths.get(path)
+            if entry and entry[0] == stat_key:
+                self._paths[path] = (stat_key, entry[1], now)
+                return self._blobs[entry[1]]
+
+        return self._load(path, stat_key, now)
+
+    def invalidate(self, path: Optional[Union[str, Path]] = None) -> None:
+        """Forget one path (or everything)."""
+        with self._lock:
+            if path is None:
+                self._paths.clear()
+                self._blobs.clear()
+                return
+            entry = self._paths.pop(Path(path), None)
+            if entry and all(e[1] != entry[1] for e in self._paths.values()):
+                self._blobs.pop(entry[1], None)
+
+    def _load(self, path: Path, stat_key: Tuple[int, int], now: float) -> Optional[CachedAsset]:
+        try:
+            data = path.read_bytes()
+        except OSError as e:
+            logger.warning(f"Could not read asset {path}: {e}")
+            return None
+
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            asset = self._blobs.get(sha)
+            if asset is None:
+                maintype, subtype = _MIME_TYPES.get(path.suffix.lower(), ("application", "octet-stream"))
+                asset = CachedAsset(
+                    sha256=sha,
+                    data=data,
+                    maintype=maintype,
+                    subtype=subtype,
+                    b64=base64.b64encode(data).decode('ascii'),
+                    b64_mime=base64.encodebytes(data).decode('ascii')
+                )
+                self._blobs[sha] = asset
+
+            old = self._paths.get(path)
+            self._paths[path] = (stat_key, sha, now)
+            if old and old[1] != sha and all(e[1] != old[1] for e in self._paths.values()):
+                self._blobs.pop(old[1], None)
+
+        logger.debug(f"Cached asset {path.name} ({len(data)} bytes, sha256 {sha[:12]})")
+        return asset
+
+
+# Global instance
+asset_cache = AssetCache()
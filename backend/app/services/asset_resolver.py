@@ -1,7 +1,13 @@
 from pathlib import Path
 from typing import Optional, Dict
+from email.mime.nonmultipart import MIMENonMultipart
 from loguru import logger
 
+from app.services.asset_cache import AssetCache, CachedAsset, asset_cache
+
+# Signature images shipped with the app ("Christian Handtekening.png", "Victor Handtekening.png")
+SIGNATURE_DIR = Path(__file__).parent.parent / "assets" / "signatures"
+
 
 class AssetResolver:
     """
@@ -16,8 +22,10 @@ class AssetResolver:
         # Add more domains as needed
     }
     
-    def __init__(self, assets_dir: str = "assets"):
+    def __init__(self, assets_dir: str = "assets", cache: AssetCache = asset_cache, signature_dir: Path = SIGNATURE_DIR):
         self.assets_dir = Path(assets_dir)
+        self.cache = cache
+        self.signature_dir = Path(signature_dir)
     
     def get_report_path(self, domain: str) -> Optional[Path]:
         """Get report path for domain. Returns None if not found."""
@@ -60,6 +68,31 @@ class AssetResolver:
         logger.warning(f"Signature not found: {signature_path}")
         return None
     
+    def get_signature_asset(self, alias: str) -> Optional[CachedAsset]:
+        """Cached, pre-encoded signature image for alias (christian/victor)."""
+        filename = self.signature_filename(alias)
+        asset = self.cache.get(self.signature_dir / filename)
+        if asset is None:
+            logger.warning(f"Signature image not found: {self.signature_dir / filename}")
+        return asset
+    
+    def get_signature_data_url(self, alias: str) -> Optional[str]:
+        """Signature as base64 data URL (previews). None if missing."""
+        asset = self.get_signature_asset(alias)
+        return asset.data_url if asset else None
+    
+    def get_signature_mime_part(self, alias: str) -> Optional[MIMENonMultipart]:
+        """Signature as inline CID part <signature_{alias}> (SMTP sends). None if missing."""
+        asset = self.get_signature_asset(alias)
+        if asset is None:
+            return None
+        alias = alias.lower()
+        return asset.mime_part(f"signature_{alias}", self.signature_filename(alias))
+    
+    @staticmethod
+    def signature_filename(alias: str) -> str:
+        return f"{alias.lower().capitalize()} Handtekening.png"
+    
     def has_report(self, domain: str) -> bool:
         """Check if report exists for domain."""
         return self.get_report_path(domain) is not None
@@ -0,0 +1,98 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from app.services.template_compiler import compile_template
+from app.services.template_renderer import get_signature_urls, render_compiled_with_lead
+
+# Audiences at least this large are split over worker processes (when processes > 1)
+PROCESS_POOL_THRESHOLD = int(os.getenv("BATCH_RENDER_PROCESS_THRESHOLD", "2000"))
+CHUNK_SIZE = 500
+
+
+def lead_to_render_data(lead) -> Dict[str, Any]:
+    """Lead fields exposed to templates (same shape as the preview endpoint uses)."""
+    return {
+        'id': lead.id,
+        'email': lead.email,
+        'company': lead.company,
+        'url': lead.url,
+        'domain': lead.domain,
+        'image_key': lead.image_key,
+        'vars': lead.vars or {}
+    }
+
+
+def mail_number_from_template_id(template_id: str) -> int:
+    """Mail number encoded in a template id (v1_mail3 / v1m3 -> 3), default 1."""
+    match = re.search(r'm(?:ail)?(\d)$', template_id)
+    return int(match.group(1)) if match else 1
+
+
+class BatchRenderer:
+    """
+    Renders one template for a whole audience.
+    - Subject and body compiled once, signature blob resolved once
+    - Results are yielded per lead in input order (stream-friendly)
+    - Large audiences can be split in chunks over a process pool
+    """
+
+    def __init__(self, leads_store, processes: int = 1, threshold: int = PROCESS_POOL_THRESHOLD):
+        self.leads_store = leads_store
+        self.processes = processes
+        self.threshold = threshold
+
+    def render_many(
+        self,
+        template_id: str,
+        subject_template: str,
+        body_template: str,
+        lead_ids: Iterable[str],
+        mail_number: Optional[int] = None,
+        campaign_data: Optional[Dict[str, Any]] = None,
+        include_content: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield {lead_id, subject, html, text, warnings} per lead (or {lead_id, error} if not found)."""
+        if mail_number is None:
+            mail_number = mail_number_from_template_id(template_id)
+        signature_urls = get_signature_urls()
+
+        # Resolve leads up front, in one bulk call, so worker processes only get plain dicts
+        lead_ids = list(lead_ids)
+        leads = self.leads_store.get_many(lead_ids)
+        jobs: List[Tuple[str, Optional[Dict[str, Any]]]] = [
+            (lead_id, lead_to_render_data(leads[lead_id]) if lead_id in leads else None)
+            for lead_id in lead_ids
+        ]
+
+        args = (template_id, subject_template, body_template, mail_number, campaign_data, signature_urls, include_content)
+        if self.processes > 1 and len(jobs) >= self.threshold:
+            logger.info(f"Batch rendering {len(jobs)} leads for {template_id} on {self.processes} processes")
+            chunks = [jobs[i:i + CHUNK_SIZE] for i in range(0, len(jobs), CHUNK_SIZE)]
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                for results in pool.map(_render_chunk, [(chunk, *args) for chunk in chunks]):
+                    yield from results
+        else:
+            yield from _render_chunk((jobs, *args))
+
+
+def _render_chunk(payload) -> List[Dict[str, Any]]:
+    """Render a list of (lead_id, lead_data) jobs. Module level so it can run in worker processes."""
+    jobs, template_id, subject_template, body_template, mail_number, campaign_data, signature_urls, include_content = payload
+    subject = compile_template(subject_template, f"{template_id}:subject")
+    body = compile_template(body_template, f"{template_id}:body")
+
+    results = []
+    for lead_id, lead_data in jobs:
+        if lead_data is None:
+            results.append({"lead_id": lead_id, "error": "Lead not found"})
+            continue
+        rendered = render_compiled_with_lead(subject, body, lead_data, campaign_data, mail_number, signature_urls)
+        result = {"lead_id": lead_id, "warnings": rendered['warnings'] or []}
+        if include_content:
+            result.update(subject=rendered['subject'], html=rendered['html'], text=rendered['text'])
+        results.append(result)
+    return results
@@ -1,14 +1,16 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 from zoneinfo import ZoneInfo
 from loguru import logger
 
-from app.core.sending_policy import SENDING_POLICY
+from app.core.sending_policy import COMPILED_POLICY, WORKDAY_CALENDAR
 from app.core.campaign_flows import get_flow_for_domain, calculate_mail_schedule, get_followup_headers
 from app.models.campaign import Campaign, Message, MessageStatus, CampaignStatus
 from app.models.lead import Lead
 from app.schemas.campaign import CampaignCreatePayload, DryRunDay
+from app.services.domain_queue import DomainQueue
+from app.services.slot_allocator import SlotAllocator
 
 
 class CampaignScheduler:
@@ -16,7 +18,8 @@ class CampaignScheduler:
     Handles campaign scheduling using hard-coded sending policy and flows.
     - 27 slots per workday (08:00-16:40, every 20 minutes)
     - Grace period until 18:00
-    - FIFO queueing per domain
+    - Concrete slot per (lead, mail) via SlotAllocator, max 27 per domain per day
+    - Priority queue per domain ordered by (scheduled_at, sequence)
     - Max 1 active campaign per domain
     """
     
@@ -29,9 +32,16 @@ class CampaignScheduler:
     
     def __init__(self):
         # In-memory tracking for MVP (replace with Redis/DB in production)
-        self.domain_queues: Dict[str, List[Dict]] = {}  # FIFO queue per domain
+        self.domain_queues: Dict[str, DomainQueue] = {}  # heap queue per domain
         self.domain_last_send: Dict[str, datetime] = {}
         self.active_campaigns: Dict[str, str] = {}  # domain -> campaign_id
+        self.slot_allocator = SlotAllocator()  # occupied slots per domain
+        
+        # Skip sets: queued messages for these are dropped/parked lazily when they surface
+        self.paused_campaigns: Set[str] = set()
+        self.stopped_campaigns: Set[str] = set()
+        self.stopped_leads: Set[str] = set()
+        self.parked_messages: Dict[str, List[Message]] = {}  # campaign_id -> messages held while paused
     
     def schedule_campaign(self, campaign: Campaign, lead_ids: List[str]) -> Dict:
         """Schedule campaign using domain flow and sending policy."""
@@ -46,7 +56,7 @@ class CampaignScheduler:
             raise ValueError(f"Domain {campaign.domain} is busy with campaign {self.active_campaigns[campaign.domain]}")
         
         # Calculate start time
-        start_at = campaign.start_at or datetime.now(ZoneInfo(SENDING_POLICY.timezone))
+        start_at = campaign.start_at or datetime.now(COMPILED_POLICY.tz)
         
         # Calculate mail schedule using flow
         mail_schedule = calculate_mail_schedule(start_at, flow)
@@ -65,13 +75,22 @@ class CampaignScheduler:
                 "flow_version": flow.version if flow else "unknown"
             }
         
+        # Assign every (lead, mail) its own slot, filling days up to the domain cap
+        slots = self.slot_allocator.allocate_campaign(
+            campaign.id,
+            campaign.domain,
+            active_lead_ids,
+            start_at,
+            {step.mail_number: step.workdays_offset for step in flow.steps}
+        )
+        
         # Create messages for each mail in flow
         messages = []
-        for mail_number, scheduled_at in mail_schedule.items():
+        for mail_number in mail_schedule:
             for lead_id in active_lead_ids:
                 # Get alias for this mail
                 alias = flow.get_alias_for_mail(mail_number)
-                headers = get_followup_headers(mail_number)
+                headers = get_followup_headers(mail_number, campaign.domain)
                 
                 message = Message(
                     id=str(uuid.uuid4()),
@@ -82,23 +101,20 @@ class CampaignScheduler:
                     alias=alias,
                     from_email=headers["from"],
                     reply_to_email=headers["reply_to"],
-                    scheduled_at=scheduled_at,
+                    scheduled_at=slots[(lead_id, mail_number)],
                     status=MessageStatus.queued,
                     is_followup=(mail_number > 1),
                     retry_count=0
                 )
                 messages.append(message)
         
-        # Add to domain queue (FIFO)
+        # Add to domain queue (ordered by scheduled_at, then insertion order)
         if campaign.domain not in self.domain_queues:
-            self.domain_queues[campaign.domain] = []
+            self.domain_queues[campaign.domain] = DomainQueue()
         
-        # Add all messages to queue
+        queue = self.domain_queues[campaign.domain]
         for message in messages:
-            self.domain_queues[campaign.domain].append({
-                "message": message,
-                "scheduled_at": message.scheduled_at
-            })
+            queue.push(message)
         
         # Mark domain as busy
         self.active_campaigns[campaign.domain] = campaign.id
@@ -110,73 +126,111 @@ class CampaignScheduler:
             "domain": campaign.domain,
             "total_messages": len(messages),
             "mail_schedule": mail_schedule,
-            "flow_version": flow.version
+            "flow_version": flow.version,
+            "messages": messages
         }
     
     def get_next_messages_to_send(self, domain: str, current_time: Optional[datetime] = None) -> List[Message]:
-        """Get next messages to send for domain (FIFO queue)."""
+        """Get next messages to send for domain: the earliest due one, at most one per throttle window."""
         if current_time is None:
-            current_time = datetime.now(ZoneInfo(SENDING_POLICY.timezone))
+            current_time = datetime.now(COMPILED_POLICY.tz)
         
         if domain not in self.domain_queues:
             return []
         
         # Check if within grace period
-        if not SENDING_POLICY.is_within_grace_period(current_time):
+        if not COMPILED_POLICY.is_within_grace_period(current_time):
             logger.info(f"Outside grace period, moving remaining messages to next day")
             self._move_remaining_to_next_day(domain, current_time)
             return []
         
-        # Get messages ready to send (FIFO)
-        ready_messages = []
         queue = self.domain_queues[domain]
         
         # Check throttle (1 email per 20 minutes per domain)
         last_send = self.domain_last_send.get(domain)
         if last_send:
             time_since_last = (current_time - last_send).total_seconds() / 60
-            if time_since_last < SENDING_POLICY.slot_every_minutes:
+            if time_since_last < COMPILED_POLICY.slot_minutes:
                 logger.debug(f"Domain {domain} throttled, {time_since_last:.1f}min since last send")
                 return []
         
-        # Get all messages in queue that are ready
-        while queue:
-            item = queue[0]
-            message = item["message"]
-            scheduled_at = item["scheduled_at"]
-            
-            if scheduled_at <= current_time:
-                # Message is ready to send
-                ready_messages.append(message)
-                queue.pop(0)  # Remove from queue (FIFO)
-                
-                # Update last send time
-                self.domain_last_send[domain] = current_time
-                
-                logger.info(f"Ready to send message {message.id} for domain {domain}")
-            else:
-                # No more ready messages
+        # At most one message per throttle window: a backlog after downtime drains one slot at a time.
+        # Paused/stopped messages are skipped without scanning the queue.
+        ready_messages = []
+        while not ready_messages:
+            due_at = queue.peek_time()
+            if due_at is None or due_at > current_time:
                 break
+            message = queue.pop()["message"]
+            
+            if self._should_skip(message):
+                continue
+            
+            ready_messages.append(message)
+            
+            # Update last send time
+            self.domain_last_send[domain] = current_time
+            
+            logger.info(f"Ready to send message {message.id} for domain {domain}")
         
         return ready_messages
     
+    def get_next_due_time(self, domain: str) -> Optional[datetime]:
+        """Scheduled time of the next queued message for domain (O(1))."""
+        queue = self.domain_queues.get(domain)
+        return queue.peek_time() if queue else None
+    
+    def _should_skip(self, message: Message) -> bool:
+        """Drop messages of stopped campaigns/leads and park those of paused campaigns."""
+        if message.campaign_id in self.stopped_campaigns or message.lead_id in self.stopped_leads:
+            message.status = MessageStatus.canceled
+            logger.debug(f"Dropped message {message.id} (campaign or lead stopped)")
+            return True
+        
+        if message.campaign_id in self.paused_campaigns:
+            self.parked_messages.setdefault(message.campaign_id, []).append(message)
+            logger.debug(f"Parked message {message.id} (campaign {message.campaign_id} paused)")
+            return True
+        
+        return False
+    
     def _move_remaining_to_next_day(self, domain: str, current_time: datetime):
         """Move remaining messages to next valid day at 08:00."""
         if domain not in self.domain_queues:
             return
         
         queue = self.domain_queues[domain]
-        next_day_start = SENDING_POLICY.get_next_valid_slot(current_time + timedelta(days=1))
-        
-        # Move all remaining messages to next day
-        for item in queue:
-            message = item["message"]
-            if message.scheduled_at.date() == current_time.date():
-                # Reschedule to next valid day
-                item["scheduled_at"] = next_day_start
-                message.scheduled_at = next_day_start
-                
-                logger.info(f"Moved message {message.id} to next day: {next_day_start}")
+        next_day_start = COMPILED_POLICY.next_day_start(current_time)
+        
+        # Everything still due before the next window opens moves in one pass,
+        # onto the first free slots from the next day on (not all onto 08:00)
+        moved = [item["message"] for item in queue.pop_before(next_day_start)]
+        if not moved:
+            return
+        
+        self._requeue(moved, next_day_start)
+        logger.info(f"Moved {len(moved)} messages on {domain} to next day from {next_day_start}")
+    
+    def _requeue(self, messages: List[Message], earliest: datetime):
+        """Give messages new slots at or after earliest and push them back on their queues."""
+        by_campaign: Dict[str, List[Message]] = {}
+        for message in messages:
+            by_campaign.setdefault(message.campaign_id, []).append(message)
+        
+        for campaign_id, campaign_messages in by_campaign.items():
+            try:
+                slots = self.slot_allocator.reallocate(
+                    campaign_id,
+                    [(m.lead_id, m.mail_number) for m in campaign_messages],
+                    earliest
+                )
+            except KeyError:
+                # Campaign not allocated by this scheduler; keep earliest slot
+                slots = {}
+            
+            for message in campaign_messages:
+                message.scheduled_at = slots.get((message.lead_id, message.mail_number), earliest)
+                self.domain_queues.setdefault(message.domain_used, DomainQueue()).push(message)
     
     def complete_campaign(self, campaign_id: str, domain: str):
         """Mark campaign as completed and free up domain."""
@@ -184,8 +238,10 @@ class CampaignScheduler:
             del self.active_campaigns[domain]
             logger.info(f"Campaign {campaign_id} completed, domain {domain} is now available")
         
+        self.slot_allocator.release_campaign(campaign_id)
+        
         # Clean up empty queue
-        if domain in self.domain_queues and len(self.domain_queues[domain]) == 0:
+        if domain in self.domain_queues and not self.domain_queues[domain]:
             del self.domain_queues[domain]
     
     def get_domain_status(self) -> Dict[str, Dict]:
@@ -231,7 +287,7 @@ class CampaignScheduler:
         # Get flow for first domain (all have same structure)
         from app.core.campaign_flows import get_flow_for_domain, calculate_mail_schedule
         
-        if not domains:
+        if not domains or lead_count <= 0:
             return []
         
         domain = domains[0]  # Use first domain for flow structure
@@ -242,15 +298,18 @@ class CampaignScheduler:
             logger.warning(f"No flow found for domain {domain}, using fallback")
             return self._dry_run_fallback(lead_count, domains, start_at)
         
-        # For each lead, schedule all mails in the flow
-        for lead_idx in range(lead_count):
-            # Calculate base schedule for this lead
-            mail_schedule = calculate_mail_schedule(start_at, flow)
-            
-            # Add each mail to daily counts
-            for mail_number, scheduled_at in mail_schedule.items():
-                date_key = scheduled_at.strftime("%Y-%m-%d")
-                daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
+        # Plan against this domain's current load without recording anything,
+        # so the preview respects the daily cap exactly like real scheduling
+        per_day = self.slot_allocator.plan_daily_counts(
+            domain,
+            lead_count,
+            start_at,
+            {step.mail_number: step.workdays_offset for step in flow.steps}
+        )
+        
+        for day, count in per_day.items():
+            date_key = day.strftime("%Y-%m-%d")
+            daily_counts[date_key] = daily_counts.get(date_key, 0) + count
         
         # Convert to response format
         return [
@@ -264,20 +323,33 @@ class CampaignScheduler:
         domains: List[str],
         start_at: datetime
     ) -> List[DryRunDay]:
-        """Fallback dry-run logic when no flow is available."""
-        next_slot = self._get_next_valid_slot(start_at)
-        domain_slots: Dict[str, datetime] = {domain: next_slot for domain in domains}
+        """Fallback dry-run logic when no flow is available.
+        
+        Leads are spread round-robin over domains; each domain fills its
+        remaining slots today, then full workdays, computed per day instead of per lead.
+        """
+        # Position on the slot grid; slots left on the first day follow by index
+        first_day, first_slot = COMPILED_POLICY.next_slot_position(start_at)
+        slots_per_day = COMPILED_POLICY.slots_per_day
+        first_day_slots = slots_per_day - first_slot
         
         daily_counts: Dict[str, int] = {}
         
-        for i in range(lead_count):
-            domain = domains[i % len(domains)]
-            slot_time = domain_slots[domain]
-            
-            date_key = slot_time.strftime("%Y-%m-%d")
-            daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
+        per_domain, extra = divmod(lead_count, len(domains))
+        for idx in range(len(domains)):
+            remaining = per_domain + (1 if idx < extra else 0)
             
-            domain_slots[domain] = self._get_next_slot_for_domain(slot_time)
+            day = first_day
+            planned = min(remaining, first_day_slots)
+            workday_offset = 0
+            while remaining > 0:
+                date_key = day.strftime("%Y-%m-%d")
+                daily_counts[date_key] = daily_counts.get(date_key, 0) + planned
+                remaining -= planned
+                
+                workday_offset += 1
+                day = WORKDAY_CALENDAR.add_workdays(first_day, workday_offset)
+                planned = min(remaining, slots_per_day)
         
         return [
             DryRunDay(date=date, planned=count)
@@ -286,22 +358,56 @@ class CampaignScheduler:
     
     def pause_campaign(self, campaign_id: str) -> bool:
         """Pause a running campaign (messages remain scheduled)."""
-        # In production: update campaign status in DB
+        # Queued messages stay in the heap; due ones are parked when they surface
+        self.paused_campaigns.add(campaign_id)
         logger.info(f"Pausing campaign {campaign_id}")
         return True
     
     def resume_campaign(self, campaign_id: str) -> bool:
         """Resume a paused campaign (reschedule pending messages)."""
-        # In production: reschedule queued messages to valid slots
-        logger.info(f"Resuming campaign {campaign_id}")
+        self.paused_campaigns.discard(campaign_id)
+        
+        # Re-queue parked messages at the next valid slot
+        parked = self.parked_messages.pop(campaign_id, [])
+        if parked:
+            self._requeue(parked, datetime.now(COMPILED_POLICY.tz))
+        
+        logger.info(f"Resuming campaign {campaign_id} ({len(parked)} parked messages re-queued)")
         return True
     
     def stop_campaign(self, campaign_id: str) -> bool:
         """Stop a campaign (cancel all queued messages)."""
-        # In production: set queued messages to canceled status
+        # Queued messages are dropped lazily when they reach the head of their queue
+        self.stopped_campaigns.add(campaign_id)
+        self.paused_campaigns.discard(campaign_id)
+        for message in self.parked_messages.pop(campaign_id, []):
+            message.status = MessageStatus.canceled
+        self.slot_allocator.release_campaign(campaign_id)
         logger.info(f"Stopping campaign {campaign_id}")
         return True
     
+    def stop_lead(self, lead_id: str) -> List[Message]:
+        """Cancel a stopped lead's queued and parked messages and free their slots. Returns them."""
+        # Messages scheduled later (follow-ups) are still dropped through the skip set
+        self.stopped_leads.add(lead_id)
+        
+        canceled: List[Message] = []
+        for queue in self.domain_queues.values():
+            canceled.extend(queue.remove_where(lambda m: m.lead_id == lead_id))
+        for parked in self.parked_messages.values():
+            canceled.extend(m for m in parked if m.lead_id == lead_id)
+            parked[:] = [m for m in parked if m.lead_id != lead_id]
+        
+        released: Dict[str, List[Tuple[str, int]]] = {}
+        for message in canceled:
+            message.status = MessageStatus.canceled
+            released.setdefault(message.campaign_id, []).append((message.lead_id, message.mail_number))
+        for campaign_id, keys in released.items():
+            self.slot_allocator.release(campaign_id, keys)
+        
+        logger.info(f"Lead {lead_id} stopped, {len(canceled)} queued messages canceled")
+        return canceled
+    
     def schedule_followup(
         self, 
         original_message: Message, 
@@ -337,45 +443,8 @@ class CampaignScheduler:
         # Ensure timezone
         if from_time.tzinfo is None:
             from_time = from_time.replace(tzinfo=self.TIMEZONE)
-        else:
-            from_time = from_time.astimezone(self.TIMEZONE)
-        
-        current = from_time
         
-        while True:
-            # Check if current time is within work hours and days
-            if (current.weekday() in self.WORK_DAYS and 
-                self.WORK_START_HOUR <= current.hour < self.WORK_END_HOUR):
-                return current
-            
-            # Move to next work period
-            if current.weekday() not in self.WORK_DAYS:
-                # Weekend - move to Monday 08:00
-                days_until_monday = (7 - current.weekday()) % 7
-                if days_until_monday == 0:  # Already Monday
-                    days_until_monday = 7
-                current = current.replace(
-                    hour=self.WORK_START_HOUR, 
-                    minute=0, 
-                    second=0, 
-                    microsecond=0
-                ) + timedelta(days=days_until_monday)
-            elif current.hour < self.WORK_START_HOUR:
-                # Before work hours - move to 08:00 same day
-                current = current.replace(
-                    hour=self.WORK_START_HOUR, 
-                    minute=0, 
-                    second=0, 
-                    microsecond=0
-                )
-            else:
-                # After work hours - move to next work day 08:00
-                current = current.replace(
-                    hour=self.WORK_START_HOUR, 
-                    minute=0, 
-                    second=0, 
-                    microsecond=0
-                ) + timedelta(days=1)
+        return COMPILED_POLICY.next_slot(from_time)
     
     def _get_next_available_domain(
         self, 
@@ -1,10 +1,11 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from loguru import logger
 
 from app.models.campaign import Campaign, CampaignAudience, Message, MessageEvent, CampaignStatus, MessageStatus
 from app.schemas.campaign import CampaignQuery, MessageQuery, CampaignKPIs, TimelinePoint
+from app.services.pagination import Page, keyset_page
 
 
 class CampaignStore:
@@ -15,6 +16,16 @@ class CampaignStore:
         self.audiences: Dict[str, CampaignAudience] = {}
         self.messages: Dict[str, Message] = {}
         self.events: Dict[str, MessageEvent] = {}
+        # Called with the message when it is created, saved or its status changes
+        self._message_listeners: List[Callable[[Message], Any]] = []
+    
+    def add_message_listener(self, listener: Callable[[Message], Any]) -> None:
+        """Register a callback for message writes, e.g. MessageLinker.index_message."""
+        self._message_listeners.append(listener)
+    
+    def _notify_message(self, message: Message) -> None:
+        for listener in self._message_listeners:
+            listener(message)
     
     def create_campaign(self, campaign: Campaign) -> Campaign:
         """Create a new campaign."""
@@ -96,27 +107,17 @@ class CampaignStore:
         """Get all messages for CSV export."""
         return list(self.messages.values())
     
+    def get_all(self) -> List[Message]:
+        """All outbound messages (message store interface used by MessageLinker)."""
+        return self.get_all_messages()
+    
     def get_campaign(self, campaign_id: str) -> Optional[Campaign]:
         """Get campaign by ID."""
         return self.campaigns.get(campaign_id)
     
     def list_campaigns(self, query: CampaignQuery) -> tuple[List[Campaign], int]:
         """List campaigns with filtering and pagination."""
-        campaigns = list(self.campaigns.values())
-        
-        # Apply filters
-        if query.status:
-            campaigns = [c for c in campaigns if c.status in query.status]
-        
-        if query.search:
-            search_lower = query.search.lower()
-            campaigns = [c for c in campaigns if search_lower in c.name.lower()]
-        
-        if query.date_from:
-            campaigns = [c for c in campaigns if c.created_at >= query.date_from]
-        
-        if query.date_to:
-            campaigns = [c for c in campaigns if c.created_at <= query.date_to]
+        campaigns = list(self._filter_campaigns(query))
         
         # Sort by created_at desc
         campaigns.sort(key=lambda c: c.created_at, reverse=True)
@@ -130,6 +131,29 @@ class CampaignStore:
         
         return campaigns, total
     
+    def campaigns_page(self, query: CampaignQuery) -> Page[Campaign]:
+        """Keyset page on (created_at desc, id) after query.cursor; cost independent of depth."""
+        campaigns = self._filter_campaigns(query)
+        if query.include_total:
+            campaigns = list(campaigns)
+        page = keyset_page(campaigns, lambda c: c.created_at, lambda c: c.id,
+                           query.page_size, query.cursor, descending=True)
+        if query.include_total:
+            page.total = len(campaigns)
+        return page
+    
+    def _filter_campaigns(self, query: CampaignQuery) -> Iterator[Campaign]:
+        for c in self.campaigns.values():
+            if query.status and c.status not in query.status:
+                continue
+            if query.search and query.search.lower() not in c.name.lower():
+                continue
+            if query.date_from and c.created_at < query.date_from:
+                continue
+            if query.date_to and c.created_at > query.date_to:
+                continue
+            yield c
+    
     def update_campaign_status(self, campaign_id: str, status: CampaignStatus) -> bool:
         """Update campaign status."""
         campaign = self.campaigns.get(campaign_id)
@@ -157,26 +181,23 @@ class CampaignStore:
         """Create multiple messages."""
         for message in messages:
             self.messages[message.id] = message
+            self._notify_message(message)
         logger.info(f"Created {len(messages)} messages")
         return messages
     
+    def save_message(self, message: Message) -> Message:
+        """Insert or replace a message (e.g. after a send attempt)."""
+        self.messages[message.id] = message
+        self._notify_message(message)
+        return message
+    
     def get_message(self, message_id: str) -> Optional[Message]:
         """Get message by ID."""
         return self.messages.get(message_id)
     
     def list_messages(self, query: MessageQuery) -> tuple[List[Message], int]:
         """List messages with filtering and pagination."""
-        messages = list(self.messages.values())
-        
-        # Apply filters
-        if query.campaign_id:
-            messages = [m for m in messages if m.campaign_id == query.campaign_id]
-        
-        if query.status:
-            messages = [m for m in messages if m.status in query.status]
-        
-        if query.lead_id:
-            messages = [m for m in messages if m.lead_id == query.lead_id]
+        messages = list(self._filter_messages(query))
         
         # Sort by scheduled_at
         messages.sort(key=lambda m: m.scheduled_at)
@@ -190,6 +211,27 @@ class CampaignStore:
         
         return messages, total
     
+    def messages_page(self, query: MessageQuery) -> Page[Message]:
+        """Keyset page on (scheduled_at, id) after query.cursor; cost independent of depth."""
+        messages = self._filter_messages(query)
+        if query.include_total:
+            messages = list(messages)
+        page = keyset_page(messages, lambda m: m.scheduled_at, lambda m: m.id,
+                           query.page_size, query.cursor)
+        if query.include_total:
+            page.total = len(messages)
+        return page
+    
+    def _filter_messages(self, query: MessageQuery) -> Iterator[Message]:
+        for m in self.messages.values():
+            if query.campaign_id and m.campaign_id != query.campaign_id:
+                continue
+            if query.status and m.status not in query.status:
+                continue
+            if query.lead_id and m.lead_id != query.lead_id:
+                continue
+            yield m
+    
     def update_message_status(self, message_id: str, status: MessageStatus, error: str = None) -> bool:
         """Update message status."""
         message = self.messages.get(message_id)
@@ -202,6 +244,7 @@ class CampaignStore:
         elif error:
             message.last_error = error
         
+        self._notify_message(message)
         return True
     
     def create_event(self, event: MessageEvent) -> MessageEvent:
@@ -1,15 +1,43 @@
 """PostgreSQL-based leads store using Supabase."""
 import os
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
+import hashlib
+import re
+import uuid
 from supabase import create_client, Client
 import logging
 import json
 
 from app.schemas.lead import LeadOut, LeadDetail, LeadStatus
+from app.services.pagination import InvalidCursor, Page, decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
+# Rows per upsert_leads() call; keeps request bodies well under PostgREST limits
+UPSERT_BATCH_SIZE = int(os.getenv("LEADS_UPSERT_BATCH_SIZE", "500"))
+# Ids per get_many() request; id=in.(...) lives in the URL, so keep it well under proxy limits
+GET_MANY_CHUNK = int(os.getenv("LEADS_GET_MANY_CHUNK", "200"))
+# Ids minted by _upsert_batches; everything else must be a UUID
+_IMPORT_ID = re.compile(r'lead_[0-9a-f]{12}')
+
+
+def _decode_lead_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a leads cursor, refusing anything that isn't (datetime, lead id).
+
+    Both parts end up inside a PostgREST or() filter string, so a crafted id
+    (',' or ')') would otherwise rewrite the filter expression.
+    """
+    created_at, lead_id = decode_cursor(cursor)
+    if not isinstance(created_at, datetime) or not isinstance(lead_id, str):
+        raise InvalidCursor("Invalid cursor")
+    if _IMPORT_ID.fullmatch(lead_id):
+        return created_at, lead_id
+    try:
+        return created_at, str(uuid.UUID(lead_id))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor") from None
+
 
 class DBLeadsStore:
     """Database leads store for production using Supabase."""
@@ -68,6 +96,7 @@ class DBLeadsStore:
             deleted_at=row.get('deleted_at'),
             created_at=row.get('created_at'),
             updated_at=row.get('updated_at'),
+            has_report=row.get('has_report', False),
             is_deleted=row.get('deleted_at') is not None,
         )
     
@@ -77,13 +106,13 @@ class DBLeadsStore:
         page: int = 1,
         page_size: int = 25,
         search: Optional[str] = None,
-        status: Optional[LeadStatus] = None,
+        status: Optional[List[LeadStatus]] = None,
         tags: Optional[List[str]] = None,
         has_image: Optional[bool] = None,
-        has_vars: Optional[bool] = None,
+        has_var: Optional[bool] = None,
         list_name: Optional[str] = None,
         is_complete: Optional[bool] = None,
-        tld: Optional[str] = None,
+        domain_tld: Optional[List[str]] = None,
         sort_by: Optional[str] = None,
         sort_order: Optional[str] = None,
         include_deleted: bool = False,
@@ -96,29 +125,11 @@ class DBLeadsStore:
         try:
             # Start query
             query = self.supabase.table('leads').select('*', count='exact')
-            
-            # Filter out deleted unless explicitly requested
-            if not include_deleted:
-                query = query.is_('deleted_at', 'null')
-            
-            # Apply filters
-            if search:
-                query = query.or_(f'email.ilike.%{search}%,company.ilike.%{search}%,domain.ilike.%{search}%')
-            
-            if status:
-                query = query.eq('status', status.value)
-            
-            if list_name:
-                query = query.eq('list_name', list_name)
-            
-            if tld:
-                query = query.ilike('domain', f'%.{tld}')
-            
-            if has_image is not None:
-                if has_image:
-                    query = query.not_.is_('image_key', 'null')
-                else:
-                    query = query.is_('image_key', 'null')
+            query = self._apply_filters(
+                query, search=search, status=status, has_image=has_image, has_var=has_var,
+                list_name=list_name, is_complete=is_complete, domain_tld=domain_tld,
+                include_deleted=include_deleted,
+            )
             
             # Sorting
             if sort_by:
@@ -144,6 +155,114 @@ class DBLeadsStore:
             logger.error(f"Error querying leads: {e}")
             return [], 0
     
+    def query_page(
+        self,
+        *,
+        page_size: int = 25,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        search: Optional[str] = None,
+        status: Optional[List[LeadStatus]] = None,
+        has_image: Optional[bool] = None,
+        has_var: Optional[bool] = None,
+        list_name: Optional[str] = None,
+        is_complete: Optional[bool] = None,
+        domain_tld: Optional[List[str]] = None,
+        include_deleted: bool = False,
+    ) -> Page[LeadOut]:
+        """Keyset page on (created_at desc, id desc) after cursor.
+        
+        Uses the (created_at, id) index instead of OFFSET, so deep pages cost the same as
+        page 1. The total is only counted on request, and then estimated from planner stats.
+        Raises InvalidCursor for a malformed cursor.
+        """
+        after = _decode_lead_cursor(cursor) if cursor else None
+        if not self.supabase:
+            logger.warning("Supabase not initialized")
+            return Page()
+        
+        try:
+            if include_total:
+                query = self.supabase.table('leads').select('*', count='estimated')
+            else:
+                query = self.supabase.table('leads').select('*')
+            query = self._apply_filters(
+                query, search=search, status=status, has_image=has_image, has_var=has_var,
+                list_name=list_name, is_complete=is_complete, domain_tld=domain_tld,
+                include_deleted=include_deleted,
+            )
+            
+            if after:
+                created_at, lead_id = after
+                ts = created_at.isoformat()
+                query = query.or_(f'created_at.lt.{ts},and(created_at.eq.{ts},id.lt.{lead_id})')
+            
+            query = query.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1)
+            response = query.execute()
+            rows = response.data or []
+            
+            page = Page(items=[self._row_to_lead(row) for row in rows[:page_size]])
+            if len(rows) > page_size:
+                last = rows[page_size - 1]
+                created_at = last['created_at']
+                if isinstance(created_at, str):
+                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                page.next_cursor = encode_cursor(created_at, last['id'])
+            if include_total:
+                page.total = response.count
+            return page
+            
+        except Exception as e:
+            logger.error(f"Error querying lead page: {e}")
+            return Page()
+    
+    def _apply_filters(
+        self,
+        query,
+        *,
+        search: Optional[str],
+        status: Optional[List[LeadStatus]],
+        has_image: Optional[bool],
+        has_var: Optional[bool],
+        list_name: Optional[str],
+        is_complete: Optional[bool],
+        domain_tld: Optional[List[str]],
+        include_deleted: bool,
+    ):
+        """Apply the lead list filters to a PostgREST query."""
+        # Filter out deleted unless explicitly requested
+        if not include_deleted:
+            query = query.is_('deleted_at', 'null')
+        
+        # Apply filters
+        if search:
+            query = query.or_(f'email.ilike.%{search}%,company.ilike.%{search}%,domain.ilike.%{search}%')
+        
+        if status:
+            query = query.in_('status', [s.value for s in status])
+        
+        if list_name:
+            query = query.eq('list_name', list_name)
+        
+        if domain_tld:
+            # Same suffix semantics as LeadsStore: ".nl" or "nl" both match "shop.nl"
+            query = query.or_(','.join(f'domain.ilike.%{t}' for t in domain_tld))
+        
+        if is_complete is not None:
+            # Materialised column (trigger-maintained), see supabase_triggers.sql
+            query = query.eq('is_complete', is_complete)
+        
+        if has_image is not None:
+            if has_image:
+                query = query.not_.is_('image_key', 'null')
+            else:
+                query = query.is_('image_key', 'null')
+        
+        if has_var is not None:
+            query = query.neq('vars', '{}') if has_var else query.eq('vars', '{}')
+        
+        return query
+    
     def get_by_id(self, lead_id: str) -> Optional[LeadOut]:
         """Get lead by ID."""
         if not self.supabase:
@@ -159,6 +278,23 @@ class DBLeadsStore:
             logger.error(f"Error fetching lead {lead_id}: {e}")
             return None
     
+    def get_many(self, lead_ids: Iterable[str]) -> Dict[str, LeadOut]:
+        """Leads by id with one request per GET_MANY_CHUNK ids (missing ids are left out)."""
+        if not self.supabase:
+            logger.warning("Supabase not initialized")
+            return {}
+        
+        ids = list(dict.fromkeys(lead_ids))
+        leads: Dict[str, LeadOut] = {}
+        try:
+            for start in range(0, len(ids), GET_MANY_CHUNK):
+                response = self.supabase.table('leads').select('*').in_('id', ids[start:start + GET_MANY_CHUNK]).execute()
+                for row in response.data or []:
+                    leads[row['id']] = self._row_to_lead(row)
+        except Exception as e:
+            logger.error(f"Error fetching {len(ids)} leads: {e}")
+        return leads
+    
     def get_by_email(self, email: str) -> Optional[LeadOut]:
         """Get lead by email."""
         if not self.supabase:
@@ -174,6 +310,66 @@ class DBLeadsStore:
             logger.error(f"Error fetching lead by email {email}: {e}")
             return None
     
+    def set_report_bound(self, lead_id: str, bound: bool) -> bool:
+        """Set the materialised has_report of a lead (report links are held by the reports store)."""
+        if not self.supabase:
+            return False
+        
+        try:
+            response = self.supabase.table('leads').update({'has_report': bound}).eq('id', lead_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error updating has_report for lead {lead_id}: {e}")
+            return False
+    
+    def update_status(self, lead_id: str, status: LeadStatus) -> bool:
+        """Update lead status (unsubscribe, bounce). Returns True if found."""
+        if not self.supabase:
+            return False
+        
+        try:
+            response = self.supabase.table('leads').update({'status': status.value}).eq('id', lead_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error updating status for lead {lead_id}: {e}")
+            return False
+    
+    def stop_lead(self, lead_id: str) -> bool:
+        """Mark a lead as stopped (queued messages are canceled by the scheduler). Returns True if found."""
+        if not self.supabase:
+            return False
+        
+        try:
+            response = self.supabase.table('leads').update({'stopped': True}).eq('id', lead_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error stopping lead {lead_id}: {e}")
+            return False
+    
+    def is_stopped(self, lead_id: str) -> bool:
+        """Check if a lead is stopped."""
+        if not self.supabase:
+            return False
+        
+        try:
+            response = self.supabase.table('leads').select('stopped').eq('id', lead_id).execute()
+            return bool(response.data and response.data[0].get('stopped'))
+        except Exception as e:
+            logger.error(f"Error reading stopped flag for lead {lead_id}: {e}")
+            return False
+    
+    def refresh_completeness(self) -> int:
+        """Recompute vars_complete for all leads server-side (template set changed). Returns rows updated."""
+        if not self.supabase:
+            return 0
+        
+        try:
+            response = self.supabase.rpc('refresh_lead_completeness', {}).execute()
+            return int(response.data or 0)
+        except Exception as e:
+            logger.error(f"Error refreshing lead completeness: {e}")
+            return 0
+    
     def get_all(self) -> List[LeadOut]:
         """Get all leads (non-deleted)."""
         leads, _ = self.query(page=1, page_size=10000, include_deleted=False)
@@ -217,7 +413,6 @@ class DBLeadsStore:
             data['id'] = existing.id
         else:
             # Insert
-            import hashlib
             lead_id = f"lead_{hashlib.md5(email.encode()).hexdigest()[:12]}"
             data['id'] = lead_id
             data['created_at'] = datetime.utcnow().isoformat()
@@ -230,3 +425,49 @@ class DBLeadsStore:
             logger.error(f"Error upserting lead: {e}")
         
         return None
+
+    def upsert_many(self, records: Iterable[Dict[str, Any]], batch_size: int = UPSERT_BATCH_SIZE) -> List[bool]:
+        """Batched upsert by email. Returns per-row created flags (False = updated).
+        - One upsert_leads() RPC per batch: INSERT ... ON CONFLICT (email), vars merged server-side
+        - Empty values never overwrite stored ones (same rules as the in-memory store)
+        """
+        if not self.supabase:
+            raise RuntimeError("Supabase not initialized")
+
+        created: List[bool] = []
+        for batch in self._upsert_batches(records, batch_size):
+            try:
+                response = self.supabase.rpc('upsert_leads', {'leads_json': batch}).execute()
+            except Exception as e:
+                logger.error(f"Error upserting {len(batch)} leads (is upsert_leads() deployed?): {e}")
+                raise
+            flags = {row['lead_email']: row['created'] for row in (response.data or [])}
+            created.extend(flags.get(row['email'], False) for row in batch)
+        return created
+
+    def _upsert_batches(self, records: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """JSON rows in batches; an email repeated within a batch starts a new one (ON CONFLICT can't hit a row twice)."""
+        batch: List[Dict[str, Any]] = []
+        emails = set()
+        for record in records:
+            email = record['email']
+            if len(batch) >= batch_size or email in emails:
+                yield batch
+                batch, emails = [], set()
+            status = record.get('status') or LeadStatus.active
+            batch.append({
+                'id': f"lead_{hashlib.md5(email.encode()).hexdigest()[:12]}",
+                'email': email,
+                'company': record.get('company'),
+                'url': record.get('url'),
+                'domain': record.get('domain'),
+                'status': status.value if isinstance(status, LeadStatus) else status,
+                'tags': record.get('tags') or [],
+                'image_key': record.get('image_key'),
+                'list_name': record.get('list_name'),
+                # Round-trip so dates etc. from spreadsheets serialise
+                'vars': json.loads(json.dumps(record.get('vars') or {}, default=str)),
+            })
+            emails.add(email)
+        if batch:
+            yield batch
@@ -0,0 +1,106 @@
+import heapq
+import itertools
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.models.campaign import Message
+
+
+class DomainQueue:
+    """
+    Priority queue of scheduled messages for a single domain.
+    - Ordered by (scheduled_at, sequence) so equal slots stay FIFO
+    - O(log n) push/pop, O(1) peek of the next due time
+    - Lazy deletion: cancelled entries stay in the heap and are dropped when they surface
+    """
+
+    def __init__(self):
+        # Heap entries are [scheduled_at, sequence, item]; item is None once cancelled
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}  # message_id -> heap entry
+        self._sequence = itertools.count()
+
+    def push(self, message: Message, scheduled_at: Optional[datetime] = None) -> None:
+        """Add message to queue (replaces an existing entry for the same message)."""
+        if message.id in self._entries:
+            self.cancel(message.id)
+
+        scheduled_at = scheduled_at or message.scheduled_at
+        item = {"message": message, "scheduled_at": scheduled_at}
+        entry = [scheduled_at, next(self._sequence), item]
+        self._entries[message.id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, message_id: str) -> bool:
+        """Mark message as removed. Returns True if it was queued."""
+        entry = self._entries.pop(message_id, None)
+        if entry is None:
+            return False
+        entry[-1] = None
+        return True
+
+    def peek_time(self) -> Optional[datetime]:
+        """Scheduled time of the next live message, or None if empty."""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def peek(self) -> Optional[Dict]:
+        """Next live queue item without removing it."""
+        self._drop_cancelled()
+        return self._heap[0][-1] if self._heap else None
+
+    def pop(self) -> Optional[Dict]:
+        """Remove and return the next live queue item."""
+        self._drop_cancelled()
+        if not self._heap:
+            return None
+        entry = heapq.heappop(self._heap)
+        item = entry[-1]
+        del self._entries[item["message"].id]
+        return item
+
+    def pop_due(self, current_time: datetime) -> List[Dict]:
+        """Remove and return all items scheduled at or before current_time (in order)."""
+        due = []
+        while True:
+            next_time = self.peek_time()
+            if next_time is None or next_time > current_time:
+                break
+            due.append(self.pop())
+        return due
+
+    def pop_before(self, cutoff: datetime) -> List[Dict]:
+        """Remove and return all items scheduled strictly before cutoff (in order)."""
+        due = []
+        while True:
+            next_time = self.peek_time()
+            if next_time is None or next_time >= cutoff:
+                break
+            due.append(self.pop())
+        return due
+
+    def remove_where(self, predicate: Callable[[Message], bool]) -> List[Message]:
+        """Cancel all live messages matching predicate. Returns the cancelled messages."""
+        matched = [entry[-1]["message"] for entry in self._entries.values() if predicate(entry[-1]["message"])]
+        for message in matched:
+            self.cancel(message.id)
+        return matched
+
+    def _drop_cancelled(self) -> None:
+        heap = self._heap
+        while heap and heap[0][-1] is None:
+            heapq.heappop(heap)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Iterate live items in scheduling order (O(n log n), for inspection only)."""
+        for entry in sorted(e for e in self._heap if e[-1] is not None):
+            yield entry[-1]
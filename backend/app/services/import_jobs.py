@@ -29,11 +29,11 @@ class ImportJobStore:
     def __init__(self) -> None:
         self._jobs: Dict[str, ImportJobRecord] = {}
 
-    def create(self, *, job_id: str, filename: str) -> ImportJobRecord:
+    def create(self, *, job_id: str, filename: str, status: str = "running") -> ImportJobRecord:
         rec = ImportJobRecord(
             id=job_id,
             filename=filename,
-            status="running",
+            status=status,
             progress=0.0,
             inserted=0,
             updated=0,
@@ -67,7 +67,7 @@ class ImportJobStore:
         if skipped is not None:
             rec.skipped = skipped
         if errors is not None:
-            rec.errors = errors
+            rec.errors = list(errors)
         if status is not None:
             rec.status = status
             if status in ("succeeded", "failed"):
@@ -1,15 +1,22 @@
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import uuid4
 from loguru import logger
 from ..inbox.imap_client import IMAPClient
 
 
+def account_folders(account: Dict[str, Any]) -> List[str]:
+    """Folders ingested for an account (INBOX when none are configured)"""
+    return account.get('folders') or ['INBOX']
+
+
 class MailAccountsStore:
     """In-memory store for IMAP accounts (MVP implementation)"""
     
     def __init__(self):
         self.accounts: Dict[str, Dict[str, Any]] = {}
+        # (account_id, folder) -> uidvalidity, last_seen_uid, highest_modseq
+        self.sync_state: Dict[Tuple[str, str], Dict[str, Any]] = {}
         self._seed_default_accounts()
     
     
@@ -39,6 +46,7 @@ class MailAccountsStore:
             'username': account_data['username'],
             'secret_ref': account_data['secret_ref'],
             'active': account_data.get('active', True),
+            'folders': account_data.get('folders') or ['INBOX'],
             'last_fetch_at': None,
             'last_seen_uid': None,
             'created_at': now,
@@ -57,7 +65,7 @@ class MailAccountsStore:
         account = self.accounts[account_id]
         
         # Update allowed fields
-        allowed_fields = ['label', 'imap_host', 'imap_port', 'use_ssl', 'username', 'secret_ref', 'active']
+        allowed_fields = ['label', 'imap_host', 'imap_port', 'use_ssl', 'username', 'secret_ref', 'active', 'folders']
         for field in allowed_fields:
             if field in updates:
                 account[field] = updates[field]
@@ -79,14 +87,32 @@ class MailAccountsStore:
         logger.info(f"IMAP account {status}: {account['label']}")
         return account
     
-    def update_fetch_info(self, account_id: str, last_seen_uid: int):
+    def update_fetch_info(self, account_id: str, last_seen_uid: int, folder: str = 'INBOX'):
         """Update last fetch information"""
         if account_id in self.accounts:
+            self.sync_state.setdefault((account_id, folder), {})['last_seen_uid'] = last_seen_uid
             account = self.accounts[account_id]
             account['last_fetch_at'] = datetime.utcnow()
-            account['last_seen_uid'] = last_seen_uid
+            if folder == 'INBOX':
+                account['last_seen_uid'] = last_seen_uid
             account['updated_at'] = datetime.utcnow()
     
+    def get_sync_state(self, account_id: str, folder: str = 'INBOX') -> Dict[str, Any]:
+        """Sync state of one folder (empty values before the first sync)"""
+        state = {'uidvalidity': None, 'last_seen_uid': None, 'highest_modseq': None}
+        if folder == 'INBOX' and account_id in self.accounts:
+            state['last_seen_uid'] = self.accounts[account_id].get('last_seen_uid')
+        state.update(self.sync_state.get((account_id, folder), {}))
+        return state
+    
+    def update_sync_state(self, account_id: str, folder: str, uidvalidity: Optional[int],
+                          highest_modseq: Optional[int]):
+        """Record the folder's UIDVALIDITY and HIGHESTMODSEQ after a sync"""
+        if account_id in self.accounts:
+            state = self.sync_state.setdefault((account_id, folder), {})
+            state['uidvalidity'] = uidvalidity
+            state['highest_modseq'] = highest_modseq
+    
     def mask_username(self, username: str) -> str:
         """Mask username for security"""
         if '@' in username:
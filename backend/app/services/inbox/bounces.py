@@ -0,0 +1,152 @@
+import email
+import email.message
+import os
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+from app.models.lead import LeadStatus
+from app.models.campaign import MessageStatus
+
+# Transient failures (4.x.x / Action: delayed) are recorded but only suppress the lead when enabled
+BOUNCE_SUPPRESS_SOFT = os.getenv("BOUNCE_SUPPRESS_SOFT", "false").lower() == "true"
+
+
+def _field(headers: email.message.Message, name: str) -> Optional[str]:
+    """DSN field value without its type prefix ("rfc822; a@b.nl" -> "a@b.nl")"""
+    value = headers.get(name)
+    if not value:
+        return None
+    value = str(value).strip()
+    if name in ('Final-Recipient', 'Original-Recipient', 'Diagnostic-Code') and ';' in value:
+        value = value.split(';', 1)[1].strip()
+    return ' '.join(value.split()) or None
+
+
+def _original_message_id(report: email.message.Message) -> Optional[str]:
+    """Message-ID of the returned message (message/rfc822 or text/rfc822-headers part)"""
+    for part in report.walk():
+        content_type = part.get_content_type()
+        if content_type == 'message/rfc822':
+            payload = part.get_payload()
+            headers = payload[0] if isinstance(payload, list) and payload else None
+        elif content_type == 'text/rfc822-headers':
+            headers = email.message_from_string(part.get_payload(decode=True).decode('utf-8', errors='replace'))
+        else:
+            continue
+        if headers is not None and headers.get('Message-ID'):
+            return str(headers['Message-ID']).strip().strip('<>')
+    return None
+
+
+def parse_dsn(msg: email.message.Message) -> Optional[Dict[str, Any]]:
+    """
+    Parse an RFC 3464 delivery status notification (multipart/report; report-type=delivery-status).
+    Returns None for other mail, otherwise the first failed or delayed recipient:
+    original_message_id, recipient, action, status (e.g. "5.1.1"), diagnostic and hard (permanent failure).
+    """
+    if msg.get_content_type() != 'multipart/report':
+        return None
+    if (msg.get_param('report-type') or '').lower() != 'delivery-status':
+        return None
+
+    recipients = []
+    for part in msg.walk():
+        if part.get_content_type() == 'message/delivery-status':
+            payload = part.get_payload()
+            # First block holds per-message fields, the rest are per-recipient
+            recipients = payload[1:] if isinstance(payload, list) else []
+            break
+
+    for fields in recipients:
+        action = (_field(fields, 'Action') or '').lower()
+        status = (_field(fields, 'Status') or '').split(' ')[0]  # "5.1.1 (comment)"
+        if action not in ('failed', 'delayed') and not status.startswith(('4', '5')):
+            continue
+        return {
+            'original_message_id': _original_message_id(msg),
+            'recipient': (_field(fields, 'Final-Recipient') or _field(fields, 'Original-Recipient') or '').lower() or None,
+            'action': action or None,
+            'status': status or None,
+            'diagnostic': _field(fields, 'Diagnostic-Code'),
+            'hard': status.startswith('5') or (action == 'failed' and not status.startswith('4'))
+        }
+    return None
+
+
+class BounceProcessor:
+    """
+    Classifier stage of the inbox pipeline: turns fetched DSNs into bounces
+    - Outbound message resolved through the linker index (Original Message-ID, else recipient + send time)
+    - Hard bounces go through MessageSender.handle_bounce per batch; each lead is looked up and suppressed once
+    - Suppressed leads are reported to listeners (e.g. the scheduler drops their queued messages)
+    """
+
+    def __init__(self, message_linker, sender, campaign_store, leads_store,
+                 suppress_soft: bool = BOUNCE_SUPPRESS_SOFT):
+        self.message_linker = message_linker
+        self.sender = sender
+        self.campaign_store = campaign_store
+        self.leads_store = leads_store
+        self.suppress_soft = suppress_soft
+        self._suppress_listeners: List[Callable[[str], None]] = []
+
+    def add_suppress_listener(self, listener: Callable[[str], None]) -> None:
+        """Register a callback(lead_id) for leads suppressed because of a bounce"""
+        self._suppress_listeners.append(listener)
+
+    async def process(self, inbox_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Resolve and apply the DSNs in a fetched batch. Resolved DSNs are linked to their
+        outbound message; returns them (other messages are ignored).
+        """
+        bounced = []
+        for inbox_message in inbox_messages:
+            dsn = inbox_message.get('dsn')
+            if not dsn:
+                continue
+            try:
+                outbound = self.message_linker.find_outbound(
+                    dsn['original_message_id'], dsn['recipient'], inbox_message['received_at']
+                )
+            except Exception as e:
+                # One unreadable report must not drop the rest of the fetched batch
+                logger.error(f"Error resolving bounce for {dsn.get('recipient')}: {str(e)}")
+                continue
+            if outbound is None:
+                logger.info(f"Unresolved bounce for {dsn['recipient']} ({dsn['status']})")
+                continue
+            inbox_message.update({
+                'linked_message_id': outbound.id,
+                'linked_campaign_id': outbound.campaign_id,
+                'linked_lead_id': outbound.lead_id,
+                'weak_link': False
+            })
+            bounced.append(inbox_message)
+
+        leads = {}
+        for inbox_message in bounced:
+            dsn = inbox_message['dsn']
+            if not (dsn['hard'] or self.suppress_soft):
+                logger.info(f"Soft bounce for message {inbox_message['linked_message_id']}: {dsn['status']}")
+                continue
+            message = self.campaign_store.get_message(inbox_message['linked_message_id'])
+            if message is None or message.status == MessageStatus.bounced:
+                continue  # repeated DSN
+            lead = leads.get(message.lead_id) or self.leads_store.get_by_id(message.lead_id)
+            if lead is None:
+                continue
+            leads[message.lead_id] = lead
+
+            reason = ' '.join(filter(None, [dsn['status'], dsn['diagnostic']]))
+            try:
+                await self.sender.handle_bounce(message, lead, reason)
+                self.campaign_store.save_message(message)
+            except Exception as e:
+                logger.error(f"Error applying bounce to message {message.id}: {str(e)}")
+
+        for lead_id in leads:
+            self.leads_store.update_status(lead_id, LeadStatus.bounced)
+            for listener in self._suppress_listeners:
+                listener(lead_id)
+        if leads:
+            logger.warning(f"Suppressed {len(leads)} bounced leads")
+        return bounced
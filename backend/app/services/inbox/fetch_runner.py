@@ -1,65 +1,153 @@
 import asyncio
+import os
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from itertools import islice
+from typing import List, Dict, Any, Optional, Set, Tuple
 from uuid import uuid4
 from loguru import logger
 from .imap_client import IMAPClient
-from .linker import MessageLinker
-from .accounts import MailAccountService
+from .linker import MessageLinker, to_utc
+from .accounts import MailAccountService, account_folders
+from .bounces import BounceProcessor
+from app.services.pagination import InvalidCursor, Page, decode_cursor, encode_cursor
+
+# imaplib is blocking: IMAP sessions run on a bounded thread pool, never on the event loop
+IMAP_FETCH_WORKERS = int(os.getenv("IMAP_FETCH_WORKERS", "4"))
+# Wall-clock limit for one account's connect + search + fetch
+IMAP_FETCH_TIMEOUT = float(os.getenv("IMAP_FETCH_TIMEOUT", "120"))
+# Socket timeout per IMAP operation, so a timed-out worker thread is released too
+IMAP_SOCKET_TIMEOUT = float(os.getenv("IMAP_SOCKET_TIMEOUT", "30"))
+# IMAP sessions one account may hold at once (one per folder); servers cap concurrent logins
+IMAP_FOLDER_CONNECTIONS = int(os.getenv("IMAP_FOLDER_CONNECTIONS", "3"))
+# Fetch headers first; pull body snippets only for replies the linker cannot resolve from headers
+IMAP_HEADERS_FIRST = os.getenv("IMAP_FETCH_MODE", "full").lower() == "headers_first"
 
 
 class MailMessageStore:
-    """In-memory store for mail messages (MVP implementation)"""
+    """
+    In-memory store for mail messages (MVP implementation)
+    - Unique (account_id, folder, uid) key map: duplicate check is O(1)
+    - Secondary indexes on account_id, linked_campaign_id and unread
+    - (received_at, id) kept sorted on insert, so queries never re-sort; received_at is
+      stored as aware UTC so parsed Date headers and utcnow fallbacks compare
+    """
     
     def __init__(self):
         self.messages: Dict[str, Dict[str, Any]] = {}
         self.runs: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[Tuple[str, str, int], str] = {}
+        self._by_account: Dict[str, Set[str]] = {}
+        self._by_campaign: Dict[str, Set[str]] = {}
+        self._unread: Set[str] = set()
+        self._order: List[Tuple[datetime, str]] = []  # ascending (received_at, id)
     
     
     def create_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create new message with unique constraint check"""
         # Check for duplicate (account_id, folder, uid)
-        for existing_msg in self.messages.values():
-            if (existing_msg['account_id'] == message_data['account_id'] and
-                existing_msg['folder'] == message_data['folder'] and
-                existing_msg['uid'] == message_data['uid']):
-                logger.debug(f"Duplicate message ignored: UID {message_data['uid']}")
-                return existing_msg
+        key = (message_data['account_id'], message_data['folder'], message_data['uid'])
+        existing_id = self._by_key.get(key)
+        if existing_id is not None:
+            logger.debug(f"Duplicate message ignored: UID {message_data['uid']}")
+            return self.messages[existing_id]
         
         message_id = str(uuid4())
         message_data['id'] = message_id
         message_data['created_at'] = datetime.utcnow()
+        message_data['received_at'] = to_utc(message_data['received_at'])
         
+        # Ordered index first: a failure there leaves no half-stored message behind
+        self._index(key, message_data)
         self.messages[message_id] = message_data
         return message_data
     
+    def create_messages(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Bulk insert a fetched batch; returns only the newly created messages"""
+        created = []
+        for message_data in batch:
+            try:
+                stored = self.create_message(message_data)
+            except Exception as e:
+                logger.error(f"Error storing message UID {message_data.get('uid')}: {str(e)}")
+                continue
+            if stored is message_data:
+                created.append(stored)
+        return created
+    
+    def _index(self, key: Tuple[str, str, int], message: Dict[str, Any]) -> None:
+        message_id = message['id']
+        insort(self._order, (message['received_at'], message_id))
+        self._by_key[key] = message_id
+        self._by_account.setdefault(message['account_id'], set()).add(message_id)
+        if message.get('linked_campaign_id'):
+            self._by_campaign.setdefault(message['linked_campaign_id'], set()).add(message_id)
+        if not message.get('is_read'):
+            self._unread.add(message_id)
+    
     def get_all(self) -> List[Dict[str, Any]]:
         """Get all messages"""
         return list(self.messages.values())
     
     def get_by_query(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Get messages by query parameters"""
-        messages = list(self.messages.values())
-        
-        # Apply filters
+        """Get messages by query parameters, sorted by received_at desc"""
+        return list(self._iter_desc(query))
+    
+    def get_page_by_query(self, query: Dict[str, Any], page_size: int,
+                          cursor: Optional[str] = None, include_total: bool = False) -> Page[Dict[str, Any]]:
+        """Keyset page on (received_at desc, id) after cursor; cost independent of depth"""
+        before = None
+        if cursor:
+            received_at, message_id = decode_cursor(cursor)
+            if not isinstance(received_at, datetime):
+                raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+            before = (to_utc(received_at), message_id)
+        messages = list(islice(self._iter_desc(query, before), page_size + 1))
+        page = Page(items=messages[:page_size])
+        if len(messages) > page_size:
+            last = messages[page_size - 1]
+            page.next_cursor = encode_cursor(last['received_at'], last['id'])
+        if include_total:
+            page.total = sum(1 for _ in self._iter_desc(query))
+        return page
+    
+    def _candidate_ids(self, query: Dict[str, Any]) -> Optional[Set[str]]:
+        """Ids matching the indexed filters (None when no indexed filter applies)"""
+        sets: List[Set[str]] = []
         if query.get('account_id'):
-            messages = [m for m in messages if m['account_id'] == query['account_id']]
-        
+            sets.append(self._by_account.get(query['account_id'], set()))
         if query.get('campaign_id'):
-            messages = [m for m in messages if m['linked_campaign_id'] == query['campaign_id']]
+            sets.append(self._by_campaign.get(query['campaign_id'], set()))
+        if query.get('unread') is True:
+            sets.append(self._unread)
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+    
+    def _iter_desc(self, query: Dict[str, Any], before: Optional[Tuple[datetime, str]] = None):
+        """Matching messages lazily by (received_at, id) desc, strictly before the given position"""
+        ids = self._candidate_ids(query)
+        if ids is None:
+            end = bisect_left(self._order, before) if before else len(self._order)
+            keys = (self._order[i] for i in range(end - 1, -1, -1))
+        else:
+            keys = ((self.messages[i]['received_at'], i) for i in ids)
+            if before:
+                keys = (k for k in keys if k < before)
+            keys = sorted(keys, reverse=True)
+        messages = (self.messages[message_id] for _, message_id in keys)
         
-        if query.get('unread') is not None:
-            messages = [m for m in messages if not m['is_read'] == query['unread']]
+        if query.get('unread') is False:
+            messages = (m for m in messages if m['id'] not in self._unread)
         
         if query.get('q'):
             search_term = query['q'].lower()
-            messages = [m for m in messages if 
+            messages = (m for m in messages if 
                        search_term in m['from_email'].lower() or
-                       search_term in (m['from_name'] or '').lower() or
-                       search_term in m['subject'].lower()]
-        
-        # Sort by received_at desc
-        messages.sort(key=lambda x: x['received_at'], reverse=True)
+                       search_term in (m.get('from_name') or '').lower() or
+                       search_term in m['subject'].lower())
         
         return messages
     
@@ -67,9 +155,48 @@ class MailMessageStore:
         """Mark message as read"""
         if message_id in self.messages:
             self.messages[message_id]['is_read'] = True
+            self._unread.discard(message_id)
             return True
         return False
     
+    def sync_read_flags(self, account_id: str, folder: str, flags: Dict[int, bool]) -> int:
+        """Apply server-side \\Seen changes (uid -> seen); returns the number of messages changed"""
+        changed = 0
+        for uid, seen in flags.items():
+            message_id = self._by_key.get((account_id, folder, uid))
+            if message_id is None or self.messages[message_id].get('is_read') == seen:
+                continue
+            self.messages[message_id]['is_read'] = seen
+            if seen:
+                self._unread.discard(message_id)
+            else:
+                self._unread.add(message_id)
+            changed += 1
+        return changed
+    
+    def rebind_uids(self, account_id: str, folder: str, fetched: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        UIDVALIDITY changed: the folder's stored UIDs are void. Drops them from the key map,
+        re-keys stored messages found again by Message-ID and returns the fetched ones not stored yet.
+        """
+        by_message_id = {}
+        for message_id in self._by_account.get(account_id, set()):
+            stored = self.messages[message_id]
+            if stored['folder'] == folder:
+                self._by_key.pop((account_id, folder, stored['uid']), None)
+                if stored.get('message_id'):
+                    by_message_id[stored['message_id']] = stored
+        
+        fresh = []
+        for msg in fetched:
+            stored = by_message_id.get(msg.get('message_id'))
+            if stored is None:
+                fresh.append(msg)
+                continue
+            stored['uid'] = msg['uid']
+            self._by_key[(account_id, folder, msg['uid'])] = stored['id']
+        return fresh
+    
     def create_run(self, run_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create fetch run record"""
         run_id = str(uuid4())
@@ -95,17 +222,51 @@ class MailMessageStore:
 
 
 class FetchRunner:
-    """Manages IMAP fetch operations with rate limiting and job tracking"""
+    """
+    Manages IMAP fetch operations with rate limiting and job tracking
+    - Blocking IMAP I/O runs on a bounded thread pool (IMAP_FETCH_WORKERS), accounts in parallel
+    - One fetch per account at a time; each folder session is cut off after IMAP_FETCH_TIMEOUT
+    - An account's folders sync concurrently, at most IMAP_FOLDER_CONNECTIONS sessions each
+    - Linking and storing stay on the event loop
+    - Headers-first mode (IMAP_FETCH_MODE=headers_first) skips snippets for header-linked replies;
+      which replies those are is decided on the event loop, between the header and snippet fetches
+    """
     
     MIN_FETCH_INTERVAL = timedelta(minutes=2)  # Configurable minimum interval
     
     def __init__(self, accounts_service: MailAccountService, 
                  messages_store: MailMessageStore,
-                 message_linker: MessageLinker):
+                 message_linker: MessageLinker,
+                 max_workers: int = IMAP_FETCH_WORKERS,
+                 fetch_timeout: float = IMAP_FETCH_TIMEOUT,
+                 headers_first: bool = IMAP_HEADERS_FIRST,
+                 folder_connections: int = IMAP_FOLDER_CONNECTIONS,
+                 bounce_processor: Optional[BounceProcessor] = None):
         self.accounts_service = accounts_service
         self.messages_store = messages_store
         self.message_linker = message_linker
         self.last_fetch_times: Dict[str, datetime] = {}
+        self.fetch_timeout = fetch_timeout
+        self.folder_connections = folder_connections
+        self.bounce_processor = bounce_processor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="imap-fetch")
+        self._fetching: Set[str] = set()  # account ids with a fetch in flight
+        self.headers_first = headers_first
+    
+    def _unresolved_by_headers(self, message: Dict[str, Any]) -> bool:
+        # Bounce reports need their body (delivery-status part) for the bounce stage
+        if message.get('content_type') == 'multipart/report':
+            return True
+        return not self.message_linker.resolves_from_headers(message)
+    
+    async def fetch_bodies(self, client: IMAPClient, messages: List[Dict[str, Any]], call) -> None:
+        """Headers-first: pick the messages the linker cannot resolve (on the event loop),
+        then fetch their snippets through call(fn, *args), which runs fn on the session's thread pool"""
+        if not self.headers_first:
+            return
+        wanted = [m['uid'] for m in messages if self._unresolved_by_headers(m)]
+        if wanted:
+            await call(client.fetch_bodies, messages, wanted)
     
     async def start_fetch_all_accounts(self) -> str:
         """Start fetch job for all active accounts"""
@@ -121,7 +282,9 @@ class FetchRunner:
         # Start async fetch for each account
         tasks = []
         for account in active_accounts:
-            if self._can_fetch_account(account['id']):
+            if account['id'] in self._fetching:
+                logger.info(f"Skipping account {account['label']} - fetch already running")
+            elif self._can_fetch_account(account['id']):
                 task = asyncio.create_task(self._fetch_account(account, run_id))
                 tasks.append(task)
             else:
@@ -148,8 +311,108 @@ class FetchRunner:
         except Exception as e:
             logger.error(f"Error in fetch tasks: {str(e)}")
     
+    def _client(self, account: Dict[str, Any]) -> IMAPClient:
+        return IMAPClient(
+            host=account['imap_host'],
+            port=account['imap_port'],
+            use_ssl=account['use_ssl'],
+            timeout=IMAP_SOCKET_TIMEOUT
+        )
+    
+    async def _download(self, account: Dict[str, Any], password: str, folder: str = 'INBOX') -> Dict[str, Any]:
+        """IMAP session for one folder, blocking calls on the fetch thread pool; returns the IMAPClient.sync_folder result"""
+        loop = asyncio.get_running_loop()
+        
+        def call(fn, *args):
+            return loop.run_in_executor(self._executor, fn, *args)
+        
+        client = self._client(account)
+        try:
+            if not await call(client.connect, account['username'], password):
+                raise Exception("Failed to connect to IMAP server")
+            
+            result = await call(self.sync, account, client, folder)
+            await self.fetch_bodies(client, result['messages'], call)
+            return result
+        finally:
+            # Logout on the pool, also when the session was cut off by the timeout
+            self._executor.submit(client.close)
+    
+    def sync(self, account: Dict[str, Any], client: IMAPClient, folder: str = 'INBOX') -> Dict[str, Any]:
+        """Select the folder and fetch what changed since the stored sync state (blocking)"""
+        state = self.accounts_service.store.get_sync_state(account['id'], folder)
+        result = client.sync_folder(state, folder, with_body=not self.headers_first)
+        if result is None:
+            raise Exception(f"Failed to select {folder} folder")
+        return result
+    
+    async def apply_sync(self, account: Dict[str, Any], result: Dict[str, Any]) -> Tuple[int, int]:
+        """Store a sync result: new messages, flag changes and the folder's sync state; returns (new_count, max_uid)"""
+        account_id, folder = account['id'], result['folder']
+        store = self.accounts_service.store
+        messages = result['messages']
+        if result['resync']:
+            messages = self.messages_store.rebind_uids(account_id, folder, messages)
+        
+        new_count, max_uid = await self.store_fetched(account, messages, result['last_seen_uid'], folder)
+        if result['flags']:
+            changed = self.messages_store.sync_read_flags(account_id, folder, result['flags'])
+            logger.info(f"Synced read state of {changed} messages for {account['label']}")
+        store.update_sync_state(account_id, folder, result['uidvalidity'], result['highest_modseq'])
+        return new_count, max_uid
+    
+    async def store_fetched(self, account: Dict[str, Any], new_messages: List[Dict[str, Any]],
+                            last_seen_uid: Optional[int] = None, folder: str = 'INBOX') -> Tuple[int, int]:
+        """Link, classify bounces and store fetched messages, advance the folder's UID; returns (new_count, max_uid)"""
+        account_id = account['id']
+        batch = []
+        max_uid = last_seen_uid if last_seen_uid is not None else account.get('last_seen_uid', 0)
+        
+        for msg_data in new_messages:
+            try:
+                # Add account info
+                msg_data['account_id'] = account_id
+                msg_data['folder'] = folder
+                
+                # Link to campaigns/leads
+                link_result = self.message_linker.link_message(msg_data)
+                msg_data.update(link_result)
+                batch.append(msg_data)
+                
+                # Track max UID
+                if msg_data['uid'] and msg_data['uid'] > max_uid:
+                    max_uid = msg_data['uid']
+                    
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}")
+        
+        # Bounce reports (DSNs) suppress their lead before its next scheduled message
+        if self.bounce_processor and any(m.get('dsn') for m in batch):
+            await self.bounce_processor.process(batch)
+        
+        # Store the whole batch (duplicates on account/folder/uid are skipped)
+        processed_count = len(self.messages_store.create_messages(batch))
+        
+        # Update account fetch info
+        self.accounts_service.store.update_fetch_info(account_id, max_uid, folder)
+        self.last_fetch_times[account_id] = datetime.utcnow()
+        return processed_count, max_uid
+    
+    async def _fetch_folder(self, account: Dict[str, Any], password: str, folder: str,
+                            connections: asyncio.Semaphore) -> int:
+        """Sync one folder on its own IMAP session; returns the number of new messages"""
+        async with connections:
+            try:
+                result = await asyncio.wait_for(self._download(account, password, folder),
+                                                timeout=self.fetch_timeout)
+            except asyncio.TimeoutError:
+                raise Exception(f"IMAP fetch timed out after {self.fetch_timeout:g}s")
+        
+        new_count, _ = await self.apply_sync(account, result)
+        return new_count
+    
     async def _fetch_account(self, account: Dict[str, Any], run_id: str) -> Dict[str, Any]:
-        """Fetch messages for a single account"""
+        """Fetch messages for a single account (all its folders)"""
         account_id = account['id']
         
         # Create run record
@@ -162,6 +425,7 @@ class FetchRunner:
         }
         
         run_record = self.messages_store.create_run(run_data)
+        self._fetching.add(account_id)
         
         try:
             logger.info(f"Starting fetch for account: {account['label']}")
@@ -171,70 +435,37 @@ class FetchRunner:
             if not password:
                 raise Exception("Failed to retrieve password from secret store")
             
-            # Connect to IMAP
-            client = IMAPClient(
-                host=account['imap_host'],
-                port=account['imap_port'],
-                use_ssl=account['use_ssl']
+            # Connect, select and fetch off the event loop, one session per folder
+            folders = account_folders(account)
+            connections = asyncio.Semaphore(self.folder_connections)
+            results = await asyncio.gather(
+                *(self._fetch_folder(account, password, folder, connections) for folder in folders),
+                return_exceptions=True
             )
+            processed_count = sum(r for r in results if not isinstance(r, Exception))
+            errors = [f"{folder}: {r}" for folder, r in zip(folders, results) if isinstance(r, Exception)]
+            if len(errors) == len(folders):
+                raise Exception("; ".join(str(r) for r in results))
             
-            if not client.connect(account['username'], password):
-                raise Exception("Failed to connect to IMAP server")
-            
-            if not client.select_inbox():
-                raise Exception("Failed to select INBOX folder")
-            
-            # Fetch new messages
-            new_messages = client.fetch_new_messages(
-                last_seen_uid=account.get('last_seen_uid'),
-                last_fetch_date=account.get('last_fetch_at')
-            )
-            
-            client.close()
-            
-            # Process and link messages
-            processed_count = 0
-            max_uid = account.get('last_seen_uid', 0)
-            
-            for msg_data in new_messages:
-                try:
-                    # Add account info
-                    msg_data['account_id'] = account_id
-                    msg_data['folder'] = 'INBOX'
-                    
-                    # Link to campaigns/leads
-                    link_result = self.message_linker.link_message(msg_data)
-                    msg_data.update(link_result)
-                    
-                    # Store message
-                    stored_msg = self.messages_store.create_message(msg_data)
-                    if stored_msg['id'] == msg_data['id']:  # New message created
-                        processed_count += 1
-                    
-                    # Track max UID
-                    if msg_data['uid'] and msg_data['uid'] > max_uid:
-                        max_uid = msg_data['uid']
-                        
-                except Exception as e:
-                    logger.error(f"Error processing message: {str(e)}")
-            
-            # Update account fetch info
-            self.accounts_service.store.update_fetch_info(account_id, max_uid)
-            self.last_fetch_times[account_id] = datetime.utcnow()
-            
-            # Update run record
+            # Update run record (folders that failed are reported, the others are kept)
             self.messages_store.update_run(run_record['id'], {
                 'finished_at': datetime.utcnow(),
-                'new_count': processed_count
+                'new_count': processed_count,
+                'error': "; ".join(errors) or None
             })
             
+            if errors:
+                logger.warning(f"Fetch partially failed for {account['label']}: {'; '.join(errors)}")
             logger.info(f"Fetch completed for {account['label']}: {processed_count} new messages")
             
-            return {
+            result = {
                 'account_id': account_id,
-                'success': True,
+                'success': not errors,
                 'new_count': processed_count
             }
+            if errors:
+                result['error'] = "; ".join(errors)
+            return result
             
         except Exception as e:
             error_msg = str(e)
@@ -251,3 +482,6 @@ class FetchRunner:
                 'success': False,
                 'error': error_msg
             }
+        
+        finally:
+            self._fetching.discard(account_id)
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from .accounts import account_folders
+from .imap_client import IMAPClient
+from .fetch_runner import FetchRunner, IMAP_SOCKET_TIMEOUT
+
+IMAP_IDLE_ENABLED = os.getenv("IMAP_IDLE_ENABLED", "false").lower() == "true"
+# Re-issue IDLE well before servers drop idle sessions (RFC 2177: 29 minutes)
+IMAP_IDLE_TIMEOUT = float(os.getenv("IMAP_IDLE_TIMEOUT", str(25 * 60)))
+# Polling fallback (no IDLE) and reconnect backoff: start interval, doubled up to the max
+IMAP_POLL_INTERVAL = float(os.getenv("IMAP_POLL_INTERVAL", "60"))
+IMAP_POLL_MAX_INTERVAL = float(os.getenv("IMAP_POLL_MAX_INTERVAL", "900"))
+
+
+class IdleListener:
+    """
+    Push-mode reply detection: one long-lived IMAP session per active account folder
+    - Per account, the first FetchRunner.folder_connections folders are watched; the rest
+      are left to the periodic fetch
+    - IDLE until the server reports EXISTS, then fetch only UIDs above the last seen one
+    - Servers without IDLE are polled; the interval doubles while nothing arrives
+    - Lost connections reconnect with the same backoff, then catch up via FetchRunner.sync
+      (UIDVALIDITY check, flag changes)
+    - New mail goes through FetchRunner.store_fetched (linking + storage)
+    """
+
+    def __init__(self, fetch_runner: FetchRunner,
+                 idle_timeout: float = IMAP_IDLE_TIMEOUT,
+                 poll_interval: float = IMAP_POLL_INTERVAL,
+                 max_interval: float = IMAP_POLL_MAX_INTERVAL):
+        self.fetch_runner = fetch_runner
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        """Start a listener task per active account folder (call from the running event loop)"""
+        accounts = self.fetch_runner.accounts_service.get_active_accounts()
+        watched = [(account, folder) for account in accounts
+                   for folder in account_folders(account)[:self.fetch_runner.folder_connections]]
+        # A session blocks its thread while idling, so each folder gets its own
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(watched)), thread_name_prefix="imap-idle")
+        for account, folder in watched:
+            self._tasks[(account['id'], folder)] = asyncio.create_task(self._listen(account, folder))
+        logger.info(f"IMAP listeners started for {len(watched)} folders of {len(accounts)} accounts")
+
+    async def stop(self) -> None:
+        """Cancel the listeners; sessions are logged out once their IDLE returns"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self, account: Dict[str, Any]) -> IMAPClient:
+        """Connect (blocking); INBOX is selected by the catch-up sync"""
+        password = self.fetch_runner.accounts_service._get_password_from_secret_store(account['secret_ref'])
+        if not password:
+            raise Exception("Failed to retrieve password from secret store")
+
+        client = IMAPClient(
+            host=account['imap_host'],
+            port=account['imap_port'],
+            use_ssl=account['use_ssl'],
+            timeout=IMAP_SOCKET_TIMEOUT
+        )
+        if not client.connect(account['username'], password):
+            raise Exception("Failed to connect to IMAP server")
+        return client
+
+    async def _fetch_new(self, account: Dict[str, Any], client: IMAPClient, last_uid: int,
+                         folder: str = 'INBOX') -> int:
+        """Fetch UIDs above last_uid and store them; returns the new last UID"""
+        new_messages = await self._call(client.fetch_new_messages, last_uid or None, None,
+                                        not self.fetch_runner.headers_first)
+        if not new_messages:
+            return last_uid
+        await self.fetch_runner.fetch_bodies(client, new_messages, self._call)
+        new_count, max_uid = await self.fetch_runner.store_fetched(account, new_messages, last_uid, folder)
+        logger.info(f"IMAP listener stored {new_count} new messages for {account['label']}/{folder}")
+        return max_uid
+
+    async def _listen(self, account: Dict[str, Any], folder: str = 'INBOX') -> None:
+        delay = self.poll_interval
+
+        while True:
+            client = None
+            try:
+                client = await self._call(self._open, account)
+                use_idle = client.supports_idle()
+
+                # Catch up on anything that arrived or changed while disconnected
+                result = await self._call(self.fetch_runner.sync, account, client, folder)
+                await self.fetch_runner.fetch_bodies(client, result['messages'], self._call)
+                _, last_uid = await self.fetch_runner.apply_sync(account, result)
+                logger.info(f"IMAP {'IDLE' if use_idle else 'polling'} listener connected for {account['label']}/{folder}")
+                delay = self.poll_interval
+
+                while True:
+                    if use_idle:
+                        if await self._call(client.idle, self.idle_timeout):
+                            last_uid = await self._fetch_new(account, client, last_uid, folder)
+                    else:
+                        await asyncio.sleep(delay)
+                        await self._call(client.connection.noop)  # raises when the session died
+                        previous = last_uid
+                        last_uid = await self._fetch_new(account, client, last_uid, folder)
+                        delay = self.poll_interval if last_uid > previous else min(delay * 2, self.max_interval)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"IMAP listener for {account['label']}/{folder} failed: {str(e)}; retry in {delay:g}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_interval)
+            finally:
+                if client is not None:
+                    # Logout on the session's thread, after a running IDLE has returned
+                    self._executor.submit(client.close)
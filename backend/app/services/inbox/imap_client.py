@@ -1,26 +1,54 @@
 import imaplib
 import email
+import os
 import re
-from datetime import datetime
+import select
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from email.header import decode_header
 from loguru import logger
+from .bounces import parse_dsn
+
+_EXISTS_RE = re.compile(rb'^\* \d+ EXISTS')
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_TEXT_SECTION_RE = re.compile(rb'BODY\[TEXT\]')
+_UID_RE = re.compile(rb'\bUID (\d+)')
+_FLAGS_RE = re.compile(rb'\bFLAGS \(([^)]*)\)')
+
+HEADER_FIELDS = ('BODY.PEEK[HEADER.FIELDS (MESSAGE-ID IN-REPLY-TO REFERENCES FROM TO SUBJECT DATE '
+                 'CONTENT-TYPE CONTENT-TRANSFER-ENCODING)]')
+# Body bytes pulled per message for the snippet (partial FETCH)
+IMAP_SNIPPET_BYTES = int(os.getenv("IMAP_SNIPPET_BYTES", "20480"))
+# UIDs per FETCH command: starting size, adapted within [min, max] towards the target window time
+IMAP_FETCH_BATCH = int(os.getenv("IMAP_FETCH_BATCH", "50"))
+IMAP_FETCH_BATCH_MIN = 10
+IMAP_FETCH_BATCH_MAX = 500
+IMAP_FETCH_TARGET_SECONDS = float(os.getenv("IMAP_FETCH_TARGET_SECONDS", "1.0"))
+# FETCH commands in flight before the first completion is read
+IMAP_FETCH_PIPELINE = int(os.getenv("IMAP_FETCH_PIPELINE", "4"))
+# First sync / UIDVALIDITY resync: only the newest messages of a recent window
+IMAP_SYNC_WINDOW_DAYS = int(os.getenv("IMAP_SYNC_WINDOW_DAYS", "30"))
+IMAP_SYNC_MAX_MESSAGES = int(os.getenv("IMAP_SYNC_MAX_MESSAGES", "500"))
 
 
 class IMAPClient:
-    def __init__(self, host: str, port: int = 993, use_ssl: bool = True):
+    def __init__(self, host: str, port: int = 993, use_ssl: bool = True, timeout: Optional[float] = None):
         self.host = host
         self.port = port
         self.use_ssl = use_ssl
+        self.timeout = timeout  # socket timeout per operation (None = blocking)
+        self.batch_size = IMAP_FETCH_BATCH
+        self.pipeline_depth = IMAP_FETCH_PIPELINE
         self.connection: Optional[imaplib.IMAP4_SSL] = None
     
     def connect(self, username: str, password: str) -> bool:
         """Connect to IMAP server and authenticate"""
         try:
             if self.use_ssl:
-                self.connection = imaplib.IMAP4_SSL(self.host, self.port)
+                self.connection = imaplib.IMAP4_SSL(self.host, self.port, timeout=self.timeout)
             else:
-                self.connection = imaplib.IMAP4(self.host, self.port)
+                self.connection = imaplib.IMAP4(self.host, self.port, timeout=self.timeout)
             
             self.connection.login(username, password)
             return True
@@ -30,19 +58,104 @@ class IMAPClient:
     
     def select_inbox(self) -> bool:
         """Select INBOX folder"""
+        return self.select_folder('INBOX') is not None
+    
+    def select_folder(self, folder: str = 'INBOX') -> Optional[Dict[str, Any]]:
+        """
+        SELECT a folder (with CONDSTORE when the server supports it).
+        Returns its uidvalidity, uidnext and highest_modseq (None without CONDSTORE), or None on failure.
+        """
         try:
             if not self.connection:
-                return False
+                return None
             
-            status, _ = self.connection.select('INBOX')
-            return status == 'OK'
+            condstore = self.supports_condstore()
+            mailbox = self._quote_mailbox(folder)
+            status, _ = self.connection.select(f'{mailbox} (CONDSTORE)' if condstore else mailbox)
+            if status != 'OK':
+                return None
+            return {
+                'uidvalidity': self._response_code('UIDVALIDITY'),
+                'uidnext': self._response_code('UIDNEXT'),
+                'highest_modseq': self._response_code('HIGHESTMODSEQ') if condstore else None
+            }
         except Exception as e:
-            logger.error(f"Failed to select INBOX: {str(e)}")
-            return False
+            logger.error(f"Failed to select {folder}: {str(e)}")
+            return None
+    
+    def _quote_mailbox(self, folder: str) -> str:
+        """Quote folder names containing spaces or specials (e.g. Junk E-mail, [Gmail]/Spam)"""
+        if re.fullmatch(r'[\w./&+-]+', folder):
+            return folder
+        return '"' + folder.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    
+    def _response_code(self, code: str) -> Optional[int]:
+        """Numeric value of a response code from the last SELECT, e.g. [UIDVALIDITY 3857529045]"""
+        _, data = self.connection.response(code)
+        value = data[-1] if data else None
+        return int(value) if value else None
+    
+    def supports_condstore(self) -> bool:
+        """Server advertises RFC 7162 CONDSTORE (per-message MODSEQ)"""
+        return bool(self.connection) and 'CONDSTORE' in self.connection.capabilities
+    
+    def supports_idle(self) -> bool:
+        """Server advertises RFC 2177 IDLE"""
+        return bool(self.connection) and 'IDLE' in self.connection.capabilities
+    
+    def idle(self, timeout: float) -> bool:
+        """
+        IDLE until the server reports new mail (EXISTS) or timeout seconds pass.
+        Returns True when new messages arrived; the session is back in selected state either way.
+        """
+        conn = self.connection
+        tag = conn._new_tag()
+        conn.tagged_commands.pop(tag, None)  # completion is read here, not by imaplib
+        conn.send(tag + b' IDLE\r\n')
+        line = conn.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+        
+        new_mail = False
+        deadline = time.monotonic() + timeout
+        while not new_mail:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._readable(remaining):
+                break
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            new_mail = bool(_EXISTS_RE.match(line))
+        
+        # Leave IDLE; untagged lines before the completion may still announce mail
+        conn.send(b'DONE\r\n')
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().startswith(b'OK'):
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+                return new_mail
+            new_mail = new_mail or bool(_EXISTS_RE.match(line))
+    
+    def _readable(self, timeout: float) -> bool:
+        """Wait until the socket (or SSL layer) has data, at most timeout seconds"""
+        sock = self.connection.sock
+        pending = getattr(sock, 'pending', None)
+        if pending and pending():
+            return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
     
     def fetch_new_messages(self, last_seen_uid: Optional[int] = None, 
-                          last_fetch_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Fetch new messages using UID strategy"""
+                          last_fetch_date: Optional[datetime] = None,
+                          with_body: bool = True) -> List[Dict[str, Any]]:
+        """Fetch new messages using UID strategy.
+        
+        Without with_body only headers are fetched (empty snippets); fetch_bodies
+        fills in the snippets that turn out to be needed.
+        """
         try:
             if not self.connection:
                 return []
@@ -58,90 +171,221 @@ class IMAPClient:
                 # First time fetch - get recent messages
                 search_criteria = "ALL"
             
-            # Search for messages
-            status, message_ids = self.connection.uid('search', None, search_criteria)
-            if status != 'OK':
-                return []
-            
-            uid_list = message_ids[0].split()
-            if not uid_list:
-                return []
-            
-            # Fetch in batches of 50
-            messages = []
-            batch_size = 50
-            
-            for i in range(0, len(uid_list), batch_size):
-                batch_uids = uid_list[i:i + batch_size]
-                uid_range = b','.join(batch_uids).decode()
-                
-                # Fetch envelope + headers + text preview
-                status, msg_data = self.connection.uid('fetch', uid_range, 
-                    '(ENVELOPE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID IN-REPLY-TO REFERENCES FROM TO SUBJECT DATE)] BODY.PEEK[TEXT]<0.20480>)')
-                
-                if status == 'OK':
-                    messages.extend(self._parse_messages(msg_data, batch_uids))
-            
-            return messages
+            uids = self._search_uids(search_criteria)
+            if last_seen_uid:
+                # "UID n:*" always matches the newest message, even when its UID < n
+                uids = [uid for uid in uids if uid > last_seen_uid]
+            return self._fetch_uids(uids, with_body)
             
         except Exception as e:
             logger.error(f"Failed to fetch messages: {str(e)}")
             return []
     
-    def _parse_messages(self, msg_data: List, uids: List[bytes]) -> List[Dict[str, Any]]:
+    def sync_folder(self, state: Dict[str, Any], folder: str = 'INBOX',
+                    with_body: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Incremental sync of one folder against its stored state (uidvalidity, last_seen_uid, highest_modseq):
+        - Same UIDVALIDITY: only UIDs above last_seen_uid, plus flag changes since HIGHESTMODSEQ (CONDSTORE)
+        - First sync or changed UIDVALIDITY: bounded to the newest IMAP_SYNC_MAX_MESSAGES
+          of the last IMAP_SYNC_WINDOW_DAYS; 'resync' marks that stored UIDs are void
+        Returns None when the folder cannot be selected; leaves the folder selected.
+        """
+        info = self.select_folder(folder)
+        if info is None:
+            return None
+        
+        result = {
+            'folder': folder,
+            'uidvalidity': info['uidvalidity'],
+            'highest_modseq': info['highest_modseq'],
+            'resync': False,
+            'last_seen_uid': state.get('last_seen_uid') or 0,  # UID the fetched messages continue from
+            'messages': [],
+            'flags': {}
+        }
+        last_seen_uid = result['last_seen_uid']
+        if state.get('uidvalidity') is not None and state['uidvalidity'] != info['uidvalidity']:
+            logger.warning(f"UIDVALIDITY of {folder} changed ({state['uidvalidity']} -> {info['uidvalidity']}), resyncing")
+            result['resync'] = True
+            result['last_seen_uid'] = last_seen_uid = 0
+        
+        if last_seen_uid:
+            uids = [uid for uid in self._search_uids(f"UID {last_seen_uid + 1}:*") if uid > last_seen_uid]
+            known_modseq = state.get('highest_modseq')
+            if known_modseq and info['highest_modseq'] and info['highest_modseq'] > known_modseq:
+                result['flags'] = self._changed_flags(last_seen_uid, known_modseq)
+        else:
+            since = (datetime.utcnow() - timedelta(days=IMAP_SYNC_WINDOW_DAYS)).strftime("%d-%b-%Y")
+            uids = self._search_uids(f"SINCE {since}")[-IMAP_SYNC_MAX_MESSAGES:]
+        
+        result['messages'] = self._fetch_uids(uids, with_body)
+        return result
+    
+    def _search_uids(self, criteria: str) -> List[int]:
+        """UID SEARCH, ascending"""
+        status, message_ids = self.connection.uid('search', None, criteria)
+        if status != 'OK' or not message_ids or not message_ids[0]:
+            return []
+        return sorted(int(uid) for uid in message_ids[0].split())
+    
+    def _changed_flags(self, last_seen_uid: int, modseq: int) -> Dict[int, bool]:
+        """Seen state of known messages whose flags changed since modseq (UID FETCH ... CHANGEDSINCE)"""
+        status, data = self.connection.uid('fetch', f'1:{last_seen_uid}', f'(UID FLAGS) (CHANGEDSINCE {modseq})')
+        if status != 'OK':
+            return {}
+        flags = {}
+        for line in data:
+            if isinstance(line, tuple):
+                line = line[0]
+            uid_match = _UID_RE.search(line or b'')
+            flags_match = _FLAGS_RE.search(line or b'')
+            if uid_match and flags_match:
+                flags[int(uid_match.group(1))] = b'\\Seen' in flags_match.group(1)
+        return flags
+    
+    def _fetch_uids(self, uids: List[int], with_body: bool) -> List[Dict[str, Any]]:
+        """Fetch and parse the given UIDs"""
+        if not uids:
+            return []
+        return self._fetch_parsed(uids, with_body)
+    
+    def fetch_bodies(self, messages: List[Dict[str, Any]], uids: List[int]) -> None:
+        """Second pass of a headers-only fetch: fill in snippet and dsn for the given UIDs (folder still selected)"""
+        if not uids:
+            return
+        bodies = {m['uid']: m for m in self._fetch_parsed(uids, with_body=True)}
+        for message in messages:
+            if message['uid'] in bodies:
+                message['snippet'] = bodies[message['uid']]['snippet']
+                message['dsn'] = bodies[message['uid']].get('dsn')
+    
+    def _fetch_parsed(self, uids: List[int], with_body: bool) -> List[Dict[str, Any]]:
+        """Pipelined UID FETCH of headers (plus the text snippet when with_body), parsed"""
+        items = f"(UID FLAGS RFC822.SIZE {HEADER_FIELDS}"
+        if with_body:
+            items += f" BODY.PEEK[TEXT]<0.{IMAP_SNIPPET_BYTES}>"
+        return self._parse_messages(self._pipelined_fetch(uids, items + ")"))
+    
+    def _pipelined_fetch(self, uids: List[int], items: str) -> List:
+        """
+        Send up to pipeline_depth UID FETCH commands before reading any completion.
+        Responses are collected from all commands at once (parsed by UID, not position);
+        the batch size adapts so one window takes about IMAP_FETCH_TARGET_SECONDS.
+        """
+        conn = self.connection
+        conn.untagged_responses.pop('FETCH', None)
+        data = []
+        pos = 0
+        while pos < len(uids):
+            window = []
+            while pos < len(uids) and len(window) < self.pipeline_depth:
+                window.append(uids[pos:pos + self.batch_size])
+                pos += len(window[-1])
+            
+            started = time.monotonic()
+            tags = [conn._command('UID', 'FETCH', ','.join(map(str, batch)), items) for batch in window]
+            for tag in tags:
+                status, detail = conn._command_complete('UID', tag)
+                if status != 'OK':
+                    logger.warning(f"UID FETCH returned {status}: {detail}")
+            _, fetched = conn._untagged_response('OK', [None], 'FETCH')
+            data.extend(part for part in fetched if part is not None)
+            self._adapt_batch_size(time.monotonic() - started)
+        return data
+    
+    def _adapt_batch_size(self, elapsed: float) -> None:
+        """Grow batches while windows are fast, shrink them when a window exceeds the target"""
+        if elapsed < IMAP_FETCH_TARGET_SECONDS / 2:
+            self.batch_size = min(self.batch_size * 2, IMAP_FETCH_BATCH_MAX)
+        elif elapsed > IMAP_FETCH_TARGET_SECONDS:
+            self.batch_size = max(self.batch_size // 2, IMAP_FETCH_BATCH_MIN)
+    
+    def _group_responses(self, msg_data: List) -> List[Tuple[Optional[int], bool, bytes]]:
+        """
+        Group imaplib FETCH data per message: a part starting with "<seq> (" opens a message,
+        later literals and trailing bytes belong to it. Returns (uid, seen, raw headers + text).
+        """
+        groups = []
+        for part in msg_data:
+            prefix, literal = part if isinstance(part, tuple) else (part, None)
+            if _FETCH_START_RE.match(prefix) or not groups:
+                groups.append({'meta': b'', 'header': None, 'text': None})
+            group = groups[-1]
+            group['meta'] += prefix
+            if literal is not None:
+                if _TEXT_SECTION_RE.search(prefix):
+                    group['text'] = literal
+                else:
+                    group['header'] = literal
+        
+        messages = []
+        for group in groups:
+            if group['header'] is None:
+                continue  # unsolicited FETCH (e.g. flag update)
+            uid_match = _UID_RE.search(group['meta'])
+            flags_match = _FLAGS_RE.search(group['meta'])
+            seen = bool(flags_match) and b'\\Seen' in flags_match.group(1)
+            raw = group['header']
+            if group['text'] is not None:
+                raw = raw.rstrip(b'\r\n') + b'\r\n\r\n' + group['text']
+            messages.append((int(uid_match.group(1)) if uid_match else None, seen, raw))
+        return messages
+    
+    def _parse_messages(self, msg_data: List) -> List[Dict[str, Any]]:
         """Parse IMAP message data into structured format"""
         messages = []
         
-        for i, response_part in enumerate(msg_data):
-            if isinstance(response_part, tuple):
-                try:
-                    uid = int(uids[i // 2]) if i // 2 < len(uids) else None
-                    msg = email.message_from_bytes(response_part[1])
-                    
-                    # Extract headers
-                    message_id = self._decode_header(msg.get('Message-ID', ''))
-                    in_reply_to = self._decode_header(msg.get('In-Reply-To', ''))
-                    references = self._parse_references(msg.get('References', ''))
-                    from_header = self._parse_from_header(msg.get('From', ''))
-                    to_email = self._decode_header(msg.get('To', ''))
-                    subject = self._decode_header(msg.get('Subject', ''))
-                    date_header = msg.get('Date', '')
-                    
-                    # Get text content (first 20KB)
-                    snippet = self._extract_text_content(msg)
-                    
-                    # Parse date
-                    received_at = self._parse_date(date_header)
-                    
-                    message_data = {
-                        'uid': uid,
-                        'message_id': message_id.strip('<>') if message_id else None,
-                        'in_reply_to': in_reply_to.strip('<>') if in_reply_to else None,
-                        'references': references,
-                        'from_email': from_header['email'],
-                        'from_name': from_header['name'],
-                        'to_email': to_email,
-                        'subject': self._normalize_subject(subject),
-                        'snippet': snippet,
-                        'raw_size': len(response_part[1]),
-                        'received_at': received_at,
-                        'encoding_issue': False  # Will be set if decode fails
-                    }
-                    
-                    messages.append(message_data)
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to parse message: {str(e)}")
-                    # Create minimal message with encoding issue flag
-                    messages.append({
-                        'uid': uid,
-                        'message_id': None,
-                        'from_email': 'unknown@unknown.com',
-                        'subject': 'Encoding Error',
-                        'snippet': 'Message could not be decoded',
-                        'received_at': datetime.utcnow(),
-                        'encoding_issue': True
-                    })
+        for uid, seen, raw in self._group_responses(msg_data):
+            try:
+                msg = email.message_from_bytes(raw)
+                
+                # Extract headers
+                message_id = self._decode_header(msg.get('Message-ID', ''))
+                in_reply_to = self._decode_header(msg.get('In-Reply-To', ''))
+                references = self._parse_references(msg.get('References', ''))
+                from_header = self._parse_from_header(msg.get('From', ''))
+                to_email = self._decode_header(msg.get('To', ''))
+                subject = self._decode_header(msg.get('Subject', ''))
+                date_header = msg.get('Date', '')
+                
+                # Get text content (first IMAP_SNIPPET_BYTES)
+                snippet = self._extract_text_content(msg)
+                
+                # Parse date
+                received_at = self._parse_date(date_header)
+                
+                message_data = {
+                    'uid': uid,
+                    'message_id': message_id.strip('<>') if message_id else None,
+                    'in_reply_to': in_reply_to.strip('<>') if in_reply_to else None,
+                    'references': references,
+                    'from_email': from_header['email'],
+                    'from_name': from_header['name'],
+                    'to_email': to_email,
+                    'subject': self._normalize_subject(subject),
+                    'snippet': snippet,
+                    'raw_size': len(raw),
+                    'received_at': received_at,
+                    'is_read': seen,
+                    'content_type': msg.get_content_type(),
+                    'dsn': parse_dsn(msg),  # delivery status notification (bounce), else None
+                    'encoding_issue': False  # Will be set if decode fails
+                }
+                
+                messages.append(message_data)
+                
+            except Exception as e:
+                logger.warning(f"Failed to parse message: {str(e)}")
+                # Create minimal message with encoding issue flag
+                messages.append({
+                    'uid': uid,
+                    'message_id': None,
+                    'from_email': 'unknown@unknown.com',
+                    'subject': 'Encoding Error',
+                    'snippet': 'Message could not be decoded',
+                    'received_at': datetime.utcnow(),
+                    'encoding_issue': True
+                })
         
         return messages
     
@@ -197,7 +441,7 @@ class IMAPClient:
             return {'name': None, 'email': 'unknown@unknown.com'}
     
     def _extract_text_content(self, msg: email.message.Message) -> str:
-        """Extract text content from email message (max 20KB)"""
+        """Extract text content from email message (max IMAP_SNIPPET_BYTES)"""
         try:
             if msg.is_multipart():
                 for part in msg.walk():
@@ -206,13 +450,13 @@ class IMAPClient:
                         if payload:
                             charset = part.get_content_charset() or 'utf-8'
                             text = payload.decode(charset, errors='replace')
-                            return text[:20480]  # Max 20KB
+                            return text[:IMAP_SNIPPET_BYTES]
             else:
                 payload = msg.get_payload(decode=True)
                 if payload:
                     charset = msg.get_content_charset() or 'utf-8'
                     text = payload.decode(charset, errors='replace')
-                    return text[:20480]  # Max 20KB
+                    return text[:IMAP_SNIPPET_BYTES]
             
             return ""
         except Exception:
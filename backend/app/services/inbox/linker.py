@@ -1,8 +1,74 @@
-from typing import Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from bisect import bisect_right, insort
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from loguru import logger
 
 
+def to_utc(value: datetime) -> datetime:
+    """Aware UTC datetime; naive values (utcnow timestamps) are taken as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class LinkIndex:
+    """
+    Lookup maps for linking inbound mail without scanning the stores.
+    - smtp_message_id -> outbound message (In-Reply-To / References)
+    - lower(email) -> lead id
+    - Per lead: sent outbound messages ordered by sent_at, nearest one found by bisect
+      (aware UTC: sent_at is naive utcnow, received dates carry their Date header's offset)
+    - Updated incrementally with add_message / add_lead
+    """
+    
+    def __init__(self):
+        self.by_smtp_id: Dict[str, Any] = {}
+        self.lead_by_email: Dict[str, str] = {}
+        self._sent: Dict[str, List[Tuple[datetime, str]]] = {}  # lead_id -> sorted (sent_at, message id)
+        self._messages: Dict[str, Any] = {}
+        self._indexed: Dict[str, Tuple[Optional[str], Optional[str], Optional[datetime]]] = {}
+    
+    def add_message(self, msg) -> None:
+        """Index (or re-index after a send) an outbound message"""
+        previous = self._indexed.get(msg.id)
+        current = (msg.smtp_message_id, msg.lead_id, to_utc(msg.sent_at) if msg.sent_at else None)
+        if previous == current:
+            self._messages[msg.id] = msg
+            return
+        if previous:
+            smtp_id, lead_id, sent_at = previous
+            if smtp_id and self.by_smtp_id.get(smtp_id) is self._messages.get(msg.id):
+                del self.by_smtp_id[smtp_id]
+            if sent_at:
+                sent = self._sent.get(lead_id, [])
+                key = (sent_at, msg.id)
+                i = bisect_right(sent, key) - 1
+                if i >= 0 and sent[i] == key:
+                    del sent[i]
+        
+        self._messages[msg.id] = msg
+        self._indexed[msg.id] = current
+        if msg.smtp_message_id:
+            self.by_smtp_id[msg.smtp_message_id] = msg
+        if current[2]:
+            insort(self._sent.setdefault(msg.lead_id, []), (current[2], msg.id))
+    
+    def add_lead(self, lead_id: str, email: str) -> None:
+        """Index a lead's email (first lead wins, like the store's unique email)"""
+        if email:
+            self.lead_by_email.setdefault(email.lower(), lead_id)
+    
+    def latest_sent(self, lead_id: str, not_after: datetime, not_before: datetime):
+        """Most recent message sent to lead within [not_before, not_after], or None"""
+        sent = self._sent.get(lead_id)
+        if not sent:
+            return None
+        i = bisect_right(sent, (to_utc(not_after), '\uffff')) - 1
+        if i < 0 or sent[i][0] < to_utc(not_before):
+            return None
+        return self._messages[sent[i][1]]
+
+
 class MessageLinker:
     """Smart linking of inbox messages to campaigns, leads, and outbound messages"""
     
@@ -10,6 +76,55 @@ class MessageLinker:
         self.messages_store = messages_store
         self.leads_store = leads_store
         self.campaigns_store = campaigns_store
+        self._index: Optional[LinkIndex] = None
+        
+        # Keep the index current when the stores support change listeners
+        if hasattr(messages_store, 'add_message_listener'):
+            messages_store.add_message_listener(self.index_message)
+        if hasattr(leads_store, 'add_lead_listener'):
+            leads_store.add_lead_listener(self.index_lead)
+    
+    @property
+    def index(self) -> LinkIndex:
+        """Lookup index, built from the stores on first use and kept current via index_* hooks"""
+        if self._index is None:
+            index = LinkIndex()
+            for lead in self.leads_store.get_all():
+                index.add_lead(lead.id, lead.email)
+            for msg in self.messages_store.get_all():
+                index.add_message(msg)
+            self._index = index
+        return self._index
+    
+    def index_message(self, msg) -> None:
+        """Hook for message stores: an outbound message was created or sent"""
+        if self._index is not None:
+            self._index.add_message(msg)
+    
+    def index_lead(self, lead_id: str, email: str) -> None:
+        """Hook for lead stores: a lead was created"""
+        if self._index is not None:
+            self._index.add_lead(lead_id, email)
+    
+    def resolves_from_headers(self, inbox_message: Dict[str, Any]) -> bool:
+        """True when In-Reply-To or References point at a known outbound message (strategies 1-2)"""
+        ids = [inbox_message.get('in_reply_to')] + list(inbox_message.get('references') or [])
+        return any(smtp_id in self.index.by_smtp_id for smtp_id in ids if smtp_id)
+    
+    def find_outbound(self, smtp_id: Optional[str], recipient: Optional[str], received_at: datetime):
+        """
+        Outbound message a bounce refers to: by its Message-ID, else the latest message
+        sent to the recipient's lead in the 30 days before the bounce arrived
+        """
+        if smtp_id:
+            for key in (smtp_id, f"<{smtp_id.strip('<>')}>", smtp_id.strip('<>')):
+                msg = self.index.by_smtp_id.get(key)
+                if msg is not None:
+                    return msg
+        lead_id = self.index.lead_by_email.get(recipient.lower()) if recipient else None
+        if not lead_id:
+            return None
+        return self.index.latest_sent(lead_id, received_at, received_at - timedelta(days=30))
     
     def link_message(self, inbox_message: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -75,17 +190,15 @@ class MessageLinker:
         """Link by matching In-Reply-To with smtp_message_id"""
         try:
             # Find outbound message with matching smtp_message_id
-            outbound_messages = self.messages_store.get_all()
-            
-            for msg in outbound_messages:
-                if msg.smtp_message_id == in_reply_to:
-                    return {
-                        'linked_message_id': msg.id,
-                        'linked_campaign_id': msg.campaign_id,
-                        'linked_lead_id': msg.lead_id
-                    }
+            msg = self.index.by_smtp_id.get(in_reply_to)
+            if msg is None:
+                return None
             
-            return None
+            return {
+                'linked_message_id': msg.id,
+                'linked_campaign_id': msg.campaign_id,
+                'linked_lead_id': msg.lead_id
+            }
         except Exception as e:
             logger.error(f"Error in _link_by_in_reply_to: {str(e)}")
             return None
@@ -93,16 +206,10 @@ class MessageLinker:
     def _link_by_references(self, references: list) -> Optional[Dict[str, Any]]:
         """Link by checking if any reference matches smtp_message_id"""
         try:
-            outbound_messages = self.messages_store.get_all()
-            
             for ref in references:
-                for msg in outbound_messages:
-                    if msg.smtp_message_id == ref:
-                        return {
-                            'linked_message_id': msg.id,
-                            'linked_campaign_id': msg.campaign_id,
-                            'linked_lead_id': msg.lead_id
-                        }
+                result = self._link_by_in_reply_to(ref)
+                if result:
+                    return result
             
             return None
         except Exception as e:
@@ -114,45 +221,23 @@ class MessageLinker:
         """Link by email + normalized subject + chronological proximity"""
         try:
             # Find lead by email
-            leads = self.leads_store.get_all()
-            matching_lead = None
-            
-            for lead in leads:
-                if lead.email.lower() == from_email.lower():
-                    matching_lead = lead
-                    break
-            
-            if not matching_lead:
+            lead_id = self.index.lead_by_email.get(from_email.lower())
+            if not lead_id:
                 return None
             
-            # Find recent outbound messages to this lead
-            outbound_messages = self.messages_store.get_all()
-            recent_messages = []
-            
-            # Look for messages sent in the last 30 days
+            # Most recent message sent to this lead in the 30 days before receipt
             cutoff_date = received_at - timedelta(days=30)
-            
-            for msg in outbound_messages:
-                if (msg.lead_id == matching_lead.id and 
-                    msg.sent_at and 
-                    msg.sent_at >= cutoff_date and 
-                    msg.sent_at <= received_at):
-                    recent_messages.append(msg)
-            
-            if not recent_messages:
+            closest_message = self.index.latest_sent(lead_id, received_at, cutoff_date)
+            if closest_message is None:
                 return None
             
-            # Find the most recent message (closest chronologically)
-            recent_messages.sort(key=lambda x: x.sent_at, reverse=True)
-            closest_message = recent_messages[0]
-            
             # Optional: Check subject similarity (basic implementation)
             # For now, just return the chronologically closest match
             
             return {
                 'linked_message_id': closest_message.id,
                 'linked_campaign_id': closest_message.campaign_id,
-                'linked_lead_id': matching_lead.id
+                'linked_lead_id': lead_id
             }
             
         except Exception as e:
@@ -163,17 +248,15 @@ class MessageLinker:
         """Weak link by email only"""
         try:
             # Find lead by email
-            leads = self.leads_store.get_all()
-            
-            for lead in leads:
-                if lead.email.lower() == from_email.lower():
-                    return {
-                        'linked_lead_id': lead.id,
-                        'linked_campaign_id': None,  # No campaign link
-                        'linked_message_id': None    # No specific message link
-                    }
+            lead_id = self.index.lead_by_email.get(from_email.lower())
+            if not lead_id:
+                return None
             
-            return None
+            return {
+                'linked_lead_id': lead_id,
+                'linked_campaign_id': None,  # No campaign link
+                'linked_message_id': None    # No specific message link
+            }
         except Exception as e:
             logger.error(f"Error in _link_by_email_only: {str(e)}")
             return None
@@ -32,6 +32,55 @@ def enrich_lead_with_metadata(lead: Lead, include_completeness: bool = True) ->
             'is_complete': bool
         }
     """
+    has_report = reports_store.get_report_for_lead(lead.id) is not None
+    vars_completeness = template_variables_service.calculate_completeness(lead) if include_completeness else None
+    return _build_enriched(lead, has_report, vars_completeness)
+
+
+def enrich_leads_bulk(
+    leads: list[Lead],
+    include_completeness: bool = False,
+    materialised: bool = False
+) -> list[Dict[str, Any]]:
+    """
+    Verrijk meerdere leads tegelijk (optimized voor list views).
+    
+    Eén pass over de report links (of één query) voor de hele pagina in plaats
+    van een lookup per lead; compleetheid via de voorgecompileerde variabelen-bitmask.
+    
+    Args:
+        leads: List van Lead instances
+        include_completeness: Of full compleetheid berekend moet worden
+                             (False voor performance in lijsten)
+        materialised: has_report lezen uit de gematerialiseerde kolom van de lead
+                      (zoals de store-rijen uit LeadsStore/DBLeadsStore), dezelfde
+                      bron als het is_complete filter; anders één pass over reports_store
+    
+    Returns:
+        List van enriched lead dicts
+    """
+    if not leads:
+        return []
+    
+    if materialised:
+        report_ids = {lead.id for lead in leads if lead.has_report}
+    else:
+        report_ids = reports_store.get_report_ids_for_leads([lead.id for lead in leads])
+    
+    enriched_leads = []
+    for lead in leads:
+        vars_completeness = None
+        if include_completeness:
+            vars_completeness = template_variables_service.completeness_from_mask(
+                template_variables_service.missing_mask(lead)
+            )
+        enriched_leads.append(_build_enriched(lead, lead.id in report_ids, vars_completeness))
+    
+    return enriched_leads
+
+
+def _build_enriched(lead: Lead, has_report: bool, vars_completeness: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Lead dict + computed fields (has_report, has_image, vars_completeness, is_complete)."""
     # Converteer lead naar dict
     lead_dict = {
         'id': lead.id,
@@ -54,16 +103,9 @@ def enrich_lead_with_metadata(lead: Lead, include_completeness: bool = True) ->
     if hasattr(lead, 'list_name'):
         lead_dict['list_name'] = lead.list_name
     
-    # Computed fields
-    has_report = reports_store.get_report_for_lead(lead.id) is not None
     has_image = lead.image_key is not None and lead.image_key != ''
     
-    # Variabelen compleetheid (optioneel, kan performance impact hebben)
-    vars_completeness = None
-    is_complete = False
-    
-    if include_completeness:
-        vars_completeness = template_variables_service.calculate_completeness(lead)
+    if vars_completeness is not None:
         is_complete = has_report and has_image and vars_completeness['is_complete']
     else:
         # Simplified completeness check without full calculation
@@ -81,27 +123,6 @@ def enrich_lead_with_metadata(lead: Lead, include_completeness: bool = True) ->
     return lead_dict
 
 
-def enrich_leads_bulk(leads: list[Lead], include_completeness: bool = False) -> list[Dict[str, Any]]:
-    """
-    Verrijk meerdere leads tegelijk (optimized voor list views).
-    
-    Args:
-        leads: List van Lead instances
-        include_completeness: Of full compleetheid berekend moet worden
-                             (False voor performance in lijsten)
-    
-    Returns:
-        List van enriched lead dicts
-    """
-    enriched_leads = []
-    
-    for lead in leads:
-        enriched_lead = enrich_lead_with_metadata(lead, include_completeness=include_completeness)
-        enriched_leads.append(enriched_lead)
-    
-    return enriched_leads
-
-
 def get_lead_variables_detail(lead: Lead) -> Dict[str, Any]:
     """
     Haal gedetailleerde variabelen info op voor een lead (voor drawer view).
@@ -153,6 +174,6 @@ def check_lead_is_complete(lead: Lead) -> bool:
     """
     has_report = reports_store.get_report_for_lead(lead.id) is not None
     has_image = lead.image_key is not None and lead.image_key != ''
-    vars_complete = len(template_variables_service.get_missing_variables(lead)) == 0
+    vars_complete = template_variables_service.missing_mask(lead) == 0
     
     return has_report and has_image and vars_complete
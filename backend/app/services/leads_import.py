@@ -1,18 +1,23 @@
 from __future__ import annotations
-from typing import Tuple, Set
+from typing import Iterator, Tuple, Set
 from pydantic import BaseModel
-from fastapi import UploadFile, HTTPException, status
+from fastapi import BackgroundTasks, UploadFile, HTTPException, status
+from loguru import logger
+from uuid import uuid4
 import pandas as pd
-import io
+import os
 import re
-from urllib.parse import urlparse
-from datetime import datetime
+import tempfile
 
 from app.schemas.lead import LeadStatus
 from app.services.leads_store import LeadsStore
 from app.services.import_jobs import import_job_store, ImportErrorItem
 
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# Netloc of a URL with or without scheme (as urlparse finds it), split as host / first label / rest
+_HOST_RE = re.compile(r"^(?:(?:[A-Za-z][A-Za-z0-9+.-]*:)?//)?(?:www\.)?(([^/?#.]*)(\.[^/?#]*)?)")
+# "_" -> "-" and collapsed hyphens in one substitution
+_SEPARATORS_RE = re.compile(r"[_-]+")
 
 
 class ImportResult(BaseModel):
@@ -28,42 +33,16 @@ def _normalize_key(key: str) -> str:
     return key
 
 
-def _domain_from_url(url: str | None) -> str | None:
-    if not url:
-        return None
-    try:
-        host = urlparse(url).netloc or urlparse("https://" + url).netloc
-        if host.startswith("www."):
-            host = host[4:]
-        return host or None
-    except Exception:
-        return None
-
+# Upload is copied to disk in blocks of this size, then parsed in row chunks
+_COPY_BLOCK_BYTES = 1024 * 1024
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
 
-def _extract_root_domain(domain: str | None) -> str | None:
-    """Extract root domain for image_key generation"""
-    if not domain:
-        return None
-    try:
-        # Remove www prefix if present
-        if domain.startswith("www."):
-            domain = domain[4:]
-        
-        # Extract root (first part before TLD)
-        parts = domain.split(".")
-        if len(parts) >= 2:
-            root = parts[0]
-            # Normalize: lowercase, replace underscores with hyphens
-            root = root.lower().replace("_", "-")
-            # Collapse multiple hyphens
-            root = re.sub(r"-+", "-", root)
-            return root
-        return domain.lower()
-    except Exception:
-        return None
+# Columns mapped to lead fields; everything else becomes a var
+KNOWN_COLUMNS = {"email", "company", "company_name", "url", "website", "image_key"}
 
 
-async def process_import_file(file: UploadFile, store: LeadsStore) -> ImportResult:
+async def start_import(file: UploadFile, store: LeadsStore, background_tasks: BackgroundTasks) -> ImportResult:
+    """Validate header, spool upload to disk and queue the import job. Returns immediately with the job id."""
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing filename")
 
@@ -71,90 +50,230 @@ async def process_import_file(file: UploadFile, store: LeadsStore) -> ImportResu
     if not (filename.endswith(".csv") or filename.endswith(".xlsx")):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only .csv or .xlsx supported")
 
-    content = await file.read()
-
+    # Stream upload to a temp file (never holds the whole file in memory)
+    suffix = ".csv" if filename.endswith(".csv") else ".xlsx"
+    tmp = tempfile.NamedTemporaryFile(prefix="import-", suffix=suffix, delete=False)
     try:
-        if filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(content))
-        else:
-            df = pd.read_excel(io.BytesIO(content))
+        with tmp:
+            while True:
+                block = await file.read(_COPY_BLOCK_BYTES)
+                if not block:
+                    break
+                tmp.write(block)
+        columns = _read_header(tmp.name)
+    except HTTPException:
+        os.unlink(tmp.name)
+        raise
     except Exception:
+        os.unlink(tmp.name)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to parse file")
 
-    if df.empty:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+    if "email" not in columns:
+        os.unlink(tmp.name)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Column 'email' is required")
 
-    df.columns = [_normalize_key(c) for c in df.columns]
+    job_id = f"import-{uuid4().hex[:12]}"
+    import_job_store.create(job_id=job_id, filename=filename, status="queued")
 
-    if "email" not in df.columns:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Column 'email' is required")
+    # Sync task: Starlette runs it in the threadpool after the response is sent
+    background_tasks.add_task(run_import_job, job_id, tmp.name, store)
+
+    return ImportResult(inserted=0, updated=0, skipped=0, jobId=job_id)
 
-    inserted = 0
-    updated = 0
-    skipped = 0
-    errors: list[ImportErrorItem] = []
 
+def run_import_job(job_id: str, path: str, store: LeadsStore, chunk_rows: int = IMPORT_CHUNK_ROWS) -> None:
+    """Parse file chunk by chunk, upsert each chunk and publish progress on the job record."""
+    inserted = updated = skipped = 0
+    errors: list[ImportErrorItem] = []
     seen: Set[str] = set()
 
-    for _, row in df.iterrows():
-        email = str(row.get("email", "")).strip()
-        if not email or not EMAIL_RE.match(email):
-            skipped += 1
-            errors.append(ImportErrorItem(row=int(_)+1, field="email", reason="invalid email"))
-            continue
-        low_email = email.lower()
-        if low_email in seen:
-            skipped += 1
-            continue
-        seen.add(low_email)
-
-        company = row.get("company") or row.get("company_name") or None
-        url = row.get("url") or row.get("website") or None
-        url = str(url).strip() if isinstance(url, str) else url
-        domain = _domain_from_url(url)
-        
-        # Auto-generate image_key based on root domain
-        image_key = None
-        if domain:
-            root_domain = _extract_root_domain(domain)
-            if root_domain:
-                image_key = f"{root_domain}_picture"
-
-        # Collect extra vars (exclude known columns)
-        known = {"email", "company", "company_name", "url", "website", "image_key"}
-        extra_vars = {}
-        for c in df.columns:
-            if c not in known:
-                val = row.get(c)
-                if pd.notna(val):
-                    extra_vars[c] = val
-
-        created, _rec = store.upsert(
+    try:
+        import_job_store.update_progress(job_id, progress=0.0, status="running")
+        for chunk, progress in _iter_chunks(path, chunk_rows):
+            rows, chunk_skipped = normalize_chunk(chunk, seen, errors)
+            chunk_inserted, chunk_updated = _upsert_rows(store, rows)
+            inserted += chunk_inserted
+            updated += chunk_updated
+            skipped += chunk_skipped
+            import_job_store.update_progress(
+                job_id,
+                progress=min(progress, 99.0),
+                inserted=inserted,
+                updated=updated,
+                skipped=skipped,
+                errors=errors,
+            )
+
+        if inserted + updated + skipped == 0:
+            errors.append(ImportErrorItem(row=0, field="file", reason="empty file"))
+            final_status = "failed"
+        else:
+            final_status = "succeeded"
+        import_job_store.update_progress(
+            job_id,
+            progress=100.0,
+            inserted=inserted,
+            updated=updated,
+            skipped=skipped,
+            status=final_status,
+            errors=errors,
+        )
+        logger.info(f"Import {job_id} {final_status}: {inserted} inserted, {updated} updated, {skipped} skipped")
+    except Exception as e:
+        logger.error(f"Import {job_id} failed: {e}")
+        errors.append(ImportErrorItem(row=0, field="file", reason=str(e)))
+        import_job_store.update_progress(job_id, progress=100.0, status="failed", errors=errors)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _read_header(path: str) -> list[str]:
+    """Normalised column names of the file; reads only the header and first data row."""
+    if path.endswith(".csv"):
+        try:
+            head = pd.read_csv(path, nrows=1)
+        except pd.errors.EmptyDataError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+        if head.empty:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+        columns = head.columns
+    else:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            head = list(workbook.active.iter_rows(max_row=2, values_only=True))
+        finally:
+            workbook.close()
+        if len(head) < 2:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+        columns = [str(c) for c in head[0] if c is not None]
+    return [_normalize_key(str(c)) for c in columns]
+
+
+def _iter_chunks(path: str, chunk_rows: int) -> Iterator[Tuple[pd.DataFrame, float]]:
+    """Yield (DataFrame chunk, progress percentage). Row index is 0-based over the whole file."""
+    if path.endswith(".csv"):
+        # Parser reads ahead in large buffers, so progress is rows done over a cheap line count
+        total = max(_count_lines(path) - 1, 1)
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            chunk.columns = [_normalize_key(str(c)) for c in chunk.columns]
+            yield chunk, min((chunk.index[-1] + 1) * 100.0 / total, 100.0)
+        return
+
+    # XLSX: openpyxl read-only mode streams rows without loading the sheet
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = [_normalize_key(str(c)) if c is not None else f"column_{i}" for i, c in enumerate(next(rows, ()))]
+        total = max((sheet.max_row or 1) - 1, 1)
+        start = 0
+        batch = []
+        for values in rows:
+            batch.append(values[:len(header)])
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch))), (start + len(batch)) * 100.0 / total
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, index=range(start, start + len(batch))), 100.0
+    finally:
+        workbook.close()
+
+
+def _count_lines(path: str) -> int:
+    count = 0
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_COPY_BLOCK_BYTES), b""):
+            count += block.count(b"\n")
+    return count
+
+
+def normalize_chunk(df: pd.DataFrame, seen: Set[str], errors: list[ImportErrorItem]) -> Tuple[list[dict], int]:
+    """
+    Validate and normalise one chunk column-wise. Returns (upsert kwargs per row, skipped count).
+    - Emails stripped/lower-cased and validated with one vectorised regex
+    - Duplicates dropped with duplicated() plus the job-level seen set
+    - Host, root domain and image_key derived for the whole column at once
+    """
+    # Missing cells become "nan"/"None", which fail the regex like any other invalid value
+    emails = df["email"].astype(str).str.strip().str.lower()
+    valid = emails.str.match(EMAIL_RE)
+    for index in df.index[~valid]:
+        errors.append(ImportErrorItem(row=int(index) + 1, field="email", reason="invalid email"))
+
+    duplicate = valid & (emails.duplicated() | emails.isin(seen))
+    keep = valid & ~duplicate
+    skipped = int((~keep).sum())
+    if not keep.any():
+        return [], skipped
+
+    df = df[keep]
+    emails = emails[keep].tolist()
+    seen.update(emails)
+
+    company = _coalesce(df, "company", "company_name")
+    url = _text(_coalesce(df, "url", "website")).str.strip()
+
+    # One pass extracts host (www. dropped), its first label and the rest
+    parts = url.str.extract(_HOST_RE)
+    host, label, suffix = parts[0], parts[1], parts[2]
+    domain = host.where(host.str.len() > 0)
+
+    # Root = first label, normalised when the host has a TLD; image_key only for non-empty roots
+    root = label.str.lower().str.replace(_SEPARATORS_RE, "-", regex=True).where(suffix.notna(), host.str.lower())
+    image_key = (root + "_picture").where(root.str.len() > 0)
+
+    extra_columns = [c for c in df.columns if c not in KNOWN_COLUMNS]
+    extra = list(zip(*(_none(df[c]) for c in extra_columns))) if extra_columns else [()] * len(emails)
+
+    rows = []
+    for email, company_value, url_value, domain_value, image_key_value, extra_values in zip(
+        emails, _none(company), _none(url), _none(domain), _none(image_key), extra
+    ):
+        extra_vars = {c: v for c, v in zip(extra_columns, extra_values) if v is not None}
+        rows.append(dict(
             email=email,
-            company=company if company else None,
-            url=url,
-            domain=domain,
+            company=company_value,
+            url=url_value,
+            domain=domain_value,
             status=LeadStatus.active,
-            image_key=image_key,
+            image_key=image_key_value,
             vars=extra_vars if extra_vars else None,
-        )
-        if created:
-            inserted += 1
-        else:
-            updated += 1
-
-    job_id = f"import-{int(datetime.utcnow().timestamp())}"
-
-    # Create job record and mark as succeeded for MVP (no async worker yet)
-    job = import_job_store.create(job_id=job_id, filename=filename)
-    import_job_store.update_progress(
-        job_id,
-        progress=100.0,
-        inserted=inserted,
-        updated=updated,
-        skipped=skipped,
-        status="succeeded",
-        errors=errors,
-    )
-
-    return ImportResult(inserted=inserted, updated=updated, skipped=skipped, jobId=job_id)
+        ))
+
+    return rows, skipped
+
+
+def _coalesce(df: pd.DataFrame, primary: str, fallback: str) -> pd.Series:
+    """First non-empty value of two optional columns (object Series, NaN when both are empty)."""
+    result = pd.Series(None, index=df.index, dtype=object)
+    for column in (fallback, primary):
+        if column in df.columns:
+            values = df[column]
+            present = values.notna() & (values != "")
+            result = values.where(present, result)
+    return result
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Object Series keeping only str values (anything else becomes NaN), safe for the .str accessor."""
+    return series.where(series.map(type) == str).astype(object)
+
+
+def _none(series: pd.Series) -> list:
+    """Column as a Python list with missing values as None."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _upsert_rows(store: LeadsStore, rows: list[dict]) -> Tuple[int, int]:
+    """Bulk upsert prepared rows. Returns (inserted, updated)."""
+    if not rows:
+        return 0, 0
+    created = store.upsert_many(rows)
+    inserted = sum(created)
+    return inserted, len(created) - inserted
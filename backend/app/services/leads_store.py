@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
+from itertools import islice
 from uuid import uuid4
 
 from app.schemas.lead import LeadOut, LeadDetail, LeadStatus
+from app.services.pagination import InvalidCursor, Page, decode_cursor, encode_cursor
+from app.services.template_variables import template_variables_service
 
 
 def _now() -> datetime:
@@ -29,6 +32,9 @@ class _LeadRec:
     deleted_at: Optional[datetime] = None
     created_at: datetime = field(default_factory=_now)
     updated_at: datetime = field(default_factory=_now)
+    # Materialised completeness inputs
+    has_report: bool = False
+    missing_mask: int = 0  # template_variables_service.missing_mask() of this lead
 
     def to_out(self) -> LeadOut:
         return LeadOut(
@@ -48,6 +54,7 @@ class _LeadRec:
             deleted_at=self.deleted_at,
             created_at=self.created_at,
             updated_at=self.updated_at,
+            has_report=self.has_report,
             is_deleted=(self.deleted_at is not None),
         )
 
@@ -56,15 +63,93 @@ class _LeadRec:
         return LeadDetail(**self.to_out().model_dump())
 
 
+def _is_complete(rec: _LeadRec) -> bool:
+    return rec.has_report and bool(rec.image_key) and rec.missing_mask == 0
+
+
+def _tld(domain: Optional[str]) -> Optional[str]:
+    """Last label of a domain ("acme.co.nl" -> "nl"), lowercased."""
+    if not domain:
+        return None
+    return domain.lower().rsplit('.', 1)[-1]
+
+
 class LeadsStore:
+    """
+    In-memory lead store with hash indexes.
+    - Records keyed by id (insertion ordered) plus a lowercased email index
+    - Secondary indexes: list_name, status, domain TLD and deleted ids
+    - Indexes are updated on every mutation; point operations are O(1)
+    - Filter queries intersect index sets and only scan the candidates
+    - Completeness is materialised per lead (missing-variable mask + has_report) and
+      indexed; recomputed when content fields change, a report is (un)bound or the
+      template set changes
+    - query_page pages by (insertion seq, id) cursor and starts scanning at the cursor
+    """
+
     def __init__(self) -> None:
-        self._leads: List[_LeadRec] = []
+        self._leads: Dict[str, _LeadRec] = {}
+        self._seq: Dict[str, int] = {}  # id -> insertion order (for stable query order)
+        self._order: List[str] = []  # ids by seq, so keyset pages start at the cursor directly
+        self._next_seq = 0
+        self._by_email: Dict[str, str] = {}
+        self._by_list: Dict[str, Set[str]] = {}
+        self._by_status: Dict[LeadStatus, Set[str]] = {}
+        self._by_tld: Dict[str, Set[str]] = {}
+        self._deleted: Set[str] = set()
+        self._complete: Set[str] = set()
+        self._completeness_version = template_variables_service.version
+        # Called with (lead_id, email) when a lead is created
+        self._lead_listeners: List[Callable[[str, str], Any]] = []
 
-    def _find_index_by_email(self, email: str) -> Optional[int]:
-        for i, rec in enumerate(self._leads):
-            if rec.email.lower() == email.lower():
-                return i
-        return None
+    def add_lead_listener(self, listener: Callable[[str, str], Any]) -> None:
+        """Register a callback for new leads, e.g. MessageLinker.index_lead."""
+        self._lead_listeners.append(listener)
+
+    def clear(self) -> None:
+        """Remove all leads and indexes."""
+        for index in (self._leads, self._seq, self._order, self._by_email, self._by_list, self._by_status, self._by_tld):
+            index.clear()
+        self._next_seq = 0
+        self._deleted.clear()
+        self._complete.clear()
+
+    def __len__(self) -> int:
+        return len(self._leads)
+
+    def records(self) -> List[_LeadRec]:
+        """All lead records in insertion order."""
+        return list(self._leads.values())
+
+    def get_all(self) -> List[_LeadRec]:
+        """All lead records (same interface as DBLeadsStore.get_all)."""
+        return self.records()
+
+    def _index(self, rec: _LeadRec) -> None:
+        if rec.list_name is not None:
+            self._by_list.setdefault(rec.list_name, set()).add(rec.id)
+        self._by_status.setdefault(rec.status, set()).add(rec.id)
+        tld = _tld(rec.domain)
+        if tld is not None:
+            self._by_tld.setdefault(tld, set()).add(rec.id)
+        if rec.deleted_at is not None:
+            self._deleted.add(rec.id)
+        if _is_complete(rec):
+            self._complete.add(rec.id)
+
+    def _unindex(self, rec: _LeadRec) -> None:
+        for index, key in ((self._by_list, rec.list_name), (self._by_status, rec.status), (self._by_tld, _tld(rec.domain))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(rec.id)
+                if not ids:
+                    del index[key]
+        self._deleted.discard(rec.id)
+        self._complete.discard(rec.id)
+
+    def _find_by_email(self, email: str) -> Optional[_LeadRec]:
+        lead_id = self._by_email.get(email.lower())
+        return self._leads.get(lead_id) if lead_id is not None else None
 
     def upsert(
         self,
@@ -84,8 +169,8 @@ class LeadsStore:
         """Insert or update by email. Returns (created, record). Vars merge on update.
         - Do not overwrite image_key if new value is empty.
         """
-        idx = self._find_index_by_email(email)
-        if idx is None:
+        rec = self._find_by_email(email)
+        if rec is None:
             rec = _LeadRec(
                 id=str(uuid4()),
                 email=email,
@@ -100,10 +185,18 @@ class LeadsStore:
                 last_emailed_at=last_emailed_at,
                 last_open_at=last_open_at,
             )
-            self._leads.append(rec)
+            rec.missing_mask = template_variables_service.missing_mask(rec)
+            self._leads[rec.id] = rec
+            self._seq[rec.id] = self._next_seq
+            self._order.append(rec.id)
+            self._next_seq += 1
+            self._by_email[email.lower()] = rec.id
+            self._index(rec)
+            for listener in self._lead_listeners:
+                listener(rec.id, rec.email)
             return True, rec
         else:
-            rec = self._leads[idx]
+            self._unindex(rec)
             # update non-empty basic fields
             if company:
                 rec.company = company
@@ -125,19 +218,91 @@ class LeadsStore:
                 rec.last_emailed_at = last_emailed_at
             if last_open_at:
                 rec.last_open_at = last_open_at
+            if company or url or domain or image_key or vars:
+                # Only fields templates read affect completeness
+                rec.missing_mask = template_variables_service.missing_mask(rec)
             rec.updated_at = _now()
+            self._index(rec)
             return False, rec
 
+    def upsert_many(self, records: Iterable[dict]) -> List[bool]:
+        """Upsert a batch of upsert() keyword dicts. Returns per-row created flags (False = updated).
+        - Same merge rules as upsert(); a repeated email within the batch updates the earlier row
+        """
+        upsert = self.upsert
+        return [upsert(**record)[0] for record in records]
+
     def get(self, lead_id: str) -> Optional[LeadDetail]:
-        for rec in self._leads:
-            if rec.id == lead_id:
-                return rec.to_detail()
-        return None
-    
+        rec = self._leads.get(lead_id)
+        return rec.to_detail() if rec else None
+
     def get_by_id(self, lead_id: str) -> Optional[LeadDetail]:
         """Alias for get method to match expected interface"""
         return self.get(lead_id)
 
+    def get_many(self, lead_ids: Iterable[str]) -> Dict[str, LeadOut]:
+        """Leads by id in one call (missing ids are left out)."""
+        leads = self._leads
+        return {lead_id: leads[lead_id].to_out() for lead_id in lead_ids if lead_id in leads}
+
+    def get_by_email(self, email: str) -> Optional[LeadDetail]:
+        """Lead by email (case-insensitive)."""
+        rec = self._find_by_email(email)
+        return rec.to_detail() if rec else None
+
+    def set_report_bound(self, lead_id: str, bound: bool) -> bool:
+        """Record whether a report is bound to the lead (reports store link listener)."""
+        rec = self._leads.get(lead_id)
+        if rec is None:
+            return False
+        rec.has_report = bound
+        if _is_complete(rec):
+            self._complete.add(lead_id)
+        else:
+            self._complete.discard(lead_id)
+        return True
+
+    def refresh_completeness(self) -> None:
+        """Recompute every lead's missing-variable mask (template set changed)."""
+        self._completeness_version = template_variables_service.version
+        self._complete.clear()
+        for rec in self._leads.values():
+            rec.missing_mask = template_variables_service.missing_mask(rec)
+            if _is_complete(rec):
+                self._complete.add(rec.id)
+
+    def _candidate_ids(
+        self,
+        status: Optional[List[LeadStatus]],
+        domain_tld: Optional[List[str]],
+        list_name: Optional[str],
+        is_complete: Optional[bool] = None,
+    ) -> Optional[Set[str]]:
+        """Ids matching the indexed filters (None when no indexed filter applies)."""
+        sets: List[Set[str]] = []
+        if status:
+            sets.append(set().union(*(self._by_status.get(s, ()) for s in set(status))))
+        if domain_tld:
+            suffixes = set(t.lower() for t in domain_tld)
+            matched: Set[str] = set()
+            for suffix in suffixes:
+                # A domain ending in suffix has a TLD that equals (dotted suffix) or ends with (bare suffix) it
+                last = suffix.rsplit('.', 1)[-1]
+                keys = [last] if '.' in suffix else [k for k in self._by_tld if k.endswith(suffix)]
+                for key in keys:
+                    for lead_id in self._by_tld.get(key, ()):
+                        if self._leads[lead_id].domain.lower().endswith(suffix):
+                            matched.add(lead_id)
+            sets.append(matched)
+        if list_name is not None:
+            sets.append(self._by_list.get(list_name, set()))
+        if is_complete:
+            sets.append(self._complete)
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
     def query(
         self,
         *,
@@ -152,105 +317,120 @@ class LeadsStore:
         is_complete: Optional[bool] = None,
         include_deleted: bool = False,
     ) -> Tuple[List[LeadOut], int]:
-        # Filter deleted leads UNLESS explicitly requested
-        if include_deleted:
-            data = list(self._leads)
+        data = list(self._filtered(
+            status=status, domain_tld=domain_tld, has_image=has_image, has_var=has_var,
+            search=search, list_name=list_name, is_complete=is_complete, include_deleted=include_deleted,
+        ))
+        total = len(data)
+        start = (page - 1) * page_size
+        end = start + page_size
+        return [r.to_out() for r in data[start:end]], total
+
+    def query_page(
+        self,
+        *,
+        page_size: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        **filters,
+    ) -> Page[LeadOut]:
+        """Keyset page in insertion order after cursor (filters as in query); starts at the cursor, not at row 0."""
+        after_seq = -1
+        if cursor:
+            after_seq, lead_id = decode_cursor(cursor)
+            if not isinstance(after_seq, int) or self._seq.get(lead_id) != after_seq:
+                raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+        recs = list(islice(self._filtered(after_seq=after_seq, **filters), page_size + 1))
+        page = Page(items=[r.to_out() for r in recs[:page_size]])
+        if len(recs) > page_size:
+            last = recs[page_size - 1]
+            page.next_cursor = encode_cursor(self._seq[last.id], last.id)
+        if include_total:
+            page.total = sum(1 for _ in self._filtered(**filters))
+        return page
+
+    def _filtered(
+        self,
+        *,
+        status: Optional[List[LeadStatus]] = None,
+        domain_tld: Optional[List[str]] = None,
+        has_image: Optional[bool] = None,
+        has_var: Optional[bool] = None,
+        search: Optional[str] = None,
+        list_name: Optional[str] = None,
+        is_complete: Optional[bool] = None,
+        include_deleted: bool = False,
+        after_seq: int = -1,
+    ) -> Iterator[_LeadRec]:
+        """Matching leads lazily, in insertion order, after sequence number after_seq."""
+        if is_complete is not None and self._completeness_version != template_variables_service.version:
+            self.refresh_completeness()
+        # Indexed filters (status, TLD, list, complete) narrow the candidates first
+        ids = self._candidate_ids(status, domain_tld, list_name, is_complete)
+        if ids is None:
+            data = (self._leads[self._order[i]] for i in range(after_seq + 1, len(self._order)))
+            if not include_deleted:
+                data = (r for r in data if r.deleted_at is None)
         else:
-            data = [r for r in self._leads if r.deleted_at is None]
-        if status:
-            sset = set(status)
-            data = [r for r in data if r.status in sset]
-        if domain_tld:
-            tlds = set([t.lower() for t in domain_tld])
-            data = [
-                r
-                for r in data
-                if r.domain and any(r.domain.lower().endswith(t) for t in tlds)
-            ]
+            # Filter deleted leads UNLESS explicitly requested
+            if not include_deleted:
+                ids = ids - self._deleted
+            ids = [i for i in ids if self._seq[i] > after_seq]
+            data = (self._leads[i] for i in sorted(ids, key=self._seq.__getitem__))
         if has_image is not None:
-            data = [r for r in data if (r.image_key is not None) == has_image]
+            data = (r for r in data if (r.image_key is not None) == has_image)
         if has_var is not None:
-            data = [r for r in data if (len(r.vars) > 0) == has_var]
-        if list_name is not None:
-            data = [r for r in data if r.list_name == list_name]
-        if is_complete is not None:
-            # For is_complete filter, we need to import the enrichment service
-            from app.services.lead_enrichment import check_lead_is_complete
-            from app.models.lead import Lead
-            
-            # Convert _LeadRec to Lead model for checking
-            filtered = []
-            for r in data:
-                lead = Lead(
-                    id=r.id,
-                    email=r.email,
-                    company=r.company,
-                    url=r.url,
-                    domain=r.domain,
-                    status=r.status,
-                    tags=r.tags,
-                    image_key=r.image_key,
-                    list_name=r.list_name,
-                    vars=r.vars,
-                    stopped=r.stopped,
-                    created_at=r.created_at,
-                    updated_at=r.updated_at
-                )
-                if check_lead_is_complete(lead) == is_complete:
-                    filtered.append(r)
-            data = filtered
+            data = (r for r in data if (len(r.vars) > 0) == has_var)
+        if is_complete is False:
+            data = (r for r in data if r.id not in self._complete)
         if search:
             q = search.lower()
-            data = [
+            data = (
                 r
                 for r in data
                 if q in r.email.lower()
                 or (r.company or "").lower().find(q) != -1
                 or (r.domain or "").lower().find(q) != -1
-            ]
-        total = len(data)
-        start = (page - 1) * page_size
-        end = start + page_size
-        return [r.to_out() for r in data[start:end]], total
+            )
+        return data
 
-    def stop_lead(self, lead_id: str) -> int:
-        """Stop a lead and cancel all future messages. Returns count of canceled messages."""
-        for rec in self._leads:
-            if rec.id == lead_id:
-                rec.stopped = True
-                rec.updated_at = _now()
-                # TODO: Cancel queued messages in campaign scheduler
-                # For now, return 0 as we don't have message queue implemented yet
-                return 0
-        return 0
+    def stop_lead(self, lead_id: str) -> bool:
+        """Mark a lead as stopped (queued messages are canceled by the scheduler). Returns True if found."""
+        rec = self._leads.get(lead_id)
+        if rec is None:
+            return False
+        rec.stopped = True
+        rec.updated_at = _now()
+        return True
 
     def is_stopped(self, lead_id: str) -> bool:
         """Check if a lead is stopped."""
-        for rec in self._leads:
-            if rec.id == lead_id:
-                return rec.stopped
-        return False
+        rec = self._leads.get(lead_id)
+        return rec.stopped if rec is not None else False
     
     def update_status(self, lead_id: str, status: LeadStatus) -> bool:
         """Update lead status (e.g., for unsubscribe). Returns True if found."""
-        for rec in self._leads:
-            if rec.id == lead_id:
-                rec.status = status
-                rec.updated_at = _now()
-                return True
-        return False
+        rec = self._leads.get(lead_id)
+        if rec is None:
+            return False
+        self._unindex(rec)
+        rec.status = status
+        rec.updated_at = _now()
+        self._index(rec)
+        return True
     
     def soft_delete(self, lead_id: str) -> bool:
         """Soft delete a lead by setting deleted_at timestamp.
         
         Returns True if successful, False if lead not found.
         """
-        for rec in self._leads:
-            if rec.id == lead_id:
-                rec.deleted_at = _now()
-                rec.updated_at = _now()
-                return True
-        return False
+        rec = self._leads.get(lead_id)
+        if rec is None:
+            return False
+        rec.deleted_at = _now()
+        rec.updated_at = _now()
+        self._deleted.add(lead_id)
+        return True
     
     def soft_delete_bulk(self, lead_ids: List[str]) -> Tuple[List[str], List[str]]:
         """Soft delete multiple leads.
@@ -273,12 +453,13 @@ class LeadsStore:
         
         Returns True if successful, False if lead not found.
         """
-        for rec in self._leads:
-            if rec.id == lead_id:
-                rec.deleted_at = None
-                rec.updated_at = _now()
-                return True
-        return False
+        rec = self._leads.get(lead_id)
+        if rec is None:
+            return False
+        rec.deleted_at = None
+        rec.updated_at = _now()
+        self._deleted.discard(lead_id)
+        return True
     
     def restore_bulk(self, lead_ids: List[str]) -> Tuple[List[str], List[str]]:
         """Restore multiple soft-deleted leads.
@@ -307,7 +488,7 @@ class LeadsStore:
         
         Returns (leads, total_count)
         """
-        data = [r for r in self._leads if r.deleted_at is not None]
+        data = [self._leads[i] for i in sorted(self._deleted, key=self._seq.__getitem__)]
         
         if search:
             q = search.lower()
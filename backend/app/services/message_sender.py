@@ -6,6 +6,7 @@ from loguru import logger
 from app.models.campaign import Message, MessageStatus, MessageEvent, MessageEventType
 from app.models.lead import Lead, LeadStatus
 from app.services.signature_injector import inject_signature_cid, get_alias_from_mail_number
+from app.services.smtp_pool import smtp_pool
 
 
 class MessageSender:
@@ -19,10 +20,13 @@ class MessageSender:
         self.smtp_enabled = False
         self.bounce_rate = 0.05  # 5% simulated bounce rate
         self.delivery_success_rate = 0.95
+        self.smtp_pool = smtp_pool
     
-    async def send_message(self, message: Message, lead: Lead, template_content: str) -> bool:
+    async def send_message(self, message: Message, lead: Lead, template_content: str,
+                           subject: Optional[str] = None) -> bool:
         """
         Send a single message with bounce detection and status updates.
+        subject is the rendered subject line; None falls back to the campaign template's subject.
         Returns True if sent successfully, False if failed.
         """
         
@@ -35,7 +39,7 @@ class MessageSender:
             
             # Simulate SMTP sending
             if self.smtp_enabled:
-                success = await self._send_via_smtp(message, lead, template_content)
+                success = await self._send_via_smtp(message, lead, template_content, subject)
             else:
                 success = await self._simulate_send(message, lead)
             
@@ -131,23 +135,26 @@ class MessageSender:
         token = self._generate_token(message.id)
         return f"{base_url}/api/v1/track/open.gif?m={message.id}&t={token}"
     
-    async def _send_via_smtp(self, message: Message, lead: Lead, template_content: str) -> bool:
+    async def _send_via_smtp(self, message: Message, lead: Lead, template_content: str,
+                             subject: Optional[str] = None) -> bool:
         """Send email via actual SMTP (production implementation)."""
         import smtplib
         import os
         from email.mime.multipart import MIMEMultipart
         from email.mime.text import MIMEText
-        from email.utils import formataddr
+        from email.utils import formataddr, make_msgid
         
+        from app.services.campaign_store import campaign_store
         from app.services.settings import settings_service
-        from app.services.template_renderer import inject_tracking_pixel, inject_signature_cid
+        from app.services.template_renderer import inject_tracking_pixel
         
         settings = settings_service.get_settings()
         
-        # Inject signature based on alias (before tracking pixel)
+        # Inject signature based on alias (before tracking pixel), unless the renderer placed it
         alias = get_alias_from_mail_number(message.mail_number)
-        template_content = inject_signature_cid(template_content, alias)
-        logger.debug(f"Injected {alias} signature for message {message.id}")
+        if 'src="cid:signature_' not in template_content:
+            template_content = inject_signature_cid(template_content, alias)
+            logger.debug(f"Injected {alias} signature for message {message.id}")
         
         # Inject tracking pixel
         if settings.tracking_pixel_enabled:
@@ -166,18 +173,20 @@ class MessageSender:
             logger.error("SMTP credentials not configured in environment")
             return False
         
-        # Get campaign to determine template subject
-        campaign = campaign_store.get_campaign(message.campaign_id)
-        if not campaign:
-            logger.error(f"Campaign {message.campaign_id} not found for message {message.id}")
-            return False
-        
-        # Get template for subject
-        from app.services.template_store import template_store
-        template = template_store.get(campaign.template_id)
-        if not template:
-            logger.error(f"Template {campaign.template_id} not found")
-            return False
+        if subject is None:
+            # Get campaign to determine template subject
+            campaign = campaign_store.get_campaign(message.campaign_id)
+            if not campaign:
+                logger.error(f"Campaign {message.campaign_id} not found for message {message.id}")
+                return False
+            
+            # Get template for subject
+            from app.services.template_store import template_store
+            template = template_store.get_by_id(campaign.template_id)
+            if not template:
+                logger.error(f"Template {campaign.template_id} not found")
+                return False
+            subject = template.subject_template
         
         # Determine From address based on domain
         from_name = "Christian"
@@ -189,8 +198,11 @@ class MessageSender:
             msg = MIMEMultipart('related')  # Changed to 'related' for embedded images
             msg['From'] = formataddr((from_name, from_email))
             msg['To'] = lead.email
-            msg['Subject'] = template.subject
+            msg['Subject'] = subject
             msg['Reply-To'] = reply_to
+            # Own Message-ID, so replies (In-Reply-To/References) and DSNs link back to this message
+            smtp_message_id = make_msgid(domain=message.domain_used)
+            msg['Message-ID'] = smtp_message_id
             
             # Add unsubscribe headers
             for key, value in unsub_headers.items():
@@ -200,40 +212,22 @@ class MessageSender:
             html_part = MIMEText(template_content, 'html', 'utf-8')
             msg.attach(html_part)
             
-            # Attach signature image as CID
-            from email.mime.image import MIMEImage
-            import os
-            from pathlib import Path
+            # Attach signature image as CID (pre-encoded, cached by asset_resolver)
+            from app.services.asset_resolver import asset_resolver
             
             alias = get_alias_from_mail_number(message.mail_number)
-            signature_filename = f"{alias.capitalize()} Handtekening.png"
-            signature_path = Path(__file__).parent.parent / "assets" / "signatures" / signature_filename
+            image = asset_resolver.get_signature_mime_part(alias)
+            if image is not None:
+                msg.attach(image)
+                logger.debug(f"Attached {alias} signature image as CID for message {message.id}")
             
-            if signature_path.exists():
-                with open(signature_path, 'rb') as img_file:
-                    img_data = img_file.read()
-                    image = MIMEImage(img_data)
-                    image.add_header('Content-ID', f'<signature_{alias}>')
-                    image.add_header('Content-Disposition', 'inline', filename=signature_filename)
-                    msg.attach(image)
-                    logger.debug(f"Attached {alias} signature image as CID for message {message.id}")
-            else:
-                logger.warning(f"Signature image not found: {signature_path}")
-            
-            # Connect to SMTP server
-            logger.debug(f"Connecting to SMTP server {smtp_host}:{smtp_port}")
+            # Send over a pooled, already authenticated session (off the event loop),
+            # capped per sending domain
+            await self.smtp_pool.send_async(smtp_host, smtp_port, smtp_user, smtp_password, msg,
+                                            domain=message.domain_used)
+            # Stored bare, like the In-Reply-To/References ids the IMAP client parses
+            message.smtp_message_id = smtp_message_id.strip('<>')
             
-            with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-                # Start TLS
-                server.starttls()
-                
-                # Login
-                logger.debug(f"Authenticating as {smtp_user}")
-                server.login(smtp_user, smtp_password)
-                
-                # Send email
-                server.send_message(msg)
-                
             logger.info(f"Successfully sent email via SMTP for message {message.id} to {lead.email}")
             return True
             
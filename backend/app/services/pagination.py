@@ -0,0 +1,75 @@
+import base64
+import heapq
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """Cursor could not be decoded (tampered, truncated or from another listing)."""
+
+
+@dataclass
+class Page(Generic[T]):
+    """One keyset page: items, cursor for the next page (None on the last) and optional total."""
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+def encode_cursor(sort_key: Any, item_id: str) -> str:
+    """Opaque cursor for the position (sort_key, item_id)."""
+    if isinstance(sort_key, datetime):
+        key = ["dt", sort_key.isoformat()]
+    else:
+        key = ["v", sort_key]
+    raw = json.dumps([key, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """(sort_key, item_id) of a cursor made by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (kind, value), item_id = json.loads(raw)
+        if kind == "dt":
+            value = datetime.fromisoformat(value)
+        elif kind != "v":
+            raise ValueError(kind)
+        return value, str(item_id)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(
+    items: Iterable[T],
+    sort_key: Callable[[T], Any],
+    item_id: Callable[[T], str],
+    page_size: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+) -> Page[T]:
+    """
+    Page of items ordered by (sort_key, id) strictly after cursor.
+    - Unsorted input: selects with a bounded heap, so cost does not grow with page depth
+    - Ties on sort_key are broken by id, so pages never skip or repeat items
+    """
+    position = lambda item: (sort_key(item), item_id(item))
+    if cursor:
+        after = decode_cursor(cursor)
+        if descending:
+            items = (item for item in items if position(item) < after)
+        else:
+            items = (item for item in items if position(item) > after)
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    selected = select(page_size + 1, items, key=position)
+
+    next_cursor = None
+    if len(selected) > page_size:
+        selected = selected[:page_size]
+        next_cursor = encode_cursor(*position(selected[-1]))
+    return Page(items=selected, next_cursor=next_cursor)
@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from app.models.report import Report, ReportLink, ReportType
 from app.schemas.report import ReportsQuery, ReportOut, ReportDetail
+from app.services.pagination import Page, keyset_page
 
 
 class ReportsStore:
@@ -11,6 +12,18 @@ class ReportsStore:
     def __init__(self):
         self.reports: Dict[str, Report] = {}
         self.report_links: Dict[str, ReportLink] = {}
+        # Called with (lead_id, has_report) when a lead's report binding changes
+        self._link_listeners: List[Callable[[str, bool], Any]] = []
+    
+    def add_link_listener(self, listener: Callable[[str, bool], Any]) -> None:
+        """Register a callback for lead report (un)binding, e.g. LeadsStore.set_report_bound."""
+        self._link_listeners.append(listener)
+    
+    def _notify_leads(self, lead_ids) -> None:
+        for lead_id in {lid for lid in lead_ids if lid}:
+            bound = self.get_report_for_lead(lead_id) is not None
+            for listener in self._link_listeners:
+                listener(lead_id, bound)
     
     
     def create_report(self, report_data: Dict[str, Any]) -> Report:
@@ -29,6 +42,31 @@ class ReportsStore:
     
     def list_reports(self, query: ReportsQuery) -> Tuple[List[ReportOut], int]:
         """List reports with filtering and pagination."""
+        reports = self._filter_reports(query)
+        
+        # Sort by created_at desc
+        reports.sort(key=lambda r: r.created_at, reverse=True)
+        
+        total = len(reports)
+        
+        # Pagination
+        start = (query.page - 1) * query.page_size
+        end = start + query.page_size
+        reports = reports[start:end]
+        
+        return [self._to_out(report) for report in reports], total
+    
+    def reports_page(self, query: ReportsQuery) -> Page[ReportOut]:
+        """Keyset page on (created_at desc, id) after query.cursor; cost independent of depth."""
+        reports = self._filter_reports(query)
+        page = keyset_page(reports, lambda r: r.created_at, lambda r: r.id,
+                           query.page_size, query.cursor, descending=True)
+        page.items = [self._to_out(report) for report in page.items]
+        if query.include_total:
+            page.total = len(reports)
+        return page
+    
+    def _filter_reports(self, query: ReportsQuery) -> List[Report]:
         reports = list(self.reports.values())
         
         # Apply filters
@@ -48,31 +86,18 @@ class ReportsStore:
                 bound_report_ids = {link.report_id for link in self.report_links.values()}
                 reports = [r for r in reports if r.id not in bound_report_ids]
         
-        # Sort by created_at desc
-        reports.sort(key=lambda r: r.created_at, reverse=True)
-        
-        total = len(reports)
-        
-        # Pagination
-        start = (query.page - 1) * query.page_size
-        end = start + query.page_size
-        reports = reports[start:end]
-        
-        # Convert to output format with bound_to info
-        report_outs = []
-        for report in reports:
-            bound_to = self._get_bound_to_info(report.id)
-            report_out = ReportOut(
-                id=report.id,
-                filename=report.filename,
-                type=report.type,
-                size_bytes=report.size_bytes,
-                created_at=report.created_at,
-                bound_to=bound_to
-            )
-            report_outs.append(report_out)
-        
-        return report_outs, total
+        return reports
+    
+    def _to_out(self, report: Report) -> ReportOut:
+        """Convert to output format with bound_to info."""
+        return ReportOut(
+            id=report.id,
+            filename=report.filename,
+            type=report.type,
+            size_bytes=report.size_bytes,
+            created_at=report.created_at,
+            bound_to=self._get_bound_to_info(report.id)
+        )
     
     def get_report_detail(self, report_id: str) -> Optional[ReportDetail]:
         """Get detailed report info."""
@@ -99,7 +124,7 @@ class ReportsStore:
                    campaign_id: Optional[str] = None) -> ReportLink:
         """Create a link between report and lead/campaign."""
         # Remove existing links for this report (MVP: 1:1 relationship)
-        self._remove_links_for_report(report_id)
+        previous = self._remove_links_for_report(report_id, notify=False)
         
         link_id = str(uuid.uuid4())
         link = ReportLink(
@@ -110,23 +135,26 @@ class ReportsStore:
             created_at=datetime.utcnow()
         )
         self.report_links[link_id] = link
+        self._notify_leads(previous + [lead_id])
         return link
     
     def remove_links_for_report(self, report_id: str) -> int:
         """Remove all links for a report."""
-        return self._remove_links_for_report(report_id)
+        lead_ids = self._remove_links_for_report(report_id)
+        return len(lead_ids)
     
-    def _remove_links_for_report(self, report_id: str) -> int:
-        """Internal method to remove links for a report."""
+    def _remove_links_for_report(self, report_id: str, notify: bool = True) -> List[Optional[str]]:
+        """Internal method to remove links for a report. Returns the lead_id of each removed link."""
         links_to_remove = [
             link_id for link_id, link in self.report_links.items()
             if link.report_id == report_id
         ]
         
-        for link_id in links_to_remove:
-            del self.report_links[link_id]
+        lead_ids = [self.report_links.pop(link_id).lead_id for link_id in links_to_remove]
+        if notify:
+            self._notify_leads(lead_ids)
         
-        return len(links_to_remove)
+        return lead_ids
     
     def _get_bound_to_info(self, report_id: str) -> Optional[Dict[str, str]]:
         """Get bound_to information for a report."""
@@ -155,6 +183,18 @@ class ReportsStore:
                 return self.reports.get(link.report_id)
         return None
     
+    def get_report_ids_for_leads(self, lead_ids: List[str]) -> Dict[str, str]:
+        """Map lead_id -> report_id for the given leads in one pass over the links."""
+        wanted = set(lead_ids)
+        result: Dict[str, str] = {}
+        for link in self.report_links.values():
+            if link.lead_id in wanted and link.lead_id not in result:
+                # Same rule as get_report_for_lead: first link decides, report must exist
+                wanted.discard(link.lead_id)
+                if link.report_id in self.reports:
+                    result[link.lead_id] = link.report_id
+        return result
+    
     def get_report_for_campaign(self, campaign_id: str) -> Optional[Report]:
         """Get report linked to a specific campaign."""
         for link in self.report_links.values():
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.campaign_flows import get_flow_for_domain
+from app.core.sending_policy import COMPILED_POLICY
+from app.core.templates_store import get_template_for_flow
+from app.models.campaign import Message, MessageStatus
+from app.services.batch_render import lead_to_render_data
+from app.services.campaign_scheduler import CampaignScheduler
+from app.services.message_sender import MessageSender
+from app.services.signature_injector import CID_SIGNATURE_URLS
+from app.services.template_renderer import render_template_with_lead
+
+
+class SendWorker:
+    """
+    Background loop that ticks the CampaignScheduler and hands due messages to MessageSender.
+    - Min-heap of (next due time, domain) wake-ups; sleeps until the earliest one
+    - Idle when nothing is queued (no polling), woken early by notify()
+    - Due domains are dispatched concurrently, one message per domain per throttle window
+    - Messages are rendered by the shared lead renderer (same subject/body as preview and batch render)
+    - A message that errors is stored as failed; it never takes the rest of the queue with it
+    - stop() lets in-flight sends finish before returning
+    """
+
+    def __init__(
+        self,
+        scheduler: CampaignScheduler,
+        sender: MessageSender,
+        campaign_store=None,
+        leads_store=None,
+        clock: Optional[Callable[[], datetime]] = None
+    ):
+        if campaign_store is None or leads_store is None:
+            # Lazy import to avoid circular imports
+            from app.services import store_factory
+            campaign_store = campaign_store or store_factory.campaigns_store
+            leads_store = leads_store or store_factory.leads_store
+
+        self.scheduler = scheduler
+        self.sender = sender
+        self.campaign_store = campaign_store
+        self.leads_store = leads_store
+        self.clock = clock or (lambda: datetime.now(COMPILED_POLICY.tz))
+
+        self._wakeups: List[Tuple[datetime, str]] = []  # heap of (due time, domain)
+        self._due: Dict[str, datetime] = {}  # domain -> current wake-up (older heap entries are stale)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the loop on the running event loop."""
+        if self.running:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self.notify()
+        self._task = asyncio.create_task(self._run(), name="send-worker")
+        logger.info("Send worker started")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop taking new work and wait for in-flight sends to finish."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Send worker did not drain within {timeout}s, cancelling")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        finally:
+            self._task = None
+        logger.info("Send worker stopped")
+
+    def notify(self, domain: Optional[str] = None) -> None:
+        """Recompute wake-up for domain (all domains if None), e.g. after scheduling a campaign."""
+        domains = [domain] if domain else list(self.scheduler.domain_queues)
+        for name in domains:
+            self._schedule(name)
+        self._wake.set()
+
+    def next_wakeup(self) -> Optional[datetime]:
+        """Earliest pending wake-up, or None when idle."""
+        self._drop_stale()
+        return self._wakeups[0][0] if self._wakeups else None
+
+    async def tick(self) -> int:
+        """Dispatch every domain that is due now. Returns number of messages handed to the sender."""
+        now = self.clock()
+        domains = []
+        self._drop_stale()
+        while self._wakeups and self._wakeups[0][0] <= now:
+            _, domain = heapq.heappop(self._wakeups)
+            self._due.pop(domain, None)
+            domains.append(domain)
+            self._drop_stale()
+
+        if not domains:
+            return 0
+
+        results = await asyncio.gather(*(self._track(self._dispatch_domain(d, now)) for d in domains))
+        return sum(results)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wake.clear()
+            await self.tick()
+            if self._stopping:
+                break
+
+            wakeup = self.next_wakeup()
+            delay = None if wakeup is None else max((wakeup - self.clock()).total_seconds(), 0)
+            if delay == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+        # Drain: sends already handed out finish, nothing new is picked up
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _track(self, coro) -> int:
+        task = asyncio.ensure_future(coro)
+        self._in_flight.add(task)
+        try:
+            return await task
+        finally:
+            self._in_flight.discard(task)
+
+    async def _dispatch_domain(self, domain: str, now: datetime) -> int:
+        sent = 0
+        try:
+            messages = self.scheduler.get_next_messages_to_send(domain, now)
+            for message in messages:
+                try:
+                    await self._send(message)
+                    sent += 1
+                except Exception as e:
+                    logger.error(f"Send worker error on message {message.id} ({domain}): {str(e)}")
+                    message.status = MessageStatus.failed
+                    message.last_error = str(e)
+                    self.campaign_store.save_message(message)
+        except Exception as e:
+            logger.error(f"Send worker error on domain {domain}: {str(e)}")
+        finally:
+            self._schedule(domain)
+        return sent
+
+    async def _send(self, message: Message) -> None:
+        lead = self.leads_store.get_by_id(message.lead_id)
+        if lead is None:
+            message.status = MessageStatus.failed
+            message.last_error = "Lead not found"
+            logger.warning(f"Lead {message.lead_id} not found for message {message.id}")
+        else:
+            rendered = self._render(message, lead)
+            await self.sender.send_message(message, lead, rendered["html"], subject=rendered["subject"])
+        self.campaign_store.save_message(message)
+
+    def _render(self, message: Message, lead) -> Dict[str, Optional[str]]:
+        """Subject and HTML of the flow template for this message, via the shared lead renderer."""
+        flow = get_flow_for_domain(message.domain_used)
+        template = get_template_for_flow(flow.version, message.mail_number) if flow else None
+        if template is None:
+            return {"html": "", "subject": None}
+
+        campaign = self.campaign_store.get_campaign(message.campaign_id)
+        campaign_data = {"id": campaign.id, "name": campaign.name} if campaign else None
+        # Signature as CID references: MessageSender attaches the images
+        return render_template_with_lead(
+            template.body, template.subject, lead_to_render_data(lead), campaign_data,
+            mail_number=message.mail_number, template_id=template.id, signature_urls=CID_SIGNATURE_URLS
+        )
+
+    def _schedule(self, domain: str) -> None:
+        """Push the domain's next due time: earliest queued slot, but not inside the throttle window."""
+        due = self.scheduler.get_next_due_time(domain)
+        if due is None:
+            self._due.pop(domain, None)
+            return
+
+        last_send = self.scheduler.domain_last_send.get(domain)
+        if last_send is not None:
+            due = max(due, last_send + timedelta(minutes=COMPILED_POLICY.slot_minutes))
+
+        if self._due.get(domain) == due:
+            return
+        self._due[domain] = due
+        heapq.heappush(self._wakeups, (due, domain))
+
+    def _drop_stale(self) -> None:
+        heap = self._wakeups
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
@@ -4,6 +4,9 @@ Signature injection service - adds signature images to email templates based on
 import re
 from typing import Optional
 
+# Signature sources for sent mail: the images travel as CID parts (see MessageSender)
+CID_SIGNATURE_URLS = ("cid:signature_christian", "cid:signature_victor")
+
 
 def inject_signature(html: str, alias: str, signature_url_christian: str, signature_url_victor: str) -> str:
     """
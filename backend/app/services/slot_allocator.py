@@ -0,0 +1,208 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.sending_policy import SENDING_POLICY, COMPILED_POLICY, CompiledSendingPolicy
+
+SlotKey = Tuple[str, int]  # (lead_id, mail_number)
+
+# Workdays are numbered from this (weekend) date; any date before all campaigns works
+_EPOCH = date(2000, 1, 1)
+
+
+class SlotAllocator:
+    """
+    Assigns every (lead, mail_number) a concrete send slot per domain.
+    - Slots are numbered linearly: workday_number * daily_cap + slot_index
+    - Days fill up to daily_cap_per_domain, overflow spills to the next free slot
+    - "Next free slot" is a union-find with path compression (near O(1) per message)
+    - Occupied slots are indexed per domain and per campaign for incremental release;
+      a release only re-links the occupied run in front of each freed slot
+    """
+
+    def __init__(self, policy: CompiledSendingPolicy = COMPILED_POLICY, daily_cap: Optional[int] = None):
+        self.policy = policy
+        self.daily_cap = min(daily_cap or SENDING_POLICY.daily_cap_per_domain, policy.slots_per_day)
+
+        self._next_free: Dict[str, Dict[int, int]] = {}              # domain -> slot -> next candidate
+        self._occupied: Dict[str, Dict[int, Tuple[str, SlotKey]]] = {}  # domain -> slot -> (campaign_id, key)
+        self._campaign_slots: Dict[str, Dict[SlotKey, int]] = {}     # campaign_id -> key -> slot
+        self._campaign_domain: Dict[str, str] = {}
+        self._days: Dict[int, date] = {}                             # workday number -> date
+
+    def allocate_campaign(
+        self,
+        campaign_id: str,
+        domain: str,
+        lead_ids: List[str],
+        start_at: datetime,
+        offsets: Dict[int, int]
+    ) -> Dict[SlotKey, datetime]:
+        """Allocate slots for all leads of a campaign in one pass.
+
+        offsets maps mail_number -> workdays after the first mail. Each lead's
+        follow-ups are placed at the same time of day, offset workdays after
+        that lead's first mail, or the next free slot after that.
+        """
+        steps = sorted(offsets.items(), key=lambda item: item[1])
+        base_offset = steps[0][1] if steps else 0
+        parent = self._next_free.setdefault(domain, {})
+        occupied = self._occupied.setdefault(domain, {})
+        slots = self._campaign_slots.setdefault(campaign_id, {})
+        self._campaign_domain[campaign_id] = domain
+
+        cap = self.daily_cap
+        start = self._start_slot(start_at)
+        result: Dict[SlotKey, datetime] = {}
+
+        for lead_id in lead_ids:
+            first = None
+            for mail_number, offset in steps:
+                wanted = start if first is None else first + (offset - base_offset) * cap
+                slot = self._find(parent, wanted)
+                if first is None:
+                    first = slot
+                    # Follow-ups start at the same time of day as the first mail
+                    start = slot
+                key = (lead_id, mail_number)
+                self._occupy(parent, occupied, slot, campaign_id, key)
+                slots[key] = slot
+                result[key] = self.slot_to_datetime(slot)
+
+        return result
+
+    def reallocate(
+        self,
+        campaign_id: str,
+        keys: Iterable[SlotKey],
+        earliest: datetime
+    ) -> Dict[SlotKey, datetime]:
+        """Move already-allocated messages to the first free slots at or after earliest (in order)."""
+        domain = self._campaign_domain[campaign_id]
+        occupied = self._occupied[domain]
+        slots = self._campaign_slots[campaign_id]
+
+        keys = list(keys)
+        self._free(domain, [slots.pop(key) for key in keys if key in slots])
+        parent = self._next_free[domain]
+
+        wanted = self._start_slot(earliest)
+        result: Dict[SlotKey, datetime] = {}
+        for key in keys:
+            slot = self._find(parent, wanted)
+            self._occupy(parent, occupied, slot, campaign_id, key)
+            slots[key] = slot
+            result[key] = self.slot_to_datetime(slot)
+            wanted = slot
+        return result
+
+    def release_campaign(self, campaign_id: str) -> int:
+        """Free all slots held by campaign. Returns number of slots released."""
+        slots = self._campaign_slots.pop(campaign_id, {})
+        domain = self._campaign_domain.pop(campaign_id, None)
+        if domain is None:
+            return 0
+
+        self._free(domain, slots.values())
+        return len(slots)
+
+    def release(self, campaign_id: str, keys: Iterable[SlotKey]) -> int:
+        """Free slots for specific messages (e.g. stopped lead). Returns number released."""
+        slots = self._campaign_slots.get(campaign_id)
+        domain = self._campaign_domain.get(campaign_id)
+        if not slots or domain is None:
+            return 0
+
+        freed = [slots.pop(key) for key in keys if key in slots]
+        self._free(domain, freed)
+        return len(freed)
+
+    def daily_load(self, domain: str) -> Dict[date, int]:
+        """Occupied slot count per day for domain."""
+        load: Dict[date, int] = {}
+        for slot in self._occupied.get(domain, {}):
+            day = self._day(slot // self.daily_cap)
+            load[day] = load.get(day, 0) + 1
+        return load
+
+    def plan_daily_counts(
+        self,
+        domain: str,
+        lead_count: int,
+        start_at: datetime,
+        offsets: Dict[int, int]
+    ) -> Dict[date, int]:
+        """Count messages per day for lead_count leads without recording them (dry run)."""
+        steps = sorted(offsets.values())
+        base_offset = steps[0] if steps else 0
+        parent = dict(self._next_free.get(domain, {}))
+        cap = self.daily_cap
+        start = self._start_slot(start_at)
+
+        per_workday: Dict[int, int] = {}
+        for _ in range(lead_count):
+            first = None
+            for offset in steps:
+                wanted = start if first is None else first + (offset - base_offset) * cap
+                slot = self._find(parent, wanted)
+                if first is None:
+                    first = start = slot
+                parent[slot] = slot + 1
+                workday = slot // cap
+                per_workday[workday] = per_workday.get(workday, 0) + 1
+
+        return {self._day(workday): count for workday, count in per_workday.items()}
+
+    def slot_to_datetime(self, slot: int) -> datetime:
+        """Local datetime for a linear slot number."""
+        workday, index = divmod(slot, self.daily_cap)
+        return self.policy.slot_datetime(self._day(workday), index)
+
+    def _start_slot(self, start_at: datetime) -> int:
+        """Linear slot number of the first usable slot at or after start_at."""
+        day, index = self.policy.next_slot_position(start_at)
+        if index >= self.daily_cap:
+            day, index = self.policy.calendar.add_workdays(day, 1), 0
+        workday = self.policy.calendar.workdays_between(_EPOCH, day)
+        self._days.setdefault(workday, day)
+        return workday * self.daily_cap + index
+
+    def _day(self, workday: int) -> date:
+        day = self._days.get(workday)
+        if day is None:
+            day = self.policy.calendar.add_workdays(_EPOCH, workday)
+            self._days[workday] = day
+        return day
+
+    def _occupy(self, parent: Dict[int, int], occupied: Dict, slot: int, campaign_id: str, key: SlotKey) -> None:
+        parent[slot] = slot + 1
+        occupied[slot] = (campaign_id, key)
+
+    def _free(self, domain: str, freed: Iterable[int]) -> None:
+        """Reopen released slots, touching only the pointers that could skip them.
+
+        A pointer only jumps over occupied slots, so just the occupied run right in
+        front of a freed slot can point past it; those pointers are re-linked to the
+        freed slot, which is a root again (free slots have no pointer).
+        """
+        parent = self._next_free[domain]
+        occupied = self._occupied[domain]
+        freed = list(freed)
+        for slot in freed:
+            occupied.pop(slot, None)
+            parent.pop(slot, None)
+        for slot in freed:
+            before = slot - 1
+            while before in occupied:
+                if parent[before] > slot:
+                    parent[before] = slot
+                before -= 1
+
+    @staticmethod
+    def _find(parent: Dict[int, int], slot: int) -> int:
+        """First free slot at or after slot (with path compression)."""
+        root = slot
+        while root in parent:
+            root = parent[root]
+        while slot != root:
+            parent[slot], slot = root, parent[slot]
+        return root
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message as EmailMessage
+from typing import Dict, Hashable, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+
+PoolKey = Tuple[str, int, str]  # (host, port, user)
+
+# Errors that concern one message only; smtplib has already sent RSET, so the session stays usable
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP sessions kept alive and reused per (host, port, user).
+    - STARTTLS + LOGIN once per session instead of once per message
+    - Idle sessions are NOOP-checked before reuse; stale or dead ones are replaced
+    - Reconnects once on SMTPServerDisconnected
+    - At most max_per_domain sessions in use per sending domain, also when domains share
+      one login (without a domain the cap applies per (host, port, user))
+    - Blocking smtplib calls run on a dedicated thread pool, never on the event loop
+    - send_async waits for its domain's slot on the event loop, so pool threads only run
+      sends that can proceed and a capped domain never starves the others of workers
+    """
+
+    def __init__(
+        self,
+        max_per_domain: int = 2,
+        max_idle_seconds: float = 240.0,
+        timeout: float = 30.0,
+        acquire_timeout: float = 60.0,
+        workers: int = 8
+    ):
+        self.max_per_domain = max_per_domain
+        self.max_idle_seconds = max_idle_seconds
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self._idle: Dict[PoolKey, List[Tuple[smtplib.SMTP, float]]] = {}  # key -> [(session, returned_at)]
+        self._slots: Dict[Hashable, threading.BoundedSemaphore] = {}  # sending domain (or key) -> cap
+        self._gates: WeakKeyDictionary = WeakKeyDictionary()  # event loop -> {sending domain (or key) -> asyncio cap}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def send_async(self, host: str, port: int, user: str, password: str, msg: EmailMessage,
+                         domain: Optional[str] = None) -> None:
+        """Send msg on the SMTP thread pool once its domain has a free slot (raises smtplib errors like send())."""
+        loop = asyncio.get_running_loop()
+        gate = self._gate(loop, domain or (host, port, user))
+        try:
+            await asyncio.wait_for(gate.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise self._exhausted(host, domain or user) from None
+
+        # Free the gate when the thread is done, not when the awaiting task is cancelled
+        future = self._get_executor().submit(self.send, host, port, user, password, msg, domain)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(gate.release))
+        await asyncio.wrap_future(future, loop=loop)
+
+    def send(self, host: str, port: int, user: str, password: str, msg: EmailMessage,
+             domain: Optional[str] = None) -> None:
+        """Send msg over a pooled session (blocking); domain is the sending domain the cap counts against."""
+        key = (host, port, user)
+        slot = self._slot(domain or key)
+        for attempt in (1, 2):
+            server = self._checkout(key, password, slot, domain or user)
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(server, slot)
+                if attempt == 2:
+                    raise
+                logger.info(f"SMTP session to {host} for {user} dropped, reconnecting")
+                continue
+            except _MESSAGE_ERRORS:
+                self._checkin(key, server, slot)
+                raise
+            except BaseException:
+                self._discard(server, slot)
+                raise
+            self._checkin(key, server, slot)
+            return
+
+    def idle_count(self, host: str, port: int, user: str) -> int:
+        with self._lock:
+            return len(self._idle.get((host, port, user), []))
+
+    def close_all(self) -> None:
+        """Quit all idle sessions and stop the thread pool."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            executor, self._executor = self._executor, None
+        for sessions in idle.values():
+            for server, _ in sessions:
+                self._quit(server)
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _checkout(self, key: PoolKey, password: str, slot: threading.BoundedSemaphore, owner: str) -> smtplib.SMTP:
+        if not slot.acquire(timeout=self.acquire_timeout):
+            raise self._exhausted(key[0], owner)
+
+        try:
+            while True:
+                with self._lock:
+                    sessions = self._idle.get(key)
+                    server, returned_at = sessions.pop() if sessions else (None, 0.0)
+                if server is None:
+                    return self._connect(key, password)
+                if time.monotonic() - returned_at <= self.max_idle_seconds and self._is_alive(server):
+                    return server
+                self._quit(server)
+        except BaseException:
+            slot.release()
+            raise
+
+    def _checkin(self, key: PoolKey, server: smtplib.SMTP, slot: threading.BoundedSemaphore) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append((server, time.monotonic()))
+        slot.release()
+
+    def _discard(self, server: smtplib.SMTP, slot: threading.BoundedSemaphore) -> None:
+        self._quit(server)
+        slot.release()
+
+    def _connect(self, key: PoolKey, password: str) -> smtplib.SMTP:
+        host, port, user = key
+        logger.debug(f"Opening SMTP session to {host}:{port} as {user}")
+        server = smtplib.SMTP(host, port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(user, password)
+        except BaseException:
+            self._quit(server)
+            raise
+        return server
+
+    def _slot(self, cap_key: Hashable) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(cap_key)
+            if slot is None:
+                slot = self._slots[cap_key] = threading.BoundedSemaphore(self.max_per_domain)
+            return slot
+
+    def _gate(self, loop: asyncio.AbstractEventLoop, cap_key: Hashable) -> asyncio.Semaphore:
+        # asyncio primitives are bound to one loop; the sync slot still guards plain send() callers
+        with self._lock:
+            gates = self._gates.setdefault(loop, {})
+            gate = gates.get(cap_key)
+            if gate is None:
+                gate = gates[cap_key] = asyncio.Semaphore(self.max_per_domain)
+            return gate
+
+    def _exhausted(self, host: str, owner: str) -> smtplib.SMTPException:
+        return smtplib.SMTPException(f"No SMTP session available for {owner} via {host} (pool limit {self.max_per_domain})")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="smtp")
+            return self._executor
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                server.close()
+            except OSError:
+                pass
+
+
+# Global pool instance (shared by all MessageSender instances)
+smtp_pool = SMTPConnectionPool(
+    max_per_domain=int(os.getenv("SMTP_POOL_MAX_PER_DOMAIN", "2")),
+    max_idle_seconds=float(os.getenv("SMTP_POOL_MAX_IDLE_SECONDS", "240")),
+    workers=int(os.getenv("SMTP_POOL_WORKERS", "8"))
+)
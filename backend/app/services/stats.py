@@ -1,23 +1,68 @@
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional, Tuple
-from collections import defaultdict
+from datetime import date
+from typing import Callable, Dict, List, Optional
 import csv
 import io
 
-from app.models.campaign import Message, Campaign, MessageStatus
+from app.models.campaign import Message, Campaign
 from app.schemas.stats import (
     StatsSummary, GlobalStats, DomainStats, CampaignStats, 
     TimelineData, TimelinePoint
 )
+from app.services.stats_aggregator import StatsAggregator
 
 
 class StatsService:
+    """
+    Stats summary and CSV exports, read from pre-aggregated buckets (StatsAggregator)
+    - Fed by message store listeners (attach) or by assigning messages directly
+    - Summary, domain, campaign and timeline views cost O(buckets), not O(messages)
+    - Campaign details are looked up by id in the attached stores
+    """
+
     def __init__(self):
         # In-memory stores (MVP)
-        self.messages: List[Message] = []
-        self.campaigns: List[Campaign] = []
-    
-    
+        self.aggregator = StatsAggregator()
+        self._campaigns: Dict[str, Campaign] = {}
+        self._campaign_lookups: List[Callable[[str], Optional[Campaign]]] = []
+
+    @property
+    def messages(self) -> List[Message]:
+        return self.aggregator.messages
+
+    @messages.setter
+    def messages(self, messages: List[Message]) -> None:
+        self.aggregator = StatsAggregator()
+        for msg in messages:
+            self.aggregator.record(msg)
+
+    @property
+    def campaigns(self) -> List[Campaign]:
+        return list(self._campaigns.values())
+
+    @campaigns.setter
+    def campaigns(self, campaigns: List[Campaign]) -> None:
+        self._campaigns = {c.id: c for c in campaigns}
+
+    def attach(self, campaign_store) -> None:
+        """Aggregate the store's messages and keep the buckets current via its message listener"""
+        campaign_store.add_message_listener(self.record_message)
+        self._campaign_lookups.append(campaign_store.get_campaign)
+        for msg in campaign_store.get_all_messages():
+            self.record_message(msg)
+
+    def record_message(self, msg: Message) -> None:
+        """Hook for message stores: apply a message transition to the buckets"""
+        self.aggregator.record(msg)
+
+    def _get_campaign(self, campaign_id: str) -> Optional[Campaign]:
+        if campaign_id in self._campaigns:
+            return self._campaigns[campaign_id]
+        for lookup in self._campaign_lookups:
+            campaign = lookup(campaign_id)
+            if campaign is not None:
+                return campaign
+        return None
+
     def get_stats_summary(
         self, 
         from_date: Optional[date] = None,
@@ -25,56 +70,16 @@ class StatsService:
         template_id: Optional[str] = None
     ) -> StatsSummary:
         """Get comprehensive stats summary"""
-        
-        # Filter messages by date range
-        filtered_messages = self._filter_messages_by_date(from_date, to_date)
-        
-        # Calculate global stats
-        global_stats = self._calculate_global_stats(filtered_messages)
-        
-        # Calculate domain stats
-        domain_stats = self._calculate_domain_stats(filtered_messages)
-        
-        # Calculate campaign stats
-        campaign_stats = self._calculate_campaign_stats(filtered_messages)
-        
-        # Calculate timeline data
-        timeline = self._calculate_timeline(filtered_messages)
-        
         return StatsSummary(
-            global_stats=global_stats,
-            domains=domain_stats,
-            campaigns=campaign_stats,
-            timeline=timeline
+            global_stats=self._calculate_global_stats(from_date, to_date),
+            domains=self._calculate_domain_stats(from_date, to_date),
+            campaigns=self._calculate_campaign_stats(from_date, to_date),
+            timeline=self._calculate_timeline(from_date, to_date)
         )
     
-    def _filter_messages_by_date(
-        self, 
-        from_date: Optional[date], 
-        to_date: Optional[date]
-    ) -> List[Message]:
-        """Filter messages by date range"""
-        if not from_date and not to_date:
-            return self.messages
-        
-        filtered = []
-        for msg in self.messages:
-            msg_date = msg.sent_at.date() if msg.sent_at else msg.created_at.date()
-            
-            if from_date and msg_date < from_date:
-                continue
-            if to_date and msg_date > to_date:
-                continue
-                
-            filtered.append(msg)
-        
-        return filtered
-    
-    def _calculate_global_stats(self, messages: List[Message]) -> GlobalStats:
+    def _calculate_global_stats(self, from_date: Optional[date], to_date: Optional[date]) -> GlobalStats:
         """Calculate global KPIs"""
-        total_sent = sum(1 for msg in messages if msg.status == MessageStatus.sent)
-        total_opens = sum(1 for msg in messages if msg.open_at is not None)
-        bounces = sum(1 for msg in messages if msg.status == MessageStatus.bounced)
+        _, total_sent, total_opens, bounces = self.aggregator.totals(from_date, to_date)
         
         open_rate = (total_opens / total_sent) if total_sent > 0 else 0.0
         
@@ -85,85 +90,44 @@ class StatsService:
             bounces=bounces
         )
     
-    def _calculate_domain_stats(self, messages: List[Message]) -> List[DomainStats]:
+    def _calculate_domain_stats(self, from_date: Optional[date], to_date: Optional[date]) -> List[DomainStats]:
         """Calculate per-domain statistics"""
-        domain_data = defaultdict(lambda: {
-            'sent': 0, 'opens': 0, 'bounces': 0, 'last_activity': None
-        })
-        
-        for msg in messages:
-            domain = msg.domain_used
-            
-            if msg.status == MessageStatus.sent:
-                domain_data[domain]['sent'] += 1
-                
-            if msg.open_at:
-                domain_data[domain]['opens'] += 1
-                
-            if msg.status == MessageStatus.bounced:
-                domain_data[domain]['bounces'] += 1
-            
-            # Track last activity
-            activity_time = msg.open_at or msg.sent_at or msg.created_at
-            if activity_time:
-                current_last = domain_data[domain]['last_activity']
-                if not current_last or activity_time > current_last:
-                    domain_data[domain]['last_activity'] = activity_time
-        
-        # Convert to DomainStats objects
         stats = []
-        for domain, data in domain_data.items():
-            open_rate = (data['opens'] / data['sent']) if data['sent'] > 0 else 0.0
-            last_activity = data['last_activity'].isoformat() if data['last_activity'] else None
+        for domain, (_, sent, opens, bounces) in self.aggregator.scope_totals('domain', from_date, to_date):
+            open_rate = (opens / sent) if sent > 0 else 0.0
+            last_activity = self.aggregator.last_activity(domain, from_date, to_date)
             
             stats.append(DomainStats(
                 domain=domain,
-                sent=data['sent'],
-                opens=data['opens'],
+                sent=sent,
+                opens=opens,
                 open_rate=round(open_rate, 3),
-                bounces=data['bounces'],
-                last_activity=last_activity
+                bounces=bounces,
+                last_activity=last_activity.isoformat() if last_activity else None
             ))
         
         # Sort by sent count descending
         return sorted(stats, key=lambda x: x.sent, reverse=True)
     
-    def _calculate_campaign_stats(self, messages: List[Message]) -> List[CampaignStats]:
+    def _calculate_campaign_stats(self, from_date: Optional[date], to_date: Optional[date]) -> List[CampaignStats]:
         """Calculate per-campaign statistics"""
-        campaign_data = defaultdict(lambda: {
-            'sent': 0, 'opens': 0, 'bounces': 0
-        })
-        
-        for msg in messages:
-            campaign_id = msg.campaign_id
-            
-            if msg.status == MessageStatus.sent:
-                campaign_data[campaign_id]['sent'] += 1
-                
-            if msg.open_at:
-                campaign_data[campaign_id]['opens'] += 1
-                
-            if msg.status == MessageStatus.bounced:
-                campaign_data[campaign_id]['bounces'] += 1
-        
-        # Convert to CampaignStats objects
         stats = []
-        for campaign_id, data in campaign_data.items():
+        for campaign_id, (_, sent, opens, bounces) in self.aggregator.scope_totals('campaign', from_date, to_date):
             # Find campaign details
-            campaign = next((c for c in self.campaigns if c.id == campaign_id), None)
+            campaign = self._get_campaign(campaign_id)
             campaign_name = campaign.name if campaign else f"Campaign {campaign_id}"
             campaign_status = campaign.status if campaign else "unknown"
             start_date = campaign.created_at.date().isoformat() if campaign else None
             
-            open_rate = (data['opens'] / data['sent']) if data['sent'] > 0 else 0.0
+            open_rate = (opens / sent) if sent > 0 else 0.0
             
             stats.append(CampaignStats(
                 id=campaign_id,
                 name=campaign_name,
-                sent=data['sent'],
-                opens=data['opens'],
+                sent=sent,
+                opens=opens,
                 open_rate=round(open_rate, 3),
-                bounces=data['bounces'],
+                bounces=bounces,
                 status=campaign_status,
                 start_date=start_date
             ))
@@ -171,25 +135,14 @@ class StatsService:
         # Sort by sent count descending
         return sorted(stats, key=lambda x: x.sent, reverse=True)
     
-    def _calculate_timeline(self, messages: List[Message]) -> TimelineData:
+    def _calculate_timeline(self, from_date: Optional[date], to_date: Optional[date]) -> TimelineData:
         """Calculate daily timeline data"""
-        daily_sent = defaultdict(int)
-        daily_opens = defaultdict(int)
-        
-        for msg in messages:
-            # Count sent messages by date
-            if msg.sent_at:
-                sent_date = msg.sent_at.date().isoformat()
-                daily_sent[sent_date] += 1
-            
-            # Count opens by date
-            if msg.open_at:
-                open_date = msg.open_at.date().isoformat()
-                daily_opens[open_date] += 1
+        events = self.aggregator.events(from_date, to_date)
+        daily_sent = events['sent']
+        daily_opens = events['opens']
         
         # Get all dates and sort
-        all_dates = set(daily_sent.keys()) | set(daily_opens.keys())
-        sorted_dates = sorted(all_dates)
+        sorted_dates = sorted(set(daily_sent) | set(daily_opens))
         
         # Create timeline points
         timeline_points = []
@@ -214,18 +167,16 @@ class StatsService:
     ) -> str:
         """Export statistics as CSV"""
         
-        filtered_messages = self._filter_messages_by_date(from_date, to_date)
-        
         if scope == "global":
-            return self._export_global_csv(filtered_messages)
+            return self._export_global_csv(from_date, to_date)
         elif scope == "domain":
-            return self._export_domain_csv(filtered_messages, entity_id)
+            return self._export_domain_csv(from_date, to_date, entity_id)
         elif scope == "campaign":
-            return self._export_campaign_csv(filtered_messages, entity_id)
+            return self._export_campaign_csv(from_date, to_date, entity_id)
         else:
             raise ValueError(f"Invalid export scope: {scope}")
     
-    def _export_global_csv(self, messages: List[Message]) -> str:
+    def _export_global_csv(self, from_date: Optional[date], to_date: Optional[date]) -> str:
         """Export global stats as CSV"""
         output = io.StringIO()
         writer = csv.writer(output)
@@ -234,14 +185,8 @@ class StatsService:
         writer.writerow(['Date', 'Sent', 'Opens', 'Bounces', 'Open_Rate'])
         
         # Daily data
-        timeline = self._calculate_timeline(messages)
-        daily_bounces = defaultdict(int)
-        
-        # Calculate daily bounces
-        for msg in messages:
-            if msg.status == MessageStatus.bounced:
-                bounce_date = (msg.created_at.date() if msg.created_at else date.today()).isoformat()
-                daily_bounces[bounce_date] += 1
+        timeline = self._calculate_timeline(from_date, to_date)
+        daily_bounces = self.aggregator.events(from_date, to_date)['bounces']
         
         for point in timeline.sent_by_day:
             bounces = daily_bounces.get(point.date, 0)
@@ -257,7 +202,8 @@ class StatsService:
         
         return output.getvalue()
     
-    def _export_domain_csv(self, messages: List[Message], domain_filter: Optional[str]) -> str:
+    def _export_domain_csv(self, from_date: Optional[date], to_date: Optional[date],
+                           domain_filter: Optional[str]) -> str:
         """Export domain stats as CSV"""
         output = io.StringIO()
         writer = csv.writer(output)
@@ -265,7 +211,7 @@ class StatsService:
         # Headers
         writer.writerow(['Domain', 'Sent', 'Opens', 'Open_Rate', 'Bounces', 'Last_Activity'])
         
-        domain_stats = self._calculate_domain_stats(messages)
+        domain_stats = self._calculate_domain_stats(from_date, to_date)
         
         for stat in domain_stats:
             if domain_filter and stat.domain != domain_filter:
@@ -282,7 +228,8 @@ class StatsService:
         
         return output.getvalue()
     
-    def _export_campaign_csv(self, messages: List[Message], campaign_filter: Optional[str]) -> str:
+    def _export_campaign_csv(self, from_date: Optional[date], to_date: Optional[date],
+                             campaign_filter: Optional[str]) -> str:
         """Export campaign stats as CSV"""
         output = io.StringIO()
         writer = csv.writer(output)
@@ -290,7 +237,7 @@ class StatsService:
         # Headers
         writer.writerow(['Campaign_ID', 'Campaign_Name', 'Sent', 'Opens', 'Open_Rate', 'Bounces', 'Status', 'Start_Date'])
         
-        campaign_stats = self._calculate_campaign_stats(messages)
+        campaign_stats = self._calculate_campaign_stats(from_date, to_date)
         
         for stat in campaign_stats:
             if campaign_filter and stat.id != campaign_filter:
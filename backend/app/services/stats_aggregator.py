@@ -0,0 +1,173 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.models.campaign import Message, MessageStatus
+
+# Counter layout per bucket: messages, sent, opens, bounces
+Counts = Tuple[int, int, int, int]
+_ZERO: Counts = (0, 0, 0, 0)
+_GLOBAL = ('global', '')
+
+
+class _Snapshot(NamedTuple):
+    """What a message contributed to the buckets at its last transition"""
+    day: date  # range key: sent date, else creation date
+    domain: str
+    campaign_id: str
+    counts: Counts
+    events: Tuple[Tuple[str, str], ...]  # (sent|opens|bounces, ISO date) for the timeline
+    activity: Optional[datetime]
+
+
+def _snapshot(msg: Message) -> _Snapshot:
+    sent_at = msg.sent_at
+    bounced = msg.status == MessageStatus.bounced
+    events = []
+    if sent_at:
+        events.append(('sent', sent_at.date().isoformat()))
+    if msg.open_at:
+        events.append(('opens', msg.open_at.date().isoformat()))
+    if bounced:
+        events.append(('bounces', (msg.created_at.date() if msg.created_at else date.today()).isoformat()))
+
+    return _Snapshot(
+        day=sent_at.date() if sent_at else msg.created_at.date(),
+        domain=msg.domain_used,
+        campaign_id=msg.campaign_id,
+        counts=(1, int(msg.status == MessageStatus.sent), int(msg.open_at is not None), int(bounced)),
+        events=tuple(events),
+        activity=msg.open_at or sent_at or msg.created_at
+    )
+
+
+class StatsAggregator:
+    """
+    Incremental counters behind the stats endpoints
+    - Every message write (queued -> sent -> opened/bounced) replaces the message's previous
+      contribution, so buckets never need a pass over all messages
+    - Buckets per day for the global, domain and campaign scopes; date ranges are answered
+      from prefix sums over the sorted day buckets
+    - Prefix sums are rebuilt lazily, only for the scopes a transition touched
+    - Timeline points and domain last activity come from the day buckets inside the range
+    """
+
+    def __init__(self):
+        self._messages: Dict[str, Message] = {}
+        self._snapshots: Dict[str, _Snapshot] = {}
+        # (scope, name) -> day -> counts
+        self._series: Dict[Tuple[str, str], Dict[date, Counts]] = defaultdict(dict)
+        # domain -> day -> latest activity (open, send or creation time)
+        self._activity: Dict[str, Dict[date, datetime]] = defaultdict(dict)
+        # day -> Counter of (event, ISO date)
+        self._events: Dict[date, Counter] = defaultdict(Counter)
+        # (scope, name) -> (sorted days, running totals)
+        self._prefix: Dict[Tuple[str, str], Tuple[List[date], List[Counts]]] = {}
+
+    @property
+    def messages(self) -> List[Message]:
+        return list(self._messages.values())
+
+    def record(self, msg: Message) -> None:
+        """Hook for message stores: a message was created, saved or changed status"""
+        snapshot = _snapshot(msg)
+        previous = self._snapshots.get(msg.id)
+        self._messages[msg.id] = msg
+        if previous == snapshot:
+            return
+        if previous is not None:
+            self._apply(previous, -1)
+        self._apply(snapshot, 1)
+        self._snapshots[msg.id] = snapshot
+
+    def remove(self, message_id: str) -> None:
+        self._messages.pop(message_id, None)
+        previous = self._snapshots.pop(message_id, None)
+        if previous is not None:
+            self._apply(previous, -1)
+
+    def _apply(self, snapshot: _Snapshot, sign: int) -> None:
+        for key in (_GLOBAL, ('domain', snapshot.domain), ('campaign', snapshot.campaign_id)):
+            series = self._series[key]
+            counts = tuple(a + sign * b for a, b in zip(series.get(snapshot.day, _ZERO), snapshot.counts))
+            if counts[0]:
+                series[snapshot.day] = counts
+            else:
+                series.pop(snapshot.day, None)
+                if not series:
+                    del self._series[key]
+            self._prefix.pop(key, None)
+
+        activity = self._activity[snapshot.domain]
+        if snapshot.day not in self._series.get(('domain', snapshot.domain), {}):
+            activity.pop(snapshot.day, None)
+        elif sign > 0 and snapshot.activity and (snapshot.day not in activity or snapshot.activity > activity[snapshot.day]):
+            # Activity only moves forward per message, so the maximum is kept rather than recomputed
+            activity[snapshot.day] = snapshot.activity
+        if not activity:
+            del self._activity[snapshot.domain]
+
+        events = self._events[snapshot.day]
+        for event in snapshot.events:
+            events[event] += sign
+            if not events[event]:
+                del events[event]
+        if not events:
+            del self._events[snapshot.day]
+
+    def _prefix_for(self, key: Tuple[str, str]) -> Tuple[List[date], List[Counts]]:
+        cached = self._prefix.get(key)
+        if cached is None:
+            days = sorted(self._series.get(key, {}))
+            totals, running = [], _ZERO
+            for day in days:
+                running = tuple(a + b for a, b in zip(running, self._series[key][day]))
+                totals.append(running)
+            cached = self._prefix[key] = (days, totals)
+        return cached
+
+    @staticmethod
+    def _bounds(days: List[date], from_date: Optional[date], to_date: Optional[date]) -> Tuple[int, int]:
+        lo = bisect_left(days, from_date) if from_date else 0
+        hi = bisect_right(days, to_date) if to_date else len(days)
+        return lo, hi
+
+    def _range(self, key: Tuple[str, str], from_date: Optional[date], to_date: Optional[date]) -> Counts:
+        days, totals = self._prefix_for(key)
+        lo, hi = self._bounds(days, from_date, to_date)
+        if lo >= hi:
+            return _ZERO
+        before = totals[lo - 1] if lo else _ZERO
+        return tuple(a - b for a, b in zip(totals[hi - 1], before))
+
+    def totals(self, from_date: Optional[date] = None, to_date: Optional[date] = None) -> Counts:
+        """Counts for all messages in the range"""
+        return self._range(_GLOBAL, from_date, to_date)
+
+    def scope_totals(self, scope: str, from_date: Optional[date] = None,
+                     to_date: Optional[date] = None) -> Iterator[Tuple[str, Counts]]:
+        """(name, counts) per domain or campaign with messages in the range"""
+        for key in list(self._series):
+            if key[0] != scope:
+                continue
+            counts = self._range(key, from_date, to_date)
+            if counts[0]:
+                yield key[1], counts
+
+    def last_activity(self, domain: str, from_date: Optional[date] = None,
+                      to_date: Optional[date] = None) -> Optional[datetime]:
+        activity = self._activity.get(domain, {})
+        days, _ = self._prefix_for(('domain', domain))
+        lo, hi = self._bounds(days, from_date, to_date)
+        return max((activity[day] for day in days[lo:hi] if day in activity), default=None)
+
+    def events(self, from_date: Optional[date] = None, to_date: Optional[date] = None) -> Dict[str, Counter]:
+        """Timeline counts per event date: {'sent': Counter(date -> n), 'opens': ..., 'bounces': ...}"""
+        days, _ = self._prefix_for(_GLOBAL)
+        lo, hi = self._bounds(days, from_date, to_date)
+        timeline = {'sent': Counter(), 'opens': Counter(), 'bounces': Counter()}
+        for day in days[lo:hi]:
+            for (event, event_date), count in self._events.get(day, {}).items():
+                timeline[event][event_date] += count
+        return timeline
@@ -77,8 +77,10 @@ except Exception as e:
 # REPORTS STORE - TODO: Create DBReportsStore
 # ============================================================================
 try:
-    from app.services.reports_store import ReportsStore
-    reports_store = ReportsStore()
+    # Shared with lead enrichment so bound reports show up everywhere
+    from app.services.reports_store import reports_store
+    if hasattr(leads_store, 'set_report_bound'):
+        reports_store.add_link_listener(leads_store.set_report_bound)
     if USE_DB:
         logger.warning("⚠️  DBReportsStore not implemented yet, using in-memory ReportsStore")
     else:
@@ -0,0 +1,251 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+TOKEN_PATTERN = re.compile(r'\{\{\s*([^}]+)\s*\}\}')
+_CID_PATTERN = re.compile(r"image\.cid\s+['\"]([^'\"]+)['\"]")
+_URL_PATTERN = re.compile(r"image\.url\s+['\"]([^'\"]+)['\"]")
+_DEFAULT_PATTERN = re.compile(r"default\s+['\"]([^'\"]+)['\"]")
+
+Resolver = Callable[[Dict[str, Any], List[str]], Any]
+
+
+@dataclass(frozen=True)
+class Token:
+    """One {{ ... }} occurrence, resolved to an accessor at compile time."""
+    var: str          # Stripped inner text, e.g. "lead.company" or "vars.x|default 'y'"
+    raw: str          # Exact source text including braces
+    resolve: Resolver
+
+
+class CompiledTemplate:
+    """
+    Template parsed once into literal chunks and tokens.
+    - Accessors and helper pipelines are built at compile time (no regex per render)
+    - render() is a single pass plus one ''.join
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        parts: List[Union[str, Token]] = []
+        pos = 0
+        for match in TOKEN_PATTERN.finditer(source):
+            if match.start() > pos:
+                parts.append(source[pos:match.start()])
+            var = match.group(1).strip()
+            parts.append(Token(var=var, raw=match.group(0), resolve=_compile_variable(var)))
+            pos = match.end()
+        if pos < len(source):
+            parts.append(source[pos:])
+
+        self.parts: Tuple[Union[str, Token], ...] = tuple(parts)
+        self.variables: List[str] = [p.var for p in self.parts if isinstance(p, Token)]
+
+    def render(self, context: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """Render with context, return (rendered_text, warnings)."""
+        warnings: List[str] = []
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            try:
+                value = part.resolve(context, warnings)
+                out.append(str(value) if value is not None else '')
+            except Exception as e:
+                warnings.append(f"Error processing variable '{part.var}': {str(e)}")
+        return ''.join(out), warnings
+
+    def substitute(self, variables: Dict[str, Any]) -> str:
+        """Replace tokens whose inner text is a key of variables; leave others as written."""
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part.var in variables:
+                out.append(str(variables[part.var]))
+            else:
+                out.append(part.raw)
+        return ''.join(out)
+
+
+class TemplateCache:
+    """
+    Compiled templates keyed by template id (checked against the source) or by content.
+    - Id entries are replaced when the template text changes
+    - Anonymous sources are kept in a bounded LRU keyed by the text itself
+    """
+
+    def __init__(self, max_anonymous: int = 256):
+        self.max_anonymous = max_anonymous
+        self._lock = threading.Lock()
+        self._by_id: Dict[str, CompiledTemplate] = {}
+        self._by_content: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+
+    def get(self, source: str, template_id: Optional[str] = None) -> CompiledTemplate:
+        with self._lock:
+            if template_id is not None:
+                compiled = self._by_id.get(template_id)
+                if compiled is not None and compiled.source == source:
+                    return compiled
+            else:
+                compiled = self._by_content.get(source)
+                if compiled is not None:
+                    self._by_content.move_to_end(source)
+                    return compiled
+
+        compiled = CompiledTemplate(source)
+
+        with self._lock:
+            if template_id is not None:
+                self._by_id[template_id] = compiled
+            else:
+                self._by_content[source] = compiled
+                if len(self._by_content) > self.max_anonymous:
+                    self._by_content.popitem(last=False)
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._by_id) + len(self._by_content)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._by_content.clear()
+
+
+def compile_template(source: str, template_id: Optional[str] = None) -> CompiledTemplate:
+    """Compiled form of source from the shared cache."""
+    return template_cache.get(source, template_id)
+
+
+def _compile_variable(var: str) -> Resolver:
+    """Build the accessor for one variable expression."""
+    if '|' in var:
+        return _compile_helpers(var)
+    if var.startswith('lead.'):
+        return _lead_accessor(var[len('lead.'):])
+    if var.startswith('vars.'):
+        return _vars_accessor(var[len('vars.'):])
+    if var.startswith('campaign.'):
+        return _campaign_accessor(var[len('campaign.'):])
+    if var.startswith('image.'):
+        return _image_accessor(var)
+
+    def context_value(context, warnings):
+        value = context.get(var, '')
+        if not value:
+            warnings.append(f"Variable '{var}' not found")
+        return value
+    return context_value
+
+
+def _lead_accessor(field: str) -> Resolver:
+    required = field in ('email', 'company')
+
+    def lead_value(context, warnings):
+        value = context.get('lead', {}).get(field, '')
+        if not value and required:
+            warnings.append(f"Required lead field '{field}' is missing")
+        return str(value) if value else ''
+    return lead_value
+
+
+def _vars_accessor(field: str) -> Resolver:
+    def vars_value(context, warnings):
+        value = context.get('vars', {}).get(field, '')
+        if not value:
+            warnings.append(f"Variable 'vars.{field}' not found in lead data")
+        return str(value) if value else ''
+    return vars_value
+
+
+def _campaign_accessor(field: str) -> Resolver:
+    def campaign_value(context, warnings):
+        value = context.get('campaign', {}).get(field, '')
+        if not value:
+            warnings.append(f"Campaign variable '{field}' not available")
+        return str(value) if value else ''
+    return campaign_value
+
+
+def _image_accessor(var: str) -> Resolver:
+    if 'image.cid' in var:
+        match = _CID_PATTERN.search(var)
+        if not match:
+            def invalid_cid(context, warnings):
+                warnings.append(f"Invalid image.cid syntax: {var}")
+                return "[IMAGE_ERROR]"
+            return invalid_cid
+
+        slot = match.group(1)
+        if slot == 'dashboard':
+            def dashboard_cid(context, warnings):
+                domain = context.get('domain', '')
+                if not domain:
+                    warnings.append("No domain provided for dashboard image")
+                    return ""
+                # Lazy import to avoid circular imports
+                from app.services.asset_resolver import asset_resolver
+                if asset_resolver.has_dashboard_image(domain):
+                    return f"cid:dashboard_{domain.replace('.', '_')}"
+                warnings.append(f"Dashboard image not found for domain: {domain}")
+                return ""  # Permissive: render without the image
+            return dashboard_cid
+
+        def lead_cid(context, warnings):
+            image_key = context.get('lead', {}).get('image_key', '')
+            if not image_key:
+                warnings.append(f"No image available for slot '{slot}'")
+                return f"[IMAGE_PLACEHOLDER_{slot.upper()}]"
+            return f"cid:{image_key}_{slot}"
+        return lead_cid
+
+    if 'image.url' in var:
+        match = _URL_PATTERN.search(var)
+        if not match:
+            def invalid_url(context, warnings):
+                warnings.append(f"Invalid image.url syntax: {var}")
+                return "[IMAGE_ERROR]"
+            return invalid_url
+        url = f"https://assets.example.com/{match.group(1)}.png"
+        return lambda context, warnings: url
+
+    return lambda context, warnings: "[IMAGE_ERROR]"
+
+
+def _compile_helpers(var: str) -> Resolver:
+    """value | default 'x' | uppercase | lowercase, parsed once."""
+    parts = [p.strip() for p in var.split('|')]
+    source = parts[0]
+    if source.startswith('lead.'):
+        initial = _lead_accessor(source[len('lead.'):])
+    elif source.startswith('vars.'):
+        initial = _vars_accessor(source[len('vars.'):])
+    else:
+        initial = lambda context, warnings: context.get(source, '')
+
+    pipeline: List[Callable[[Any], Any]] = []
+    for helper in parts[1:]:
+        if helper.startswith('default'):
+            match = _DEFAULT_PATTERN.search(helper)
+            if match:
+                fallback = match.group(1)
+                pipeline.append(lambda value, fallback=fallback: value or fallback)
+        elif helper == 'uppercase':
+            pipeline.append(lambda value: str(value).upper())
+        elif helper == 'lowercase':
+            pipeline.append(lambda value: str(value).lower())
+
+    def apply_helpers(context, warnings):
+        value = initial(context, warnings)
+        for step in pipeline:
+            value = step(value)
+        return str(value)
+    return apply_helpers
+
+
+# Global cache instance
+template_cache = TemplateCache()
@@ -113,32 +113,20 @@ def render_preview(template_id: str, lead_id: str, store: LeadsStore, mail_numbe
     
     # Add signature based on mail_number (for preview purposes)
     from app.services.signature_injector import inject_signature, get_alias_from_mail_number
-    import base64
-    from pathlib import Path
+    from app.services.asset_resolver import asset_resolver
     
     alias = get_alias_from_mail_number(mail_number)
     
-    # Load signatures as base64 data URLs for preview
+    # Signatures as cached base64 data URLs for preview
     try:
-        signature_dir = Path(__file__).parent.parent / "assets" / "signatures"
-        christian_path = signature_dir / "Christian Handtekening.png"
-        victor_path = signature_dir / "Victor Handtekening.png"
-        
-        # Load and encode Christian signature
-        if christian_path.exists():
-            with open(christian_path, 'rb') as f:
-                christian_data = base64.b64encode(f.read()).decode('utf-8')
-                christian_signature_url = f"data:image/png;base64,{christian_data}"
-        else:
-            christian_signature_url = "https://via.placeholder.com/300x100?text=Christian+Signature"
-        
-        # Load and encode Victor signature
-        if victor_path.exists():
-            with open(victor_path, 'rb') as f:
-                victor_data = base64.b64encode(f.read()).decode('utf-8')
-                victor_signature_url = f"data:image/png;base64,{victor_data}"
-        else:
-            victor_signature_url = "https://via.placeholder.com/300x100?text=Victor+Signature"
+        christian_signature_url = (
+            asset_resolver.get_signature_data_url("christian")
+            or "https://via.placeholder.com/300x100?text=Christian+Signature"
+        )
+        victor_signature_url = (
+            asset_resolver.get_signature_data_url("victor")
+            or "https://via.placeholder.com/300x100?text=Victor+Signature"
+        )
         
         html = inject_signature(html, alias, christian_signature_url, victor_signature_url)
     except Exception as e:
@@ -1,151 +1,22 @@
 import re
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from app.services.template_compiler import TOKEN_PATTERN, CompiledTemplate, compile_template
+
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
 
 class TemplateRenderer:
-    """Template rendering engine with variable interpolation"""
+    """Template rendering engine with variable interpolation (compiled templates, cached by content)"""
     
     def __init__(self):
-        self.variable_pattern = re.compile(r'\{\{\s*([^}]+)\s*\}\}')
+        self.variable_pattern = TOKEN_PATTERN
     
-    def render(self, template: str, context: Dict[str, Any]) -> tuple[str, List[str]]:
+    def render(self, template: str, context: Dict[str, Any], template_id: Optional[str] = None) -> tuple[str, List[str]]:
         """Render template with context, return (rendered_text, warnings)"""
-        warnings = []
-        rendered = template
-        
-        # Find all variables in template
-        variables = self.variable_pattern.findall(template)
-        
-        for var in variables:
-            var = var.strip()
-            placeholder = f"{{{{{var}}}}}"
-            
-            try:
-                # Handle different variable types
-                if var.startswith('lead.'):
-                    value = self._get_lead_value(var, context.get('lead', {}), warnings)
-                elif var.startswith('vars.'):
-                    value = self._get_vars_value(var, context.get('vars', {}), warnings)
-                elif var.startswith('campaign.'):
-                    value = self._get_campaign_value(var, context.get('campaign', {}), warnings)
-                elif var.startswith('image.'):
-                    value = self._get_image_value(var, context, warnings)
-                elif '|' in var:  # Helper functions
-                    value = self._apply_helper(var, context, warnings)
-                else:
-                    value = context.get(var, '')
-                    if not value:
-                        warnings.append(f"Variable '{var}' not found")
-                
-                rendered = rendered.replace(placeholder, str(value) if value is not None else '')
-                
-            except Exception as e:
-                warnings.append(f"Error processing variable '{var}': {str(e)}")
-                rendered = rendered.replace(placeholder, '')
-        
-        return rendered, warnings
-    
-    def _get_lead_value(self, var: str, lead: Dict[str, Any], warnings: List[str]) -> str:
-        """Get value from lead context"""
-        field = var.replace('lead.', '')
-        value = lead.get(field, '')
-        if not value and field in ['email', 'company']:
-            warnings.append(f"Required lead field '{field}' is missing")
-        return str(value) if value else ''
-    
-    def _get_vars_value(self, var: str, vars_dict: Dict[str, Any], warnings: List[str]) -> str:
-        """Get value from vars context"""
-        field = var.replace('vars.', '')
-        value = vars_dict.get(field, '')
-        if not value:
-            warnings.append(f"Variable 'vars.{field}' not found in lead data")
-        return str(value) if value else ''
-    
-    def _get_campaign_value(self, var: str, campaign: Dict[str, Any], warnings: List[str]) -> str:
-        """Get value from campaign context"""
-        field = var.replace('campaign.', '')
-        value = campaign.get(field, '')
-        if not value:
-            warnings.append(f"Campaign variable '{field}' not available")
-        return str(value) if value else ''
-    
-    def _get_image_value(self, var: str, context: Dict[str, Any], warnings: List[str]) -> str:
-        """Handle image variables"""
-        if 'image.cid' in var:
-            # Extract slot name: image.cid 'hero' -> hero or 'dashboard' -> dashboard
-            slot_match = re.search(r"image\.cid\s+['\"]([^'\"]+)['\"]", var)
-            if slot_match:
-                slot = slot_match.group(1)
-                
-                # Special handling for dashboard images (implementation plan)
-                if slot == 'dashboard':
-                    domain = context.get('domain', '')
-                    if domain:
-                        # Lazy import to avoid circular imports
-                        from app.services.asset_resolver import asset_resolver
-                        if asset_resolver.has_dashboard_image(domain):
-                            return f"cid:dashboard_{domain.replace('.', '_')}"
-                        else:
-                            warnings.append(f"Dashboard image not found for domain: {domain}")
-                            return ""  # Return empty as per plan (permissive)
-                    else:
-                        warnings.append("No domain provided for dashboard image")
-                        return ""
-                
-                # Regular per-lead images
-                lead = context.get('lead', {})
-                image_key = lead.get('image_key', '')
-                if not image_key:
-                    warnings.append(f"No image available for slot '{slot}'")
-                    return f"[IMAGE_PLACEHOLDER_{slot.upper()}]"
-                return f"cid:{image_key}_{slot}"
-            else:
-                warnings.append(f"Invalid image.cid syntax: {var}")
-                return "[IMAGE_ERROR]"
-        
-        elif 'image.url' in var:
-            # Extract asset key: image.url 'logo' -> logo
-            key_match = re.search(r"image\.url\s+['\"]([^'\"]+)['\"]", var)
-            if key_match:
-                key = key_match.group(1)
-                return f"https://assets.example.com/{key}.png"
-            else:
-                warnings.append(f"Invalid image.url syntax: {var}")
-                return "[IMAGE_ERROR]"
-        
-        return "[IMAGE_ERROR]"
-    
-    def _apply_helper(self, var: str, context: Dict[str, Any], warnings: List[str]) -> str:
-        """Apply helper functions like default, uppercase, etc."""
-        if '|' not in var:
-            return ''
-        
-        parts = [p.strip() for p in var.split('|')]
-        value = parts[0]
-        helpers = parts[1:]
-        
-        # Get initial value
-        if value.startswith('lead.'):
-            result = self._get_lead_value(value, context.get('lead', {}), warnings)
-        elif value.startswith('vars.'):
-            result = self._get_vars_value(value, context.get('vars', {}), warnings)
-        else:
-            result = context.get(value, '')
-        
-        # Apply helpers
-        for helper in helpers:
-            if helper.startswith('default'):
-                # Extract default value: default 'fallback'
-                default_match = re.search(r"default\s+['\"]([^'\"]+)['\"]", helper)
-                if default_match and not result:
-                    result = default_match.group(1)
-            elif helper == 'uppercase':
-                result = str(result).upper()
-            elif helper == 'lowercase':
-                result = str(result).lower()
-        
-        return str(result)
+        return compile_template(template, template_id).render(context)
     
     def extract_variables(self, template: str) -> List[str]:
         """Extract all variables from template"""
@@ -161,6 +32,10 @@ class TemplateRenderer:
         return warnings
 
 
+# Shared renderer (stateless; compiled templates live in template_cache)
+_renderer = TemplateRenderer()
+
+
 def inject_tracking_pixel(html: str, pixel_url: str) -> str:
     """
     Inject 1x1 tracking pixel before closing </body> tag.
@@ -177,7 +52,17 @@ def inject_tracking_pixel(html: str, pixel_url: str) -> str:
         return html + pixel_html
 
 
-def render_template_with_lead(template_body: str, subject_template: str, lead_data: Dict[str, Any], campaign_data: Optional[Dict[str, Any]] = None, mail_number: Optional[int] = None) -> Dict[str, Any]:
+def get_signature_urls() -> Tuple[str, str]:
+    """(christian, victor) signature data URLs for previews; placeholder URLs if an image is missing."""
+    # Lazy import to avoid circular imports
+    from app.services.asset_resolver import asset_resolver
+    
+    christian_url = asset_resolver.get_signature_data_url("christian") or "https://via.placeholder.com/300x100?text=Christian"
+    victor_url = asset_resolver.get_signature_data_url("victor") or "https://via.placeholder.com/300x100?text=Victor"
+    return christian_url, victor_url
+
+
+def render_template_with_lead(template_body: str, subject_template: str, lead_data: Dict[str, Any], campaign_data: Optional[Dict[str, Any]] = None, mail_number: Optional[int] = None, template_id: Optional[str] = None, signature_urls: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
     """Render template with lead data and signature.
     
     Args:
@@ -186,8 +71,27 @@ def render_template_with_lead(template_body: str, subject_template: str, lead_da
         lead_data: Lead data for variable substitution
         campaign_data: Optional campaign context
         mail_number: Mail number (1-4) to determine signature. If None, defaults to 1.
+        template_id: Optional cache key for the compiled subject/body
+        signature_urls: (christian, victor) image sources; preview data URLs if None
     """
-    renderer = TemplateRenderer()
+    subject = compile_template(subject_template, f"{template_id}:subject" if template_id else None)
+    body = compile_template(template_body, f"{template_id}:body" if template_id else None)
+    return render_compiled_with_lead(subject, body, lead_data, campaign_data, mail_number, signature_urls)
+
+
+def render_compiled_with_lead(
+    subject: CompiledTemplate,
+    body: CompiledTemplate,
+    lead_data: Dict[str, Any],
+    campaign_data: Optional[Dict[str, Any]] = None,
+    mail_number: Optional[int] = None,
+    signature_urls: Optional[Tuple[str, str]] = None
+) -> Dict[str, Any]:
+    """Render already compiled subject/body for one lead (shared by single and batch rendering).
+    
+    signature_urls: (christian, victor) URLs resolved once by the caller; looked up if None.
+    """
+    from app.services.signature_injector import inject_signature, get_alias_from_mail_number
     
     # Auto-detect mail_number if not provided (default to 1)
     if mail_number is None:
@@ -201,46 +105,24 @@ def render_template_with_lead(template_body: str, subject_template: str, lead_da
     }
     
     # Render subject and body
-    rendered_subject, subject_warnings = renderer.render(subject_template, context)
-    rendered_body, body_warnings = renderer.render(template_body, context)
+    rendered_subject, subject_warnings = subject.render(context)
+    rendered_body, body_warnings = body.render(context)
     
     # Add signature based on mail_number (for preview)
-    import base64
-    from pathlib import Path
-    from app.services.signature_injector import inject_signature, get_alias_from_mail_number
-    
     alias = get_alias_from_mail_number(mail_number)
     
     try:
-        signature_dir = Path(__file__).parent.parent / "assets" / "signatures"
-        christian_path = signature_dir / "Christian Handtekening.png"
-        victor_path = signature_dir / "Victor Handtekening.png"
-        
-        # Load and encode signatures as base64 data URLs
-        if christian_path.exists():
-            with open(christian_path, 'rb') as f:
-                christian_data = base64.b64encode(f.read()).decode('utf-8')
-                christian_url = f"data:image/png;base64,{christian_data}"
-        else:
-            christian_url = "https://via.placeholder.com/300x100?text=Christian"
-        
-        if victor_path.exists():
-            with open(victor_path, 'rb') as f:
-                victor_data = base64.b64encode(f.read()).decode('utf-8')
-                victor_url = f"data:image/png;base64,{victor_data}"
-        else:
-            victor_url = "https://via.placeholder.com/300x100?text=Victor"
-        
+        christian_url, victor_url = signature_urls or get_signature_urls()
         rendered_body = inject_signature(rendered_body, alias, christian_url, victor_url)
     except Exception as e:
         body_warnings.append(f"Could not load signature: {str(e)}")
     
     # Validate subject
-    subject_validation_warnings = renderer.validate_subject(rendered_subject)
+    subject_validation_warnings = _renderer.validate_subject(rendered_subject)
     
     # Generate plain text version (simple HTML strip)
-    text_body = re.sub(r'<[^>]+>', '', rendered_body)
-    text_body = re.sub(r'\s+', ' ', text_body).strip()
+    text_body = _TAG_PATTERN.sub('', rendered_body)
+    text_body = _WHITESPACE_PATTERN.sub(' ', text_body).strip()
     
     # Combine all warnings
     all_warnings = subject_warnings + body_warnings + subject_validation_warnings
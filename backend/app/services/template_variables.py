@@ -7,7 +7,7 @@ Dit service scant alle hard-coded templates en bepaalt:
 - De compleetheid score van een lead
 """
 
-from typing import Set, List, Dict, Any, Optional
+from typing import Callable, Set, List, Dict, Any, Optional, Tuple
 import re
 from app.core.templates_store import get_all_templates
 from app.models.lead import Lead
@@ -18,6 +18,26 @@ class TemplateVariablesService:
     
     def __init__(self):
         self._cached_variables: Optional[Set[str]] = None
+        # Checkable variables (sorted) with one bit each, plus a check per variable
+        self._compiled_checks: Optional[List[Tuple[str, int, Optional[Callable[[Lead], bool]]]]] = None
+        self._required_mask = 0
+        # Verhoogd bij elke wijziging van de template set; stores herberekenen compleetheid dan
+        self.version = 0
+        # Aangeroepen na invalidate(), bijv. leads_store.refresh_completeness
+        self._change_listeners: List[Callable[[], Any]] = []
+
+    def add_change_listener(self, listener: Callable[[], Any]) -> None:
+        """Registreer een callback voor een gewijzigde template set."""
+        self._change_listeners.append(listener)
+
+    def invalidate(self) -> None:
+        """Vergeet gecachte variabelen/checks (template set gewijzigd) en meld dit aan de listeners."""
+        self._cached_variables = None
+        self._compiled_checks = None
+        self._required_mask = 0
+        self.version += 1
+        for listener in self._change_listeners:
+            listener()
     
     def get_all_required_variables(self) -> Set[str]:
         """
@@ -94,6 +114,39 @@ class TemplateVariablesService:
         
         return categorized
     
+    def _compile_checks(self) -> List[Tuple[str, int, Optional[Callable[[Lead], bool]]]]:
+        """
+        Precompile de checkable variabelen tot (naam, bit, check) in gesorteerde volgorde.
+        campaign.* vars tellen niet mee (runtime data); variabelen zonder check gelden als gevuld.
+        """
+        if self._compiled_checks is not None:
+            return self._compiled_checks
+
+        checks = []
+        for bit, var in enumerate(sorted(v for v in self.get_all_required_variables() if not v.startswith('campaign.'))):
+            check = None
+            if var.startswith('lead.'):
+                field_name = var.split('.', 1)[1]
+                check = lambda lead, f=field_name: bool(getattr(lead, f, None))
+            elif var.startswith('vars.'):
+                var_name = var.split('.', 1)[1]
+                check = lambda lead, k=var_name: bool(lead.vars and lead.vars.get(k))
+            elif var == 'image.cid':
+                check = lambda lead: bool(lead.image_key)
+            checks.append((var, 1 << bit, check))
+
+        self._required_mask = (1 << len(checks)) - 1
+        self._compiled_checks = checks
+        return checks
+
+    def missing_mask(self, lead: Lead) -> int:
+        """Bitmask van ontbrekende variabelen (bit per variabele uit _compile_checks)."""
+        missing = 0
+        for _var, bit, check in self._compile_checks():
+            if check is not None and not check(lead):
+                missing |= bit
+        return missing
+
     def get_missing_variables(self, lead: Lead) -> List[str]:
         """
         Bepaal welke variabelen een lead mist.
@@ -104,31 +157,27 @@ class TemplateVariablesService:
         Returns:
             List van ontbrekende variabele namen
         """
-        required_vars = self.get_all_required_variables()
-        missing = []
-        
-        for var in sorted(required_vars):
-            if var.startswith('lead.'):
-                # Check lead field
-                field_name = var.split('.', 1)[1]
-                if not hasattr(lead, field_name) or not getattr(lead, field_name):
-                    missing.append(var)
-            
-            elif var.startswith('vars.'):
-                # Check custom var in vars dict
-                var_name = var.split('.', 1)[1]
-                if not lead.vars or var_name not in lead.vars or not lead.vars[var_name]:
-                    missing.append(var)
-            
-            elif var == 'image.cid':
-                # Check image_key
-                if not lead.image_key:
-                    missing.append(var)
-            
-            # campaign.* vars worden niet gecheckt (runtime data)
-        
-        return missing
-    
+        return self._mask_to_names(self.missing_mask(lead))
+
+    def _mask_to_names(self, mask: int) -> List[str]:
+        if not mask:
+            return []
+        return [var for var, bit, _check in self._compile_checks() if mask & bit]
+
+    def completeness_from_mask(self, mask: int) -> Dict[str, Any]:
+        """Compleetheid dict (zie calculate_completeness) uit een missing-bitmask."""
+        self._compile_checks()
+        total = self._required_mask.bit_count()
+        missing = self._mask_to_names(mask)
+        filled = total - len(missing)
+        return {
+            'filled': filled,
+            'total': total,
+            'missing': missing,
+            'percentage': int((filled / total * 100)) if total > 0 else 0,
+            'is_complete': len(missing) == 0
+        }
+
     def calculate_completeness(self, lead: Lead) -> Dict[str, Any]:
         """
         Bereken compleetheid score van een lead.
@@ -146,23 +195,8 @@ class TemplateVariablesService:
                 'is_complete': False
             }
         """
-        all_vars = self.get_all_required_variables()
-        
-        # Filter campaign vars (die checken we niet voor leads)
-        checkable_vars = {v for v in all_vars if not v.startswith('campaign.')}
-        
-        missing = self.get_missing_variables(lead)
-        filled = len(checkable_vars) - len(missing)
-        total = len(checkable_vars)
-        
-        return {
-            'filled': filled,
-            'total': total,
-            'missing': missing,
-            'percentage': int((filled / total * 100)) if total > 0 else 0,
-            'is_complete': len(missing) == 0
-        }
-    
+        return self.completeness_from_mask(self.missing_mask(lead))
+
     def get_variable_value(self, lead: Lead, var_name: str) -> Optional[str]:
         """
         Haal de waarde van een variabele op voor een lead.
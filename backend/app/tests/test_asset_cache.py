@@ -0,0 +1,68 @@
+"""
+Tests for the content-addressed asset cache.
+"""
+import base64
+import os
+from email import message_from_bytes
+
+from app.services.asset_cache import AssetCache
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+def test_hit_returns_same_encoded_asset(tmp_path):
+    """Second lookup reuses the cached blob and its encodings."""
+    path = tmp_path / "sig.png"
+    path.write_bytes(PNG)
+    cache = AssetCache(check_interval=60)
+
+    first = cache.get(path)
+    path.unlink()  # no stat within check_interval, so still served from memory
+    second = cache.get(path)
+
+    assert first is second
+    assert first.data == PNG
+    assert first.data_url == "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    """A new mtime/size invalidates the cached entry."""
+    path = tmp_path / "sig.png"
+    path.write_bytes(PNG)
+    cache = AssetCache(check_interval=0)
+    old = cache.get(path)
+
+    path.write_bytes(PNG + b"changed")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    new = cache.get(path)
+
+    assert new is not old
+    assert new.data.endswith(b"changed")
+
+
+def test_identical_files_share_blob(tmp_path):
+    """Content addressing: same bytes under two names are encoded once."""
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    a.write_bytes(PNG)
+    b.write_bytes(PNG)
+    cache = AssetCache()
+
+    assert cache.get(a) is cache.get(b)
+
+
+def test_missing_file_returns_none(tmp_path):
+    assert AssetCache().get(tmp_path / "missing.png") is None
+
+
+def test_mime_part_uses_preencoded_payload(tmp_path):
+    """CID part round-trips to the original bytes."""
+    path = tmp_path / "Christian Handtekening.png"
+    path.write_bytes(PNG)
+    part = AssetCache().get(path).mime_part("signature_christian", path.name)
+
+    parsed = message_from_bytes(part.as_bytes())
+    assert parsed["Content-ID"] == "<signature_christian>"
+    assert parsed.get_content_type() == "image/png"
+    assert parsed.get_payload(decode=True) == PNG
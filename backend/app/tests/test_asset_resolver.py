@@ -56,3 +56,16 @@ def test_has_report_methods():
     # These should return False for unknown domains
     assert resolver.has_report("unknown-domain.com") is False
     assert resolver.has_dashboard_image("unknown-domain.com") is False
+
+
+def test_signature_assets_cached(tmp_path):
+    """Signature data URL and CID part come from the shared asset cache."""
+    from app.services.asset_cache import AssetCache
+    
+    (tmp_path / "Christian Handtekening.png").write_bytes(b"\x89PNGchristian")
+    resolver = AssetResolver(cache=AssetCache(), signature_dir=tmp_path)
+    
+    assert resolver.get_signature_data_url("christian").startswith("data:image/png;base64,")
+    assert resolver.get_signature_asset("christian") is resolver.get_signature_asset("Christian")
+    assert resolver.get_signature_mime_part("christian")["Content-ID"] == "<signature_christian>"
+    assert resolver.get_signature_data_url("victor") is None
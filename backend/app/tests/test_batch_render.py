@@ -0,0 +1,113 @@
+"""
+Tests for batch rendering one template over a whole audience.
+"""
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.batch_render import BatchRenderer, mail_number_from_template_id
+from app.services.leads_store import LeadsStore
+from app.services.store_factory import leads_store as app_leads_store
+
+AUTH_HEADERS = {"Authorization": "Bearer test-token"}
+
+SUBJECT = "SEO voor {{lead.company}}"
+BODY = "<html><body>Hallo {{lead.company}}, zoekterm {{vars.keyword}}</body></html>"
+
+
+def _store(count: int):
+    store = LeadsStore()
+    ids = []
+    for i in range(count):
+        _, rec = store.upsert(email=f"lead{i}@example.com", company=f"Company {i}", vars={"keyword": "seo"} if i % 2 == 0 else {})
+        ids.append(rec.id)
+    return store, ids
+
+
+def test_render_many_in_input_order_with_warnings():
+    store, ids = _store(4)
+    results = list(BatchRenderer(store).render_many("tpl-batch", SUBJECT, BODY, ids + ["missing"]))
+
+    assert [r["lead_id"] for r in results] == ids + ["missing"]
+    assert results[0]["subject"] == "SEO voor Company 0"
+    assert "cid:" not in results[0]["html"] and "Handtekening" in results[0]["html"]
+    assert results[0]["warnings"] == []
+    assert any("keyword" in w for w in results[1]["warnings"])
+    assert results[-1] == {"lead_id": "missing", "error": "Lead not found"}
+
+
+def test_render_many_without_content():
+    """Pre-flight mode only reports warnings."""
+    store, ids = _store(2)
+    results = list(BatchRenderer(store).render_many("tpl-batch", SUBJECT, BODY, ids, include_content=False))
+
+    assert set(results[0]) == {"lead_id", "warnings"}
+
+
+def test_process_pool_matches_inline():
+    """Fan-out over worker processes gives the same results in the same order."""
+    store, ids = _store(30)
+    inline = list(BatchRenderer(store).render_many("tpl-batch", SUBJECT, BODY, ids))
+    pooled = list(BatchRenderer(store, processes=2, threshold=10).render_many("tpl-batch", SUBJECT, BODY, ids))
+
+    assert pooled == inline
+
+
+def test_leads_resolved_in_one_bulk_call():
+    """Leads come from one get_many call, never from per-lead lookups."""
+    from unittest.mock import MagicMock
+
+    store, ids = _store(3)
+    store.get_by_id = MagicMock(side_effect=AssertionError("per-lead lookup"))
+    store.get_many = MagicMock(wraps=store.get_many)
+
+    results = list(BatchRenderer(store).render_many("tpl-batch", SUBJECT, BODY, ids))
+
+    store.get_many.assert_called_once_with(ids)
+    assert [r["subject"] for r in results] == [f"SEO voor Company {i}" for i in range(3)]
+
+
+def test_db_get_many_chunks_id_filter():
+    from unittest.mock import MagicMock
+    from app.services import db_leads_store
+    from app.services.db_leads_store import DBLeadsStore
+
+    store = DBLeadsStore.__new__(DBLeadsStore)
+    store.supabase = MagicMock()
+    query = store.supabase.table.return_value.select.return_value
+    query.in_.side_effect = lambda column, chunk: MagicMock(
+        execute=MagicMock(return_value=MagicMock(data=[{"id": i} for i in chunk if i != "l3"])))
+    store._row_to_lead = lambda row: row["id"]
+
+    ids = [f"l{i}" for i in range(db_leads_store.GET_MANY_CHUNK + 5)]
+    leads = store.get_many(ids)
+
+    assert query.in_.call_count == 2
+    assert len(leads) == len(ids) - 1 and "l3" not in leads
+
+
+def test_mail_number_from_template_id():
+    assert mail_number_from_template_id("v2_mail3") == 3
+    assert mail_number_from_template_id("v1m4") == 4
+    assert mail_number_from_template_id("custom") == 1
+
+
+def test_render_batch_endpoint_streams_ndjson():
+    _, rec = app_leads_store.upsert(email="batch@example.com", company="Batch BV", vars={"keyword": "seo", "google_rank": "4"})
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/templates/v1_mail1/render-batch",
+        json={"lead_ids": [rec.id, "missing"], "include_content": False},
+        headers=AUTH_HEADERS
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["lead_id"] == rec.id
+    assert lines[1]["error"] == "Lead not found"
+    assert lines[-1]["summary"]["total"] == 2
+    assert lines[-1]["summary"]["not_found"] == 1
+    assert lines[-1]["summary"]["ok"] is False
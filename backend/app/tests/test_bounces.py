@@ -0,0 +1,240 @@
+"""
+Tests for DSN (bounce report) parsing and the bounce stage of the inbox pipeline.
+"""
+import asyncio
+import email
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from app.models.campaign import Campaign, Message, MessageStatus
+from app.models.template import Template
+from app.models.lead import LeadStatus
+from app.services.campaign_scheduler import CampaignScheduler
+from app.services.campaign_store import CampaignStore
+from app.services.inbox.bounces import BounceProcessor, parse_dsn
+from app.services.inbox.imap_client import IMAPClient
+from app.services.inbox.linker import MessageLinker
+from app.services.leads_store import LeadsStore
+from app.services.message_sender import MessageSender
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+def _dsn(recipient="bob@shop.nl", status="5.1.1", action="failed", original_id="out-1@punthelder.nl",
+         returned="text/rfc822-headers", date="Mon, 06 Jan 2025 10:00:00 +0000") -> bytes:
+    if returned == "message/rfc822":
+        original = f"Content-Type: message/rfc822\r\n\r\nMessage-ID: <{original_id}>\r\nTo: {recipient}\r\n\r\nHoi\r\n"
+    else:
+        original = f"Content-Type: text/rfc822-headers\r\n\r\nMessage-ID: <{original_id}>\r\nTo: {recipient}\r\n"
+    return (
+        "From: MAILER-DAEMON@mx.shop.nl\r\n"
+        "Subject: Undelivered Mail Returned to Sender\r\n"
+        f"Date: {date}\r\n"
+        "MIME-Version: 1.0\r\n"
+        'Content-Type: multipart/report; report-type=delivery-status; boundary="B"\r\n'
+        "\r\n"
+        "--B\r\n"
+        "Content-Type: text/plain\r\n\r\n"
+        "This is the mail system. Your message could not be delivered.\r\n"
+        "--B\r\n"
+        "Content-Type: message/delivery-status\r\n\r\n"
+        "Reporting-MTA: dns; mx.shop.nl\r\n"
+        "\r\n"
+        f"Final-Recipient: rfc822; {recipient}\r\n"
+        f"Action: {action}\r\n"
+        f"Status: {status}\r\n"
+        f"Diagnostic-Code: smtp; 550 {status} User unknown\r\n"
+        "--B\r\n"
+        f"{original}"
+        "--B--\r\n"
+    ).encode()
+
+
+def test_parse_hard_and_soft_dsn():
+    hard = parse_dsn(email.message_from_bytes(_dsn()))
+    assert hard == {'original_message_id': 'out-1@punthelder.nl', 'recipient': 'bob@shop.nl', 'action': 'failed',
+                    'status': '5.1.1', 'diagnostic': '550 5.1.1 User unknown', 'hard': True}
+
+    soft = parse_dsn(email.message_from_bytes(_dsn(status="4.2.2", action="delayed", returned="message/rfc822")))
+    assert soft['hard'] is False
+    assert soft['original_message_id'] == 'out-1@punthelder.nl'
+
+    assert parse_dsn(email.message_from_bytes(b"From: a@b.nl\r\nSubject: Re: offerte\r\n\r\nGraag!\r\n")) is None
+
+
+def test_imap_parse_marks_dsn_from_header_and_text_literals():
+    """Content-Type comes with the header fields, the report parts with BODY[TEXT]"""
+    header, text = _dsn().split(b"\r\n\r\n", 1)
+    header += b"\r\n\r\n"
+    data = [(f"1 (UID 7 FLAGS () BODY[HEADER.FIELDS (FROM)] {{{len(header)}}}".encode(), header),
+            (f" BODY[TEXT]<0> {{{len(text)}}}".encode(), text), b")"]
+
+    [message] = IMAPClient("imap.test")._parse_messages(data)
+
+    assert message['uid'] == 7
+    assert message['content_type'] == 'multipart/report'
+    assert message['dsn']['status'] == '5.1.1'
+
+
+class TestBounceProcessor:
+    """Bounce stage: resolve the outbound message, handle_bounce, suppress the lead"""
+
+    def setup_method(self):
+        self.campaigns = CampaignStore()
+        self.leads = LeadsStore()
+        self.leads.upsert(email="bob@shop.nl")
+        self.lead_id = self.leads.get_by_email("bob@shop.nl").id
+        self.campaigns.create_messages([
+            Message(id=f"m{i}", campaign_id="c1", lead_id=self.lead_id, domain_used="punthelder.nl",
+                    scheduled_at=datetime(2025, 1, i), sent_at=datetime(2025, 1, i), status=MessageStatus.sent,
+                    smtp_message_id=f"out-{i}@punthelder.nl")
+            for i in (1, 2)
+        ])
+        self.linker = MessageLinker(self.campaigns, self.leads, self.campaigns)
+        self.processor = BounceProcessor(self.linker, MessageSender(), self.campaigns, self.leads)
+        self.suppressed = []
+        self.processor.add_suppress_listener(self.suppressed.append)
+
+    def _inbound(self, **dsn):
+        return {'uid': 1, 'from_email': 'mailer-daemon@mx.shop.nl', 'received_at': datetime(2025, 1, 6),
+                'dsn': parse_dsn(email.message_from_bytes(_dsn(**dsn)))}
+
+    def test_hard_bounces_suppress_lead_once(self):
+        batch = [self._inbound(original_id="out-1@punthelder.nl"),
+                 {'uid': 2, 'from_email': 'lead@x.nl', 'received_at': datetime(2025, 1, 6), 'dsn': None},
+                 self._inbound(original_id="unknown@elsewhere.nl")]  # resolved by recipient + send time
+
+        bounced = asyncio.run(self.processor.process(batch))
+
+        assert [m['linked_message_id'] for m in bounced] == ['m1', 'm2']
+        assert self.campaigns.get_message('m1').status == MessageStatus.bounced
+        assert self.campaigns.get_message('m2').last_error == '5.1.1 550 5.1.1 User unknown'
+        assert self.leads.get_by_id(self.lead_id).status == LeadStatus.bounced
+        assert self.suppressed == [self.lead_id]
+
+        # The same report fetched again is not applied twice
+        asyncio.run(self.processor.process([self._inbound()]))
+        assert self.suppressed == [self.lead_id]
+
+    def test_recipient_fallback_with_rfc2822_date(self):
+        """received_at parsed from a Date header is aware, outbound sent_at is naive UTC"""
+        self.campaigns.create_messages([
+            Message(id="m3", campaign_id="c1", lead_id=self.lead_id, domain_used="punthelder.nl",
+                    scheduled_at=datetime(2025, 1, 6), sent_at=datetime(2025, 1, 6, 10, 30),
+                    status=MessageStatus.sent, smtp_message_id="out-3@punthelder.nl")
+        ])
+        header, text = _dsn(original_id="unknown@elsewhere.nl", date="Mon, 06 Jan 2025 11:00:00 +0100").split(b"\r\n\r\n", 1)
+        header += b"\r\n\r\n"
+        data = [(f"1 (UID 9 FLAGS () BODY[HEADER.FIELDS (DATE)] {{{len(header)}}}".encode(), header),
+                (f" BODY[TEXT]<0> {{{len(text)}}}".encode(), text), b")"]
+        [inbound] = IMAPClient("imap.test")._parse_messages(data)
+        assert inbound['received_at'].tzinfo is not None
+
+        bounced = asyncio.run(self.processor.process([inbound]))
+
+        # 11:00 +01:00 is 10:00 UTC, so m3 (sent 10:30 UTC) came after the bounce
+        assert [m['linked_message_id'] for m in bounced] == ['m2']
+
+    def test_failing_report_does_not_drop_the_batch(self):
+        broken = {**self._inbound(original_id="unknown@elsewhere.nl"), 'received_at': None}
+
+        bounced = asyncio.run(self.processor.process([broken, self._inbound()]))
+
+        assert [m['linked_message_id'] for m in bounced] == ['m1']
+        assert self.suppressed == [self.lead_id]
+
+    def test_soft_bounce_does_not_suppress(self):
+        bounced = asyncio.run(self.processor.process([self._inbound(status="4.2.2", action="delayed")]))
+
+        assert bounced[0]['linked_lead_id'] == self.lead_id
+        assert self.campaigns.get_message('m1').status == MessageStatus.sent
+        assert self.leads.get_by_id(self.lead_id).status == LeadStatus.active
+        assert self.suppressed == []
+
+    def test_suppressed_lead_is_dropped_by_scheduler(self):
+        scheduler = CampaignScheduler()
+        self.processor.add_suppress_listener(scheduler.stop_lead)
+
+        asyncio.run(self.processor.process([self._inbound()]))
+
+        followup = Message(id="m3", campaign_id="c1", lead_id=self.lead_id, domain_used="punthelder.nl",
+                           scheduled_at=datetime(2025, 1, 9))
+        assert scheduler._should_skip(followup)
+        assert followup.status == MessageStatus.canceled
+
+
+def test_app_bounce_processor_resolves_messages_from_real_stores():
+    """The wired bounce stage sees outbound messages and leads written after startup"""
+    from app.api.inbox import bounce_processor
+    from app.services.store_factory import campaigns_store, leads_store
+
+    _, lead = leads_store.upsert(email="dsn-app@shop.nl")
+    campaigns_store.create_messages([
+        Message(id="dsn-app-1", campaign_id="c-dsn", lead_id=lead.id, domain_used="punthelder.nl",
+                scheduled_at=datetime(2025, 1, 2), sent_at=datetime(2025, 1, 2), status=MessageStatus.sent,
+                smtp_message_id="dsn-app-1@punthelder.nl")
+    ])
+
+    bounced = asyncio.run(bounce_processor.process([
+        {'uid': 1, 'from_email': 'mailer-daemon@mx.shop.nl', 'received_at': datetime(2025, 1, 3),
+         'dsn': parse_dsn(email.message_from_bytes(_dsn(recipient="dsn-app@shop.nl",
+                                                        original_id="dsn-app-1@punthelder.nl")))}
+    ]))
+
+    assert [m['linked_message_id'] for m in bounced] == ['dsn-app-1']
+    assert campaigns_store.get_message('dsn-app-1').status == MessageStatus.bounced
+    assert leads_store.get_by_id(lead.id).status == LeadStatus.bounced
+
+
+@patch("smtplib.SMTP")
+@patch.dict("os.environ", {"SMTP_USER": "christian@punthelder.nl", "SMTP_PASSWORD": "secret"})
+def test_sent_message_id_links_reply_and_dsn(mock_smtp_class):
+    """The Message-ID MessageSender generates is stored and indexed; replies and DSNs resolve by it"""
+    from app.services.campaign_store import campaign_store
+    from app.services.template_store import template_store
+
+    server = MagicMock()
+    mock_smtp_class.return_value = server
+    template_store.templates["t-mid"] = Template(id="t-mid", name="Mid", subject_template="Offerte",
+                                                 body_template="<p>Hoi</p>")
+    campaign_store.campaigns["c-mid"] = Campaign(id="c-mid", name="Mid", template_id="t-mid", domain="punthelder.nl")
+
+    campaigns, leads = CampaignStore(), LeadsStore()
+    _, lead = leads.upsert(email="mid@shop.nl")
+    message = Message(id="mid-1", campaign_id="c-mid", lead_id=lead.id, domain_used="punthelder.nl",
+                      scheduled_at=datetime(2025, 1, 2))
+    campaigns.create_messages([message])
+    linker = MessageLinker(campaigns, leads, campaigns)
+    assert linker.index.by_smtp_id == {}  # built before the send, kept current by the store listener
+
+    sender = MessageSender()
+    sender.smtp_enabled = True
+    sender.smtp_pool = SMTPConnectionPool()
+    try:
+        assert asyncio.run(sender.send_message(message, lead, "<p>Hoi</p>"))
+    finally:
+        sender.smtp_pool.close_all()
+        template_store.templates.pop("t-mid")
+        campaign_store.campaigns.pop("c-mid")
+    campaigns.save_message(message)  # as SendWorker._send does
+
+    sent = server.send_message.call_args[0][0]
+    assert message.smtp_message_id == sent['Message-ID'].strip('<>')
+    assert message.smtp_message_id.endswith("@punthelder.nl")
+
+    reply = (f"Message-ID: <reply-mid@shop.nl>\r\nIn-Reply-To: {sent['Message-ID']}\r\n"
+             "From: mid@shop.nl\r\nSubject: Re: Offerte\r\nDate: Fri, 03 Jan 2025 09:00:00 +0100\r\n\r\n").encode()
+    [inbound] = IMAPClient("imap.test")._parse_messages(
+        [(f"1 (UID 3 FLAGS () BODY[HEADER.FIELDS (FROM)] {{{len(reply)}}}".encode(), reply), b")"]
+    )
+    inbound['id'] = "in-mid"
+    assert linker.resolves_from_headers(inbound)
+    assert linker.link_message(inbound)['linked_message_id'] == "mid-1"
+
+    # Unknown recipient and a date before the send: only the Original-Message-ID can resolve it
+    processor = BounceProcessor(linker, MessageSender(), campaigns, leads)
+    bounced = asyncio.run(processor.process([
+        {'uid': 4, 'from_email': 'mailer-daemon@mx.shop.nl', 'received_at': datetime(2025, 1, 1),
+         'dsn': parse_dsn(email.message_from_bytes(_dsn(recipient="other@shop.nl",
+                                                        original_id=message.smtp_message_id)))}
+    ]))
+    assert [m['linked_message_id'] for m in bounced] == ["mid-1"]
@@ -0,0 +1,107 @@
+"""
+Unit tests for the heap-backed per-domain send queue.
+"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.models.campaign import Message, MessageStatus
+from app.services.domain_queue import DomainQueue
+
+
+TZ = ZoneInfo("Europe/Amsterdam")
+BASE = datetime(2025, 9, 29, 8, 0, tzinfo=TZ)
+
+
+def _message(message_id: str, minutes: int = 0, campaign_id: str = "camp-1", lead_id: str = "lead-1") -> Message:
+    return Message(
+        id=message_id,
+        campaign_id=campaign_id,
+        lead_id=lead_id,
+        domain_used="punthelder-marketing.nl",
+        scheduled_at=BASE + timedelta(minutes=minutes),
+        status=MessageStatus.queued
+    )
+
+
+def test_pop_orders_by_scheduled_at():
+    """Messages pushed out of order come out earliest first."""
+    queue = DomainQueue()
+    queue.push(_message("m3", 40))
+    queue.push(_message("m1", 0))
+    queue.push(_message("m2", 20))
+
+    assert queue.peek_time() == BASE
+    assert [queue.pop()["message"].id for _ in range(3)] == ["m1", "m2", "m3"]
+    assert queue.pop() is None
+    assert queue.peek_time() is None
+
+
+def test_equal_slots_stay_fifo():
+    """Messages with the same slot keep insertion order."""
+    queue = DomainQueue()
+    for i in range(5):
+        queue.push(_message(f"m{i}"))
+
+    assert [item["message"].id for item in queue.pop_due(BASE)] == ["m0", "m1", "m2", "m3", "m4"]
+
+
+def test_pop_due_stops_at_future_messages():
+    """Only messages scheduled at or before current time are returned."""
+    queue = DomainQueue()
+    queue.push(_message("now", 0))
+    queue.push(_message("later", 20))
+
+    due = queue.pop_due(BASE + timedelta(minutes=10))
+
+    assert [item["message"].id for item in due] == ["now"]
+    assert len(queue) == 1
+    assert queue.peek_time() == BASE + timedelta(minutes=20)
+
+
+def test_cancel_is_lazy():
+    """Cancelled messages are skipped and not counted."""
+    queue = DomainQueue()
+    queue.push(_message("m1", 0))
+    queue.push(_message("m2", 20))
+
+    assert queue.cancel("m1") is True
+    assert queue.cancel("m1") is False
+    assert len(queue) == 1
+    assert "m1" not in queue
+    assert queue.peek_time() == BASE + timedelta(minutes=20)
+    assert [item["message"].id for item in queue] == ["m2"]
+
+
+def test_push_same_message_replaces_entry():
+    """Re-pushing a message moves it instead of duplicating it."""
+    queue = DomainQueue()
+    message = _message("m1", 0)
+    queue.push(message)
+    queue.push(message, BASE + timedelta(days=1))
+
+    assert len(queue) == 1
+    assert queue.peek_time() == BASE + timedelta(days=1)
+
+
+def test_pop_before_is_exclusive():
+    """Items at the cutoff itself stay queued."""
+    queue = DomainQueue()
+    queue.push(_message("m1", 0))
+    queue.push(_message("m2", 20))
+    queue.push(_message("tomorrow", 24 * 60))
+
+    next_day = BASE + timedelta(days=1)
+    moved = queue.pop_before(next_day)
+
+    assert [item["message"].id for item in moved] == ["m1", "m2"]
+    assert [item["message"].id for item in queue] == ["tomorrow"]
+
+
+def test_remove_where():
+    """Bulk cancel by predicate."""
+    queue = DomainQueue()
+    queue.push(_message("a", 0, lead_id="lead-1"))
+    queue.push(_message("b", 0, lead_id="lead-2"))
+
+    assert [m.id for m in queue.remove_where(lambda m: m.lead_id == "lead-1")] == ["a"]
+    assert [item["message"].id for item in queue] == ["b"]
@@ -135,5 +135,22 @@ class TestDryRunFlowBased:
             assert day1.planned == day2.planned
 
 
+def test_dry_run_large_audience_respects_daily_cap():
+    """Large dry-runs spill over days instead of stacking on the flow dates."""
+    scheduler = CampaignScheduler()
+    start_at = datetime(2025, 10, 1, 8, 0, tzinfo=ZoneInfo("Europe/Amsterdam"))
+    
+    result = scheduler.dry_run_planning(
+        lead_count=50000,
+        domains=["punthelder-marketing.nl"],
+        start_at=start_at
+    )
+    
+    # Every mail is planned, no day exceeds the per-domain cap
+    assert sum(day.planned for day in result) == 200000
+    assert max(day.planned for day in result) <= 27
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
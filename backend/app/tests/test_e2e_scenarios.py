@@ -117,11 +117,14 @@ class TestE2EScenarios:
         ]
         assert len(next_day_messages) > 0
         
-        # Next day messages should be at 08:00
-        for item in next_day_messages:
-            if item["scheduled_at"].date() == outside_grace.date() + timedelta(days=1):
-                assert item["scheduled_at"].hour == 8
-                assert item["scheduled_at"].minute == 0
+        # Next day messages fill distinct slots from 08:00 (no pile-up on one slot)
+        next_day = [
+            item["scheduled_at"] for item in next_day_messages
+            if item["scheduled_at"].date() == outside_grace.date() + timedelta(days=1)
+        ]
+        assert len(next_day) == len(set(next_day))
+        assert min(next_day).hour == 8
+        assert min(next_day).minute == 0
     
     def test_domain_busy_enforcement(self):
         """Test: Max 1 actieve campagne per domein enforcement."""
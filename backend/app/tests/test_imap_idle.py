@@ -0,0 +1,402 @@
+"""
+Tests for IMAP sessions against a local fake IMAP server: push listener (IDLE and polling
+fallback) and the pipelined FETCH engine.
+"""
+import asyncio
+import socket
+import threading
+import time
+from unittest.mock import MagicMock
+
+from app.services.inbox import imap_client
+from app.services.inbox.accounts import MailAccountService
+from app.services.inbox.fetch_runner import FetchRunner, MailMessageStore
+from app.services.inbox.idle_listener import IdleListener
+from app.services.inbox.imap_client import IMAP_FETCH_BATCH_MAX, IMAP_FETCH_BATCH_MIN, IMAPClient
+
+
+def _raw_reply(uid: int) -> bytes:
+    return (
+        f"Message-ID: <reply-{uid}@lead.nl>\r\n"
+        f"In-Reply-To: <outbound-{uid}@mail.test>\r\n"
+        f"From: Lead {uid} <lead{uid}@lead.nl>\r\n"
+        f"Subject: Re: offerte {uid}\r\n"
+        f"Date: Wed, 01 Jan 2025 10:0{uid % 10}:00 +0000\r\n"
+        f"\r\n"
+        f"Graag meer info ({uid})\r\n"
+    ).encode()
+
+
+class FakeIMAPServer:
+    """Minimal IMAP4rev1 server: CAPABILITY, LOGIN, SELECT, UID SEARCH/FETCH, NOOP, IDLE, CLOSE, LOGOUT
+    (optionally CONDSTORE: HIGHESTMODSEQ on SELECT, FETCH ... CHANGEDSINCE)"""
+
+    def __init__(self, idle: bool = True, hold_fetches: int = 1, condstore: bool = False):
+        self.idle = idle
+        self.condstore = condstore
+        self.uidvalidity = 1
+        self.seen = set()
+        self.modseq = {}  # uid -> modseq of its last flag change
+        self.highest_modseq = 1
+        self.hold_fetches = hold_fetches  # answer UID FETCHes (in reverse) once this many are pending
+        self.messages = {}  # uid -> raw message
+        self.fetched = []  # uid lists per UID FETCH
+        self.fetch_items = []  # item list per UID FETCH
+        self.max_in_flight = 0
+        self._pending = []
+        self.noops = []  # monotonic time per NOOP
+        self.idling = 0
+        self._lock = threading.Lock()
+        self._idlers = []
+        self._conns = []
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def deliver(self, uid: int) -> None:
+        """New mail: store it and notify idling sessions"""
+        with self._lock:
+            self.messages[uid] = _raw_reply(uid)
+            for conn in self._idlers:
+                conn.sendall(f"* {len(self.messages)} EXISTS\r\n".encode())
+
+    def set_seen(self, uid: int) -> None:
+        self.highest_modseq += 1
+        self.seen.add(uid)
+        self.modseq[uid] = self.highest_modseq
+
+    def drop_connections(self) -> None:
+        with self._lock:
+            for conn in self._conns:
+                conn.shutdown(socket.SHUT_RDWR)
+            self._conns.clear()
+            self._idlers.clear()
+            self.idling = 0
+
+    def close(self) -> None:
+        self.drop_connections()
+        self._server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._conns.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        reader = conn.makefile("rb")
+        conn.sendall(b"* OK fake IMAP ready\r\n")
+        try:
+            for line in reader:
+                tag, command, *args = line.decode().strip().split(" ")
+                command = command.upper()
+                if command == "CAPABILITY":
+                    caps = "IMAP4rev1" + (" IDLE" if self.idle else "") + (" CONDSTORE" if self.condstore else "")
+                    conn.sendall(f"* CAPABILITY {caps}\r\n{tag} OK done\r\n".encode())
+                elif command == "SELECT":
+                    modseq = f"* OK [HIGHESTMODSEQ {self.highest_modseq}]\r\n" if "(CONDSTORE)" in args else ""
+                    conn.sendall(f"* {len(self.messages)} EXISTS\r\n* FLAGS ()\r\n* OK [UIDVALIDITY {self.uidvalidity}]\r\n"
+                                 f"{modseq}{tag} OK [READ-WRITE] done\r\n".encode())
+                elif command == "UID" and args[0].upper() == "SEARCH":
+                    conn.sendall(f"* SEARCH {' '.join(map(str, self._search(args[1:])))}\r\n{tag} OK done\r\n".encode())
+                elif command == "UID" and args[0].upper() == "FETCH" and "CHANGEDSINCE" in line.decode():
+                    self._changed_since(conn, tag, args[1], int(args[-1].rstrip(")")))
+                elif command == "UID" and args[0].upper() == "FETCH":
+                    self._pending.append((tag, [int(u) for u in args[1].split(",")], " ".join(args[2:])))
+                    self.max_in_flight = max(self.max_in_flight, len(self._pending))
+                    if len(self._pending) >= self.hold_fetches:
+                        conn.sendall(b"* 1 FETCH (FLAGS (\\Seen))\r\n")  # unsolicited flag update
+                        for pending in reversed(self._pending):
+                            self._fetch(conn, *pending)
+                        self._pending.clear()
+                elif command == "IDLE" and self.idle:
+                    self._idle(conn, reader, tag)
+                elif command == "NOOP":
+                    self.noops.append(time.monotonic())
+                    conn.sendall(f"{tag} OK done\r\n".encode())
+                elif command == "LOGOUT":
+                    conn.sendall(f"* BYE\r\n{tag} OK done\r\n".encode())
+                    return
+                elif command in ("LOGIN", "CLOSE"):
+                    conn.sendall(f"{tag} OK done\r\n".encode())
+                else:
+                    conn.sendall(f"{tag} BAD unknown command\r\n".encode())
+        except OSError:
+            pass
+
+    def _search(self, criteria):
+        uids = sorted(self.messages)
+        if criteria[0].upper() == "UID":
+            start = int(criteria[1].split(":")[0])
+            # RFC 3501: "n:*" always includes the highest UID
+            uids = [u for u in uids if u >= start] or uids[-1:]
+        return uids
+
+    def _fetch(self, conn, tag, uids, items):
+        self.fetched.append(uids)
+        self.fetch_items.append(items)
+        for seq, uid in enumerate(uids, 1):
+            raw = self.messages[uid]
+            if "HEADER.FIELDS" not in items:
+                conn.sendall(f"* {seq} FETCH (UID {uid} BODY[] {{{len(raw)}}}\r\n".encode() + raw + b")\r\n")
+                continue
+            # Sections as separate literals, UID trailing the last one
+            header, text = raw.split(b"\r\n\r\n", 1)
+            header += b"\r\n\r\n"
+            flags = "\\Seen" if uid in self.seen else ""
+            response = (f"* {seq} FETCH (FLAGS ({flags}) RFC822.SIZE {len(raw)} "
+                        f"BODY[HEADER.FIELDS (FROM)] {{{len(header)}}}\r\n").encode() + header
+            if "BODY.PEEK[TEXT]" in items:
+                response += f" BODY[TEXT]<0> {{{len(text)}}}\r\n".encode() + text
+            conn.sendall(response + f" UID {uid})\r\n".encode())
+        conn.sendall(f"{tag} OK done\r\n".encode())
+
+    def _changed_since(self, conn, tag, uid_range, modseq):
+        self.fetch_items.append(f"CHANGEDSINCE {modseq}")
+        last = int(uid_range.split(":")[1])
+        for seq, uid in enumerate(sorted(self.messages), 1):
+            if uid <= last and self.modseq.get(uid, 0) > modseq:
+                flags = "\\Seen" if uid in self.seen else ""
+                conn.sendall(f"* {seq} FETCH (UID {uid} MODSEQ ({self.modseq[uid]}) FLAGS ({flags}))\r\n".encode())
+        conn.sendall(f"{tag} OK done\r\n".encode())
+
+    def _idle(self, conn, reader, tag):
+        with self._lock:
+            conn.sendall(b"+ idling\r\n")
+            self._idlers.append(conn)
+            self.idling += 1
+        reader.readline()  # DONE
+        with self._lock:
+            if conn in self._idlers:
+                self._idlers.remove(conn)
+                self.idling -= 1
+        conn.sendall(f"{tag} OK IDLE terminated\r\n".encode())
+
+
+def _runner(**options):
+    accounts_service = MagicMock()
+    accounts_service._get_password_from_secret_store.return_value = "secret"
+    linker = MagicMock()
+    linker.link_message.side_effect = lambda msg: {'linked_message_id': f"out-{msg['in_reply_to']}"}
+    accounts_service.store.get_sync_state.return_value = {'uidvalidity': None, 'last_seen_uid': 1, 'highest_modseq': None}
+    return FetchRunner(accounts_service, MailMessageStore(), linker, **options)
+
+
+def _account(server, last_seen_uid=1):
+    return {'id': 'acc-1', 'label': 'sales', 'secret_ref': 'ref', 'imap_host': '127.0.0.1',
+            'imap_port': server.port, 'use_ssl': False, 'username': 'user', 'last_seen_uid': last_seen_uid}
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        await asyncio.sleep(0.01)
+
+
+def _run_listener(server, scenario, **options):
+    runner = _runner()
+    runner.accounts_service.get_active_accounts.return_value = [_account(server)]
+    listener = IdleListener(runner, **options)
+
+    async def main():
+        listener.start()
+        try:
+            await scenario(runner)
+        finally:
+            await listener.stop()
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.close()
+    return runner
+
+
+def test_idle_exists_fetches_only_new_uids():
+    server = FakeIMAPServer(idle=True)
+    server.messages[1] = _raw_reply(1)
+
+    async def scenario(runner):
+        await _wait_for(lambda: server.idling == 1)
+        server.deliver(2)
+        await _wait_for(lambda: len(runner.messages_store.get_all()) == 1)
+
+    runner = _run_listener(server, scenario, idle_timeout=0.5)
+
+    stored = runner.messages_store.get_all()[0]
+    assert stored['uid'] == 2
+    assert stored['in_reply_to'] == 'outbound-2@mail.test'
+    assert stored['linked_message_id'] == 'out-outbound-2@mail.test'
+    assert server.fetched == [[2]]
+    runner.accounts_service.store.update_fetch_info.assert_called_with('acc-1', 2, 'INBOX')
+
+
+def test_reconnects_and_catches_up_after_dropped_connection():
+    server = FakeIMAPServer(idle=True)
+    server.messages[1] = _raw_reply(1)
+
+    async def scenario(runner):
+        await _wait_for(lambda: server.idling == 1)
+        server.drop_connections()
+        server.messages[2] = _raw_reply(2)  # arrives while disconnected
+        await _wait_for(lambda: len(runner.messages_store.get_all()) == 1)
+
+    runner = _run_listener(server, scenario, idle_timeout=0.5, poll_interval=0.05)
+
+    assert runner.messages_store.get_all()[0]['uid'] == 2
+
+
+def test_polling_fallback_backs_off_without_idle():
+    server = FakeIMAPServer(idle=False)
+    server.messages[1] = _raw_reply(1)
+
+    async def scenario(runner):
+        await _wait_for(lambda: len(server.noops) >= 4)
+        server.deliver(2)
+        await _wait_for(lambda: len(runner.messages_store.get_all()) == 1)
+
+    runner = _run_listener(server, scenario, poll_interval=0.05, max_interval=0.4)
+
+    assert runner.messages_store.get_all()[0]['uid'] == 2
+    assert server.idling == 0
+    gaps = [b - a for a, b in zip(server.noops, server.noops[1:])]
+    assert gaps[2] > 2 * gaps[0]  # 0.05 -> 0.1 -> 0.2 while nothing arrives
+
+
+def _client(server):
+    client = IMAPClient("127.0.0.1", server.port, use_ssl=False, timeout=5)
+    assert client.connect("user", "secret")
+    assert client.select_inbox()
+    return client
+
+
+def test_pipelined_fetch_matches_responses_by_uid():
+    """Several FETCHes are in flight at once; out-of-order responses still map to the right UID."""
+    server = FakeIMAPServer(hold_fetches=3)
+    for uid in range(1, 13):
+        server.messages[uid] = _raw_reply(uid)
+    client = _client(server)
+    client.batch_size, client.pipeline_depth = 4, 3
+    try:
+        messages = client.fetch_new_messages()
+    finally:
+        client.close()
+        server.close()
+
+    assert server.max_in_flight == 3
+    assert server.fetched == [[9, 10, 11, 12], [5, 6, 7, 8], [1, 2, 3, 4]]
+    assert sorted(m['uid'] for m in messages) == list(range(1, 13))
+    for message in messages:
+        assert message['in_reply_to'] == f"outbound-{message['uid']}@mail.test"
+        assert f"({message['uid']})" in message['snippet']
+
+
+def test_headers_first_fetches_body_only_when_needed():
+    """Headers return to the event loop, which picks the snippets to fetch; the linker never runs on the pool"""
+    server = FakeIMAPServer()
+    for uid in range(1, 6):
+        server.messages[uid] = _raw_reply(uid)
+    runner = _runner(headers_first=True)
+    threads = []
+
+    def resolves_from_headers(message):
+        threads.append(threading.current_thread())
+        return message['uid'] % 2 == 1
+
+    runner.message_linker.resolves_from_headers.side_effect = resolves_from_headers
+    try:
+        result = asyncio.run(runner._download(_account(server), "secret"))
+    finally:
+        server.close()
+
+    assert server.fetched == [[2, 3, 4, 5], [2, 4]]
+    assert "BODY.PEEK[TEXT]" not in server.fetch_items[-2]
+    assert "BODY.PEEK[TEXT]" in server.fetch_items[-1]
+    assert len(threads) == 4 and all(thread is threading.main_thread() for thread in threads)
+    snippets = {m['uid']: m['snippet'] for m in result['messages']}
+    assert snippets[3] == snippets[5] == ""
+    assert "(2)" in snippets[2] and "(4)" in snippets[4]
+    assert all(m['subject'] for m in result['messages'])
+
+
+def test_batch_size_adapts_to_window_latency():
+    client = IMAPClient("127.0.0.1", 0, use_ssl=False)
+    start = client.batch_size
+    client._adapt_batch_size(0.0)
+    assert client.batch_size == start * 2
+    client._adapt_batch_size(60.0)
+    assert client.batch_size == start
+    for _ in range(20):
+        client._adapt_batch_size(60.0)
+    assert client.batch_size == IMAP_FETCH_BATCH_MIN
+    for _ in range(20):
+        client._adapt_batch_size(0.0)
+    assert client.batch_size == IMAP_FETCH_BATCH_MAX
+
+
+def test_sync_fetches_changes_and_resyncs_on_uidvalidity_change(monkeypatch):
+    server = FakeIMAPServer(condstore=True)
+    for uid in range(1, 4):
+        server.messages[uid] = _raw_reply(uid)
+    server.set_seen(1)
+
+    service = MailAccountService()
+    account = service.store.create({'label': 'sales', 'imap_host': '127.0.0.1', 'imap_port': server.port,
+                                    'use_ssl': False, 'username': 'user', 'secret_ref': 'ref'})
+    linker = MagicMock()
+    linker.link_message.return_value = {}
+    runner = FetchRunner(service, MailMessageStore(), linker)
+    store = runner.messages_store
+
+    def sync_once():
+        client = IMAPClient("127.0.0.1", server.port, use_ssl=False, timeout=5)
+        assert client.connect("user", "secret")
+        try:
+            result = runner.sync(account, client)
+            asyncio.run(runner.apply_sync(account, result))
+        finally:
+            client.close()
+        return result
+
+    def stored(original_uid):
+        return next(m for m in store.get_all() if m['message_id'] == f"reply-{original_uid}@lead.nl")
+
+    try:
+        sync_once()
+        assert sorted(m['uid'] for m in store.get_all()) == [1, 2, 3]
+        assert stored(1)['is_read'] and not stored(2)['is_read']
+        state = service.store.get_sync_state(account['id'])
+        assert state == {'uidvalidity': 1, 'last_seen_uid': 3, 'highest_modseq': 2}
+
+        # Same UIDVALIDITY: only the new UID is fetched, read state comes from CHANGEDSINCE
+        server.set_seen(2)
+        server.messages[4] = _raw_reply(4)
+        result = sync_once()
+        assert server.fetched[-1] == [4]
+        assert server.fetch_items[-2] == "CHANGEDSINCE 2"
+        assert result['flags'] == {2: True}
+        assert stored(2)['is_read']
+        assert sorted(m['uid'] for m in store.get_by_query({'unread': True})) == [3, 4]
+        assert service.store.get_sync_state(account['id'])['highest_modseq'] == 3
+
+        # UIDVALIDITY change: bounded resync re-keys known messages instead of duplicating them
+        server.uidvalidity = 2
+        server.messages = {uid + 10: _raw_reply(uid) for uid in range(1, 6)}
+        monkeypatch.setattr(imap_client, "IMAP_SYNC_MAX_MESSAGES", 3)
+        result = sync_once()
+        assert result['resync']
+        assert server.fetched[-1] == [13, 14, 15]
+        assert len(store.get_all()) == 5
+        assert stored(3)['uid'] == 13 and stored(5)['uid'] == 15
+        assert store.create_message({**stored(4), 'id': None})['id'] == stored(4)['id']  # (INBOX, 14) is known
+        assert service.store.get_sync_state(account['id'])['uidvalidity'] == 2
+        assert service.store.get_sync_state(account['id'])['last_seen_uid'] == 15
+    finally:
+        server.close()
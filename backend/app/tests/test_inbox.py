@@ -7,6 +7,7 @@ from app.main import app
 from app.services.inbox.accounts import MailAccountService
 from app.services.inbox.fetch_runner import MailMessageStore
 from app.services.inbox.linker import MessageLinker
+from app.models.campaign import MessageStatus
 
 client = TestClient(app)
 
@@ -304,6 +305,88 @@ class TestMessageLinker:
         assert result['weak_link'] is False
 
 
+class TestMessageLinkerIndex:
+    """Test the linker's lookup index and its incremental updates"""
+
+    def setup_method(self):
+        """Real campaign and lead stores wired to the linker"""
+        from app.services.campaign_store import CampaignStore
+        from app.services.leads_store import LeadsStore
+
+        self.campaigns = CampaignStore()
+        self.leads = LeadsStore()
+        self.leads.upsert(email="Reply@Example.com")
+        self.lead_id = self.leads.get_by_email("reply@example.com").id
+        self.linker = MessageLinker(self.campaigns, self.leads, self.campaigns)
+
+    def _message(self, msg_id, sent_at=None, smtp_id=None):
+        from app.models.campaign import Message
+        return Message(id=msg_id, campaign_id=f"camp-{msg_id}", lead_id=self.lead_id, domain_used="x.nl",
+                       scheduled_at=datetime(2025, 1, 1), sent_at=sent_at, smtp_message_id=smtp_id)
+
+    def _inbound(self, **headers):
+        return {'id': 'inbox-1', 'from_email': 'reply@example.com', 'subject': 'Re: hi',
+                'received_at': datetime(2025, 1, 20, 12), **headers}
+
+    def test_chronology_picks_latest_sent_before_receipt(self):
+        from datetime import timedelta
+        self.campaigns.create_messages([
+            self._message("old", sent_at=datetime(2024, 12, 1)),  # outside the 30 day window
+            self._message("m1", sent_at=datetime(2025, 1, 5)),
+            self._message("m2", sent_at=datetime(2025, 1, 15)),
+            self._message("later", sent_at=datetime(2025, 1, 25)),  # after receipt
+        ])
+
+        assert self.linker.link_message(self._inbound())['linked_message_id'] == 'm2'
+
+        # Exactly at the send time still counts; 30 days after the last send no longer does
+        at_send = self._inbound(received_at=datetime(2025, 1, 15))
+        assert self.linker.link_message(at_send)['linked_message_id'] == 'm2'
+
+        late = self._inbound(received_at=datetime(2025, 1, 25) + timedelta(days=31))
+        result = self.linker.link_message(late)
+        assert result['weak_link'] is True
+        assert result['linked_lead_id'] == self.lead_id
+
+    def test_index_follows_sends_and_new_leads(self):
+        """Index is built once, then kept current by the store listeners"""
+        self.campaigns.create_messages([self._message("m1")])
+        assert self.linker.link_message(self._inbound())['linked_message_id'] is None
+
+        message = self.campaigns.get_message("m1")
+        message.smtp_message_id = "<m1@x.nl>"
+        self.campaigns.update_message_status("m1", MessageStatus.sent)
+        message.sent_at = datetime(2025, 1, 10)
+        self.campaigns.save_message(message)
+
+        assert self.linker.link_message(self._inbound(in_reply_to="<m1@x.nl>"))['linked_message_id'] == 'm1'
+        assert self.linker.link_message(self._inbound())['linked_message_id'] == 'm1'
+        assert self.linker.index.latest_sent(self.lead_id, datetime(2025, 1, 20), datetime(2025, 1, 1)) is message
+
+        self.leads.upsert(email="new@example.com")
+        result = self.linker.link_message(self._inbound(from_email="NEW@example.com"))
+        assert result['linked_lead_id'] == self.leads.get_by_email("new@example.com").id
+
+    def test_lookups_do_not_scan_stores(self):
+        self.campaigns.create_messages([self._message("m1", datetime(2025, 1, 10), "<m1@x.nl>")])
+        self.linker.index
+        self.campaigns.get_all = MagicMock(side_effect=AssertionError("store scanned"))
+        self.leads.get_all = MagicMock(side_effect=AssertionError("store scanned"))
+
+        result = self.linker.link_message(self._inbound(references=["<other@x.nl>", "<m1@x.nl>"]))
+        assert result['linked_message_id'] == 'm1'
+        assert self.linker.link_message(self._inbound())['linked_lead_id'] == self.lead_id
+
+    def test_resolves_from_headers(self):
+        """Headers-first fetching skips the body only for replies to known outbound messages"""
+        self.campaigns.create_messages([self._message("m1", datetime(2025, 1, 10), "<m1@x.nl>")])
+
+        assert self.linker.resolves_from_headers(self._inbound(in_reply_to="<m1@x.nl>"))
+        assert self.linker.resolves_from_headers(self._inbound(references=["<other@x.nl>", "<m1@x.nl>"]))
+        assert not self.linker.resolves_from_headers(self._inbound(in_reply_to="<other@x.nl>"))
+        assert not self.linker.resolves_from_headers(self._inbound())
+
+
 class TestMailMessageStore:
     """Test mail message store functionality"""
     
@@ -329,6 +412,26 @@ class TestMailMessageStore:
         assert result['account_id'] == 'acc-test'
         assert result['uid'] == 9999
     
+    def test_batch_with_naive_and_aware_received_at(self):
+        """utcnow fallbacks (naive) and parsed Date headers (aware) share one ordered index"""
+        from datetime import timedelta, timezone
+        base = datetime(2025, 1, 6, 9, 0)
+        batch = [
+            {'account_id': 'acc-tz', 'folder': 'INBOX', 'uid': uid, 'from_email': 'a@b.nl',
+             'subject': f'm{uid}', 'snippet': '', 'received_at': received_at}
+            for uid, received_at in ((1, base.replace(tzinfo=timezone.utc)),
+                                     (2, base + timedelta(minutes=5)),  # naive fallback
+                                     (3, (base + timedelta(minutes=10)).replace(tzinfo=timezone(timedelta(hours=1)))))
+        ]
+        
+        assert len(self.store.create_messages(batch)) == 3
+        listed = self.store.get_by_query({'account_id': 'acc-tz'})
+        assert [m['uid'] for m in listed] == [2, 1, 3]  # 09:05Z, 09:00Z, 08:10Z
+        assert all(m['received_at'].tzinfo == timezone.utc for m in listed)
+        
+        page = self.store.get_page_by_query({}, 1)
+        assert self.store.get_page_by_query({}, 1, page.next_cursor).items
+    
     def test_duplicate_message_ignored(self):
         """Test that duplicate messages are ignored"""
         message_data = {
@@ -391,3 +494,198 @@ class TestMailMessageStore:
         for msg in messages:
             search_text = f"{msg['from_email']} {msg.get('from_name', '')} {msg['subject']}".lower()
             assert 'john' in search_text
+
+    def _fetched(self, uid, account_id='acc-test', minutes=0, **extra):
+        from datetime import timedelta
+        return {
+            'account_id': account_id,
+            'folder': 'INBOX',
+            'uid': uid,
+            'from_email': f'sender{uid}@example.com',
+            'from_name': None,
+            'subject': f'Reply {uid}',
+            'is_read': False,
+            'received_at': datetime(2025, 1, 1) + timedelta(minutes=minutes),
+            **extra
+        }
+    
+    def test_bulk_insert_skips_duplicates(self):
+        """Duplicates (also within one batch) are found via the composite key"""
+        first = self.store.create_messages([self._fetched(1), self._fetched(2)])
+        second = self.store.create_messages([self._fetched(2), self._fetched(3), self._fetched(3)])
+        
+        assert [m['uid'] for m in first] == [1, 2]
+        assert [m['uid'] for m in second] == [3]
+        assert len(self.store.get_all()) == 3
+        assert self.store.create_message(self._fetched(1))['id'] == first[0]['id']
+    
+    def test_indexed_filters_sorted_by_received_at(self):
+        """Indexed filters return received_at desc without re-sorting; mark_as_read updates the index"""
+        self.store.create_messages([
+            self._fetched(1, minutes=5),
+            self._fetched(2, minutes=1, linked_campaign_id='camp-1'),
+            self._fetched(3, account_id='acc-other', minutes=3, linked_campaign_id='camp-1'),
+            self._fetched(4, minutes=9, linked_campaign_id='camp-1'),
+        ])
+        
+        assert [m['uid'] for m in self.store.get_by_query({})] == [4, 1, 3, 2]
+        assert [m['uid'] for m in self.store.get_by_query({'campaign_id': 'camp-1'})] == [4, 3, 2]
+        assert [m['uid'] for m in self.store.get_by_query({'account_id': 'acc-test', 'campaign_id': 'camp-1'})] == [4, 2]
+        
+        read_id = self.store.get_by_query({'campaign_id': 'camp-1'})[0]['id']
+        self.store.mark_as_read(read_id)
+        assert [m['uid'] for m in self.store.get_by_query({'unread': True})] == [1, 3, 2]
+        assert [m['uid'] for m in self.store.get_by_query({'unread': False})] == [4]
+        
+        page = self.store.get_page_by_query({'unread': True}, 2, include_total=True)
+        rest = self.store.get_page_by_query({'unread': True}, 2, page.next_cursor)
+        assert [m['uid'] for m in page.items + rest.items] == [1, 3, 2]
+        assert page.total == 3
+        assert rest.next_cursor is None
+
+
+class TestFetchRunnerConcurrency:
+    """IMAP sessions run off the event loop, in parallel, with a timeout"""
+    
+    def _runner(self, fetch_timeout=5.0, folder_connections=3):
+        from app.services.inbox.fetch_runner import FetchRunner
+        
+        accounts_service = MagicMock()
+        accounts_service._get_password_from_secret_store.return_value = "secret"
+        linker = MagicMock()
+        linker.link_message.return_value = {}
+        runner = FetchRunner(accounts_service, MailMessageStore(), linker, max_workers=4, fetch_timeout=fetch_timeout,
+                             folder_connections=folder_connections)
+        runner._client = lambda account: MagicMock(**{'connect.return_value': True})
+        return runner
+    
+    def _account(self, account_id):
+        return {'id': account_id, 'label': account_id, 'secret_ref': 'ref', 'imap_host': 'imap.test',
+                'imap_port': 993, 'use_ssl': True, 'username': 'user', 'last_seen_uid': 0}
+    
+    def test_accounts_fetched_in_parallel_without_blocking_loop(self):
+        import asyncio
+        import threading
+        import time
+        
+        runner = self._runner()
+        threads = []
+        
+        def slow_sync(account, client, folder='INBOX'):
+            threads.append(threading.current_thread().name)
+            time.sleep(0.3)
+            return {'folder': 'INBOX', 'uidvalidity': 1, 'highest_modseq': None, 'resync': False,
+                    'last_seen_uid': 0, 'flags': {},
+                    'messages': [{'uid': 1, 'from_email': 'a@x.nl', 'from_name': None, 'subject': 'Re',
+                                  'received_at': datetime(2025, 1, 1), 'is_read': False}]}
+        
+        runner.sync = slow_sync
+        
+        async def scenario():
+            ticks = 0
+            
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            
+            tick_task = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            results = await asyncio.gather(*(runner._fetch_account(self._account(f"acc-{i}"), "run") for i in range(3)))
+            elapsed = time.perf_counter() - started
+            tick_task.cancel()
+            return results, elapsed, ticks
+        
+        results, elapsed, ticks = asyncio.run(scenario())
+        
+        assert all(r['success'] and r['new_count'] == 1 for r in results)
+        assert elapsed < 0.8  # three 0.3s sessions overlapped
+        assert ticks > 10  # event loop kept running during the fetch
+        assert all(name.startswith("imap-fetch") for name in threads)
+        assert len(runner.messages_store.get_all()) == 3
+    
+    def test_fetch_timeout_records_error(self):
+        import asyncio
+        import time
+        
+        runner = self._runner(fetch_timeout=0.05)
+        runner.sync = lambda account, client, folder: time.sleep(0.3) or []
+        
+        result = asyncio.run(runner._fetch_account(self._account("acc-slow"), "run"))
+        
+        assert result['success'] is False
+        assert "timed out" in result['error']
+        assert runner.messages_store.get_runs("acc-slow")[0]['error'] == result['error']
+        assert "acc-slow" not in runner._fetching
+    
+    def _folder_result(self, folder):
+        return {'folder': folder, 'uidvalidity': 1, 'highest_modseq': None, 'resync': False,
+                'last_seen_uid': 0, 'flags': {},
+                'messages': [{'uid': 1, 'from_email': 'a@x.nl', 'from_name': None, 'subject': 'Re',
+                              'received_at': datetime(2025, 1, 1), 'is_read': False}]}
+    
+    def test_folders_fetched_concurrently_within_connection_limit(self):
+        import asyncio
+        import threading
+        import time
+        
+        runner = self._runner(folder_connections=2)
+        lock = threading.Lock()
+        active, peak = 0, 0
+        
+        def sync(account, client, folder):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.2)
+            with lock:
+                active -= 1
+            return self._folder_result(folder)
+        
+        runner.sync = sync
+        account = {**self._account("acc-1"), 'folders': ['INBOX', 'Junk', 'Bounces', 'Archive']}
+        
+        started = time.perf_counter()
+        result = asyncio.run(runner._fetch_account(account, "run"))
+        elapsed = time.perf_counter() - started
+        
+        assert result['success'] and result['new_count'] == 4
+        assert peak == 2
+        assert 0.35 < elapsed < 0.75  # two rounds of two sessions
+        stored = runner.messages_store.get_all()
+        assert sorted(m['folder'] for m in stored) == ['Archive', 'Bounces', 'INBOX', 'Junk']
+        runner.accounts_service.store.update_fetch_info.assert_any_call("acc-1", 1, "Junk")
+    
+    def test_failed_folder_keeps_other_folders(self):
+        import asyncio
+        
+        runner = self._runner()
+        
+        def sync(account, client, folder):
+            if folder == 'Junk':
+                raise Exception("Failed to select Junk folder")
+            return self._folder_result(folder)
+        
+        runner.sync = sync
+        account = {**self._account("acc-1"), 'folders': ['INBOX', 'Junk']}
+        
+        result = asyncio.run(runner._fetch_account(account, "run"))
+        
+        assert result['success'] is False
+        assert result['new_count'] == 1
+        assert result['error'] == "Junk: Failed to select Junk folder"
+        assert runner.messages_store.get_runs("acc-1")[0]['new_count'] == 1
+    
+    def test_account_with_fetch_in_flight_is_skipped(self):
+        import asyncio
+        
+        runner = self._runner()
+        runner.accounts_service.get_active_accounts.return_value = [self._account("acc-1")]
+        runner._fetching.add("acc-1")
+        runner._fetch_account = MagicMock()
+        
+        asyncio.run(runner.start_fetch_all_accounts())
+        
+        runner._fetch_account.assert_not_called()
@@ -0,0 +1,92 @@
+"""
+Tests for bulk lead enrichment (one report-link pass per page, bitmask completeness).
+"""
+from unittest.mock import MagicMock, patch
+
+from app.models.report import ReportType
+from app.services import lead_enrichment
+from app.services.lead_enrichment import enrich_lead_with_metadata, enrich_leads_bulk
+from app.services.leads_store import LeadsStore
+from app.services.reports_store import ReportsStore
+from app.services.template_variables import template_variables_service
+
+
+def _leads():
+    store = LeadsStore()
+    store.upsert(email="full@acme.nl", company="Acme", url="https://acme.nl", image_key="acme_picture",
+                 vars={"keyword": "seo", "google_rank": "3"})
+    store.upsert(email="half@beta.nl", company="Beta", vars={"keyword": "ads"})
+    store.upsert(email="bare@gamma.nl")
+    return [rec.to_out() for rec in store.records()]
+
+
+def _reports(leads):
+    reports = ReportsStore()
+    for lead in leads[:2]:
+        report = reports.create_report({
+            "filename": f"{lead.id}.pdf", "type": ReportType.pdf, "size_bytes": 10, "storage_path": "x"
+        })
+        reports.create_link(report.id, lead_id=lead.id)
+    return reports
+
+
+def test_bulk_matches_single_enrichment():
+    leads = _leads()
+    reports = _reports(leads)
+
+    with patch.object(lead_enrichment, "reports_store", reports):
+        single = [enrich_lead_with_metadata(lead, include_completeness=True) for lead in leads]
+        bulk = enrich_leads_bulk(leads, include_completeness=True)
+
+    assert bulk == single
+    assert [e["has_report"] for e in bulk] == [True, True, False]
+    assert [e["is_complete"] for e in bulk] == [True, False, False]
+    assert bulk[1]["vars_completeness"]["missing"] == ["image.cid", "lead.url", "vars.google_rank"]
+
+
+def test_bulk_uses_one_report_lookup_per_page():
+    leads = _leads()
+    reports = _reports(leads)
+    reports.get_report_for_lead = MagicMock(side_effect=AssertionError("per-lead lookup"))
+
+    with patch.object(lead_enrichment, "reports_store", reports):
+        enriched = enrich_leads_bulk(leads, include_completeness=True)
+
+    assert sum(e["has_report"] for e in enriched) == 2
+
+
+def test_bulk_reads_materialised_has_report():
+    """List pages use the lead's materialised has_report, the same column the is_complete filter uses"""
+    store = LeadsStore()
+    store.upsert(email="full@acme.nl", company="Acme", url="https://acme.nl", image_key="acme_picture",
+                 vars={"keyword": "seo", "google_rank": "3"})
+    store.upsert(email="bare@gamma.nl")
+    full_id = store.get_by_email("full@acme.nl").id
+    store.set_report_bound(full_id, True)
+    reports = MagicMock()
+    reports.get_report_ids_for_leads.side_effect = AssertionError("report link lookup")
+
+    items, _ = store.query(page=1, page_size=10)
+    with patch.object(lead_enrichment, "reports_store", reports):
+        enriched = enrich_leads_bulk(items, include_completeness=True, materialised=True)
+
+    by_id = {e["id"]: e for e in enriched}
+    assert by_id[full_id]["has_report"] and by_id[full_id]["is_complete"]
+    assert [e["id"] for e in enriched if e["is_complete"]] == [lead.id for lead in store.query(page=1, page_size=10, is_complete=True)[0]]
+    assert sum(e["has_report"] for e in enriched) == 1
+
+
+def test_completeness_bitmask():
+    full, half, bare = _leads()
+
+    assert template_variables_service.missing_mask(full) == 0
+    assert template_variables_service.calculate_completeness(half) == {
+        "filled": 2,
+        "total": 5,
+        "missing": ["image.cid", "lead.url", "vars.google_rank"],
+        "percentage": 40,
+        "is_complete": False,
+    }
+    assert template_variables_service.get_missing_variables(bare) == [
+        "image.cid", "lead.company", "lead.url", "vars.google_rank", "vars.keyword"
+    ]
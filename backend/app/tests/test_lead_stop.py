@@ -56,3 +56,31 @@ def test_stopped_lead_check():
     
     # Check if lead is stopped
     assert store.is_stopped(lead_id) is True
+
+
+def test_stop_lead_cancels_queued_messages():
+    """A manual stop cancels the lead's queued messages and reports the real count."""
+    from datetime import datetime
+    from app.api.campaigns import scheduler, campaign_store
+    from app.models.campaign import Message, MessageStatus
+    from app.services.domain_queue import DomainQueue
+
+    _, lead = store.upsert(email="stop-queue@shop.nl")
+    messages = [
+        Message(id=f"stop-q{i}", campaign_id="c-stop", lead_id=lead_id, domain_used="stop.example",
+                scheduled_at=datetime(2030, 1, 7, 8, 20 * i), status=MessageStatus.queued)
+        for i, lead_id in enumerate([lead.id, lead.id, "other-lead"])
+    ]
+    campaign_store.create_messages(messages)
+    queue = scheduler.domain_queues.setdefault("stop.example", DomainQueue())
+    for message in messages:
+        queue.push(message)
+
+    response = client.post(f"/api/v1/leads/{lead.id}/stop", headers=AUTH)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["canceled"] == 2
+    assert [campaign_store.get_message(f"stop-q{i}").status for i in range(3)] == [
+        MessageStatus.canceled, MessageStatus.canceled, MessageStatus.queued
+    ]
+    assert [item["message"].id for item in queue] == ["stop-q2"]
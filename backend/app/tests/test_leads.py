@@ -53,11 +53,16 @@ def test_import_csv():
     assert r.status_code == 200
     body = r.json()
     data = body["data"]
-    assert data["inserted"] >= 1
-    assert data["updated"] >= 1
-    assert data["skipped"] >= 1
     assert data["jobId"].startswith("import-")
 
+    # Import runs as a background job; counts are reported on the job
+    r2 = client.get(f"/api/v1/import/jobs/{data['jobId']}", headers=AUTH)
+    job = r2.json()["data"]
+    assert job["status"] == "succeeded"
+    assert job["inserted"] >= 1
+    assert job["updated"] >= 1
+    assert job["skipped"] >= 1
+
 
 def test_asset_url():
     r = client.get("/api/v1/assets/image-by-key", headers=AUTH, params={"key": "acme-logo"})
@@ -0,0 +1,242 @@
+"""
+Unit tests for the chunked background lead import.
+"""
+import io
+import os
+import re
+import tempfile
+from urllib.parse import urlparse
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from openpyxl import Workbook
+
+from app.services.import_jobs import import_job_store
+from app.services.leads_import import run_import_job, start_import
+from app.services.leads_store import LeadsStore
+
+
+def _csv_file(rows: int, invalid_every: int = 0) -> str:
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as fh:
+        fh.write("email,company,website,Sector\n")
+        for i in range(rows):
+            email = f"bad-{i}" if invalid_every and i % invalid_every == 0 else f"user{i}@lead{i}.nl"
+            fh.write(f"{email},Company {i},https://www.lead{i}.nl,retail\n")
+    return path
+
+
+def test_csv_imported_in_chunks_with_progress(monkeypatch):
+    """Each chunk is upserted and published on the job before the next one is read."""
+    store = LeadsStore()
+    path = _csv_file(25, invalid_every=10)
+    import_job_store.create(job_id="import-chunks", filename="leads.csv", status="queued")
+
+    progress = []
+    original = import_job_store.update_progress
+
+    def record(job_id, **kwargs):
+        progress.append((kwargs.get("progress"), kwargs.get("inserted")))
+        return original(job_id, **kwargs)
+
+    monkeypatch.setattr(import_job_store, "update_progress", record)
+    run_import_job("import-chunks", path, store, chunk_rows=10)
+
+    job = import_job_store.get("import-chunks")
+    assert job.status == "succeeded"
+    assert job.progress == 100.0
+    assert (job.inserted, job.updated, job.skipped) == (22, 0, 3)
+    assert [e.row for e in job.errors] == [1, 11, 21]
+
+    # Start, three chunks, final
+    assert len(progress) == 5
+    assert [p[1] for p in progress[1:4]] == [9, 18, 22]
+    assert progress[1][0] < progress[2][0] < progress[3][0]
+
+    lead = store.get_by_email("user1@lead1.nl")
+    assert lead.domain == "lead1.nl"
+    assert lead.image_key == "lead1_picture"
+    assert lead.vars == {"sector": "retail"}
+    assert not os.path.exists(path)
+
+
+def test_duplicates_skipped_across_chunks():
+    store = LeadsStore()
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as fh:
+        fh.write("email,company\na@x.nl,A\nb@x.nl,B\nA@X.nl,A again\n")
+    import_job_store.create(job_id="import-dupes", filename="dupes.csv")
+
+    run_import_job("import-dupes", path, store, chunk_rows=2)
+
+    job = import_job_store.get("import-dupes")
+    assert (job.inserted, job.skipped) == (2, 1)
+    assert store.get_by_email("a@x.nl").company == "A"
+
+
+def test_xlsx_streamed_in_read_only_mode():
+    store = LeadsStore()
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Email", "Company", "URL"])
+    for i in range(7):
+        sheet.append([f"x{i}@shop{i}.com", f"Shop {i}", None])
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    workbook.save(path)
+    import_job_store.create(job_id="import-xlsx", filename="leads.xlsx")
+
+    run_import_job("import-xlsx", path, store, chunk_rows=3)
+
+    job = import_job_store.get("import-xlsx")
+    assert job.status == "succeeded"
+    assert job.inserted == 7
+    lead = store.get_by_email("x6@shop6.com")
+    assert lead.company == "Shop 6"
+    assert lead.url is None
+
+
+def test_start_import_returns_queued_job():
+    """Upload is validated and queued; nothing is imported until the task runs."""
+    store = LeadsStore()
+    tasks = BackgroundTasks()
+    upload = UploadFile(io.BytesIO(b"email,company\nq@queued.nl,Queued\n"), filename="q.csv")
+
+    import asyncio
+    result = asyncio.run(start_import(upload, store, tasks))
+
+    assert result.inserted == 0
+    assert import_job_store.get(result.jobId).status == "queued"
+    assert len(store) == 0
+
+    asyncio.run(tasks())
+    assert import_job_store.get(result.jobId).status == "succeeded"
+    assert store.get_by_email("q@queued.nl") is not None
+
+
+@pytest.mark.parametrize("content,detail", [
+    (b"", "Empty file"),
+    (b"email,company\n", "Empty file"),
+    (b"name,company\nx,y\n", "Column 'email' is required"),
+])
+def test_start_import_rejects_bad_files(content, detail):
+    import asyncio
+    upload = UploadFile(io.BytesIO(content), filename="bad.csv")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(start_import(upload, LeadsStore(), BackgroundTasks()))
+    assert exc.value.detail == detail
+
+
+def _domain_from_url(url):
+    if not url:
+        return None
+    try:
+        host = urlparse(url).netloc or urlparse("https://" + url).netloc
+        if host.startswith("www."):
+            host = host[4:]
+        return host or None
+    except Exception:
+        return None
+
+
+def _extract_root_domain(domain):
+    if not domain:
+        return None
+    if domain.startswith("www."):
+        domain = domain[4:]
+    parts = domain.split(".")
+    if len(parts) >= 2:
+        return re.sub(r"-+", "-", parts[0].lower().replace("_", "-"))
+    return domain.lower()
+
+
+def _legacy_normalize(df, seen, errors):
+    """Row-by-row reference (the pre-vectorised loop), emails lower-cased like the new stage."""
+    from app.services.import_jobs import ImportErrorItem
+    from app.services.leads_import import EMAIL_RE, KNOWN_COLUMNS
+
+    rows, skipped = [], 0
+    df = df.astype(object).where(df.notna(), None)
+    for index, row in zip(df.index, df.to_dict("records")):
+        email = str(row.get("email") or "").strip()
+        if not email or not EMAIL_RE.match(email):
+            skipped += 1
+            errors.append(ImportErrorItem(row=int(index) + 1, field="email", reason="invalid email"))
+            continue
+        if email.lower() in seen:
+            skipped += 1
+            continue
+        seen.add(email.lower())
+        url = row.get("url") or row.get("website") or None
+        url = str(url).strip() if isinstance(url, str) else url
+        domain = _domain_from_url(url)
+        root = _extract_root_domain(domain) if domain else None
+        extra = {c: v for c, v in row.items() if c not in KNOWN_COLUMNS and v is not None}
+        rows.append(dict(
+            email=email.lower(),
+            company=row.get("company") or row.get("company_name") or None,
+            url=url,
+            domain=domain,
+            image_key=f"{root}_picture" if root else None,
+            vars=extra or None,
+        ))
+    return rows, skipped
+
+
+def _sample_frame(n: int):
+    import pandas as pd
+
+    urls = [
+        "https://www.Shop-{i}.nl/contact", "http://my__agency--{i}.com", "lead{i}.be/path?x=1",
+        "www.bakkerij_{i}.nl", "", None, "https://intranet{i}", "//cdn{i}.example.org/a",
+    ]
+    data = {"email": [], "company": [], "url": [], "website": [], "city": []}
+    for i in range(n):
+        if i % 17 == 0:
+            email = f"broken{i}.example.com"
+        elif i % 13 == 0:
+            email = f"  User{i - 1}@Example.com "
+        else:
+            email = f"User{i}@Example.com"
+        data["email"].append(email)
+        data["company"].append(None if i % 5 == 0 else f"Company {i}")
+        data["url"].append(urls[i % len(urls)] and urls[i % len(urls)].format(i=i))
+        data["website"].append(f"site{i}.nl" if i % 3 == 0 else None)
+        data["city"].append(None if i % 4 == 0 else "Utrecht")
+    return pd.DataFrame(data)
+
+
+def _comparable(rows):
+    return [{k: v for k, v in row.items() if k != "status"} for row in rows]
+
+
+def test_normalize_chunk_matches_row_loop():
+    from app.services.leads_import import normalize_chunk
+
+    df = _sample_frame(2000)
+    expected_errors, errors = [], []
+    expected = _legacy_normalize(df, set(), expected_errors)
+    actual = normalize_chunk(df, set(), errors)
+
+    assert _comparable(actual[0]) == expected[0]
+    assert actual[1] == expected[1]
+    assert errors == expected_errors
+
+
+@pytest.mark.skipif(not os.getenv("RUN_PERF_TESTS"), reason="benchmark; set RUN_PERF_TESTS=1 to run")
+def test_normalize_chunk_throughput(record_property):
+    """Benchmark: rows/sec of the vectorised stage vs the row-by-row loop (recorded, not compared)."""
+    import time
+    from app.services.leads_import import normalize_chunk
+
+    df = _sample_frame(50000)
+
+    started = time.perf_counter()
+    _legacy_normalize(df, set(), [])
+    record_property("loop_rows_per_sec", round(len(df) / (time.perf_counter() - started)))
+
+    started = time.perf_counter()
+    rows, skipped = normalize_chunk(df, set(), [])
+    record_property("vectorised_rows_per_sec", round(len(df) / (time.perf_counter() - started)))
+
+    assert len(rows) + skipped == len(df)
@@ -0,0 +1,221 @@
+"""
+Tests for the hash-indexed in-memory LeadsStore.
+"""
+import time
+
+from app.schemas.lead import LeadStatus
+from app.services.leads_store import LeadsStore
+
+
+def _ids(result):
+    leads, _ = result
+    return [lead.id for lead in leads]
+
+
+def test_upsert_matches_email_case_insensitive():
+    store = LeadsStore()
+    created, rec = store.upsert(email="Info@Acme.nl", company="Acme")
+    created_again, same = store.upsert(email="info@acme.NL", url="acme.nl")
+
+    assert created is True and created_again is False
+    assert same is rec
+    assert len(store) == 1
+    assert store.get_by_email("INFO@ACME.NL").url == "acme.nl"
+
+
+def test_point_operations_by_id():
+    store = LeadsStore()
+    _, rec = store.upsert(email="a@x.nl")
+
+    assert store.get(rec.id).email == "a@x.nl"
+    assert store.get("missing") is None
+    assert store.stop_lead(rec.id) is True
+    assert store.is_stopped(rec.id) is True
+    assert store.is_stopped("missing") is False
+    assert store.update_status("missing", LeadStatus.suppressed) is False
+
+
+def test_indexes_follow_mutations():
+    """Status, list and TLD indexes are kept in sync with updates."""
+    store = LeadsStore()
+    _, a = store.upsert(email="a@x.nl", domain="a.nl", list_name="q1")
+    _, b = store.upsert(email="b@x.nl", domain="b.com", list_name="q1")
+
+    store.update_status(a.id, LeadStatus.suppressed)
+    store.upsert(email="b@x.nl", list_name="q2")
+
+    query = dict(page=1, page_size=25)
+    assert _ids(store.query(**query, status=[LeadStatus.suppressed])) == [a.id]
+    assert _ids(store.query(**query, status=[LeadStatus.active])) == [b.id]
+    assert _ids(store.query(**query, list_name="q1")) == [a.id]
+    assert _ids(store.query(**query, list_name="q2")) == [b.id]
+    assert _ids(store.query(**query, domain_tld=[".nl"])) == [a.id]
+    assert _ids(store.query(**query, domain_tld=["com", "nl"])) == [a.id, b.id]
+
+
+def test_query_intersects_filters_and_skips_deleted():
+    store = LeadsStore()
+    recs = [store.upsert(email=f"l{i}@x.nl", domain="x.nl" if i % 2 else "x.com", list_name="q1")[1] for i in range(6)]
+    store.soft_delete(recs[1].id)
+
+    result = store.query(page=1, page_size=25, domain_tld=[".nl"], list_name="q1")
+    assert _ids(result) == [recs[3].id, recs[5].id]
+    assert result[1] == 2
+
+    with_deleted = store.query(page=1, page_size=25, domain_tld=[".nl"], include_deleted=True)
+    assert _ids(with_deleted) == [recs[1].id, recs[3].id, recs[5].id]
+
+    assert _ids(store.get_deleted_leads()) == [recs[1].id]
+    store.restore(recs[1].id)
+    assert store.get_deleted_leads()[1] == 0
+
+
+def test_bulk_upsert_is_linear():
+    """20k upserts (including updates) stay fast with the email index."""
+    store = LeadsStore()
+    started = time.perf_counter()
+    for i in range(20000):
+        store.upsert(email=f"lead{i % 15000}@example.com", company="Acme")
+    elapsed = time.perf_counter() - started
+
+    assert len(store) == 15000
+    assert elapsed < 5
+
+
+def test_clear_resets_indexes():
+    store = LeadsStore()
+    store.upsert(email="a@x.nl", list_name="q1")
+    store.clear()
+
+    assert len(store) == 0
+    assert store.get_by_email("a@x.nl") is None
+    assert store.query(page=1, page_size=25, list_name="q1")[1] == 0
+
+
+def test_upsert_many_returns_created_flags():
+    store = LeadsStore()
+    store.upsert(email="old@x.nl", company="Old", vars={"a": 1})
+
+    created = store.upsert_many([
+        {"email": "new@x.nl", "company": "New"},
+        {"email": "OLD@x.nl", "company": None, "vars": {"b": 2}},
+        {"email": "new@x.nl", "url": "new.nl"},
+    ])
+
+    assert created == [True, False, False]
+    assert len(store) == 2
+    old = store.get_by_email("old@x.nl")
+    assert old.company == "Old"
+    assert old.vars == {"a": 1, "b": 2}
+    assert store.get_by_email("new@x.nl").url == "new.nl"
+
+
+def test_db_upsert_many_batches_rpc_calls():
+    """One upsert_leads() RPC per batch; repeated emails go to the next batch; flags follow input order."""
+    from unittest.mock import MagicMock
+    from app.services.db_leads_store import DBLeadsStore
+
+    store = DBLeadsStore()
+    store.supabase = MagicMock()
+    calls = []
+
+    def rpc(name, params):
+        rows = params["leads_json"]
+        calls.append((name, [r["email"] for r in rows]))
+        result = MagicMock()
+        result.execute.return_value.data = [
+            {"lead_email": r["email"], "created": r["email"] != "b@x.nl"} for r in rows
+        ]
+        return result
+
+    store.supabase.rpc.side_effect = rpc
+    records = [
+        {"email": "a@x.nl", "status": LeadStatus.active, "vars": {"k": 1}},
+        {"email": "b@x.nl"},
+        {"email": "a@x.nl", "company": "A"},
+        {"email": "c@x.nl"},
+    ]
+
+    created = store.upsert_many(records, batch_size=3)
+
+    assert calls == [
+        ("upsert_leads", ["a@x.nl", "b@x.nl"]),
+        ("upsert_leads", ["a@x.nl", "c@x.nl"]),
+    ]
+    assert created == [True, False, True, True]
+
+
+def _complete_fields(**overrides):
+    fields = dict(company="Acme", url="https://acme.nl", image_key="acme_picture",
+                  vars={"keyword": "seo", "google_rank": "2"})
+    fields.update(overrides)
+    return fields
+
+
+def test_is_complete_filter_uses_materialised_completeness():
+    from app.services.reports_store import ReportsStore
+
+    store = LeadsStore()
+    reports = ReportsStore()
+    reports.add_link_listener(store.set_report_bound)
+    _, full = store.upsert(email="full@acme.nl", **_complete_fields())
+    _, partial = store.upsert(email="partial@acme.nl", **_complete_fields(vars={"keyword": "seo"}))
+
+    # Nothing is complete without a bound report
+    assert store.query(page=1, page_size=25, is_complete=True)[1] == 0
+
+    report = reports.create_report({"filename": "r.pdf", "type": "pdf", "size_bytes": 1, "storage_path": "r"})
+    reports.create_link(report.id, lead_id=full.id)
+    assert _ids(store.query(page=1, page_size=25, is_complete=True)) == [full.id]
+    assert _ids(store.query(page=1, page_size=25, is_complete=False)) == [partial.id]
+
+    # Rebinding the report moves completeness; filling vars completes the other lead
+    store.upsert(email="partial@acme.nl", vars={"google_rank": "7"})
+    reports.create_link(report.id, lead_id=partial.id)
+    assert _ids(store.query(page=1, page_size=25, is_complete=True)) == [partial.id]
+
+    reports.remove_links_for_report(report.id)
+    assert store.query(page=1, page_size=25, is_complete=True)[1] == 0
+
+
+def test_completeness_recomputed_when_template_set_changes():
+    from app.services.template_variables import template_variables_service
+
+    store = LeadsStore()
+    _, rec = store.upsert(email="a@acme.nl", **_complete_fields(vars={}))
+    store.set_report_bound(rec.id, True)
+    assert store.query(page=1, page_size=25, is_complete=True)[1] == 0
+
+    try:
+        template_variables_service.invalidate()
+        template_variables_service._cached_variables = {"lead.company", "image.cid"}
+        template_variables_service._compiled_checks = None  # listeners may have compiled the old set
+        assert _ids(store.query(page=1, page_size=25, is_complete=True)) == [rec.id]
+    finally:
+        template_variables_service.invalidate()
+
+    assert store.query(page=1, page_size=25, is_complete=True)[1] == 0
+
+
+def test_template_set_change_notifies_listeners():
+    from app.services.template_variables import TemplateVariablesService
+
+    service = TemplateVariablesService()
+    refreshed = []
+    service.add_change_listener(lambda: refreshed.append(service.version))
+
+    service.invalidate()
+
+    assert refreshed == [1]
+
+
+def test_app_refreshes_lead_completeness_on_template_reload():
+    """main registers the lead store's refresh, so a reloaded template set reaches is_complete"""
+    import app.main  # noqa: F401  (wires the listener)
+    from app.services.store_factory import leads_store
+    from app.services.template_variables import template_variables_service
+
+    template_variables_service.invalidate()
+
+    # Refreshed eagerly, not on the next is_complete query
+    assert leads_store._completeness_version == template_variables_service.version
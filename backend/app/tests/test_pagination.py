@@ -0,0 +1,226 @@
+"""
+Tests for keyset (cursor) pagination across the list stores.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.models.campaign import Campaign, Message
+from app.models.report import ReportType
+from app.schemas.campaign import CampaignQuery, MessageQuery
+from app.schemas.report import ReportsQuery
+from app.services.campaign_store import CampaignStore
+from app.services.db_leads_store import DBLeadsStore
+from app.services.inbox.fetch_runner import MailMessageStore
+from app.services.leads_store import LeadsStore
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+
+BASE = datetime(2025, 1, 1, 9, 0)
+
+
+def _walk(fetch):
+    """All items of a listing by following next_cursor from the first page."""
+    items, cursor, pages = [], "", 0
+    while cursor is not None:
+        page = fetch(cursor)
+        items.extend(page.items)
+        cursor = page.next_cursor
+        pages += 1
+    return items, pages
+
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor(BASE, "c-1")) == (BASE, "c-1")
+    assert decode_cursor(encode_cursor(42, "lead_1")) == (42, "lead_1")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_keyset_page_breaks_ties_on_id():
+    """Equal sort keys never skip or repeat items across page boundaries."""
+    rows = [{"id": f"r{i:02d}", "at": BASE + timedelta(minutes=i // 4)} for i in range(20)]
+
+    def fetch(cursor):
+        return keyset_page(rows, lambda r: r["at"], lambda r: r["id"], 3, cursor, descending=True)
+
+    items, pages = _walk(fetch)
+    expected = sorted(rows, key=lambda r: (r["at"], r["id"]), reverse=True)
+    assert items == expected
+    assert pages == 7
+
+
+def test_campaigns_and_messages_pages_match_offset_order():
+    store = CampaignStore()
+    for i in range(7):
+        store.create_campaign(Campaign(id=f"c{i}", name=f"Campaign {i}", template_id="t1",
+                                       created_at=BASE + timedelta(days=i % 3)))
+    store.create_messages([
+        Message(id=f"m{i}", campaign_id="c1", lead_id=f"l{i}", domain_used="x.nl",
+                scheduled_at=BASE + timedelta(hours=i % 4))
+        for i in range(9)
+    ])
+
+    campaigns, _ = _walk(lambda cursor: store.campaigns_page(CampaignQuery(page_size=2, cursor=cursor)))
+    assert [c.id for c in campaigns] == ["c5", "c2", "c4", "c1", "c6", "c3", "c0"]
+
+    messages, _ = _walk(lambda cursor: store.messages_page(MessageQuery(page_size=4, campaign_id="c1", cursor=cursor)))
+    assert [m.id for m in messages] == [m.id for m in sorted(store.messages.values(),
+                                                             key=lambda m: (m.scheduled_at, m.id))]
+
+    page = store.messages_page(MessageQuery(page_size=4, campaign_id="c1", include_total=True))
+    assert page.total == 9
+    assert store.messages_page(MessageQuery(page_size=4, campaign_id="c1")).total is None
+
+
+def test_reports_page():
+    from app.services.reports_store import ReportsStore
+
+    store = ReportsStore()
+    for i in range(5):
+        report = store.create_report({"filename": f"r{i}.pdf", "type": ReportType.pdf,
+                                      "size_bytes": 1, "storage_path": "x"})
+        report.created_at = BASE + timedelta(minutes=i)
+    store.create_link(report.id, lead_id="lead-1")
+
+    first = store.reports_page(ReportsQuery(page_size=2, include_total=True))
+    assert [r.filename for r in first.items] == ["r4.pdf", "r3.pdf"]
+    assert first.items[0].bound_to is not None
+    assert first.total == 5
+
+    rest, _ = _walk(lambda cursor: store.reports_page(ReportsQuery(page_size=2, cursor=cursor or first.next_cursor)))
+    assert [r.filename for r in rest] == ["r2.pdf", "r1.pdf", "r0.pdf"]
+
+
+def test_inbox_page_by_received_at():
+    store = MailMessageStore()
+    for uid in range(6):
+        store.create_message({"account_id": "acc", "folder": "INBOX", "uid": uid, "from_email": f"a{uid}@x.nl",
+                              "from_name": None, "subject": "Re", "is_read": uid % 2 == 0,
+                              "linked_campaign_id": None, "received_at": BASE + timedelta(minutes=uid)})
+
+    items, _ = _walk(lambda cursor: store.get_page_by_query({"unread": True}, 2, cursor))
+    assert [m["uid"] for m in items] == [5, 3, 1]
+    assert [m["id"] for m in items] == [m["id"] for m in store.get_by_query({"unread": True})]
+
+
+def test_leads_query_page_walks_filtered_leads():
+    store = LeadsStore()
+    for i in range(12):
+        store.upsert(email=f"u{i}@shop{i}.nl", list_name="a" if i % 2 else "b")
+    store.soft_delete(store.get_by_email("u3@shop3.nl").id)
+
+    for filters in ({}, {"list_name": "a"}):
+        items, _ = _walk(lambda cursor: store.query_page(page_size=2, cursor=cursor, **filters))
+        expected, total = store.query(page=1, page_size=100, **filters)
+        assert [l.id for l in items] == [l.id for l in expected]
+        assert store.query_page(page_size=2, include_total=True, **filters).total == total
+
+
+def test_leads_endpoint_walks_cursor_pages():
+    """GET /leads?cursor= against the default in-memory store, with the API filter names."""
+    from fastapi.testclient import TestClient
+    from app.api.leads import store
+    from app.main import app
+
+    client = TestClient(app)
+    for i in range(5):
+        domain = f"cursor{i}.{'nl' if i % 2 else 'com'}"
+        store.upsert(email=f"c{i}@{domain}", domain=domain, list_name="cursor-walk",
+                     vars={"first_name": "A"} if i < 3 else {})
+
+    def fetch(cursor, **params):
+        r = client.get("/api/v1/leads", headers={"Authorization": "Bearer demo"},
+                       params={"list_name": "cursor-walk", "page_size": 2, "cursor": cursor, **params})
+        assert r.status_code == 200, r.text
+        data = r.json()["data"]
+        return MagicMock(items=data["items"], next_cursor=data["next_cursor"])
+
+    items, pages = _walk(fetch)
+    assert [l["email"] for l in items] == [f"c{i}@cursor{i}.{'nl' if i % 2 else 'com'}" for i in range(5)]
+    assert pages == 3
+
+    items, _ = _walk(lambda cursor: fetch(cursor, domain_tld=".nl", has_var=True, status="active"))
+    assert [l["email"] for l in items] == ["c1@cursor1.nl"]
+
+
+def test_leads_query_page_starts_at_cursor():
+    """A deep page does not scan the leads before the cursor."""
+    store = LeadsStore()
+    for i in range(50):
+        store.upsert(email=f"u{i}@x.nl")
+    cursor = store.query_page(page_size=45).next_cursor
+
+    seen = []
+
+    class SpyDict(dict):
+        def __getitem__(self, key):
+            seen.append(key)
+            return super().__getitem__(key)
+
+    store._leads = SpyDict(store._leads)
+    page = store.query_page(page_size=10, cursor=cursor)
+
+    assert [l.email for l in page.items] == [f"u{i}@x.nl" for i in range(45, 50)]
+    assert page.next_cursor is None
+    assert len(seen) == 5
+
+
+def test_leads_query_page_rejects_foreign_cursor():
+    store = LeadsStore()
+    store.upsert(email="a@x.nl")
+    with pytest.raises(InvalidCursor):
+        store.query_page(page_size=10, cursor=encode_cursor(BASE, "c1"))
+
+
+def test_db_leads_query_page_uses_keyset_filter():
+    store = DBLeadsStore.__new__(DBLeadsStore)
+    store.supabase = MagicMock()
+    query = store.supabase.table.return_value.select.return_value
+    for method in ("is_", "or_", "order", "limit", "eq"):
+        getattr(query, method).return_value = query
+    query.execute.return_value = MagicMock(data=[], count=None)
+    store._row_to_lead = lambda row: row
+
+    store.query_page(page_size=25, cursor=encode_cursor(datetime(2025, 1, 1, 9), "lead_0123456789ab"))
+
+    store.supabase.table.return_value.select.assert_called_once_with('*')
+    query.or_.assert_called_once_with(
+        'created_at.lt.2025-01-01T09:00:00,and(created_at.eq.2025-01-01T09:00:00,id.lt.lead_0123456789ab)'
+    )
+    query.limit.assert_called_once_with(26)
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor(datetime(2025, 1, 1, 9), "x),id.gt.(0"),
+    encode_cursor(datetime(2025, 1, 1, 9), "lead_abc,id.gt.0"),
+    encode_cursor("2025-01-01T09:00:00),id.gt.(0", "lead_0123456789ab"),
+    encode_cursor(42, "lead_0123456789ab"),
+])
+def test_db_leads_query_page_rejects_crafted_cursor(cursor):
+    store = DBLeadsStore.__new__(DBLeadsStore)
+    store.supabase = MagicMock()
+
+    with pytest.raises(InvalidCursor):
+        store.query_page(page_size=25, cursor=cursor)
+    store.supabase.table.assert_not_called()
+
+
+def test_db_leads_next_cursor_roundtrips_uuid_ids():
+    store = DBLeadsStore.__new__(DBLeadsStore)
+    store.supabase = MagicMock()
+    query = store.supabase.table.return_value.select.return_value
+    for method in ("is_", "or_", "order", "limit", "eq"):
+        getattr(query, method).return_value = query
+    lead_id = "0b6f3c1e-2a4d-4f5e-9c7b-1d2e3f4a5b6c"
+    rows = [{"created_at": "2025-01-01T09:00:00+00:00", "id": lead_id}] * 2
+    query.execute.return_value = MagicMock(data=rows, count=None)
+    store._row_to_lead = lambda row: row
+
+    page = store.query_page(page_size=1)
+    store.query_page(page_size=1, cursor=page.next_cursor)
+
+    query.or_.assert_called_once_with(
+        f'created_at.lt.2025-01-01T09:00:00+00:00,'
+        f'and(created_at.eq.2025-01-01T09:00:00+00:00,id.lt.{lead_id})'
+    )
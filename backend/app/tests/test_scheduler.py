@@ -149,8 +149,14 @@ class TestCampaignScheduler:
         current_time = datetime(2025, 9, 29, 8, 0, tzinfo=self.tz)
         ready_messages = self.scheduler.get_next_messages_to_send("punthelder-marketing.nl", current_time)
         
-        # Should get 2 messages (mail 1 for both leads)
-        assert len(ready_messages) == 2
+        # Each lead has its own slot: only lead-1's mail 1 is due at 08:00
+        assert len(ready_messages) == 1
+        assert ready_messages[0].lead_id == "lead-1"
+        
+        # lead-2's mail 1 follows in the next slot
+        current_time = datetime(2025, 9, 29, 8, 20, tzinfo=self.tz)
+        ready_messages += self.scheduler.get_next_messages_to_send("punthelder-marketing.nl", current_time)
+        assert [m.lead_id for m in ready_messages] == ["lead-1", "lead-2"]
         
         # All should be mail number 1
         for message in ready_messages:
@@ -336,3 +342,90 @@ class TestCampaignScheduler:
             assert message.alias == "victor"
             assert message.from_email == "victor@punthelder.nl"
             assert message.reply_to_email == "christian@punthelder.nl"
+    
+    def test_stopped_and_paused_messages_skipped(self):
+        """Test that stopped/paused campaign messages are skipped without removal scans."""
+        campaign = Campaign(
+            id="test-campaign",
+            name="Test Campaign",
+            template_id="v1_mail1",
+            domain="punthelder-marketing.nl",
+            status=CampaignStatus.draft,
+            start_at=datetime(2025, 9, 29, 8, 0, tzinfo=self.tz)
+        )
+        
+        self.scheduler.schedule_campaign(campaign, ["lead-1", "lead-2"])
+        
+        # Stop one lead (cancels its 4 queued mails) and pause the campaign
+        assert len(self.scheduler.stop_lead("lead-1")) == 4
+        self.scheduler.pause_campaign("test-campaign")
+        
+        for minute in (0, 20):
+            current_time = datetime(2025, 9, 29, 8, minute, tzinfo=self.tz)
+            ready_messages = self.scheduler.get_next_messages_to_send("punthelder-marketing.nl", current_time)
+            assert ready_messages == []
+        
+        # lead-2's first mail is parked
+        parked = self.scheduler.parked_messages["test-campaign"]
+        assert [m.lead_id for m in parked] == ["lead-2"]
+        
+        # Remaining queue holds lead-2's mails 2-4
+        assert len(self.scheduler.domain_queues["punthelder-marketing.nl"]) == 3
+        
+        # Stopping the campaign cancels parked messages
+        self.scheduler.stop_campaign("test-campaign")
+        assert parked[0].status == MessageStatus.canceled
+    
+    def test_next_due_time(self):
+        """Test O(1) lookup of next due time per domain."""
+        campaign = Campaign(
+            id="test-campaign",
+            name="Test Campaign",
+            template_id="v1_mail1",
+            domain="punthelder-marketing.nl",
+            status=CampaignStatus.draft,
+            start_at=datetime(2025, 9, 29, 8, 0, tzinfo=self.tz)
+        )
+        
+        self.scheduler.schedule_campaign(campaign, ["lead-1"])
+        
+        assert self.scheduler.get_next_due_time("punthelder-marketing.nl") == datetime(2025, 9, 29, 8, 0, tzinfo=self.tz)
+        assert self.scheduler.get_next_due_time("punthelder-seo.nl") is None
+    
+    def test_slots_respect_daily_cap(self):
+        """Test that each message gets its own slot and days fill up to the cap."""
+        campaign = Campaign(
+            id="test-campaign",
+            name="Test Campaign",
+            template_id="v1_mail1",
+            domain="punthelder-marketing.nl",
+            status=CampaignStatus.draft,
+            start_at=datetime(2025, 9, 29, 8, 0, tzinfo=self.tz)
+        )
+        
+        lead_ids = [f"lead-{i}" for i in range(100)]
+        self.scheduler.schedule_campaign(campaign, lead_ids)
+        
+        queue = self.scheduler.domain_queues["punthelder-marketing.nl"]
+        times = [item["scheduled_at"] for item in queue]
+        
+        # No two messages share a slot on the domain
+        assert len(times) == len(set(times)) == 400
+        
+        # No day exceeds the daily cap
+        per_day = {}
+        for t in times:
+            per_day[t.date()] = per_day.get(t.date(), 0) + 1
+        assert max(per_day.values()) == SENDING_POLICY.daily_cap_per_domain
+        
+        # Follow-ups come after the lead's first mail
+        by_lead = {}
+        for item in queue:
+            message = item["message"]
+            by_lead.setdefault(message.lead_id, {})[message.mail_number] = message.scheduled_at
+        for mails in by_lead.values():
+            assert mails[1] < mails[2] < mails[3] < mails[4]
+        
+        # Completing the campaign frees its slots
+        self.scheduler.complete_campaign("test-campaign", "punthelder-marketing.nl")
+        assert self.scheduler.slot_allocator.daily_load("punthelder-marketing.nl") == {}
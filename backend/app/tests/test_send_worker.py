@@ -0,0 +1,220 @@
+"""
+Tests for the background send worker that ticks the campaign scheduler.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+from app.models.campaign import Campaign, CampaignStatus, MessageStatus
+from app.services.campaign_scheduler import CampaignScheduler
+from app.services.campaign_store import CampaignStore
+from app.services.send_worker import SendWorker
+
+
+TZ = ZoneInfo("Europe/Amsterdam")
+MONDAY_8AM = datetime(2025, 9, 29, 8, 0, tzinfo=TZ)
+
+
+class FakeSender:
+    """Records sends; optionally slow to exercise the shutdown drain."""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.sent = []
+        self.subjects = []
+
+    async def send_message(self, message, lead, template_content, subject=None):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message.status = MessageStatus.sent
+        self.sent.append((message, lead, template_content))
+        self.subjects.append(subject)
+        return True
+
+
+class FakeLeads:
+    def __init__(self, *lead_ids):
+        self.leads = {
+            lead_id: SimpleNamespace(id=lead_id, email=f"{lead_id}@example.com", company="Acme", url="acme.nl",
+                                     domain="acme.nl", image_key=None, vars={"keyword": "seo"})
+            for lead_id in lead_ids
+        }
+
+    def get_by_id(self, lead_id):
+        return self.leads.get(lead_id)
+
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def _campaign(campaign_id: str, domain: str = "punthelder-marketing.nl") -> Campaign:
+    return Campaign(
+        id=campaign_id,
+        name=campaign_id,
+        template_id="v1_mail1",
+        domain=domain,
+        start_at=MONDAY_8AM,
+        status=CampaignStatus.running
+    )
+
+
+def _worker(scheduler, sender, leads, clock):
+    return SendWorker(scheduler, sender, CampaignStore(), leads, clock=clock)
+
+
+def test_idle_worker_has_no_wakeup():
+    """Nothing queued means nothing to wake up for."""
+    worker = _worker(CampaignScheduler(), FakeSender(), FakeLeads(), Clock(MONDAY_8AM))
+    worker.notify()
+
+    assert worker.next_wakeup() is None
+    assert asyncio.run(worker.tick()) == 0
+
+
+def test_tick_sends_due_messages_and_persists():
+    """Due message is sent with rendered template and stored; next wake-up is the next slot."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["lead-1", "lead-2"])
+    sender = FakeSender()
+    clock = Clock(MONDAY_8AM)
+    worker = _worker(scheduler, sender, FakeLeads("lead-1", "lead-2"), clock)
+    worker.notify("punthelder-marketing.nl")
+
+    assert worker.next_wakeup() == MONDAY_8AM
+    assert asyncio.run(worker.tick()) == 1
+
+    message, lead, content = sender.sent[0]
+    assert lead.id == "lead-1"
+    assert "Acme" in content
+    assert worker.campaign_store.get_message(message.id).status == MessageStatus.sent
+    assert worker.next_wakeup() == MONDAY_8AM + timedelta(minutes=20)
+
+    # Not due yet: nothing happens
+    clock.now = MONDAY_8AM + timedelta(minutes=10)
+    assert asyncio.run(worker.tick()) == 0
+
+    clock.now = MONDAY_8AM + timedelta(minutes=20)
+    assert asyncio.run(worker.tick()) == 1
+    assert sender.sent[1][1].id == "lead-2"
+
+
+def test_send_uses_shared_renderer_subject_and_body():
+    """Worker output matches the preview renderer: rendered subject passed on, CID signature in the body."""
+    from app.core.campaign_flows import get_flow_for_domain
+    from app.core.templates_store import get_template_for_flow
+    from app.services.batch_render import lead_to_render_data
+    from app.services.signature_injector import CID_SIGNATURE_URLS
+    from app.services.template_renderer import render_template_with_lead
+
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["lead-1"])
+    sender = FakeSender()
+    leads = FakeLeads("lead-1")
+    worker = _worker(scheduler, sender, leads, Clock(MONDAY_8AM))
+    worker.notify()
+
+    asyncio.run(worker.tick())
+
+    message, _, content = sender.sent[0]
+    template = get_template_for_flow(get_flow_for_domain(message.domain_used).version, message.mail_number)
+    expected = render_template_with_lead(template.body, template.subject, lead_to_render_data(leads.leads["lead-1"]),
+                                         mail_number=message.mail_number, template_id=template.id,
+                                         signature_urls=CID_SIGNATURE_URLS)
+    assert sender.subjects == [expected["subject"]] and "Acme" in expected["subject"]
+    assert content == expected["html"]
+    assert 'src="cid:signature_christian"' in content
+
+
+def test_backlog_after_downtime_respects_throttle():
+    """A late wake-up sends one message per domain, the rest wait for their throttle window."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["lead-1", "lead-2", "lead-3"])
+    sender = FakeSender()
+    late = MONDAY_8AM + timedelta(hours=1)  # all three first mails are overdue
+    clock = Clock(late)
+    worker = _worker(scheduler, sender, FakeLeads("lead-1", "lead-2", "lead-3"), clock)
+    worker.notify()
+
+    assert asyncio.run(worker.tick()) == 1
+    assert worker.next_wakeup() == late + timedelta(minutes=20)
+    assert asyncio.run(worker.tick()) == 0
+
+    clock.now = late + timedelta(minutes=20)
+    assert asyncio.run(worker.tick()) == 1
+    assert [lead.id for _, lead, _ in sender.sent] == ["lead-1", "lead-2"]
+
+
+def test_send_error_marks_message_failed_and_keeps_queue():
+    """An exception while sending fails that message only; later messages stay queued."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["lead-1", "lead-2"])
+    sender = FakeSender()
+    clock = Clock(MONDAY_8AM + timedelta(hours=1))
+    worker = _worker(scheduler, sender, FakeLeads("lead-1", "lead-2"), clock)
+    worker.notify()
+
+    async def broken(message, lead, template_content, subject=None):
+        raise RuntimeError("SMTP pool exhausted")
+    sender.send_message = broken
+
+    assert asyncio.run(worker.tick()) == 0
+
+    [failed] = worker.campaign_store.messages.values()
+    assert failed.status == MessageStatus.failed
+    assert failed.last_error == "SMTP pool exhausted"
+    assert scheduler.get_next_due_time("punthelder-marketing.nl") is not None
+    assert worker.next_wakeup() == clock.now + timedelta(minutes=20)
+
+
+def test_domains_dispatched_in_same_tick():
+    """Every due domain is handled in one tick."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1", "punthelder-marketing.nl"), ["lead-1"])
+    scheduler.schedule_campaign(_campaign("camp-2", "punthelder-vindbaarheid.nl"), ["lead-2"])
+    sender = FakeSender()
+    worker = _worker(scheduler, sender, FakeLeads("lead-1", "lead-2"), Clock(MONDAY_8AM))
+    worker.notify()
+
+    assert asyncio.run(worker.tick()) == 2
+    assert {m.domain_used for m, _, _ in sender.sent} == {"punthelder-marketing.nl", "punthelder-vindbaarheid.nl"}
+
+
+def test_missing_lead_marks_message_failed():
+    """Messages whose lead disappeared are stored as failed, not sent."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["ghost"])
+    sender = FakeSender()
+    worker = _worker(scheduler, sender, FakeLeads(), Clock(MONDAY_8AM))
+    worker.notify()
+
+    asyncio.run(worker.tick())
+
+    assert sender.sent == []
+    stored = list(worker.campaign_store.messages.values())
+    assert len(stored) == 1
+    assert stored[0].status == MessageStatus.failed
+
+
+def test_loop_sleeps_until_next_slot_and_drains_on_stop():
+    """Running loop sends the due message, then waits; stop() finishes the in-flight send."""
+    scheduler = CampaignScheduler()
+    scheduler.schedule_campaign(_campaign("camp-1"), ["lead-1", "lead-2"])
+    sender = FakeSender(delay=0.05)
+    worker = _worker(scheduler, sender, FakeLeads("lead-1", "lead-2"), Clock(MONDAY_8AM))
+
+    async def scenario():
+        worker.start()
+        await asyncio.sleep(0.01)  # send in flight
+        await worker.stop(timeout=5)
+
+    asyncio.run(scenario())
+
+    assert not worker.running
+    assert len(sender.sent) == 1
+    assert len(worker.campaign_store.messages) == 1
@@ -144,3 +144,34 @@ class TestSendingPolicy:
         
         # Should land on Tuesday (Fri +1, Mon +2, Tue +3)
         assert current.strftime("%a") == "Tue"
+    
+    def test_compiled_slot_grid(self):
+        """Test that compiled policy holds integer minute offsets for all slots."""
+        compiled = SENDING_POLICY.compiled
+        
+        assert compiled.slots_per_day == 27
+        assert compiled.slots[0] == 8 * 60
+        assert compiled.slots[-1] == 16 * 60 + 40
+        assert list(compiled.slot_labels) == SENDING_POLICY.get_daily_slots()
+    
+    def test_compiled_slot_lookups(self):
+        """Test slot index, remaining slots and next slot lookups."""
+        compiled = SENDING_POLICY.compiled
+        tz = compiled.tz
+        
+        monday_0825 = datetime(2025, 9, 29, 8, 25, tzinfo=tz)
+        assert compiled.slot_index(monday_0825) == 1
+        assert compiled.slots_remaining_today(monday_0825) == 25
+        assert compiled.next_slot(monday_0825) == datetime(2025, 9, 29, 8, 40, tzinfo=tz)
+        
+        # After last slot but before window end: next workday
+        monday_1650 = datetime(2025, 9, 29, 16, 50, tzinfo=tz)
+        assert compiled.slot_index(monday_1650) == 26
+        assert compiled.slots_remaining_today(monday_1650) == 0
+        assert compiled.next_slot(monday_1650) == datetime(2025, 9, 30, 8, 0, tzinfo=tz)
+        
+        # Outside window / weekend
+        saturday = datetime(2025, 10, 4, 10, 0, tzinfo=tz)
+        assert compiled.slot_index(saturday) is None
+        assert compiled.slots_remaining_today(saturday) == 0
+        assert compiled.next_day_start(datetime(2025, 10, 3, 18, 30, tzinfo=tz)) == datetime(2025, 10, 6, 8, 0, tzinfo=tz)
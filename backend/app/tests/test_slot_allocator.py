@@ -0,0 +1,97 @@
+"""
+Unit tests for the per-domain slot capacity allocator.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.services.slot_allocator import SlotAllocator
+
+
+TZ = ZoneInfo("Europe/Amsterdam")
+MONDAY = datetime(2025, 9, 29, 8, 0, tzinfo=TZ)
+FLOW = {1: 0, 2: 3, 3: 6, 4: 9}
+
+
+def test_first_mails_fill_day_then_spill():
+    """27 leads fill Monday, the 28th starts Tuesday 08:00."""
+    allocator = SlotAllocator()
+    leads = [f"lead-{i}" for i in range(28)]
+
+    slots = allocator.allocate_campaign("camp-1", "d.nl", leads, MONDAY, {1: 0})
+
+    assert slots[("lead-0", 1)] == MONDAY
+    assert slots[("lead-26", 1)] == datetime(2025, 9, 29, 16, 40, tzinfo=TZ)
+    assert slots[("lead-27", 1)] == datetime(2025, 9, 30, 8, 0, tzinfo=TZ)
+
+
+def test_followups_keep_workday_offsets():
+    """Follow-ups land offset workdays after the lead's first mail."""
+    allocator = SlotAllocator()
+
+    slots = allocator.allocate_campaign("camp-1", "d.nl", ["lead-1"], MONDAY, FLOW)
+
+    assert slots[("lead-1", 2)] == datetime(2025, 10, 2, 8, 0, tzinfo=TZ)
+    assert slots[("lead-1", 3)] == datetime(2025, 10, 7, 8, 0, tzinfo=TZ)
+    assert slots[("lead-1", 4)] == datetime(2025, 10, 10, 8, 0, tzinfo=TZ)
+
+
+def test_domains_are_independent_and_release_is_incremental():
+    """Occupied slots are tracked per domain; releasing a campaign frees only its slots."""
+    allocator = SlotAllocator()
+    allocator.allocate_campaign("camp-a", "a.nl", ["lead-1", "lead-2"], MONDAY, {1: 0})
+    allocator.allocate_campaign("camp-b", "b.nl", ["lead-3"], MONDAY, {1: 0})
+    allocator.allocate_campaign("camp-c", "a.nl", ["lead-4"], MONDAY, {1: 0})
+
+    assert allocator.daily_load("a.nl") == {MONDAY.date(): 3}
+    assert allocator.daily_load("b.nl") == {MONDAY.date(): 1}
+
+    assert allocator.release_campaign("camp-a") == 2
+    assert allocator.daily_load("a.nl") == {MONDAY.date(): 1}
+
+    # Freed slots are reused first
+    slots = allocator.allocate_campaign("camp-d", "a.nl", ["lead-5"], MONDAY, {1: 0})
+    assert slots[("lead-5", 1)] == MONDAY
+
+
+def test_release_relinks_pointers_that_skip_the_freed_slot():
+    """A compressed pointer jumping over a released slot is re-linked; pointers behind it are left alone."""
+    allocator = SlotAllocator()
+    for i, campaign_id in enumerate(["camp-a", "camp-b", "camp-c", "camp-d"]):
+        allocator.allocate_campaign(campaign_id, "d.nl", [f"lead-{i}"], MONDAY, {1: 0})
+    first = allocator._start_slot(MONDAY)
+    parent = allocator._next_free["d.nl"]
+    assert parent[first] == first + 3  # path compression jumped over the next two slots
+    after = parent[first + 2]
+
+    assert allocator.release_campaign("camp-b") == 1
+
+    assert parent is allocator._next_free["d.nl"]  # updated in place, not rebuilt
+    assert parent[first] == first + 1 and parent[first + 2] == after
+    slots = allocator.allocate_campaign("camp-e", "d.nl", ["lead-5"], MONDAY, {1: 0})
+    assert slots[("lead-5", 1)] == datetime(2025, 9, 29, 8, 20, tzinfo=TZ)
+    assert allocator.release("camp-e", [("lead-5", 1), ("lead-x", 1)]) == 1
+    assert allocator.allocate_campaign("camp-f", "d.nl", ["lead-6"], MONDAY, {1: 0})[("lead-6", 1)] == slots[("lead-5", 1)]
+
+
+def test_reallocate_moves_to_next_free_slots():
+    """Reallocated messages take consecutive free slots from the new start."""
+    allocator = SlotAllocator()
+    allocator.allocate_campaign("camp-1", "d.nl", ["lead-1", "lead-2"], MONDAY, {1: 0})
+
+    tuesday = datetime(2025, 9, 30, 8, 0, tzinfo=TZ)
+    slots = allocator.reallocate("camp-1", [("lead-1", 1), ("lead-2", 1)], tuesday)
+
+    assert slots[("lead-1", 1)] == tuesday
+    assert slots[("lead-2", 1)] == datetime(2025, 9, 30, 8, 20, tzinfo=TZ)
+    assert allocator.daily_load("d.nl") == {tuesday.date(): 2}
+
+
+def test_plan_daily_counts_does_not_record():
+    """Dry-run planning honours the cap and leaves the allocator untouched."""
+    allocator = SlotAllocator()
+
+    counts = allocator.plan_daily_counts("d.nl", 100, MONDAY, FLOW)
+
+    assert sum(counts.values()) == 400
+    assert max(counts.values()) == 27
+    assert allocator.daily_load("d.nl") == {}
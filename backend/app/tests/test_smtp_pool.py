@@ -0,0 +1,214 @@
+"""
+Unit tests for the pooled SMTP sessions.
+"""
+import asyncio
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+HOST, PORT, USER, PASSWORD = "smtp.test.com", 587, "christian@punthelder-marketing.nl", "secret"
+
+
+def _server():
+    server = MagicMock()
+    server.noop.return_value = (250, b"OK")
+    return server
+
+
+def _msg(to="lead@example.com"):
+    msg = MIMEText("<html>Hi</html>", "html")
+    msg["To"] = to
+    return msg
+
+
+@patch("smtplib.SMTP")
+def test_session_reused_across_sends(mock_smtp_class):
+    """STARTTLS and LOGIN happen once; later sends NOOP-check the idle session."""
+    server = _server()
+    mock_smtp_class.return_value = server
+    pool = SMTPConnectionPool()
+
+    for _ in range(3):
+        pool.send(HOST, PORT, USER, PASSWORD, _msg())
+
+    assert mock_smtp_class.call_count == 1
+    server.starttls.assert_called_once()
+    server.login.assert_called_once_with(USER, PASSWORD)
+    assert server.send_message.call_count == 3
+    assert server.noop.call_count == 2
+    assert pool.idle_count(HOST, PORT, USER) == 1
+
+
+@patch("smtplib.SMTP")
+def test_dead_session_replaced_after_failed_noop(mock_smtp_class):
+    """A session that fails NOOP is closed and a fresh one is opened."""
+    stale, fresh = _server(), _server()
+    stale.noop.side_effect = smtplib.SMTPServerDisconnected("gone")
+    mock_smtp_class.side_effect = [stale, fresh]
+    pool = SMTPConnectionPool()
+
+    pool.send(HOST, PORT, USER, PASSWORD, _msg())
+    pool.send(HOST, PORT, USER, PASSWORD, _msg())
+
+    assert mock_smtp_class.call_count == 2
+    assert fresh.send_message.call_count == 1
+
+
+@patch("smtplib.SMTP")
+def test_reconnect_on_server_disconnect(mock_smtp_class):
+    """Disconnect during send retries once on a new session."""
+    broken, fresh = _server(), _server()
+    broken.send_message.side_effect = smtplib.SMTPServerDisconnected("closed")
+    mock_smtp_class.side_effect = [broken, fresh]
+    pool = SMTPConnectionPool()
+
+    pool.send(HOST, PORT, USER, PASSWORD, _msg())
+
+    fresh.send_message.assert_called_once()
+    assert pool.idle_count(HOST, PORT, USER) == 1
+
+
+@patch("smtplib.SMTP")
+def test_login_failure_releases_slot(mock_smtp_class):
+    """Failed logins raise and do not leak pool capacity."""
+    server = _server()
+    server.login.side_effect = smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+    mock_smtp_class.return_value = server
+    pool = SMTPConnectionPool(max_per_domain=1, acquire_timeout=0.1)
+
+    for _ in range(2):
+        with pytest.raises(smtplib.SMTPAuthenticationError):
+            pool.send(HOST, PORT, USER, PASSWORD, _msg())
+    assert pool.idle_count(HOST, PORT, USER) == 0
+
+
+@patch("smtplib.SMTP")
+def test_sessions_capped_per_key(mock_smtp_class):
+    """With max_per_domain=1 a second concurrent sender waits and then reuses the session."""
+    in_send = threading.Event()
+    release = threading.Event()
+    server = _server()
+
+    def slow_send(msg):
+        in_send.set()
+        release.wait(2)
+
+    server.send_message.side_effect = slow_send
+    mock_smtp_class.return_value = server
+    pool = SMTPConnectionPool(max_per_domain=1, acquire_timeout=0.05)
+
+    first = threading.Thread(target=pool.send, args=(HOST, PORT, USER, PASSWORD, _msg()))
+    first.start()
+    in_send.wait(2)
+
+    with pytest.raises(smtplib.SMTPException):
+        pool.send(HOST, PORT, USER, PASSWORD, _msg())
+
+    release.set()
+    first.join(2)
+    pool.send(HOST, PORT, USER, PASSWORD, _msg())
+    assert mock_smtp_class.call_count == 1
+
+
+@patch("smtplib.SMTP")
+def test_sessions_capped_per_sending_domain_on_shared_login(mock_smtp_class):
+    """Domains sharing one SMTP login each get their own cap; a busy domain does not block another."""
+    in_send = threading.Event()
+    release = threading.Event()
+    busy, other = _server(), _server()
+
+    def slow_send(msg):
+        in_send.set()
+        release.wait(2)
+
+    busy.send_message.side_effect = slow_send
+    mock_smtp_class.side_effect = [busy, other]
+    pool = SMTPConnectionPool(max_per_domain=1, acquire_timeout=0.05)
+
+    first = threading.Thread(target=pool.send, args=(HOST, PORT, USER, PASSWORD, _msg(), "a.nl"))
+    first.start()
+    in_send.wait(2)
+
+    with pytest.raises(smtplib.SMTPException, match="a.nl"):
+        pool.send(HOST, PORT, USER, PASSWORD, _msg(), "a.nl")
+    pool.send(HOST, PORT, USER, PASSWORD, _msg(), "b.nl")
+
+    release.set()
+    first.join(2)
+    other.send_message.assert_called_once()
+    assert pool.idle_count(HOST, PORT, USER) == 2  # both sessions reusable by either domain
+
+
+@patch("smtplib.SMTP")
+def test_send_async_runs_off_event_loop(mock_smtp_class):
+    """send_async executes the blocking send on the pool's worker threads."""
+    threads = []
+    server = _server()
+    server.send_message.side_effect = lambda msg: threads.append(threading.current_thread().name)
+    mock_smtp_class.return_value = server
+    pool = SMTPConnectionPool()
+
+    asyncio.run(pool.send_async(HOST, PORT, USER, PASSWORD, _msg()))
+    pool.close_all()
+
+    assert threads[0].startswith("smtp")
+    server.quit.assert_called_once()
+
+
+@patch("smtplib.SMTP")
+def test_capped_domain_waits_on_event_loop_not_on_workers(mock_smtp_class):
+    """Queued sends for a capped domain don't hold pool threads, so other domains keep sending."""
+    release = threading.Event()
+
+    def send_message(msg):
+        if msg["To"].endswith("@a-lead.nl"):
+            release.wait(2)
+
+    def new_server(*args, **kwargs):
+        server = _server()
+        server.send_message.side_effect = send_message
+        return server
+
+    mock_smtp_class.side_effect = new_server
+    pool = SMTPConnectionPool(max_per_domain=1, workers=2)
+
+    async def scenario():
+        busy = [asyncio.create_task(pool.send_async(HOST, PORT, USER, PASSWORD, _msg("x@a-lead.nl"), "a.nl"))
+                for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(pool.send_async(HOST, PORT, USER, PASSWORD, _msg(), "b.nl"), 1)
+        release.set()
+        await asyncio.gather(*busy)
+
+    asyncio.run(scenario())
+    pool.close_all()
+
+    assert mock_smtp_class.call_count == 2  # one session per domain, a.nl's reused in turn
+
+
+@patch("smtplib.SMTP")
+def test_send_async_times_out_waiting_for_domain_slot(mock_smtp_class):
+    """A send that can't get a slot within acquire_timeout fails without touching a thread."""
+    release = threading.Event()
+    server = _server()
+    server.send_message.side_effect = lambda msg: release.wait(2)
+    mock_smtp_class.return_value = server
+    pool = SMTPConnectionPool(max_per_domain=1, acquire_timeout=0.05)
+
+    async def scenario():
+        first = asyncio.create_task(pool.send_async(HOST, PORT, USER, PASSWORD, _msg(), "a.nl"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(smtplib.SMTPException, match="a.nl"):
+            await pool.send_async(HOST, PORT, USER, PASSWORD, _msg(), "a.nl")
+        release.set()
+        await first
+
+    asyncio.run(scenario())
+    pool.close_all()
+    assert server.send_message.call_count == 1
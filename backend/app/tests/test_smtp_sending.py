@@ -36,7 +36,7 @@ class TestSMTPSending:
         """Test successful SMTP email sending."""
         # Setup mock SMTP server
         mock_server = MagicMock()
-        mock_smtp_class.return_value.__enter__.return_value = mock_server
+        mock_smtp_class.return_value = mock_server
         
         # Create test template
         from app.schemas.template import TemplateCreate
@@ -104,7 +104,7 @@ class TestSMTPSending:
         # Setup mock to raise auth error
         mock_server = MagicMock()
         mock_server.login.side_effect = smtplib.SMTPAuthenticationError(535, 'Authentication failed')
-        mock_smtp_class.return_value.__enter__.return_value = mock_server
+        mock_smtp_class.return_value = mock_server
         
         # Create template
         from app.schemas.template import TemplateCreate
@@ -323,3 +323,83 @@ def test_stats_endpoints_require_auth():
     for endpoint in endpoints:
         response = client.get(endpoint)
         assert response.status_code == 401
+
+
+def _message(i, day, domain="punthelder.nl", campaign_id="c1"):
+    return Message(id=f"m{i}", campaign_id=campaign_id, lead_id=f"l{i}", domain_used=domain,
+                   scheduled_at=datetime(2025, 1, day), created_at=datetime(2025, 1, day, 8))
+
+
+def test_stats_service_follows_store_transitions():
+    """Buckets are updated incrementally on queued -> sent -> opened/bounced"""
+    from app.services.campaign_store import CampaignStore
+
+    store = CampaignStore()
+    store.create_campaign(Campaign(id="c1", name="Januari", template_id="t1", created_at=datetime(2025, 1, 1)))
+    store.create_messages([_message(1, 2), _message(2, 3, domain="mailbox.nl"), _message(3, 5, campaign_id="c2")])
+    service = StatsService()
+    service.attach(store)
+
+    assert service.get_stats_summary().global_stats.total_sent == 0
+
+    for message_id, day in (("m1", 6), ("m2", 7), ("m3", 9)):
+        message = store.get_message(message_id)
+        message.status, message.sent_at = MessageStatus.sent, datetime(2025, 1, day, 9)
+        store.save_message(message)
+    opened = store.get_message("m1")
+    opened.status, opened.open_at = MessageStatus.opened, datetime(2025, 1, 8, 10)
+    store.save_message(opened)
+    store.update_message_status("m2", MessageStatus.bounced, "5.1.1")
+
+    summary = service.get_stats_summary()
+    assert summary.global_stats.model_dump() == {'total_sent': 1, 'total_opens': 1, 'open_rate': 1.0, 'bounces': 1}
+    assert [(d.domain, d.sent, d.opens, d.bounces, d.last_activity) for d in summary.domains] == [
+        ('punthelder.nl', 1, 1, 0, '2025-01-09T09:00:00'), ('mailbox.nl', 0, 0, 1, '2025-01-07T09:00:00')
+    ]
+    campaigns = {c.id: c for c in summary.campaigns}
+    assert campaigns['c1'].name == "Januari" and campaigns['c1'].bounces == 1
+    assert campaigns['c2'].name == "Campaign c2" and campaigns['c2'].sent == 1
+    assert [(p.date, p.sent, p.opens) for p in summary.timeline.sent_by_day] == [
+        ('2025-01-06', 1, 0), ('2025-01-07', 1, 0), ('2025-01-08', 0, 1), ('2025-01-09', 1, 0)
+    ]
+
+    # Date ranges select day buckets by send date (creation date while unsent)
+    ranged = service.get_stats_summary(from_date=date(2025, 1, 7), to_date=date(2025, 1, 9))
+    assert (ranged.global_stats.total_sent, ranged.global_stats.total_opens) == (1, 0)
+    assert sorted(c.id for c in ranged.campaigns) == ['c1', 'c2']
+    assert [d.domain for d in ranged.domains] == ['punthelder.nl', 'mailbox.nl']
+    assert service.get_stats_summary(from_date=date(2025, 1, 10)).domains == []
+
+
+def test_stats_service_matches_message_scan():
+    """Pre-aggregated results equal a direct pass over the messages for any range"""
+    messages = []
+    for i in range(60):
+        message = _message(i, 1 + i % 20, domain=f"d{i % 3}.nl", campaign_id=f"c{i % 4}")
+        if i % 5:
+            message.status, message.sent_at = MessageStatus.sent, datetime(2025, 1, 2 + i % 20, 9)
+            if i % 3 == 0:
+                message.status, message.open_at = MessageStatus.opened, datetime(2025, 1, 3 + i % 20, 9)
+            elif i % 7 == 0:
+                message.status = MessageStatus.bounced
+        messages.append(message)
+    service = StatsService()
+    service.messages = messages
+
+    for from_day, to_day in ((None, None), (3, 3), (5, 14), (1, 31), (18, None)):
+        from_date = date(2025, 1, from_day) if from_day else None
+        to_date = date(2025, 1, to_day) if to_day else None
+        in_range = [m for m in messages
+                    if (not from_date or (m.sent_at or m.created_at).date() >= from_date)
+                    and (not to_date or (m.sent_at or m.created_at).date() <= to_date)]
+        summary = service.get_stats_summary(from_date, to_date)
+
+        assert summary.global_stats.total_sent == sum(m.status == MessageStatus.sent for m in in_range)
+        assert summary.global_stats.total_opens == sum(m.open_at is not None for m in in_range)
+        assert summary.global_stats.bounces == sum(m.status == MessageStatus.bounced for m in in_range)
+        for stat in summary.domains:
+            domain = [m for m in in_range if m.domain_used == stat.domain]
+            assert stat.sent == sum(m.status == MessageStatus.sent for m in domain)
+            assert stat.last_activity == max(m.open_at or m.sent_at or m.created_at for m in domain).isoformat()
+        assert {c.id for c in summary.campaigns} == {m.campaign_id for m in in_range}
+        assert sum(p.opens for p in summary.timeline.sent_by_day) == summary.global_stats.total_opens
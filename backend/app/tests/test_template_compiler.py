@@ -0,0 +1,79 @@
+"""
+Tests for compiled templates and the template cache.
+"""
+from app.core.templates_store import HARD_CODED_TEMPLATES, precompile_templates
+from app.services.template_compiler import CompiledTemplate, TemplateCache, Token, template_cache
+
+
+def test_compile_splits_literals_and_tokens():
+    """Template is parsed once into literal chunks and tokens."""
+    compiled = CompiledTemplate("Hi {{lead.company}}, see {{ vars.keyword }}!")
+
+    assert compiled.parts[0] == "Hi "
+    assert isinstance(compiled.parts[1], Token)
+    assert compiled.parts[1].var == "lead.company"
+    assert compiled.variables == ["lead.company", "vars.keyword"]
+
+
+def test_render_resolves_accessors_and_warnings():
+    compiled = CompiledTemplate("{{lead.email}} {{vars.score}} {{campaign.name}} {{image.cid 'hero'}}")
+    context = {"lead": {"email": "a@b.nl", "image_key": "img1"}, "vars": {}, "campaign": {"name": "Q4"}}
+
+    rendered, warnings = compiled.render(context)
+
+    assert rendered == "a@b.nl  Q4 cid:img1_hero"
+    assert warnings == ["Variable 'vars.score' not found in lead data"]
+
+
+def test_helper_pipeline_parsed_once():
+    """Helpers run as a prebuilt pipeline, also on lead and vars fields."""
+    compiled = CompiledTemplate("{{lead.company|default 'uw bedrijf'|uppercase}} {{vars.city|lowercase}}")
+
+    rendered, _ = compiled.render({"lead": {}, "vars": {"city": "UTRECHT"}})
+
+    assert rendered == "UW BEDRIJF utrecht"
+
+
+def test_values_are_not_reinterpreted():
+    """A value containing {{...}} is output as-is, not rendered again."""
+    compiled = CompiledTemplate("{{lead.company}} {{lead.email}}")
+
+    rendered, _ = compiled.render({"lead": {"company": "{{lead.email}}", "email": "x@y.nl"}})
+
+    assert rendered == "{{lead.email}} x@y.nl"
+
+
+def test_substitute_keeps_unknown_placeholders():
+    compiled = CompiledTemplate("{{lead.company}} - {{lead.url}}")
+
+    assert compiled.substitute({"lead.company": "Acme"}) == "Acme - {{lead.url}}"
+
+
+def test_cache_by_id_recompiles_on_change():
+    cache = TemplateCache()
+    first = cache.get("Hello {{lead.company}}", "tpl-1")
+
+    assert cache.get("Hello {{lead.company}}", "tpl-1") is first
+    changed = cache.get("Hi {{lead.company}}", "tpl-1")
+    assert changed is not first
+    assert changed.source == "Hi {{lead.company}}"
+
+
+def test_cache_by_content_is_bounded():
+    cache = TemplateCache(max_anonymous=2)
+    a = cache.get("a {{x}}")
+    cache.get("b {{x}}")
+    cache.get("c {{x}}")
+
+    assert len(cache) == 2
+    assert cache.get("a {{x}}") is not a
+
+
+def test_precompile_hard_coded_templates():
+    """All 16 hard-coded templates are compiled into the shared cache."""
+    assert precompile_templates() == 16
+
+    template = HARD_CODED_TEMPLATES["v1_mail1"]
+    compiled = template_cache.get(template.body, "v1_mail1:body")
+    assert template_cache.get(template.body, "v1_mail1:body") is compiled
+    assert "lead.company" in compiled.variables
@@ -21,7 +21,7 @@ class TestUnsubscribeEndpoint:
         """Clear stores and create test client."""
         campaign_store.messages.clear()
         campaign_store.events.clear()
-        leads_store._leads.clear()  # Clear internal list
+        leads_store.clear()  # Clear records and indexes
         self.client = TestClient(app)
         self.sender = MessageSender()
     
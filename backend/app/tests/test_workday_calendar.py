@@ -0,0 +1,64 @@
+"""
+Unit tests for closed-form workday arithmetic.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.core.workday_calendar import WorkdayCalendar
+
+
+def _walk(calendar: WorkdayCalendar, start: date, n: int) -> date:
+    """Reference implementation: step one day at a time."""
+    day, added = start, 0
+    while added < n:
+        day += timedelta(days=1)
+        if calendar.is_workday(day):
+            added += 1
+    return day
+
+
+def test_add_workdays_skips_weekend():
+    """Monday + 3 workdays = Thursday, + 9 = Friday next week."""
+    calendar = WorkdayCalendar.from_day_names(["Mon", "Tue", "Wed", "Thu", "Fri"])
+    monday = date(2025, 9, 29)
+
+    assert calendar.add_workdays(monday, 0) == monday
+    assert calendar.add_workdays(monday, 3) == date(2025, 10, 2)
+    assert calendar.add_workdays(monday, 6) == date(2025, 10, 7)
+    assert calendar.add_workdays(monday, 9) == date(2025, 10, 10)
+
+
+def test_add_workdays_from_weekend():
+    """Starting on Saturday, the first workday is Monday."""
+    calendar = WorkdayCalendar.from_day_names(["Mon", "Tue", "Wed", "Thu", "Fri"])
+    saturday = date(2025, 10, 4)
+
+    assert calendar.add_workdays(saturday, 1) == date(2025, 10, 6)
+    assert calendar.add_workdays(saturday, 5) == date(2025, 10, 10)
+    assert calendar.next_workday(saturday) == date(2025, 10, 6)
+
+
+def test_matches_day_walk_with_holidays():
+    """Closed form equals the day-by-day walk, including holidays."""
+    holidays = [date(2025, 12, 25), date(2025, 12, 26), date(2026, 1, 1), date(2025, 12, 27)]
+    calendar = WorkdayCalendar([0, 1, 2, 3, 4], holidays)
+
+    start = date(2025, 12, 1)
+    for offset in range(60):
+        day = start + timedelta(days=offset % 40)
+        assert calendar.add_workdays(day, offset) == _walk(calendar, day, offset)
+
+
+def test_workdays_between():
+    """Count of workdays in (start, end]."""
+    calendar = WorkdayCalendar([0, 1, 2, 3, 4], [date(2025, 10, 1)])
+
+    assert calendar.workdays_between(date(2025, 9, 29), date(2025, 10, 6)) == 4
+    assert calendar.workdays_between(date(2025, 10, 6), date(2025, 9, 29)) == 0
+
+
+def test_requires_workdays():
+    """An empty workday set is rejected."""
+    with pytest.raises(ValueError):
+        WorkdayCalendar([])
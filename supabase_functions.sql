@@ -92,6 +92,73 @@ $$ LANGUAGE plpgsql;
 
 COMMENT ON FUNCTION restore_lead IS 'Restore een soft-deleted lead';
 
+-- Function 5a: Template variables completeness of lead fields (mirrors TemplateVariablesService)
+CREATE OR REPLACE FUNCTION lead_vars_complete(company VARCHAR, url TEXT, image_key VARCHAR, vars JSONB)
+RETURNS BOOLEAN AS $$
+    SELECT
+        COALESCE(company, '') != '' AND
+        COALESCE(url, '') != '' AND
+        COALESCE(vars->>'keyword', '') != '' AND
+        COALESCE(vars->>'google_rank', '') != '' AND
+        COALESCE(image_key, '') != '';
+$$ LANGUAGE sql IMMUTABLE;
+
+COMMENT ON FUNCTION lead_vars_complete IS 'Zijn alle template variabelen van een lead gevuld; aanpassen als de template set wijzigt';
+
+-- Function 5c: Recompute materialised completeness (na wijziging template set)
+CREATE OR REPLACE FUNCTION refresh_lead_completeness()
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE leads l
+    SET vars_complete = lead_vars_complete(l.company, l.url, l.image_key, l.vars),
+        has_report = EXISTS(SELECT 1 FROM report_links rl WHERE rl.lead_id = l.id)
+    WHERE l.vars_complete IS DISTINCT FROM lead_vars_complete(l.company, l.url, l.image_key, l.vars)
+       OR l.has_report IS DISTINCT FROM EXISTS(SELECT 1 FROM report_links rl WHERE rl.lead_id = l.id);
+    
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION refresh_lead_completeness IS 'Herbereken has_report/vars_complete voor alle leads';
+
+-- Function 5b: Batch upsert leads by email (imports)
+CREATE OR REPLACE FUNCTION upsert_leads(leads_json JSONB)
+RETURNS TABLE(lead_email VARCHAR, created BOOLEAN) AS $$
+BEGIN
+    RETURN QUERY
+    WITH upserted AS (
+        INSERT INTO leads AS l (id, email, company, url, domain, status, tags, image_key, list_name, vars)
+        SELECT
+            r.id, r.email, r.company, r.url, r.domain,
+            COALESCE(r.status, 'active'),
+            COALESCE(r.tags, '[]'::jsonb),
+            r.image_key, r.list_name,
+            COALESCE(r.vars, '{}'::jsonb)
+        FROM jsonb_to_recordset(leads_json) AS r(
+            id VARCHAR, email VARCHAR, company VARCHAR, url TEXT, domain VARCHAR, status VARCHAR,
+            tags JSONB, image_key VARCHAR, list_name VARCHAR, vars JSONB
+        )
+        ON CONFLICT (email) DO UPDATE SET
+            -- Empty values never overwrite stored ones; vars are merged
+            company = COALESCE(NULLIF(EXCLUDED.company, ''), l.company),
+            url = COALESCE(NULLIF(EXCLUDED.url, ''), l.url),
+            domain = COALESCE(NULLIF(EXCLUDED.domain, ''), l.domain),
+            status = EXCLUDED.status,
+            tags = CASE WHEN EXCLUDED.tags = '[]'::jsonb THEN l.tags ELSE EXCLUDED.tags END,
+            image_key = COALESCE(NULLIF(EXCLUDED.image_key, ''), l.image_key),
+            list_name = COALESCE(NULLIF(EXCLUDED.list_name, ''), l.list_name),
+            vars = COALESCE(l.vars, '{}'::jsonb) || EXCLUDED.vars
+        RETURNING l.email, (l.xmax = 0) AS inserted
+    )
+    SELECT u.email, u.inserted FROM upserted u;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION upsert_leads IS 'Batch upsert van leads op email; vars worden gemerged, created=true voor nieuwe leads';
+
 -- ============================================================================
 -- CAMPAIGNS MODULE FUNCTIONS
 -- ============================================================================
@@ -408,7 +475,7 @@ COMMENT ON FUNCTION get_table_sizes IS 'Get sizes van alle tabellen voor monitor
 -- ============================================================================
 -- FUNCTION DEPLOYMENT COMPLETE
 -- ============================================================================
--- Total functions created: 16 functions
+-- Total functions created: 19 functions
 -- Usage: Various business logic, maintenance, and utility functions
 -- Next step: Run supabase_triggers.sql
 -- ============================================================================
@@ -159,6 +159,13 @@ CREATE INDEX IF NOT EXISTS idx_mail_messages_linked_message ON mail_messages(lin
 CREATE INDEX IF NOT EXISTS idx_mail_messages_weak_link ON mail_messages(weak_link) 
     WHERE weak_link = TRUE;
 
+-- Dedupe bij fetch: één rij per (account, folder, UID), bulk insert met ON CONFLICT DO NOTHING
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mail_messages_account_folder_uid ON mail_messages(account_id, folder, uid);
+
+-- Ongelezen filter (unread=true op /inbox/messages)
+CREATE INDEX IF NOT EXISTS idx_mail_messages_unread ON mail_messages(account_id, received_at DESC)
+    WHERE is_read = FALSE;
+
 -- Mail fetch runs indexes
 CREATE INDEX IF NOT EXISTS idx_mail_fetch_runs_account_id ON mail_fetch_runs(account_id);
 CREATE INDEX IF NOT EXISTS idx_mail_fetch_runs_started_at ON mail_fetch_runs(started_at DESC);
@@ -182,6 +189,14 @@ CREATE INDEX IF NOT EXISTS idx_leads_incomplete ON leads(id, company, url, vars)
     WHERE (company IS NULL OR url IS NULL OR vars = '{}'::jsonb) 
     AND deleted_at IS NULL;
 
+-- Materialised completeness filter (is_complete=true/false op /leads)
+CREATE INDEX IF NOT EXISTS idx_leads_is_complete ON leads(is_complete, created_at DESC)
+    WHERE deleted_at IS NULL;
+
+-- Keyset paginatie (cursor = created_at, id) op /leads; diepe pagina's zonder OFFSET
+CREATE INDEX IF NOT EXISTS idx_leads_keyset ON leads(created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
 CREATE INDEX IF NOT EXISTS idx_messages_failed_retryable ON messages(id, campaign_id, lead_id, retry_count) 
     WHERE status = 'failed' AND retry_count < 3;
 
@@ -29,15 +29,26 @@ CREATE TABLE IF NOT EXISTS leads (
     last_open_at TIMESTAMPTZ,
     vars JSONB DEFAULT '{}'::jsonb,
     stopped BOOLEAN DEFAULT FALSE,
+    has_report BOOLEAN NOT NULL DEFAULT FALSE,
+    vars_complete BOOLEAN NOT NULL DEFAULT FALSE,
+    is_complete BOOLEAN GENERATED ALWAYS AS (has_report AND vars_complete) STORED,
     deleted_at TIMESTAMPTZ,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Bestaande databases: materialised completeness kolommen toevoegen
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS has_report BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS vars_complete BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS is_complete BOOLEAN GENERATED ALWAYS AS (has_report AND vars_complete) STORED;
+
 COMMENT ON TABLE leads IS 'Lead informatie met email tracking en custom variables';
 COMMENT ON COLUMN leads.email IS 'Unique email address';
 COMMENT ON COLUMN leads.vars IS 'Custom variables zoals keyword, google_rank';
 COMMENT ON COLUMN leads.stopped IS 'Lead stop functionaliteit - geen emails meer sturen';
+COMMENT ON COLUMN leads.has_report IS 'Er is een rapport gekoppeld (bijgehouden door trigger op report_links)';
+COMMENT ON COLUMN leads.vars_complete IS 'Alle template variabelen + image gevuld (bijgehouden door trigger op leads)';
+COMMENT ON COLUMN leads.is_complete IS 'Materialised compleetheid: has_report AND vars_complete';
 COMMENT ON COLUMN leads.deleted_at IS 'Soft delete timestamp';
 
 -- Table: assets
@@ -218,12 +229,32 @@ CREATE TABLE IF NOT EXISTS mail_accounts (
     active BOOLEAN DEFAULT TRUE,
     last_fetch_at TIMESTAMPTZ,
     last_seen_uid INTEGER,
+    folders JSONB DEFAULT '["INBOX"]'::jsonb,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Bestaande databases: folders kolom toevoegen
+ALTER TABLE mail_accounts ADD COLUMN IF NOT EXISTS folders JSONB DEFAULT '["INBOX"]'::jsonb;
+
 COMMENT ON TABLE mail_accounts IS 'IMAP account configuratie';
 COMMENT ON COLUMN mail_accounts.secret_ref IS 'Reference naar encrypted password, NOOIT plain text';
+COMMENT ON COLUMN mail_accounts.folders IS 'Te synchroniseren folders, bv. ["INBOX", "Junk"] voor bounces en auto-replies';
+
+-- Table: mail_sync_state
+CREATE TABLE IF NOT EXISTS mail_sync_state (
+    account_id VARCHAR NOT NULL,
+    folder VARCHAR(100) NOT NULL DEFAULT 'INBOX',
+    uidvalidity BIGINT,
+    last_seen_uid INTEGER,
+    highest_modseq BIGINT,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (account_id, folder)
+);
+
+COMMENT ON TABLE mail_sync_state IS 'Incrementele IMAP sync status per account en folder';
+COMMENT ON COLUMN mail_sync_state.uidvalidity IS 'Bij wijziging zijn opgeslagen UIDs ongeldig: begrensde resync';
+COMMENT ON COLUMN mail_sync_state.highest_modseq IS 'CONDSTORE HIGHESTMODSEQ, NULL als server geen CONDSTORE ondersteunt';
 
 -- Table: mail_messages
 CREATE TABLE IF NOT EXISTS mail_messages (
@@ -308,15 +308,63 @@ $$ LANGUAGE plpgsql;
 --     WHEN (OLD.status IS DISTINCT FROM NEW.status)
 --     EXECUTE FUNCTION notify_campaign_status_change();
 
+-- ============================================================================
+-- LEAD COMPLETENESS (materialised)
+-- ============================================================================
+
+-- Function: Recompute vars_complete when fields used by templates change
+CREATE OR REPLACE FUNCTION update_lead_vars_complete()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.vars_complete = lead_vars_complete(NEW.company, NEW.url, NEW.image_key, NEW.vars);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger 14: Lead content change updates vars_complete
+DROP TRIGGER IF EXISTS trigger_leads_vars_complete ON leads;
+CREATE TRIGGER trigger_leads_vars_complete
+    BEFORE INSERT OR UPDATE OF company, url, image_key, vars ON leads
+    FOR EACH ROW
+    EXECUTE FUNCTION update_lead_vars_complete();
+
+COMMENT ON TRIGGER trigger_leads_vars_complete ON leads IS 'Houd leads.vars_complete bij';
+
+-- Function: Recompute has_report for the lead(s) of a changed report link
+CREATE OR REPLACE FUNCTION update_lead_has_report()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.lead_id IS NOT NULL THEN
+        UPDATE leads
+        SET has_report = EXISTS(SELECT 1 FROM report_links rl WHERE rl.lead_id = OLD.lead_id)
+        WHERE id = OLD.lead_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.lead_id IS NOT NULL THEN
+        UPDATE leads SET has_report = TRUE WHERE id = NEW.lead_id AND NOT has_report;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger 15: Report (un)binding updates lead has_report
+DROP TRIGGER IF EXISTS trigger_report_links_has_report ON report_links;
+CREATE TRIGGER trigger_report_links_has_report
+    AFTER INSERT OR DELETE OR UPDATE OF lead_id ON report_links
+    FOR EACH ROW
+    EXECUTE FUNCTION update_lead_has_report();
+
+COMMENT ON TRIGGER trigger_report_links_has_report ON report_links IS 'Houd leads.has_report bij';
+
 -- ============================================================================
 -- TRIGGER DEPLOYMENT COMPLETE
 -- ============================================================================
--- Active triggers: 9 enabled triggers
+-- Active triggers: 11 enabled triggers
 -- Disabled triggers: 4 disabled (voor future use)
 -- Key features:
 --   - Auto-update updated_at timestamps
 --   - Auto-update campaign status
 --   - Auto-update lead tracking fields
+--   - Materialised lead completeness (vars_complete, has_report)
 --   - Auto-create message events
 -- Next step: Run supabase_rls.sql (optional voor multi-tenant)
 -- ============================================================================